@@ -0,0 +1,167 @@
+# benchmarks/bench_compression.py
+# SPDX-License-Identifier: MIT
+"""
+Size/CPU trade-offs of payload compression on real packets.
+
+    python benchmarks/bench_compression.py --dir "<Saved Games>/.../Elite Dangerous"
+    python benchmarks/bench_compression.py --dir ... --train elite.dict   # write a zlib dictionary
+
+Packets are rebuilt the way the parser publishes them (format_packet + compact JSON)
+from the journal, ModulesInfo.json and JournalLoadoutCache.json in --dir. Without
+--dir a synthetic Loadout/FSDJump set is used. The first 80% of packets train the
+dictionary; results are measured on the remaining 20%.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import (  # noqa: E402
+    Compressor,
+    available_codecs,
+    decompress,
+    train_dictionary,
+)
+from utils.serial_output import format_packet  # noqa: E402
+
+
+def _encode(packet: dict) -> bytes:
+    return json.dumps(packet, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def real_packets(elite_dir: str, limit: int) -> list[bytes]:
+    out: list[bytes] = []
+    for name, source, type_ in (
+        ("ModulesInfo.json", "modules", "ModulesSnapshot"),
+        ("JournalLoadoutCache.json", "loadout", "Loadout"),
+    ):
+        path = os.path.join(elite_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                out.append(_encode(format_packet(source, type_, json.load(f))))
+    for path in sorted(glob.glob(os.path.join(elite_dir, "Journal*.log")), reverse=True):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                out.append(_encode(format_packet("journal", entry.get("event"), entry)))
+        if len(out) >= limit:
+            break
+    return out[:limit]
+
+
+def synthetic_packets(n: int) -> list[bytes]:
+    out = []
+    for i in range(n):
+        if i % 10 == 0:
+            modules = [
+                {
+                    "Slot": f"Slot{j:02d}",
+                    "Item": f"int_module_size{j % 6}_class{j % 5}",
+                    "Health": 1.0,
+                    "Priority": j % 4,
+                    "On": True,
+                }
+                for j in range(40)
+            ]
+            out.append(
+                _encode(
+                    format_packet("loadout", "Loadout", {"Ship": "krait_mkii", "Modules": modules})
+                )
+            )
+        else:
+            factions = [
+                {
+                    "Name": f"Faction {j}",
+                    "FactionState": "None",
+                    "Government": "Democracy",
+                    "Influence": 0.1 * j,
+                    "Allegiance": "Federation",
+                    "Happiness": "Happy",
+                }
+                for j in range(7)
+            ]
+            out.append(
+                _encode(
+                    format_packet(
+                        "journal",
+                        "FSDJump",
+                        {
+                            "event": "FSDJump",
+                            "StarSystem": f"Sys {i}",
+                            "SystemAddress": 1000 + i,
+                            "StarPos": [i * 1.5, -i * 0.5, i * 2.25],
+                            "JumpDist": 12.5,
+                            "FuelUsed": 1.2,
+                            "Factions": factions,
+                        },
+                    )
+                )
+            )
+    return out
+
+
+def bench(label: str, comp: Compressor, packets: list[bytes]) -> None:
+    raw = sum(len(p) for p in packets)
+    t0 = time.perf_counter()
+    packed = [comp.encode(p) for p in packets]
+    t_enc = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for payload, props in packed:
+        if props:
+            decompress(payload, comp.codec, comp.dictionary)
+    t_dec = time.perf_counter() - t0
+    sent = sum(len(p) for p, _ in packed)
+    hits = sum(1 for _, props in packed if props)
+    n = len(packets)
+    print(
+        f"{label:<24} ratio {raw / max(sent, 1):5.2f}  {sent:>10,} B  "
+        f"compressed {hits:>5}/{n}  enc {t_enc * 1e6 / n:7.1f} us/pkt  "
+        f"dec {t_dec * 1e6 / n:6.1f} us/pkt"
+    )
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--dir", help="Elite journal directory with real data")
+    ap.add_argument("--limit", type=int, default=20000, help="max packets to load")
+    ap.add_argument("--min-bytes", type=int, default=1024)
+    ap.add_argument("--train", metavar="PATH", help="write a zlib dictionary trained on --dir")
+    args = ap.parse_args(argv)
+
+    packets = real_packets(args.dir, args.limit) if args.dir else synthetic_packets(2000)
+    if not packets:
+        print("No packets found")
+        return 1
+    split = max(int(len(packets) * 0.8), 1)
+    train, test = packets[:split], packets[split:] or packets
+    large = [p for p in test if len(p) >= args.min_bytes]
+    raw = sum(len(p) for p in test)
+    print(f"{len(test)} packets, {raw:,} B ({len(large)} >= {args.min_bytes} B)\n")
+
+    if args.train:
+        with open(args.train, "wb") as f:
+            f.write(train_dictionary(train, codec="zlib"))
+        print(f"Wrote zlib dictionary to {args.train}\n")
+
+    for codec in available_codecs():
+        levels = (1, 6, 9) if codec == "zlib" else (1, 3, 9, 19)
+        zdict = train_dictionary(train, codec=codec)
+        for level in levels:
+            bench(f"{codec} -{level}", Compressor(codec, level, args.min_bytes), test)
+            bench(f"{codec} -{level} +dict", Compressor(codec, level, args.min_bytes, zdict), test)
+        bench(f"{codec} -6 all sizes +dict", Compressor(codec, 6, 0, zdict), test)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+# benchmarks/bench_priority.py
+# SPDX-License-Identifier: MIT
+"""
+Critical-vs-bulk latency through the MQTT outbox under a Loadout backlog.
+
+    python benchmarks/bench_priority.py [--bulk 300] [--bulk-ms 3] [--mode strict|weighted]
+
+A publisher thread drains a PriorityOutbox the way mqtt_output does, with a fake
+client that takes --bulk-ms per bulk packet (a large Loadout on a slow link) and
+0.1 ms for anything else. --bulk Loadouts are queued at once, then a HullDamage
+packet arrives every 10 ms while they drain. Prints the alarms' p50/p99 and the
+outbox's own lane stats. Compare with --fifo (alarms queue in the bulk lane).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.priority import BULK, CRITICAL, PriorityOutbox  # noqa: E402
+
+
+def run(bulk: int, bulk_ms: float, mode: str, fifo: bool) -> dict:
+    alarms = max(int(bulk * bulk_ms / 10), 10)
+    outbox = PriorityOutbox(sizes=(256, 1000, bulk + alarms), mode=mode)
+    alarm_latency: list[float] = []
+    stop = threading.Event()
+
+    def publisher():
+        while not stop.is_set():
+            got = outbox.get(timeout=0.1)
+            if got is None:
+                continue
+            item, cls, enqueued = got
+            time.sleep(bulk_ms / 1000 if item == "Loadout" else 0.0001)
+            outbox.done(cls, enqueued)
+            if item == "HullDamage":
+                alarm_latency.append(time.perf_counter() - enqueued)
+
+    thread = threading.Thread(target=publisher, daemon=True)
+    thread.start()
+    for _ in range(bulk):
+        outbox.put("Loadout", BULK)
+    for _ in range(alarms):
+        outbox.put("HullDamage", BULK if fifo else CRITICAL)
+        time.sleep(0.010)
+    while outbox.qsize():
+        time.sleep(0.01)
+    time.sleep(0.05)
+    stop.set()
+    thread.join()
+    alarm_latency.sort()
+
+    def pct(p: float) -> float:
+        return round(
+            1000 * alarm_latency[min(len(alarm_latency) - 1, int(p * len(alarm_latency)))], 3
+        )
+
+    lanes = {k: v for k, v in outbox.stats().items() if v["count"]}
+    return {"alarms": {"p50_ms": pct(0.5), "p99_ms": pct(0.99)}, "lanes": lanes}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--bulk", type=int, default=300)
+    ap.add_argument("--bulk-ms", type=float, default=3.0)
+    ap.add_argument("--mode", choices=("strict", "weighted"), default="strict")
+    ap.add_argument("--fifo", action="store_true", help="baseline: alarms queue behind bulk")
+    args = ap.parse_args(argv)
+    print(json.dumps(run(args.bulk, args.bulk_ms, args.mode, args.fifo), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
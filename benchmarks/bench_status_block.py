@@ -0,0 +1,96 @@
+# benchmarks/bench_status_block.py
+# SPDX-License-Identifier: MIT
+"""
+Seqlock torture test for the memory-mapped status block, across processes.
+
+    python benchmarks/bench_status_block.py [--seconds 5] [--path FILE]
+
+A child process rewrites the record as fast as it can; every record it writes
+carries one counter in all of its numeric fields. The parent reads in a tight loop
+and counts any record whose fields disagree (a torn read). Prints reads, distinct
+records seen, torn reads and the writer's rate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.status_block import BODY, StatusBlockReader, StatusBlockWriter  # noqa: E402
+
+
+def body(i: int) -> bytes:
+    """A record whose fields all say i (flags and pips wrap at their widths)."""
+    f = float(i)
+    b = i & 0xFF
+    return BODY.pack(f, f, f, f, f, i, i & 0xFFFFFFFF, i & 0xFFFFFFFF, f, f, f, f, b, b, b, b, b, 0)
+
+
+def consistent(rec) -> bool:
+    i = rec.balance
+    f = float(i)
+    b = i & 0xFF
+    floats = (rec.updated_at, rec.game_ts, rec.latitude, rec.longitude, rec.altitude)
+    floats += (rec.fuel_main, rec.fuel_reservoir, rec.cargo, rec.heading)
+    small = (rec.pips_sys, rec.pips_eng, rec.pips_wep, rec.fire_group, rec.gui_focus)
+    return (
+        all(x == f for x in floats)
+        and rec.flags == rec.flags2 == i & 0xFFFFFFFF
+        and all(x == b for x in small)
+    )
+
+
+def _write(path: str, seconds: float, counter) -> None:
+    writer = StatusBlockWriter(path)
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        i += 1
+        writer.write(body(i))
+    counter.value = i
+    writer.close()
+
+
+def run(path: str, seconds: float) -> dict:
+    StatusBlockWriter(path).close()  # the reader needs a valid header to map
+    counter = multiprocessing.Value("q", 0)
+    child = multiprocessing.Process(target=_write, args=(path, seconds, counter))
+    child.start()
+    reads = torn = 0
+    seen = set()
+    with StatusBlockReader(path) as reader:
+        while child.is_alive():
+            rec = reader.read()
+            if rec is None:
+                continue
+            reads += 1
+            seen.add(rec.seq)
+            if not consistent(rec):
+                torn += 1
+    child.join()
+    return {
+        "reads": reads,
+        "distinct_records": len(seen),
+        "torn": torn,
+        "writes_per_s": round(counter.value / seconds),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "bench-status.bin"))
+    args = ap.parse_args(argv)
+    print(json.dumps(run(args.path, args.seconds), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
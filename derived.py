@@ -0,0 +1,229 @@
+# derived.py
+# SPDX-License-Identifier: MIT
+"""
+Derived session telemetry, updated incrementally from journal events and
+Status.json flag transitions so dashboards don't re-aggregate the raw stream.
+- Jumps/hour, fuel per jump, net credits/hour, supercruise vs normal-space
+  time and hull damage rate over rolling 1 m / 15 m windows and the session
+- Every update is O(1): windows are fixed rings of time buckets with a running sum
+- Published as a `Derived` packet at most once per derived.interval_ms, and only
+  when the numbers changed
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+
+from utils.config import snapshot
+from utils.instance import Instance, default_instance
+from utils.mqtt_output import publish_packet
+from utils.serial_output import format_packet, send_to_serial
+
+METRICS = ("jumps", "fuel", "credits", "supercruise_s", "normal_s", "hull_damage")
+
+# Window name -> (span seconds, buckets)
+WINDOWS = {"1m": (60.0, 60), "15m": (900.0, 90)}
+
+# Net credit changes: event -> (field, sign)
+_CREDITS = {
+    "MarketSell": ("TotalSale", 1),
+    "SellExplorationData": ("TotalEarnings", 1),
+    "MultiSellExplorationData": ("TotalEarnings", 1),
+    "RedeemVoucher": ("Amount", 1),
+    "MissionCompleted": ("Reward", 1),
+    "ModuleSell": ("SellPrice", 1),
+    "MarketBuy": ("TotalCost", -1),
+    "BuyDrones": ("TotalCost", -1),
+    "BuyAmmo": ("Cost", -1),
+    "RefuelAll": ("Cost", -1),
+    "Repair": ("Cost", -1),
+    "RepairAll": ("Cost", -1),
+    "RestockVehicle": ("Cost", -1),
+    "ModuleBuy": ("BuyPrice", -1),
+    "ShipyardBuy": ("ShipPrice", -1),
+    "PayFines": ("Amount", -1),
+    "PayBounties": ("Amount", -1),
+}
+_SESSION_EVENTS = {"LoadGame", "Shutdown", "FSDJump", "HullDamage", "Repair", "RepairAll"}
+
+
+def _epoch(ts: str | None) -> float:
+    """Journal/Status timestamp ('2026-10-19T12:00:00Z') -> epoch seconds."""
+    if ts:
+        try:
+            return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class RollingWindow:
+    """Sum of values over the last span_s seconds, in fixed time buckets."""
+
+    __slots__ = ("bucket_s", "n", "_sums", "_head", "total")
+
+    def __init__(self, span_s: float, buckets: int):
+        self.bucket_s = span_s / buckets
+        self.n = buckets
+        self._sums = [0.0] * buckets
+        self._head: int | None = None  # newest bucket id
+        self.total = 0.0
+
+    def _advance(self, bid: int) -> None:
+        if self._head is None:
+            self._head = bid
+            return
+        if bid <= self._head:
+            return
+        # Clear the buckets that just fell out (at most n, amortized O(1))
+        for b in range(self._head + 1, self._head + 1 + min(bid - self._head, self.n)):
+            idx = b % self.n
+            self.total -= self._sums[idx]
+            self._sums[idx] = 0.0
+        self._head = bid
+
+    def add(self, value: float, ts: float) -> None:
+        bid = int(ts // self.bucket_s)
+        self._advance(bid)
+        if bid <= self._head - self.n:  # type: ignore[operator]
+            return  # older than the window (e.g. journal catch-up)
+        self._sums[bid % self.n] += value
+        self.total += value
+
+    def sum(self, now: float) -> float:
+        self._advance(int(now // self.bucket_s))
+        return max(self.total, 0.0)
+
+
+class DerivedState:
+    """
+    Per-instance rolling counters plus the supercruise/normal-space clock. In
+    watchdog mode on_status() runs on the observer thread while journal events and
+    maybe_publish() run on the poller, so all three hold `lock` while they touch it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+        self.last_publish = 0.0
+        self.last_data: dict | None = None
+
+    def reset(self, ts: float | None) -> None:
+        self.session_start = ts
+        self.session = dict.fromkeys(METRICS, 0.0)
+        self.windows = {
+            name: {m: RollingWindow(span, buckets) for m in METRICS}
+            for name, (span, buckets) in WINDOWS.items()
+        }
+        self.supercruise: bool | None = None  # None = not flying / unknown
+        self.mode_since = 0.0
+        self.hull = 1.0
+
+    def add(self, metric: str, value: float, ts: float) -> None:
+        if self.session_start is None:
+            self.session_start = ts
+        self.session[metric] += value
+        for win in self.windows.values():
+            win[metric].add(value, ts)
+
+    def settle(self, ts: float) -> None:
+        """Book the time spent in the current flight mode up to ts."""
+        if ts <= self.mode_since:
+            return  # Status.json and publish clocks interleave; never book time twice
+        if self.supercruise is not None:
+            self.add("supercruise_s" if self.supercruise else "normal_s", ts - self.mode_since, ts)
+        self.mode_since = ts
+
+    def report(self, now: float) -> dict:
+        out = {}
+        started = self.session_start if self.session_start is not None else now
+        spans = {name: span for name, (span, _) in WINDOWS.items()}
+        spans["session"] = max(now - started, 0.0)
+        for name, span in spans.items():
+            if name == "session":
+                v = self.session
+            else:
+                v = {m: w.sum(now) for m, w in self.windows[name].items()}
+            elapsed = max(min(span, now - started), 1.0)
+            flown = v["supercruise_s"] + v["normal_s"]
+            out[name] = {
+                "jumps": int(v["jumps"]),
+                "jumps_per_hr": round(v["jumps"] * 3600 / elapsed, 1),
+                "fuel_per_jump": round(v["fuel"] / v["jumps"], 3) if v["jumps"] else None,
+                "credits_per_hr": round(v["credits"] * 3600 / elapsed),
+                "supercruise_s": round(v["supercruise_s"], 1),
+                "normal_s": round(v["normal_s"], 1),
+                "supercruise_share": round(v["supercruise_s"] / flown, 3) if flown else None,
+                "hull_dmg_pct_per_min": round(v["hull_damage"] * 100 * 60 / elapsed, 2),
+            }
+        return out
+
+
+def on_journal_event(entry: dict, inst: Instance | None = None) -> None:
+    """Feed one journal entry (every entry, not just WATCHED_EVENTS)."""
+    event = entry.get("event")
+    credit = _CREDITS.get(event)  # type: ignore[arg-type]
+    if credit is None and event not in _SESSION_EVENTS:
+        return
+    st = (inst or default_instance()).state("derived", DerivedState)
+    ts = _epoch(entry.get("timestamp"))
+    with st.lock:
+        if event == "LoadGame":
+            st.reset(ts)
+        elif event == "Shutdown":
+            st.settle(ts)
+            st.supercruise = None
+        elif event == "FSDJump":
+            st.add("jumps", 1, ts)
+            st.add("fuel", float(entry.get("FuelUsed", 0.0)), ts)
+        elif event == "HullDamage":
+            health = float(entry.get("Health", st.hull))
+            if health < st.hull:
+                st.add("hull_damage", st.hull - health, ts)
+            st.hull = health
+        if event in ("Repair", "RepairAll"):
+            st.hull = 1.0
+        if credit is not None:
+            field, sign = credit
+            st.add("credits", sign * float(entry.get(field) or 0), ts)
+
+
+def on_status(flags: dict, ts: str | None, inst: Instance | None = None) -> None:
+    """Feed a decoded Status.json update; only the Supercruise transition matters."""
+    st = (inst or default_instance()).state("derived", DerivedState)
+    supercruise = bool(flags.get("Supercruise"))
+    now = _epoch(ts)
+    with st.lock:
+        if supercruise == st.supercruise:
+            return
+        st.settle(now)
+        st.supercruise = supercruise
+
+
+def maybe_publish(inst: Instance | None = None, now: float | None = None) -> bool:
+    """Publish a Derived packet if derived.interval_ms has passed and the numbers moved."""
+    cfg = snapshot().derived
+    if not cfg.enabled:
+        return False
+    inst = inst or default_instance()
+    st = inst.state("derived", DerivedState)
+    mono = time.monotonic()
+    now = time.time() if now is None else now
+    with st.lock:
+        if mono - st.last_publish < cfg.interval_ms / 1000.0:
+            return False
+        st.last_publish = mono
+        st.settle(now)
+        if st.session_start is None:
+            return False
+        data = st.report(now)
+        if data == st.last_data:
+            return False
+        st.last_data = data
+    # Sent outside the lock so a slow serial port never stalls the observer thread
+    packet = format_packet("derived", "Derived", data, cmdr=inst.ns)
+    send_to_serial(packet)
+    publish_packet(packet)
+    return True
@@ -1,35 +1,44 @@
+import functools
 import os
+import sys
 import threading
-import time
 
-from watchdog.events import FileSystemEventHandler
-from watchdog.observers import Observer
-
-from journal import process_journal_file
+from derived import maybe_publish as publish_derived
+from journal import JournalState, get_latest_journal_file, process_journal_file
 from modules import process_modules_file
 from status import process_status_file
+from telemetry import maybe_publish as publish_telemetry
+from utils import diagnostics, spatial_index
 from utils.command_router import handle_inbound_command
-from utils.config import get, load_config
+from utils.config import load_config, snapshot, watch_config
+from utils.headless import HEADLESS_ENV
+from utils.instance import Instance, configured_instances
 from utils.keymap import load_keymap
-from utils.mqtt_output import set_command_handler
+from utils.mqtt_output import is_connected, set_command_handler
 from utils.mqtt_output import start as mqtt_start
+from utils.mqtt_output import subscribe as mqtt_subscribe
+from utils.plugins import load as load_plugins
+from utils.poller import AdaptivePoller, choose_mode
+from utils.supervisor import RunContext, Supervisor, serve_ipc
 
 __version__ = "0.1.1-dev"
 
 
-def _load_runtime_config(path: str = "config.toml"):
+def _load_runtime_config(path: str = "config.toml") -> list[Instance]:
     """Load configuration and validate required paths. Raise on problems."""
     # Ensure config is loaded before using `get(...)`
     load_config(path)
-    elite_dir = get("general.elite_dir")
-    if not os.path.isdir(elite_dir):
-        msg = (
-            "[ELITEPARSER] ERROR: 'general.elite_dir' does not exist:\n"
-            f"  {elite_dir}\n"
-            "        Fix this in config.toml, then rerun."
-        )
-        raise RuntimeError(msg)
-    return elite_dir
+    instances = configured_instances()
+    for inst in instances:
+        if not os.path.isdir(inst.elite_dir):
+            key = f"instances '{inst.name}' elite_dir" if inst.name else "general.elite_dir"
+            msg = (
+                f"[ELITEPARSER] ERROR: '{key}' does not exist:\n"
+                f"  {inst.elite_dir}\n"
+                "        Fix this in config.toml, then rerun."
+            )
+            raise RuntimeError(msg)
+    return instances
 
 
 TARGET_FILES = {
@@ -42,57 +51,206 @@ def _log_command(topic: str, payload):
     print(f"[CMD] {topic} -> {payload}")
 
 
-# === Journal needs a timer/loop because of dynamic filenames ===
-def journal_loop():
-    interval = max(int(get("general.poll_interval_ms", 500)), 50) / 1000.0
-    while True:
-        process_journal_file()
-        time.sleep(interval)
+# === Journal (every instance) and Status/Modules (poll-mode instances) ===
+def _tune(poller: AdaptivePoller) -> None:
+    cfg = snapshot()
+    poller.min_interval = max(cfg.poller.min_interval_ms, 5) / 1000.0
+    poller.warm_interval = max(cfg.poller.warm_interval_ms, cfg.poller.min_interval_ms) / 1000.0
+    poller.idle_interval = max(cfg.poller.idle_interval_ms, cfg.poller.warm_interval_ms) / 1000.0
+    poller.hot_s = cfg.poller.hot_s
+    poller.idle_after_s = cfg.poller.idle_after_s
+    poller.rescan_s = cfg.poller.rescan_ms / 1000.0
+
+
+def build_poller(instances: list[Instance], polled: list[Instance]) -> AdaptivePoller:
+    """One adaptive poller thread serves every instance's journal (dynamic filenames)."""
+    poller = AdaptivePoller()
+    for inst in instances:
+        files = {}
+        if inst in polled:
+            files = {name: functools.partial(fn, inst) for name, fn in TARGET_FILES.items()}
+        st = inst.state("journal", JournalState)
+        poller.watch(
+            inst.elite_dir,
+            files,
+            on_journal=functools.partial(process_journal_file, inst),
+            idle_hint=lambda st=st: st.shutdown,
+        )
+    return poller
+
+
+def poller_loop(poller: AdaptivePoller, instances: list[Instance]):
+    def _run(ctx: RunContext):
+        cfg = None
+        while ctx.wait_active():
+            if cfg is not snapshot():  # apply [poller] edits live
+                cfg = snapshot()
+                _tune(poller)
+            diagnostics.checkpoint()  # attaches/detaches a $diag cProfile session
+            poller.poll_once()
+            for inst in instances:
+                publish_derived(inst)  # rate-limited; keeps rolling windows fresh
+                publish_telemetry(inst)  # flushes the last samples once motion stops
+            if not ctx.sleep(poller.interval):
+                return
+
+    return _run
 
 
 # === Watchdog Handler ===
-class EDFileHandler(FileSystemEventHandler):
-    def on_modified(self, event):
-        if not event.is_directory:
-            filename = os.path.basename(event.src_path)
-            if filename in TARGET_FILES:
-                TARGET_FILES[filename]()
+# watchdog is imported when the watcher starts, keeping `import eliteparser` cheap
+@functools.cache
+def _handler_class():
+    from watchdog.events import FileSystemEventHandler
+
+    class EDFileHandler(FileSystemEventHandler):
+        def __init__(self, active: threading.Event, instances: list[Instance]):
+            super().__init__()
+            self._active = active
+            self._by_dir = {os.path.normcase(i.elite_dir): i for i in instances}
+
+        def on_modified(self, event):
+            if not event.is_directory and self._active.is_set():
+                dirname, filename = os.path.split(event.src_path)
+                handler = TARGET_FILES.get(filename)
+                inst = self._by_dir.get(os.path.normcase(os.path.normpath(dirname)))
+                if handler is not None and inst is not None:
+                    handler(inst)
+
+    return EDFileHandler
+
+
+def watcher_loop(instances: list[Instance]):
+    # One observer (and one handler) for every watched directory
+    def _run(ctx: RunContext):
+        from watchdog.observers import Observer
+
+        observer = Observer()
+        handler = _handler_class()(ctx.active, instances)
+        for inst in instances:
+            observer.schedule(handler, inst.elite_dir, recursive=False)
+        observer.start()
+        try:
+            while not ctx.stop.wait(1.0):
+                if not observer.is_alive():
+                    raise RuntimeError("watchdog observer stopped")
+        finally:
+            observer.stop()
+            observer.join(timeout=2)
+
+    return _run
+
+
+def build_runtime(instances: list[Instance]) -> Supervisor:
+    polled = []
+    for inst in instances:
+        mode = choose_mode(inst.elite_dir, inst.watch_mode)
+        print(f"{inst.label('WATCH')} {inst.elite_dir}: {mode}")
+        if mode == "poll":
+            polled.append(inst)
+    watched = [inst for inst in instances if inst not in polled]
+    poller = build_poller(instances, polled)
+
+    def _catch_up():
+        """On resume, publish current Status/Modules right away instead of waiting for a write."""
+        poller.kick()
+        for inst in instances:
+            for fn in TARGET_FILES.values():
+                fn(inst)
+
+    sup = Supervisor()
+    sup.add("poller", poller_loop(poller, instances), on_resume=_catch_up)
+    if watched:
+        sup.add("watcher", watcher_loop(watched))
+    sup.add_health("mqtt_connected", is_connected)
+    return sup
+
+
+def build_aggregator() -> Supervisor:
+    """Squadron mode: no local game files, just merge members' streams from the broker."""
+    from squadron import SquadronAggregator, aggregator_loop
+
+    agg = SquadronAggregator()
+    mqtt_subscribe(agg.topic_filter, agg.on_message)
+    sup = Supervisor()
+    sup.add("squadron", aggregator_loop(agg))
+    sup.add_health("mqtt_connected", is_connected)
+    sup.add_health("squadron", agg.stats)
+    return sup
 
 
 # === Launch ===
 def main(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="eliteparser", description="Elite Dangerous telemetry")
+    ap.add_argument("--config", default="config.toml", help="path to config.toml")
+    ap.add_argument(
+        "--supervised",
+        action="store_true",
+        help="serve health/pause/resume over local IPC (used by the tray app)",
+    )
+    ap.add_argument("--paused", action="store_true", help="start warm but paused")
+    ap.add_argument(
+        "--headless",
+        action="store_true",
+        help="never send keys; log routed commands instead (default off-Windows)",
+    )
+    ap.add_argument(
+        "--aggregate",
+        action="store_true",
+        help="squadron aggregator: merge <base>/+/events/# into summary topics",
+    )
+    args = ap.parse_args(argv)
+    if args.headless:
+        os.environ[HEADLESS_ENV] = "1"
+
     print("[ELITEPARSER] Starting telemetry monitor...")
 
-    try:
-        watch_dir = _load_runtime_config("config.toml")
-    except RuntimeError as e:
-        print(e)
-        return 1
-
-    # Now that config is validated, do runtime setup
-    load_keymap(force=True)
-    mqtt_start()
-    set_command_handler(handle_inbound_command)
-
-    # Start journal file polling thread
-    journal_thread = threading.Thread(target=journal_loop, daemon=True)
-    journal_thread.start()
-
-    # Start watchdog for status and modules
-    event_handler = EDFileHandler()
-    observer = Observer()
-    observer.schedule(event_handler, watch_dir, recursive=False)
-    observer.start()
+    if args.aggregate:
+        load_config(args.config)
+        watch_config()
+        mqtt_start()
+        sup = build_aggregator()
+    else:
+        try:
+            instances = _load_runtime_config(args.config)
+        except RuntimeError as e:
+            print(e)
+            return 1
+
+        # Now that config is validated, do runtime setup
+        watch_config()
+        load_keymap(force=True)
+        mqtt_start()
+        set_command_handler(handle_inbound_command)
+        if snapshot().outputs.stream.enabled:
+            from utils import stream_server
+
+            stream_server.start()
+        load_plugins()
+        for inst in instances:
+            # Saved index + background backfill of journals written since it was saved
+            spatial_index.load(inst, get_latest_journal_file(inst))
+        if snapshot().inputs.serial.enabled:
+            from utils import serial_input
+
+            serial_input.start()
+
+        # Journal poller + watchdog for status and modules, restarted on crash
+        sup = build_runtime(instances)
+    sup.start(active=not args.paused)
+    if args.supervised:
+        serve_ipc(sup, snapshot().supervisor.ipc_port)
 
     try:
-        while True:
-            time.sleep(1)
+        while not sup.stopped.wait(1):
+            pass
     except KeyboardInterrupt:
-        observer.stop()
-
-    observer.join()
+        sup.shutdown()
+    spatial_index.flush()
     return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,13 +1,18 @@
 import json
 import os
 
+from derived import maybe_publish as publish_derived
+from derived import on_journal_event as derive_journal
 from loadout import process_loadout_event
-from utils.config import get
+from shipcomms import COMMS_EVENTS, handle_comms
+from utils.batcher import BurstBatcher
+from utils.config import snapshot
+from utils.instance import Instance, default_instance
 from utils.mqtt_output import publish_packet
-from utils.mqtt_output import start as mqtt_start
+from utils.plugins import dispatch as dispatch_plugins
+from utils.priority import CRITICAL, classify
 from utils.serial_output import format_packet, send_to_serial
-
-mqtt_start()
+from utils.spatial_index import on_journal_event as record_visit
 
 WATCHED_EVENTS = {
     "Fileheader",
@@ -26,70 +31,174 @@ WATCHED_EVENTS = {
     "HullDamage",
     "HeatWarning",
     "ShieldState",
+    "HeatDamage",
+    "Interdicted",
+    "EscapeInterdiction",
+    "UnderAttack",
+    "CockpitBreached",
     "FuelScoop",
-    "ReceiveText",  # handled by shipcomms.py but included in watch filter
+    "ReceiveText",  # routed to shipcomms.py (Comms packets)
 }
 
-ELITE_DIR = os.path.normpath(get("general.elite_dir"))
-JOURNAL_DIR = ELITE_DIR
+# Exploration floods: gathered per system and published as one ScanBatch packet
+BATCHED_EVENTS = {"Scan", "FSSSignalDiscovered", "SAASignalsFound"}
+
+
+class JournalState:
+    """Tail position of the journal being followed (one per instance)."""
+
+    __slots__ = ("last_file", "position", "system", "system_address", "shutdown")
+
+    def __init__(self):
+        self.last_file: str | None = None
+        self.position = 0
+        self.system: str | None = None
+        self.system_address: int | None = None
+        self.shutdown = False  # game exited (last event was Shutdown); pollers idle
+
+
+def _scan_item(entry: dict) -> dict:
+    """Compact per-body summary for ScanBatch."""
+    event = entry.get("event")
+    if event == "FSSSignalDiscovered":
+        item = {
+            "e": "FSS",
+            "name": entry.get("SignalName_Localised") or entry.get("SignalName"),
+            "type": entry.get("SignalType"),
+        }
+        if entry.get("IsStation"):
+            item["station"] = True
+        return item
+    if event == "SAASignalsFound":
+        return {
+            "e": "SAA",
+            "body": entry.get("BodyName"),
+            "signals": {
+                s.get("Type_Localised") or s.get("Type"): s.get("Count")
+                for s in entry.get("Signals", ())
+            },
+            "genuses": len(entry.get("Genuses", ())),
+        }
+    item = {
+        "e": "Scan",
+        "body": entry.get("BodyName"),
+        "id": entry.get("BodyID"),
+        "class": entry.get("PlanetClass") or entry.get("StarType"),
+        "ls": round(entry.get("DistanceFromArrivalLS", 0.0), 1),
+    }
+    for src, dst in (("TerraformState", "terra"), ("Landable", "land"), ("WasMapped", "mapped")):
+        if entry.get(src):
+            item[dst] = entry[src]
+    if entry.get("WasDiscovered") is False:
+        item["first"] = True
+    return item
 
 
-_last_journal_file = None
-_last_position = 0
+def _publish_scan_batch(key: tuple, items: list[dict]) -> None:
+    inst, address, system = key
+    counts: dict[str, int] = {}
+    for item in items:
+        counts[item["e"]] = counts.get(item["e"], 0) + 1
+    data = {"SystemAddress": address, "StarSystem": system, "counts": counts, "items": items}
+    print(f"{inst.label('JOURNAL')} ScanBatch[{system}] {counts}")
+    packet = format_packet("journal", "ScanBatch", data, cmdr=inst.ns)
+    send_to_serial(packet)
+    publish_packet(packet)
 
 
-def get_latest_journal_file():
+_batcher: BurstBatcher | None = None
+
+
+def scan_batcher() -> BurstBatcher:
+    """Shared batcher for every instance (keys carry the instance); settings follow config."""
+    global _batcher
+    if _batcher is None:
+        _batcher = BurstBatcher(_publish_scan_batch)
+    cfg = snapshot().batching
+    _batcher.window_s = cfg.window_ms / 1000.0
+    _batcher.max_items = max(cfg.max_items, 1)
+    return _batcher
+
+
+def journal_dir(inst: Instance | None = None) -> str:
+    """Journal directory from the live config (follows hot reloads)."""
+    return (inst or default_instance()).elite_dir
+
+
+def get_latest_journal_file(inst: Instance | None = None):
+    inst = inst or default_instance()
+    jdir = inst.elite_dir
     try:
-        files = [
-            f for f in os.listdir(JOURNAL_DIR) if f.startswith("Journal") and f.endswith(".log")
-        ]
+        files = [f for f in os.listdir(jdir) if f.startswith("Journal") and f.endswith(".log")]
     except OSError as e:
-        print(f"[JOURNAL] Cannot list dir '{JOURNAL_DIR}': {e}")
+        print(f"{inst.label('JOURNAL')} Cannot list dir '{jdir}': {e}")
         return None
     if not files:
         return None
     files.sort(reverse=True)
-    return os.path.join(JOURNAL_DIR, files[0])
+    return os.path.join(jdir, files[0])
 
 
-def process_journal_file():
-    global _last_journal_file, _last_position
-    journal_file = get_latest_journal_file()
+def process_journal_file(inst: Instance | None = None, journal_file: str | None = None):
+    """Read new lines of journal_file (the poller passes it; otherwise the newest is listed)."""
+    inst = inst or default_instance()
+    st = inst.state("journal", JournalState)
+    tag = inst.label("JOURNAL")
+    journal_file = journal_file or get_latest_journal_file(inst)
     if not journal_file:
-        print("[JOURNAL] No journal file found.")
+        print(f"{tag} No journal file found.")
         return
 
-    if journal_file != _last_journal_file:
-        print(f"[JOURNAL] Switching to new journal file: {journal_file}")
-        _last_journal_file = journal_file
-        _last_position = 0
+    if journal_file != st.last_file:
+        print(f"{tag} Switching to new journal file: {journal_file}")
+        st.last_file = journal_file
+        st.position = 0
 
     try:
         with open(journal_file, encoding="utf-8") as f:
-            f.seek(_last_position)
+            f.seek(st.position)
             lines = f.readlines()
-            _last_position = f.tell()
+            st.position = f.tell()
     except Exception as e:
-        print(f"[JOURNAL] Failed to read journal file: {e}")
+        print(f"{tag} Failed to read journal file: {e}")
         return
 
+    batcher = scan_batcher()
     for line in lines:
         try:
             entry = json.loads(line)  # parse ONCE
         except json.JSONDecodeError:
-            print(f"[JOURNAL] Failed to parse JSON: {line.strip()}")
+            print(f"{tag} Failed to parse JSON: {line.strip()}")
             continue
 
         # loadout handling
-        process_loadout_event(entry)
+        process_loadout_event(entry, inst)
+        derive_journal(entry, inst)
+        dispatch_plugins(entry, inst)
 
         event_type = entry.get("event")
-        if event_type in WATCHED_EVENTS:
-            if event_type == "ReceiveText":
-                continue  # shipcomms handles it
+        st.shutdown = event_type == "Shutdown"
+        if event_type in ("Location", "FSDJump", "CarrierJump"):
+            st.system = entry.get("StarSystem")
+            st.system_address = entry.get("SystemAddress")
+            record_visit(entry, inst)
+        if event_type in COMMS_EVENTS:
+            handle_comms(entry, inst)
+        elif event_type in BATCHED_EVENTS:
+            address = entry.get("SystemAddress", st.system_address)
+            system = entry.get("StarSystem") if address != st.system_address else st.system
+            batcher.add((inst, address, system), _scan_item(entry))
+        elif event_type in WATCHED_EVENTS:
+            priority = classify(event_type)
+            if priority != CRITICAL:
+                # Keep scans ahead of the jump/dock that follows them; alarms don't wait
+                batcher.flush()
             print(f"WATCH[{event_type}]")
-            packet = format_packet("journal", event_type, entry)
+            packet = format_packet("journal", event_type, entry, cmdr=inst.ns)
             send_to_serial(packet)
-            publish_packet(packet)
+            publish_packet(packet, priority)
         else:
             print(f"RAW >> {line.strip()}")
+
+    # Called every poll, so Derived keeps flowing (rate-limited) between events
+    publish_derived(inst)
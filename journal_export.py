@@ -0,0 +1,348 @@
+# journal_export.py
+# SPDX-License-Identifier: MIT
+"""
+Columnar export of journal history (optional: pip install pyarrow numpy).
+- Streams every Journal*.log in bounded chunks into one Parquet file per event type
+- Two passes: the first infers a stable column schema per event type, the second
+  writes row groups of at most --chunk-rows rows, so memory stays flat across years of logs
+- StarSystem (and the running `_system` context column) are dictionary-encoded
+- Vectorized NumPy reports over the exported files: jump distance histogram,
+  exploration scan/sale totals, trade profit by station
+- Reads archived history (utils.journal_archive) plus any journals not archived
+  yet; --since/--until only decompress the archive blocks in that range
+
+Usage:
+    python journal_export.py --out export/                 # default event set
+    python journal_export.py --out export/ --events FSDJump,Scan --report
+    python journal_export.py --out export/ --since 2024-01-01 --until 2024-06-30
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable
+from typing import Any
+
+from utils.config import load_config, snapshot
+from utils.journal_archive import JournalArchive, history
+
+DEFAULT_EVENTS = (
+    "FSDJump",
+    "Scan",
+    "MarketSell",
+    "MarketBuy",
+    "Bounty",
+    "Docked",
+    "SellExplorationData",
+    "MultiSellExplorationData",
+)
+CHUNK_ROWS = 10_000
+
+# String columns with few distinct values across years of logs
+DICTIONARY_FIELDS = {
+    "StarSystem",
+    "_system",
+    "StationName",
+    "StationType",
+    "PlanetClass",
+    "StarType",
+}
+_SYSTEM_EVENTS = {"Location", "FSDJump", "CarrierJump", "Docked"}
+
+
+def _require():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Columnar export needs pyarrow: pip install pyarrow numpy") from e
+    return pa, pc, pq
+
+
+def journal_files(elite_dir: str) -> list[str]:
+    """Journal logs oldest first (the names sort chronologically)."""
+    names = sorted(
+        f for f in os.listdir(elite_dir) if f.startswith("Journal") and f.endswith(".log")
+    )
+    return [os.path.join(elite_dir, n) for n in names]
+
+
+# --- Pass 1: schema inference ---
+def _kind(value: Any) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "json"  # nested lists/objects are kept as JSON text
+
+
+def infer_kinds(entries: Iterable[dict], events: set[str]) -> dict[str, dict[str, set[str]]]:
+    """event -> field -> set of value kinds seen."""
+    kinds: dict[str, dict[str, set[str]]] = {}
+    for entry in entries:
+        event = entry.get("event")
+        if event not in events:
+            continue
+        fields = kinds.setdefault(event, {})
+        for key, value in entry.items():
+            k = _kind(value)
+            seen = fields.setdefault(key, set())
+            if k is not None:
+                seen.add(k)
+    return kinds
+
+
+def _resolve(field: str, seen: set[str]) -> str:
+    if field == "timestamp":
+        return "timestamp"
+    if seen == {"bool"}:
+        return "bool"
+    if seen == {"int"}:
+        return "int"
+    if seen and seen <= {"int", "float"}:
+        return "float"
+    if seen <= {"str"} and field in DICTIONARY_FIELDS:
+        return "dict"
+    return "str" if seen <= {"str"} else "json"
+
+
+def build_schema(fields: dict[str, set[str]]):
+    pa, _, _ = _require()
+    types = {
+        "bool": pa.bool_(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "str": pa.string(),
+        "json": pa.string(),
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+        "timestamp": pa.timestamp("s", tz="UTC"),
+    }
+    plan = {name: _resolve(name, seen) for name, seen in fields.items()}
+    plan["_system"] = "dict"
+    schema = pa.schema([(name, types[kind]) for name, kind in plan.items()])
+    return schema, plan
+
+
+# --- Pass 2: chunked writing ---
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "json":
+        return value if isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+    if kind == "float":
+        return float(value)
+    return value
+
+
+class _TableWriter:
+    """Buffers rows for one event type and writes them as Parquet row groups."""
+
+    def __init__(self, path: str, fields: dict[str, set[str]], chunk_rows: int):
+        pa, pc, pq = _require()
+        self._pa, self._pc = pa, pc
+        self.schema, self.plan = build_schema(fields)
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self._cols: dict[str, list] = {name: [] for name in self.plan}
+        self.chunk_rows = chunk_rows
+        self.buffered = 0
+        self.rows = 0
+
+    def append(self, entry: dict, system: str | None) -> None:
+        for name, kind in self.plan.items():
+            value = system if name == "_system" else entry.get(name)
+            self._cols[name].append(value if kind == "timestamp" else _coerce(value, kind))
+        self.buffered += 1
+        if self.buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffered:
+            return
+        pa, pc = self._pa, self._pc
+        arrays = []
+        for field in self.schema:
+            values = self._cols[field.name]
+            if self.plan[field.name] == "timestamp":
+                raw = pa.array(values, type=pa.string())
+                arr = pc.strptime(raw, format="%Y-%m-%dT%H:%M:%SZ", unit="s", error_is_null=True)
+                arrays.append(arr.cast(field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+            values.clear()
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows += self.buffered
+        self.buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+def export(
+    files: list[str],
+    out_dir: str,
+    events: Iterable[str] = DEFAULT_EVENTS,
+    chunk_rows: int = CHUNK_ROWS,
+    archive: JournalArchive | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> dict[str, int]:
+    """Write <out_dir>/<Event>.parquet for each event type present. Returns rows per event."""
+    wanted = set(events)
+    kinds = infer_kinds(history(files, archive, since, until, wanted), wanted)
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {
+        event: _TableWriter(os.path.join(out_dir, f"{event}.parquet"), fields, chunk_rows)
+        for event, fields in kinds.items()
+    }
+    system: str | None = None
+    try:
+        for entry in history(files, archive, since, until, wanted | _SYSTEM_EVENTS):
+            event = entry.get("event")
+            if event in _SYSTEM_EVENTS:
+                system = entry.get("StarSystem", system)
+            writer = writers.get(event)  # type: ignore[arg-type]
+            if writer is not None:
+                writer.append(entry, system)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {event: w.rows for event, w in writers.items()}
+
+
+# --- Vectorized reports ---
+def _batches(out_dir: str, event: str, columns: list[str]):
+    _, _, pq = _require()
+    path = os.path.join(out_dir, f"{event}.parquet")
+    if not os.path.exists(path):
+        return
+    pf = pq.ParquetFile(path)
+    present = [c for c in columns if c in pf.schema_arrow.names]
+    if len(present) != len(columns):
+        return
+    yield from pf.iter_batches(columns=columns)
+
+
+def jump_histogram(out_dir: str, bin_ly: float = 5.0, max_ly: float = 100.0) -> dict[str, Any]:
+    """Jump distance histogram with fixed bins (accumulated batch by batch)."""
+    import numpy as np
+
+    edges = np.arange(0.0, max_ly + bin_ly, bin_ly)
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    total = 0.0
+    jumps = 0
+    for batch in _batches(out_dir, "FSDJump", ["JumpDist"]):
+        dist = batch.column(0).to_numpy(zero_copy_only=False)
+        dist = dist[~np.isnan(dist)]
+        counts += np.histogram(np.clip(dist, 0, max_ly - 1e-9), bins=edges)[0]
+        total += float(dist.sum())
+        jumps += dist.size
+    return {
+        "jumps": jumps,
+        "total_ly": round(total, 1),
+        "mean_ly": round(total / jumps, 2) if jumps else None,
+        "bins": {
+            f"{lo:g}-{hi:g}": int(n) for lo, hi, n in zip(edges, edges[1:], counts, strict=False)
+        },
+    }
+
+
+def exploration_totals(out_dir: str) -> dict[str, Any]:
+    """Scans by body class and credits from selling exploration data."""
+    import numpy as np
+
+    classes: dict[str, int] = {}
+    for column in ("PlanetClass", "StarType"):
+        for batch in _batches(out_dir, "Scan", [column]):
+            arr = batch.column(0).drop_null()
+            if hasattr(arr, "dictionary_decode"):
+                arr = arr.dictionary_decode()
+            names, counts = np.unique(arr.to_numpy(zero_copy_only=False), return_counts=True)
+            for name, n in zip(names.tolist(), counts.tolist(), strict=True):
+                classes[name] = classes.get(name, 0) + n
+    earned = 0
+    for event in ("SellExplorationData", "MultiSellExplorationData"):
+        for batch in _batches(out_dir, event, ["TotalEarnings"]):
+            earned += int(np.nansum(batch.column(0).to_numpy(zero_copy_only=False)))
+    top = dict(sorted(classes.items(), key=lambda kv: -kv[1]))
+    return {"scans": sum(classes.values()), "by_class": top, "data_sold_cr": earned}
+
+
+def profit_by_station(out_dir: str, top: int = 20) -> list[dict[str, Any]]:
+    """Trade profit ((SellPrice - AvgPricePaid) * Count) per MarketID, named via Docked."""
+    import numpy as np
+
+    names: dict[int, str] = {}
+    for batch in _batches(out_dir, "Docked", ["MarketID", "StationName"]):
+        ids = batch.column(0).to_pylist()
+        stations = batch.column(1).to_pylist()
+        names.update((i, s) for i, s in zip(ids, stations, strict=True) if i is not None)
+
+    profit: dict[int, float] = {}
+    columns = ["MarketID", "SellPrice", "AvgPricePaid", "Count"]
+    for batch in _batches(out_dir, "MarketSell", columns):
+        market, sell, paid, count = (
+            np.nan_to_num(c.to_numpy(zero_copy_only=False).astype(np.float64))
+            for c in batch.columns
+        )
+        uniq, inv = np.unique(market.astype(np.int64), return_inverse=True)
+        sums = np.bincount(inv, weights=(sell - paid) * count)
+        for mid, value in zip(uniq.tolist(), sums.tolist(), strict=True):
+            profit[mid] = profit.get(mid, 0.0) + value
+    ranked = sorted(profit.items(), key=lambda kv: -kv[1])[:top]
+    return [
+        {"market_id": mid, "station": names.get(mid), "profit_cr": round(value)}
+        for mid, value in ranked
+    ]
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="journal_export", description=__doc__.split("\n")[1])
+    ap.add_argument("--config", default="config.toml", help="path to config.toml")
+    ap.add_argument("--dir", help="journal directory (default: general.elite_dir)")
+    ap.add_argument("--out", default="export", help="output directory for .parquet files")
+    ap.add_argument("--events", default=",".join(DEFAULT_EVENTS), help="comma-separated")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--archive", help="journal archive directory (default: archive.dir)")
+    ap.add_argument("--since", help="ISO timestamp or prefix, e.g. 2024-01-01")
+    ap.add_argument("--until", help="ISO timestamp or prefix (inclusive)")
+    ap.add_argument("--report", action="store_true", help="print summary reports afterwards")
+    ap.add_argument("--report-only", action="store_true", help="report on an existing export")
+    args = ap.parse_args(argv)
+
+    try:
+        if not args.report_only:
+            load_config(args.config)
+            elite_dir = args.dir or snapshot().general.elite_dir
+            files = journal_files(elite_dir)
+            archive_dir = args.archive or snapshot().archive.dir
+            archive = JournalArchive(archive_dir) if os.path.isdir(archive_dir) else None
+            events = [e.strip() for e in args.events.split(",") if e.strip()]
+            rows = export(files, args.out, events, args.chunk_rows, archive, args.since, args.until)
+            archived = len(archive.files) if archive is not None else 0
+            print(f"[EXPORT] {len(files)} journals + {archived} archived -> {args.out}: {rows}")
+        if args.report or args.report_only:
+            report = {
+                "jumps": jump_histogram(args.out),
+                "exploration": exploration_totals(args.out),
+                "profit_by_station": profit_by_station(args.out),
+            }
+            print(json.dumps(report, indent=2))
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"[EXPORT] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,19 @@
-import os
-
-from utils.config import get
+from utils.instance import Instance, default_instance
 from utils.mqtt_output import publish_packet
-from utils.mqtt_output import start as mqtt_start
 
 # from edpit import ELITE_DIR
 from utils.serial_output import format_packet, send_to_serial
 
-mqtt_start()
 
-ELITE_DIR = os.path.normpath(get("general.elite_dir"))
-LOADOUT_FILE = os.path.join(ELITE_DIR, "JournalLoadoutCache.json")
+def loadout_file(inst: Instance | None = None) -> str:
+    return (inst or default_instance()).path("JournalLoadoutCache.json")
+
+
+class LoadoutState:
+    __slots__ = ("last_payload",)
 
-_last_payload = None
+    def __init__(self):
+        self.last_payload = None
 
 
 def extract_module_summary(mod):
@@ -39,10 +40,11 @@ def extract_module_summary(mod):
     return summary
 
 
-def process_loadout_event(event):
-    global _last_payload
+def process_loadout_event(event, inst: Instance | None = None):
     if event.get("event") != "Loadout":
         return
+    inst = inst or default_instance()
+    st = inst.state("loadout", LoadoutState)
 
     data = {
         "Ship": event.get("Ship"),
@@ -56,11 +58,12 @@ def process_loadout_event(event):
         "Modules": [extract_module_summary(mod) for mod in event.get("Modules", [])],
     }
 
-    if data != _last_payload:
-        _last_payload = data
-        print(f"[LOADOUT] Updated ship: {data['ShipIdent']} | Hull: {data['HullHealth']*100:.0f}%")
-        packet = format_packet("loadout", "Loadout", data)
+    tag = inst.label("LOADOUT")
+    if data != st.last_payload:
+        st.last_payload = data
+        print(f"{tag} Updated ship: {data['ShipIdent']} | Hull: {data['HullHealth']*100:.0f}%")
+        packet = format_packet("loadout", "Loadout", data, cmdr=inst.ns)
         send_to_serial(packet)
         publish_packet(packet)
     else:
-        print("[LOADOUT] No change.")
+        print(f"{tag} No change.")
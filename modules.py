@@ -1,27 +1,31 @@
 import json
-import os
 
-from utils.config import get
+from utils.instance import Instance, default_instance
 from utils.mqtt_output import publish_packet
-from utils.mqtt_output import start as mqtt_start
 from utils.serial_output import format_packet, send_to_serial
 
-mqtt_start()
 
-ELITE_DIR = os.path.normpath(get("general.elite_dir"))
-MODULES_FILE = os.path.join(ELITE_DIR, "ModulesInfo.json")
+def modules_file(inst: Instance | None = None) -> str:
+    return (inst or default_instance()).path("ModulesInfo.json")
 
-_last_module_data = None
 
+class ModulesState:
+    __slots__ = ("last_module_data",)
 
-def process_modules_file():
-    global _last_module_data
+    def __init__(self):
+        self.last_module_data = None
+
+
+def process_modules_file(inst: Instance | None = None):
+    inst = inst or default_instance()
+    st = inst.state("modules", ModulesState)
+    tag = inst.label("MODULES")
 
     try:
-        with open(MODULES_FILE, encoding="utf-8") as f:
+        with open(modules_file(inst), encoding="utf-8") as f:
             data = json.load(f)
     except Exception as e:
-        print(f"[MODULES] Error reading modules file: {e}")
+        print(f"{tag} Error reading modules file: {e}")
         return
 
     simplified = []
@@ -34,11 +38,11 @@ def process_modules_file():
             }
         )
 
-    if simplified != _last_module_data:
-        _last_module_data = simplified
-        print(f"[MODULES] Modules updated ({len(simplified)} total)")
-        packet = format_packet("modules", "ModulesSnapshot", simplified)
+    if simplified != st.last_module_data:
+        st.last_module_data = simplified
+        print(f"{tag} Modules updated ({len(simplified)} total)")
+        packet = format_packet("modules", "ModulesSnapshot", simplified, cmdr=inst.ns)
         send_to_serial(packet)
         publish_packet(packet)
     else:
-        print("[MODULES] No changes detected.")
+        print(f"{tag} No changes detected.")
@@ -1,8 +1,140 @@
-def handle_receive_text(event):
-    try:
-        channel = event.get("Channel", "Unknown")
-        sender = event.get("From_Localised", "Unknown")
-        message = event.get("Message_Localised", "???")
-        print(f"[{channel}]|[{sender}] : {message}")
-    except Exception as e:
-        print(f"[SHIPCOMMS] Error formatting ReceiveText event: {e}")
+# shipcomms.py
+# SPDX-License-Identifier: MIT
+"""
+Comms pipeline for ReceiveText / SendText journal events.
+- Repeated NPC chatter is dropped via a bounded LRU of message hashes (comms.dedup_channels)
+- Messages are batched per channel (utils.batcher) into `Comms` packets, at most
+  comms.rate_hz packets per channel; when the limit is hit the batch waits for the
+  next window (only the newest messages are kept, the rest are counted as dropped)
+- The last comms.history messages stay queryable in memory via history()
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+
+from utils.batcher import BurstBatcher
+from utils.config import snapshot
+from utils.instance import Instance, default_instance
+from utils.mqtt_output import publish_packet
+from utils.ratelimit import TokenBucket
+from utils.serial_output import format_packet, send_to_serial
+
+COMMS_EVENTS = {"ReceiveText", "SendText"}
+
+
+class CommsState:
+    """Per-instance dedup LRU, message history and per-channel rate limits."""
+
+    def __init__(self):
+        cfg = snapshot().comms
+        self.seen: OrderedDict[int, float] = OrderedDict()
+        self.history: deque[dict] = deque(maxlen=max(cfg.history, 1))
+        self.buckets: dict[str, TokenBucket] = {}
+        self.suppressed = 0  # duplicates dropped by the LRU
+        self.dropped: dict[str, int] = {}  # messages lost to rate limiting, per channel
+
+    def is_repeat(self, key: int, now: float, size: int, ttl: float) -> bool:
+        stamp = self.seen.get(key)
+        if stamp is not None and now - stamp < ttl:
+            self.seen.move_to_end(key)
+            return True
+        self.seen[key] = now
+        self.seen.move_to_end(key)
+        while len(self.seen) > size:
+            self.seen.popitem(last=False)
+        return False
+
+    def bucket(self, channel: str) -> TokenBucket:
+        b = self.buckets.get(channel)
+        if b is None:
+            b = self.buckets[channel] = TokenBucket(snapshot().comms.rate_hz, burst=2.0)
+        return b
+
+
+def parse_comms(event: dict) -> dict:
+    """ReceiveText/SendText -> {channel, from, to, msg, ts}."""
+    if event.get("event") == "SendText":
+        return {
+            "channel": "sent",
+            "from": None,
+            "to": event.get("To"),
+            "msg": event.get("Message", ""),
+            "ts": event.get("timestamp"),
+        }
+    return {
+        "channel": event.get("Channel", "Unknown"),
+        "from": event.get("From_Localised") or event.get("From", "Unknown"),
+        "to": None,
+        "msg": event.get("Message_Localised") or event.get("Message", ""),
+        "ts": event.get("timestamp"),
+    }
+
+
+def _publish_comms(key: tuple, messages: list[dict]) -> None:
+    inst, channel = key
+    st = inst.state("comms", CommsState)
+    if not st.bucket(channel).try_acquire():
+        # Over the channel's packet rate: hold the newest messages for the next window.
+        # requeue() never flushes inline, so this can't call back into itself
+        lost = _batcher_for().requeue(key, messages)
+        if lost:
+            st.dropped[channel] = st.dropped.get(channel, 0) + lost
+        return
+    data = {"channel": channel, "messages": messages}
+    dropped = st.dropped.pop(channel, 0)
+    if dropped:
+        data["dropped"] = dropped
+    print(f"{inst.label('COMMS')} [{channel}] {len(messages)} message(s)")
+    packet = format_packet("journal", "Comms", data, cmdr=inst.ns)
+    send_to_serial(packet)
+    publish_packet(packet)
+
+
+_batcher: BurstBatcher | None = None
+
+
+def _batcher_for() -> BurstBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = BurstBatcher(_publish_comms)
+    cfg = snapshot().comms
+    _batcher.window_s = cfg.window_ms / 1000.0
+    _batcher.max_items = max(cfg.max_batch, 2)
+    return _batcher
+
+
+def handle_comms(event: dict, inst: Instance | None = None) -> bool:
+    """Feed one ReceiveText/SendText entry. Returns False if it was dropped as a repeat."""
+    inst = inst or default_instance()
+    st = inst.state("comms", CommsState)
+    cfg = snapshot().comms
+    msg = parse_comms(event)
+    if msg["channel"] in cfg.dedup_channels:
+        key = hash((msg["channel"], msg["from"], msg["msg"]))
+        if st.is_repeat(key, time.monotonic(), cfg.dedup_size, cfg.dedup_ttl_s):
+            st.suppressed += 1
+            return False
+    st.history.append(msg)
+    _batcher_for().add((inst, msg["channel"]), msg)
+    return True
+
+
+def handle_receive_text(event, inst: Instance | None = None):
+    return handle_comms(event, inst)
+
+
+def history(
+    channel: str | None = None, limit: int = 50, inst: Instance | None = None
+) -> list[dict]:
+    """Newest-last slice of recent messages, optionally for one channel."""
+    st = (inst or default_instance()).state("comms", CommsState)
+    out: list[dict] = []
+    for msg in reversed(list(st.history)):
+        if channel is None or msg["channel"] == channel:
+            out.append(msg)
+            if len(out) >= limit:
+                break
+    out.reverse()
+    return out
@@ -0,0 +1,336 @@
+# squadron.py
+# SPDX-License-Identifier: MIT
+"""
+Squadron aggregator: merges many commanders' parser streams into one state.
+- Consumes <base>/+/events/# (members set general.cmdr or use [[instances]])
+- Drops redelivered/duplicate packets per (source, seq); notices parser restarts
+- Publishes compact, retained summaries on a fixed cadence:
+    <base>/squadron/summary        whole squadron, every tick something changed
+    <base>/squadron/cmdr/<cmdr>    one commander, only when that commander changed
+Run with `python eliteparser.py --aggregate`.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from utils.config import snapshot
+
+SEQ_WINDOW = 1024  # out-of-order tolerance per source
+_WINDOW_MASK = (1 << SEQ_WINDOW) - 1
+
+
+class _SeqWindow:
+    """High-water mark plus a bitmask of recently seen seqs for one source."""
+
+    __slots__ = ("high", "mask", "last_ts")
+
+    def __init__(self):
+        self.high = 0
+        self.mask = 0
+        self.last_ts = ""
+
+    def accept(self, seq: int, ts: str) -> bool | None:
+        """True = new, False = duplicate, None = new after a parser restart."""
+        if seq > self.high:
+            shift = seq - self.high
+            self.mask = ((self.mask << shift) | 1) & _WINDOW_MASK if shift < SEQ_WINDOW else 1
+            self.high = seq
+            self.last_ts = max(ts, self.last_ts)
+            return True
+        back = self.high - seq
+        # seq went backwards: a redelivery carries an old timestamp, a restarted
+        # parser (seq counter reset) stamps packets newer than anything seen so far
+        if back >= SEQ_WINDOW or (ts and ts > self.last_ts):
+            self.high, self.mask, self.last_ts = seq, 1, ts
+            return None
+        bit = 1 << back
+        if self.mask & bit:
+            return False
+        self.mask |= bit
+        return True
+
+
+class CmdrState:
+    """Merged view of one commander."""
+
+    __slots__ = (
+        "name",
+        "system",
+        "station",
+        "body",
+        "ship",
+        "docked",
+        "landed",
+        "supercruise",
+        "danger",
+        "interdicted",
+        "shields",
+        "hull",
+        "shutdown",
+        "last_event",
+        "last_seen",
+        "events",
+        "restarts",
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self.system: str | None = None
+        self.station: str | None = None
+        self.body: str | None = None
+        self.ship: str | None = None
+        self.docked = False
+        self.landed = False
+        self.supercruise = False
+        self.danger = False
+        self.interdicted = False
+        self.shields = True
+        self.hull: float | None = None
+        self.shutdown = False
+        self.last_event: str | None = None
+        self.last_seen = 0.0
+        self.events = 0
+        self.restarts = 0
+
+    def compact(self, online: bool) -> dict[str, Any]:
+        """Short-key summary; empty/default fields are left out."""
+        out: dict[str, Any] = {"on": online}
+        for key, value in (
+            ("sys", self.system),
+            ("stn", self.station),
+            ("body", self.body),
+            ("ship", self.ship),
+            ("hull", self.hull),
+            ("ev", self.last_event),
+        ):
+            if value is not None:
+                out[key] = value
+        for key, flag in (
+            ("dock", self.docked),
+            ("land", self.landed),
+            ("sc", self.supercruise),
+            ("danger", self.danger),
+            ("intd", self.interdicted),
+        ):
+            if flag:
+                out[key] = True
+        if not self.shields:
+            out["shields"] = False
+        return out
+
+
+# --- Journal event handlers: fn(state, data) ---
+def _on_location(st: CmdrState, d: dict) -> None:
+    st.system = d.get("StarSystem", st.system)
+    st.body = d.get("Body")
+    st.docked = bool(d.get("Docked"))
+    st.station = d.get("StationName") if st.docked else None
+
+
+def _on_fsd_jump(st: CmdrState, d: dict) -> None:
+    st.system = d.get("StarSystem", st.system)
+    st.body = d.get("Body")
+    st.docked = st.landed = False
+    st.station = None
+    st.supercruise = True
+
+
+def _on_docked(st: CmdrState, d: dict) -> None:
+    st.docked = True
+    st.station = d.get("StationName")
+    st.system = d.get("StarSystem", st.system)
+
+
+def _on_undocked(st: CmdrState, d: dict) -> None:
+    st.docked = False
+    st.station = None
+
+
+def _on_supercruise_exit(st: CmdrState, d: dict) -> None:
+    st.supercruise = False
+    st.body = d.get("Body", st.body)
+
+
+def _on_load_game(st: CmdrState, d: dict) -> None:
+    st.ship = d.get("Ship", st.ship)
+    st.shutdown = False
+
+
+def _set(attr: str, value: Any) -> Callable[[CmdrState, dict], None]:
+    return lambda st, d: setattr(st, attr, value)
+
+
+_JOURNAL_HANDLERS: dict[str, Callable[[CmdrState, dict], None]] = {
+    "Location": _on_location,
+    "CarrierJump": _on_location,
+    "FSDJump": _on_fsd_jump,
+    "Docked": _on_docked,
+    "Undocked": _on_undocked,
+    "Touchdown": _set("landed", True),
+    "Liftoff": _set("landed", False),
+    "SupercruiseEntry": _set("supercruise", True),
+    "SupercruiseExit": _on_supercruise_exit,
+    "HullDamage": lambda st, d: setattr(st, "hull", d.get("Health", st.hull)),
+    "ShieldState": lambda st, d: setattr(st, "shields", bool(d.get("ShieldsUp", True))),
+    "Fileheader": _set("shutdown", False),
+    "LoadGame": _on_load_game,
+    "Shutdown": _set("shutdown", True),
+}
+
+
+def _apply_status(st: CmdrState, flags: dict) -> None:
+    st.docked = flags.get("Docked", st.docked)
+    st.landed = flags.get("Landed", st.landed)
+    st.supercruise = flags.get("Supercruise", st.supercruise)
+    st.danger = flags.get("IsInDanger", st.danger)
+    st.interdicted = flags.get("BeingInterdicted", st.interdicted)
+    st.shields = flags.get("ShieldsUp", st.shields)
+
+
+class SquadronAggregator:
+    """
+    Feed it raw MQTT messages with on_message(); call flush() on a fixed cadence.
+    publish(topic, payload, retain) defaults to utils.mqtt_output.publish_raw.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, str, bool], None] | None = None,
+        base_topic: str | None = None,
+        stale_after_s: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        cfg = snapshot()
+        if publish is None:
+            from utils.mqtt_output import publish_raw as publish
+        self._publish = publish
+        self.base = base_topic if base_topic is not None else cfg.general.base_topic
+        self.stale_after_s = (
+            stale_after_s if stale_after_s is not None else cfg.aggregator.stale_after_s
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cmdrs: dict[str, CmdrState] = {}
+        self._seqs: dict[str, _SeqWindow] = {}
+        self._dirty: set[str] = set()
+        self._online: dict[str, bool] = {}
+        self.received = 0
+        self.duplicates = 0
+        self.malformed = 0
+
+    @property
+    def topic_filter(self) -> str:
+        return snapshot().aggregator.topic or f"{self.base}/+/events/#"
+
+    # --- ingest (paho network thread) ---
+    def on_message(self, topic: str, payload: bytes | str) -> None:
+        parts = topic.rsplit("/", 3)
+        if len(parts) < 4 or parts[2] != "events":
+            return
+        source = parts[1]
+        try:
+            packet = json.loads(payload)
+            seq = int(packet["seq"])
+        except (ValueError, TypeError, KeyError):
+            self.malformed += 1
+            return
+        self.ingest(source, parts[3], packet, seq)
+
+    def ingest(self, source: str, type_: str, packet: dict, seq: int) -> bool:
+        """Merge one decoded packet. Returns False for duplicates."""
+        with self._lock:
+            self.received += 1
+            window = self._seqs.get(source)
+            if window is None:
+                window = self._seqs[source] = _SeqWindow()
+            verdict = window.accept(seq, packet.get("timestamp", ""))
+            if verdict is False:
+                self.duplicates += 1
+                return False
+            st = self._cmdrs.get(source)
+            if st is None:
+                st = self._cmdrs[source] = CmdrState(source)
+            if verdict is None:
+                st.restarts += 1
+            data = packet.get("data") or {}
+            if type_ == "StatusDelta":
+                _apply_status(st, data)
+            else:
+                handler = _JOURNAL_HANDLERS.get(type_)
+                if handler is not None:
+                    handler(st, data)
+                st.last_event = type_
+            st.last_seen = self._clock()
+            st.events += 1
+            self._dirty.add(source)
+            return True
+
+    # --- output (fixed cadence) ---
+    def _is_online(self, st: CmdrState, now: float) -> bool:
+        return not st.shutdown and now - st.last_seen < self.stale_after_s
+
+    def summary(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            return self._summary(now)
+
+    def _summary(self, now: float) -> dict[str, Any]:
+        cmdrs = {}
+        for name, st in self._cmdrs.items():
+            cmdrs[name] = st.compact(self._online.get(name, self._is_online(st, now)))
+        return {
+            "n": len(cmdrs),
+            "online": sum(1 for c in cmdrs.values() if c["on"]),
+            "docked": sorted(n for n, c in cmdrs.items() if c.get("dock")),
+            "danger": sorted(n for n, c in cmdrs.items() if c.get("danger")),
+            "cmdrs": cmdrs,
+        }
+
+    def flush(self) -> int:
+        """Publish summaries if anything changed. Returns the number of topics published."""
+        now = self._clock()
+        with self._lock:
+            # Going stale (or coming back) counts as a change
+            for name, st in self._cmdrs.items():
+                online = self._is_online(st, now)
+                if self._online.get(name) != online:
+                    self._online[name] = online
+                    self._dirty.add(name)
+            if not self._dirty:
+                return 0
+            summary = self._summary(now)
+            dirty, self._dirty = self._dirty, set()
+        out = 0
+        for name in sorted(dirty):
+            self._emit(f"{self.base}/squadron/cmdr/{name}", summary["cmdrs"][name])
+            out += 1
+        self._emit(f"{self.base}/squadron/summary", summary)
+        return out + 1
+
+    def _emit(self, topic: str, obj: dict) -> None:
+        self._publish(topic, json.dumps(obj, separators=(",", ":"), ensure_ascii=False), True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cmdrs": len(self._cmdrs),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "malformed": self.malformed,
+        }
+
+
+def aggregator_loop(agg: SquadronAggregator):
+    """Supervisor component: flush summaries every aggregator.interval_ms."""
+
+    def _run(ctx):
+        while ctx.wait_active():
+            agg.flush()
+            if not ctx.sleep(max(snapshot().aggregator.interval_ms, 100) / 1000.0):
+                return
+
+    return _run
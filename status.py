@@ -1,19 +1,25 @@
 import json
-import os
 
-from utils.config import get
+from derived import on_status as derive_status
+from telemetry import on_status as telemetry_status
+from utils.instance import Instance, default_instance
 from utils.mqtt_output import publish_packet
-from utils.mqtt_output import start as mqtt_start
+from utils.priority import CRITICAL, CRITICAL_FLAGS
 from utils.serial_output import format_packet, send_to_serial
+from utils.status_block import update as update_status_block
 
-mqtt_start()
 
+def status_file(inst: Instance | None = None) -> str:
+    return (inst or default_instance()).path("Status.json")
 
-ELITE_DIR = os.path.normpath(get("general.elite_dir"))
-STATUS_FILE = os.path.join(ELITE_DIR, "Status.json")
 
-# Keep last state for delta tracking
-_last_flags = {}
+class StatusState:
+    """Keep last state for delta tracking (one per instance)."""
+
+    __slots__ = ("last_flags",)
+
+    def __init__(self):
+        self.last_flags: dict = {}
 
 
 def decode_flags(flags):
@@ -52,28 +58,36 @@ def decode_flags(flags):
     }
 
 
-def process_status_file():
-    global _last_flags
+def process_status_file(inst: Instance | None = None):
+    inst = inst or default_instance()
+    st = inst.state("status", StatusState)
+    tag = inst.label("STATUS")
     try:
-        with open(STATUS_FILE) as f:
+        with open(status_file(inst)) as f:
             data = json.load(f)
     except Exception as e:
-        print(f"[STATUS] Error reading status file: {e}")
+        print(f"{tag} Error reading status file: {e}")
         return
 
+    update_status_block(data, inst)
+    telemetry_status(data, inst)
     decoded_flags = decode_flags(data.get("Flags", 0))
 
     # Check for deltas
-    if _last_flags:
+    priority = None  # by packet type
+    if st.last_flags:
         for key in decoded_flags:
-            if decoded_flags[key] != _last_flags.get(key):
-                print(f"[STATUS] Change Detected: {key} = {decoded_flags[key]}")
+            if decoded_flags[key] != st.last_flags.get(key):
+                print(f"{tag} Change Detected: {key} = {decoded_flags[key]}")
+                if key in CRITICAL_FLAGS:
+                    priority = CRITICAL  # interdiction/danger/heat/shields jump the queue
     else:
-        print("[STATUS] Initial load.")
+        print(f"{tag} Initial load.")
 
-    _last_flags = decoded_flags.copy()
+    st.last_flags = decoded_flags.copy()
+    derive_status(decoded_flags, data.get("timestamp"), inst)
 
     # Send full payload to serial
-    packet = format_packet("status", "StatusDelta", decoded_flags)
+    packet = format_packet("status", "StatusDelta", decoded_flags, cmdr=inst.ns)
     send_to_serial(packet)
-    publish_packet(packet)
+    publish_packet(packet, priority)
@@ -0,0 +1,280 @@
+# telemetry.py
+# SPDX-License-Identifier: MIT
+"""
+Planetary flight telemetry from Status.json (Latitude, Longitude, Altitude, Heading),
+for gauges and maps that want smooth data instead of one JSON packet per update.
+- Samples that clear a per-field deadband go into a NumPy ring buffer; hysteresis
+  lowers the band while the ship is moving and restores it once it settles, so
+  jitter at rest is dropped without chopping up real motion
+- Ground speed (haversine over PlanetRadius), vertical rate (least-squares slope)
+  and course are computed vectorized over the last telemetry.window_s of the buffer
+- telemetry.mode: "stream" publishes a FlightTelemetry packet at up to rate_hz,
+  "batch" publishes FlightTrack packets of column arrays, "both" does both
+- Needs numpy; off unless telemetry.enabled
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any
+
+from utils.config import Snapshot, snapshot
+from utils.instance import Instance, default_instance
+from utils.mqtt_output import publish_packet
+from utils.serial_output import format_packet, send_to_serial
+
+FIELDS = ("latitude", "longitude", "altitude", "heading")
+_KEYS = ("Latitude", "Longitude", "Altitude", "Heading")
+T, LAT, LON, ALT, HDG = range(5)
+_WRAPS = (False, False, False, True)  # heading wraps at 360
+MODES = ("stream", "batch", "both")
+
+_np: Any = None  # numpy, imported when telemetry is first used
+_unavailable = False
+
+
+def _numpy():
+    global _np, _unavailable
+    if _np is None and not _unavailable:
+        try:
+            import numpy
+        except ImportError:
+            _unavailable = True
+            print("[TELEMETRY] numpy not installed (pip install numpy); telemetry off")
+            return None
+        _np = numpy
+    return _np
+
+
+class FlightBuffer:
+    """Fixed-capacity ring of (t, lat, lon, alt, heading) float64 rows."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 2)
+        self._rows = _np.full((self.capacity, 5), _np.nan)
+        self._next = 0
+        self.count = 0
+
+    def append(self, row: tuple[float, ...]) -> None:
+        self._rows[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last(self, n: int):
+        """The newest n rows, oldest first (a view unless they wrap around)."""
+        n = min(n, self.count)
+        start = self._next - n
+        if start >= 0:
+            return self._rows[start : self._next]
+        return _np.concatenate((self._rows[start:], self._rows[: self._next]))
+
+    def since(self, t0: float):
+        rows = self.last(self.count)
+        return rows[_np.searchsorted(rows[:, T], t0) :]
+
+    def clear(self) -> None:
+        self._next = 0
+        self.count = 0
+
+
+class Deadband:
+    """
+    Accepts a sample when any field moved more than its band since the last accepted
+    one. While moving, bands shrink to band * hysteresis; one rejected sample restores them.
+    """
+
+    def __init__(self, bands: tuple[float, ...], hysteresis: float):
+        self.bands = bands
+        self.hysteresis = hysteresis
+        self.ref: tuple[float, ...] | None = None
+        self.moving = False
+
+    def accept(self, values: tuple[float, ...]) -> bool:
+        ref = self.ref
+        if ref is None:
+            self.ref = values
+            return True
+        scale = self.hysteresis if self.moving else 1.0
+        for new, old, band, wraps in zip(values, ref, self.bands, _WRAPS, strict=True):
+            if math.isnan(new) or math.isnan(old):
+                changed = math.isnan(new) != math.isnan(old)
+            else:
+                diff = abs(new - old)
+                if wraps:
+                    diff = min(diff, 360.0 - diff)  # 359 -> 1 is a 2 degree turn
+                changed = diff > band * scale
+            if changed:
+                self.ref = values
+                self.moving = True
+                return True
+        self.moving = False
+        return False
+
+
+def rates(rows, radius_m: float | None) -> dict[str, float | None]:
+    """Ground speed (m/s), vertical rate (m/s) and course (deg) over chronological rows."""
+    np = _np
+    out: dict[str, float | None] = {
+        "ground_speed": None,
+        "vertical_rate": None,
+        "course": None,
+    }
+    if len(rows) < 2:
+        return out
+    t = rows[:, T]
+    span = float(t[-1] - t[0])
+    if span <= 0:
+        return out
+    alt = rows[:, ALT]
+    ok = ~np.isnan(alt)
+    if ok.sum() >= 2:
+        ta = t[ok] - t[ok].mean()
+        denom = float((ta * ta).sum())
+        if denom > 0:
+            out["vertical_rate"] = round(float((ta * (alt[ok] - alt[ok].mean())).sum()) / denom, 2)
+    if radius_m:
+        lat, lon = np.radians(rows[:, LAT]), np.radians(rows[:, LON])
+        dlat, dlon = np.diff(lat), np.diff(lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+        dist = 2 * radius_m * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        out["ground_speed"] = round(float(np.nansum(dist)) / span, 2)
+        y = math.sin(lon[-1] - lon[0]) * math.cos(lat[-1])
+        x = math.cos(lat[0]) * math.sin(lat[-1]) - math.sin(lat[0]) * math.cos(lat[-1]) * math.cos(
+            lon[-1] - lon[0]
+        )
+        if x or y:
+            out["course"] = round(math.degrees(math.atan2(y, x)) % 360.0, 1)
+    return out
+
+
+def _sample(row) -> dict[str, Any]:
+    return {
+        "latitude": round(float(row[LAT]), 6),
+        "longitude": round(float(row[LON]), 6),
+        "altitude": None if math.isnan(row[ALT]) else round(float(row[ALT]), 1),
+        "heading": None if math.isnan(row[HDG]) else int(row[HDG]),
+    }
+
+
+def _columns(rows) -> dict[str, list]:
+    """Column arrays for a FlightTrack packet (NaN -> null)."""
+    np = _np
+    cols = {
+        "t": np.round(rows[:, T], 3),
+        "latitude": np.round(rows[:, LAT], 6),
+        "longitude": np.round(rows[:, LON], 6),
+        "altitude": np.round(rows[:, ALT], 1),
+        "heading": np.round(rows[:, HDG], 0),
+    }
+    return {
+        name: [None if math.isnan(v) else v for v in col.tolist()] for name, col in cols.items()
+    }
+
+
+class TelemetryState:
+    """
+    Per-instance buffer, deadband and publish bookkeeping. In watchdog mode
+    on_status() runs on the observer thread and maybe_publish() on the poller,
+    so both hold `lock` while they touch it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cfg: Snapshot | None = None
+        self.buffer: FlightBuffer | None = None
+        self.deadband: Deadband | None = None
+        self.radius: float | None = None
+        self.body: str | None = None
+        self.fresh = False  # accepted samples not streamed yet
+        self.pending = 0  # accepted samples not batched yet
+        self.last_stream = 0.0
+        self.batch_since = 0.0  # when the oldest pending sample arrived
+
+    def configure(self, cfg: Snapshot) -> None:
+        if cfg.mode not in MODES:
+            print(f"[TELEMETRY] Unknown mode {cfg.mode!r} (expected one of {MODES})")
+        if self.buffer is None or self.buffer.capacity != cfg.buffer:
+            self.buffer = FlightBuffer(cfg.buffer)
+            self.pending = 0
+        self.deadband = Deadband(tuple(float(cfg.deadband[f]) for f in FIELDS), cfg.hysteresis)
+        self.cfg = cfg
+
+    def reset(self) -> None:
+        if self.buffer is not None:
+            self.buffer.clear()
+        if self.deadband is not None:
+            self.deadband.ref = None
+        self.fresh = False
+        self.pending = 0
+
+
+def on_status(data: dict, inst: Instance | None = None) -> None:
+    """Feed one Status.json update; called by status.process_status_file."""
+    cfg = snapshot().telemetry
+    if not cfg.enabled or _numpy() is None:
+        return
+    inst = inst or default_instance()
+    st = inst.state("telemetry", TelemetryState)
+    now = time.time()  # Status.json timestamps only have 1 s resolution
+    with st.lock:
+        if st.cfg is not cfg:
+            st.configure(cfg)
+        if data.get("Latitude") is None:  # left the surface/orbital-cruise zone
+            if st.buffer.count:
+                st.reset()
+            return
+        values = tuple(float(data[k]) if data.get(k) is not None else math.nan for k in _KEYS)
+        st.radius = data.get("PlanetRadius") or st.radius
+        st.body = data.get("BodyName") or st.body
+        if st.deadband.accept(values):
+            st.buffer.append((now, *values))
+            st.fresh = True
+            if not st.pending:
+                st.batch_since = now
+            st.pending = min(st.pending + 1, st.buffer.capacity)
+    maybe_publish(inst, now)
+
+
+def _due(st: TelemetryState, cfg: Snapshot, now: float, inst: Instance) -> list[tuple[dict, bool]]:
+    """(packet, also to serial) pairs due now; caller holds st.lock."""
+    out: list[tuple[dict, bool]] = []
+    period = 1.0 / cfg.rate_hz if cfg.rate_hz > 0 else 0.0  # 0 = every accepted sample
+    if st.fresh and cfg.mode in ("stream", "both") and now - st.last_stream >= period:
+        st.fresh = False
+        st.last_stream = now
+        latest = st.buffer.last(1)[0]
+        data = _sample(latest) | rates(st.buffer.since(now - cfg.window_s), st.radius)
+        data["body"] = st.body
+        out.append((format_packet("telemetry", "FlightTelemetry", data, cmdr=inst.ns), True))
+    if (
+        st.pending
+        and cfg.mode in ("batch", "both")
+        and (st.pending >= cfg.batch_max or now - st.batch_since >= cfg.batch_interval_ms / 1000.0)
+    ):
+        rows = st.buffer.last(st.pending)
+        st.pending = 0
+        data = {"body": st.body, "radius": st.radius, "count": len(rows)} | _columns(rows)
+        data |= rates(rows, st.radius)
+        out.append((format_packet("telemetry", "FlightTrack", data, cmdr=inst.ns), False))
+    return out
+
+
+def maybe_publish(inst: Instance | None = None, now: float | None = None) -> None:
+    """Flush whatever is due; also called on every poller tick so the tail goes out."""
+    cfg = snapshot().telemetry
+    if not cfg.enabled or _np is None:
+        return
+    inst = inst or default_instance()
+    st = inst.state("telemetry", TelemetryState)
+    now = time.time() if now is None else now
+    with st.lock:
+        if st.buffer is None or not st.buffer.count:
+            return
+        due = _due(st, cfg, now, inst)
+    # Sent outside the lock so a slow serial port never stalls the other thread
+    for packet, to_serial in due:
+        if to_serial:
+            send_to_serial(packet)
+        publish_packet(packet)
@@ -3,6 +3,26 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def config(tmp_path):
+    """install(toml_text) swaps in a config read from tmp_path; the old one is restored after."""
+    from utils import config as cfg
+
+    cfg.snapshot()
+    previous = cfg._path
+
+    def install(text: str = ""):
+        path = tmp_path / "config.toml"
+        path.write_text(text, encoding="utf-8")
+        cfg.reload_config(path)
+        return cfg.snapshot()
+
+    yield install
+    cfg.reload_config(previous)
@@ -0,0 +1,194 @@
+# tests/test_batcher.py
+import json
+import time
+
+import pytest
+
+import journal
+from utils.batcher import BurstBatcher
+from utils.instance import Instance
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pred()
+
+
+def test_groups_by_key_and_flushes_when_the_window_expires():
+    clock, out = Clock(), []
+    b = BurstBatcher(lambda k, items: out.append((k, items)), 0.25, 100, clock, background=False)
+    b.add("sol", 1)
+    clock.t = 0.1
+    b.add("wolf", 2)
+    b.add("sol", 3)
+    assert b.pending() == 3 and b.flush_due() == 0
+    clock.t = 0.25
+    assert b.flush_due() == 1 and out == [("sol", [1, 3])]
+    b.add("sol", 4)  # a new window for the same key
+    clock.t = 0.35
+    assert b.flush_due() == 1 and out[-1] == ("wolf", [2])
+    assert b.flush_due(now=0.5) == 1 and out[-1] == ("sol", [4]) and b.pending() == 0
+
+
+def test_size_cap_and_explicit_flush():
+    out = []
+    b = BurstBatcher(lambda k, items: out.append((k, items)), 10.0, 3, background=False)
+    for i in range(7):
+        b.add("k", i)
+    assert out == [("k", [0, 1, 2]), ("k", [3, 4, 5])]  # flushed inline on the third add
+    b.add("other", "x")
+    assert b.flush("missing") == 0 and b.flush("other") == 1 and out[-1] == ("other", ["x"])
+    assert b.flush() == 1 and out[-1] == ("k", [6]) and b.flush() == 0
+
+
+def test_failing_flush_does_not_lose_other_batches():
+    out = []
+
+    def flush(key, items):
+        if key == "bad":
+            raise RuntimeError("publisher down")
+        out.append(key)
+
+    b = BurstBatcher(flush, 10.0, 100, background=False)
+    b.add("bad", 1)
+    b.add("good", 2)
+    assert b.flush() == 2 and out == ["good"] and b.pending() == 0
+
+
+def test_requeue_puts_a_refused_batch_back_in_front_without_flushing():
+    clock, out = Clock(), []
+    b = BurstBatcher(lambda k, items: out.append((k, items)), 0.25, 4, clock, background=False)
+    assert b.requeue("k", [1, 2]) == 0 and b.pending() == 2
+    b.add("k", 3)
+    assert b.requeue("k", [-1, 0]) == 2  # keeps the newest max_items - 1
+    assert out == [] and b._pending["k"] == [1, 2, 3]
+    clock.t = 0.25
+    assert b.flush_due() == 1 and out == [("k", [1, 2, 3])]
+
+
+def test_background_thread_flushes_on_time_and_close_drains():
+    out = []
+    b = BurstBatcher(lambda k, items: out.append((k, items)), 0.05, 100)
+    b.add("a", 1)
+    _wait(lambda: out == [("a", [1])])
+    b.window_s = 60.0
+    b.add("b", 2)
+    b.close()
+    assert out[-1] == ("b", [2])
+    b._thread.join(1)
+    assert not b._thread.is_alive()
+
+
+# --- ScanBatch in the journal pipeline ---
+SCANS = [
+    {"event": "FSDJump", "StarSystem": "Col 285 Sector AB-C", "SystemAddress": 42},
+    {
+        "event": "Scan",
+        "BodyName": "A 1",
+        "BodyID": 1,
+        "PlanetClass": "Icy body",
+        "DistanceFromArrivalLS": 12.345,
+        "Landable": True,
+        "WasDiscovered": False,
+        "SystemAddress": 42,
+    },
+    {
+        "event": "FSSSignalDiscovered",
+        "SignalName": "$Fixed_Event_Life_Cloud;",
+        "SignalName_Localised": "Notable stellar phenomena",
+        "SignalType": "Generic",
+        "SystemAddress": 42,
+    },
+    {
+        "event": "SAASignalsFound",
+        "BodyName": "A 1",
+        "Signals": [
+            {"Type": "$SAA_SignalType_Biological;", "Type_Localised": "Biological", "Count": 2}
+        ],
+        "Genuses": [{}, {}],
+        "SystemAddress": 42,
+    },
+    {"event": "HullDamage", "Health": 0.9},  # critical: does not wait for scans
+    {
+        "event": "Scan",
+        "BodyName": "Other 2",
+        "StarType": "M",
+        "SystemAddress": 7,
+        "StarSystem": "Elsewhere",
+    },
+    {"event": "Docked", "StationName": "Jameson Memorial"},
+]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch, config):
+    config("[batching]\nwindow_ms = 60000\nmax_items = 100\n[derived]\nenabled = false\n")
+    sent = []
+    monkeypatch.setattr(journal, "publish_packet", lambda packet, *a: sent.append(packet))
+    monkeypatch.setattr(journal, "send_to_serial", lambda packet: None)
+    monkeypatch.setattr(journal, "_batcher", BurstBatcher(journal._publish_scan_batch))
+    yield tmp_path, sent
+    journal._batcher.close()
+
+
+def _run(directory, entries, inst=None):
+    path = directory / "Journal.2024-06-01T000000.01.log"
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps({"timestamp": "2024-06-01T00:00:00Z"} | entry) + "\n")
+    inst = inst or Instance("CMDR Scanner", str(directory))
+    journal.process_journal_file(inst, str(path))
+    return inst
+
+
+def test_scans_are_batched_per_system_and_flushed_before_docking(pipeline):
+    directory, sent = pipeline
+    inst = _run(directory, SCANS)
+    assert [p["type"] for p in sent] == [
+        "FSDJump",
+        "HullDamage",
+        "ScanBatch",
+        "ScanBatch",
+        "Docked",
+    ]
+    first, second = (p["data"] for p in sent[2:4])
+    assert first["StarSystem"] == "Col 285 Sector AB-C" and first["SystemAddress"] == 42
+    assert first["counts"] == {"Scan": 1, "FSS": 1, "SAA": 1}
+    assert first["items"] == [
+        {
+            "e": "Scan",
+            "body": "A 1",
+            "id": 1,
+            "class": "Icy body",
+            "ls": 12.3,
+            "land": True,
+            "first": True,
+        },
+        {"e": "FSS", "name": "Notable stellar phenomena", "type": "Generic"},
+        {"e": "SAA", "body": "A 1", "signals": {"Biological": 2}, "genuses": 2},
+    ]
+    assert second["StarSystem"] == "Elsewhere" and second["counts"] == {"Scan": 1}
+    assert sent[2]["cmdr"] == inst.ns
+
+
+def test_scans_flush_on_the_next_jump_or_when_the_window_ends(pipeline, config):
+    directory, sent = pipeline
+    inst = _run(directory, SCANS[:2])
+    assert [p["type"] for p in sent] == ["FSDJump"]
+    _run(directory, [{"event": "FSDJump", "StarSystem": "Next", "SystemAddress": 43}], inst)
+    assert [p["type"] for p in sent] == ["FSDJump", "ScanBatch", "FSDJump"]
+
+    config("[batching]\nwindow_ms = 50\n[derived]\nenabled = false\n")
+    _run(directory, [{"event": "Scan", "BodyName": "N 1", "SystemAddress": 43}], inst)
+    _wait(lambda: len(sent) == 4)
+    assert sent[-1]["type"] == "ScanBatch" and sent[-1]["data"]["StarSystem"] == "Next"
@@ -0,0 +1,181 @@
+# tests/test_broker_pool.py
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.broker_pool import BrokerPool, Message
+from utils.priority import CRITICAL, NORMAL
+
+
+class FakeClient:
+    """Stands in for a paho client: connects on loop_start, records publishes."""
+
+    def __init__(self, client_id, delay=0.0):
+        self.client_id = client_id
+        self.delay = delay
+        self.published = []
+        self.lock = threading.Lock()
+
+    def username_pw_set(self, username, password):
+        self.auth = (username, password)
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        pass
+
+    def connect_async(self, host, port, keepalive):
+        self.address = (host, port)
+
+    def loop_start(self):
+        self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def publish(self, topic, payload, qos, retain, properties):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.published.append((topic, payload, qos, retain, time.perf_counter()))
+        return SimpleNamespace(rc=0)
+
+
+class Factory:
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.clients = {}
+
+    def __call__(self, client_id):
+        delay = next((d for name, d in self.delays.items() if name in client_id), 0.0)
+        client = self.clients[client_id] = FakeClient(client_id, delay)
+        return client
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pred()
+
+
+def _encoder():
+    calls = []
+
+    def encode(msg):
+        if msg.wire is None:
+            calls.append(msg.topic)
+            msg.wire = (msg.payload, None)
+        return msg.wire
+
+    return encode, calls
+
+
+def test_fan_out_shares_encoded_bytes_and_applies_policies():
+    factory = Factory()
+    encode, calls = _encoder()
+    pool = BrokerPool(
+        [
+            {"name": "local", "qos": 0},
+            {"name": "remote", "qos": 1, "retain": True, "topics": ["elite/+/events/FSDJump"]},
+        ],
+        encode,
+        factory,
+    )
+    pool.start()
+    try:
+        msgs = [Message(f"elite/cmdr/events/{t}", t.encode()) for t in ("FSDJump", "Docked")]
+        for m in msgs:
+            pool.publish(m, NORMAL)
+        local = factory.clients["elite-parser-local"]
+        remote = factory.clients["elite-parser-remote"]
+        _wait(lambda: len(local.published) == 2 and len(remote.published) == 1)
+    finally:
+        pool.stop()
+    assert [p[:4] for p in local.published] == [
+        ("elite/cmdr/events/FSDJump", b"FSDJump", 0, False),
+        ("elite/cmdr/events/Docked", b"Docked", 0, False),
+    ]
+    assert remote.published[0][:4] == ("elite/cmdr/events/FSDJump", b"FSDJump", 1, True)
+    assert remote.published[0][1] is local.published[0][1]  # same bytes, not re-encoded
+    assert sorted(calls) == sorted(m.topic for m in msgs)
+
+
+def test_shards_keep_each_topic_on_one_connection():
+    factory = Factory()
+    encode, _ = _encoder()
+    pool = BrokerPool(
+        [{"name": "hub", "connections": 3, "shard_topics": ["elite/+/events/#"]}],
+        encode,
+        factory,
+    )
+    pool.start()
+    topics = [f"elite/cmdr{i}/events/StatusDelta" for i in range(30)] + ["elite/squadron/summary"]
+    try:
+        for _ in range(5):
+            for t in topics:
+                pool.publish(Message(t, b"x"), NORMAL)
+        clients = [factory.clients[f"elite-parser-hub-{i}"] for i in range(3)]
+        _wait(lambda: sum(len(c.published) for c in clients) == 5 * len(topics))
+    finally:
+        pool.stop()
+    owners = {}
+    for i, c in enumerate(clients):
+        for topic, *_ in c.published:
+            assert owners.setdefault(topic, i) == i
+    assert owners["elite/squadron/summary"] == 0  # unsharded topics use the first connection
+    assert all(c.published for c in clients)
+
+
+def test_slow_capped_remote_does_not_delay_local():
+    factory = Factory({"remote": 0.005})
+    encode, _ = _encoder()
+    pool = BrokerPool(
+        [{"name": "local"}, {"name": "remote", "rate_hz": 40.0, "burst": 5.0}],
+        encode,
+        factory,
+    )
+    pool.start()
+    try:
+        sent = {}
+        for i in range(200):
+            topic = f"elite/events/E{i}"
+            sent[topic] = time.perf_counter()
+            pool.publish(Message(topic, b"{}"), CRITICAL if i % 10 == 0 else NORMAL)
+            time.sleep(0.001)
+        local = factory.clients["elite-parser-local"]
+        remote = factory.clients["elite-parser-remote"]
+        _wait(lambda: len(local.published) == 200)
+        elapsed = time.perf_counter() - min(sent.values())
+        stats = pool.stats()
+    finally:
+        pool.stop()
+    latencies = sorted(at - sent[topic] for topic, _, _, _, at in local.published)
+    assert latencies[int(0.99 * len(latencies))] < 0.05
+    # The remote is capped (burst + rate * elapsed) and slow; its backlog stays its own
+    assert len(remote.published) <= 5 + 40.0 * (elapsed + 0.5)
+    assert stats["remote"]["remote"]["throttled"] > 0
+    assert stats["local"]["local"]["published"] == 200
+
+
+def test_encode_failure_is_counted_and_the_link_keeps_going():
+    factory = Factory()
+
+    def encode(msg):
+        if msg.payload == b"bad":
+            raise ValueError("unknown codec")
+        return (msg.payload, None)
+
+    pool = BrokerPool([{"name": "remote"}], encode, factory, client_prefix="elite-parser-jo-a1")
+    pool.start()
+    try:
+        for payload in (b"bad", b"ok"):
+            pool.publish(Message("elite/events/X", payload), NORMAL)
+        client = factory.clients["elite-parser-jo-a1-remote"]  # per-process id prefix
+        _wait(lambda: len(client.published) == 1)
+        stats = pool.stats()
+    finally:
+        pool.stop()
+    assert client.published[0][1] == b"ok"
+    assert stats["remote"]["remote"]["failed"] == 1
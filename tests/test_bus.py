@@ -0,0 +1,86 @@
+# tests/test_bus.py
+import asyncio
+import threading
+
+import pytest
+
+from utils import bus
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(bus, "_subs", ())
+
+
+def test_bounded_queue_drops_the_oldest():
+    sub = bus.subscribe("elite/events/+", maxsize=3)
+    for i in range(5):
+        bus.publish("elite/events/Music", {"i": i})
+    bus.publish("elite/status", {"i": 99})  # not matched
+    assert sub.dropped == 2
+    assert [sub.get(0)["i"] for _ in range(3)] == [2, 3, 4]
+    assert sub.get(timeout=0.01) is None
+
+
+def test_subscribe_and_unsubscribe_during_publish():
+    got = []
+    late = []
+
+    def once(packet):
+        got.append(("once", packet["n"]))
+        bus.unsubscribe(first)
+        late.append(bus.subscribe("#", callback=lambda p: got.append(("late", p["n"]))))
+
+    def broken(packet):
+        raise RuntimeError("subscriber bug")
+
+    first = bus.subscribe("#", callback=once)
+    bus.subscribe("#", callback=broken)
+    bus.subscribe("#", callback=lambda p: got.append(("steady", p["n"])))
+    bus.publish("elite/events/A", {"n": 1})
+    # Publishing iterates the tuple it started with: the removed subscriber still got
+    # this packet, the new one did not, and the failing one didn't stop the rest
+    assert got == [("once", 1), ("steady", 1)]
+    bus.publish("elite/events/A", {"n": 2})
+    assert got[2:] == [("steady", 2), ("late", 2)]
+    assert len(late) == 1 and len(bus._subs) == 3
+
+
+def test_iterator_drains_then_stops_on_close():
+    sub = bus.subscribe("elite/#")
+    out = []
+    reader = threading.Thread(target=lambda: out.extend(p["n"] for p in sub))
+    reader.start()
+    for n in range(3):
+        bus.publish("elite/events/X", {"n": n})
+    sub.close()
+    reader.join(5)
+    assert not reader.is_alive() and out == [0, 1, 2]
+    assert not bus.has_subscribers()
+    bus.publish("elite/events/X", {"n": 3})
+    assert sub.get(0) is None
+
+
+def test_async_for_receives_from_other_threads():
+    async def consume():
+        with bus.subscribe("elite/events/+") as sub:
+            seen = []
+
+            def produce():
+                for n in range(5):
+                    bus.publish("elite/events/Y", {"n": n})
+                sub.close()
+
+            async for packet in sub:
+                if not seen:
+                    threading.Thread(target=produce).start()
+                seen.append(packet["n"])
+            return seen
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        bus.publish("elite/events/Y", {"n": -1})  # first packet starts the producer
+        return await asyncio.wait_for(task, 5)
+
+    assert asyncio.run(main()) == [-1, 0, 1, 2, 3, 4]
@@ -0,0 +1,148 @@
+# tests/test_command_router.py
+import threading
+
+from utils.command_router import CommandRouter
+from utils.focus import ForegroundTracker
+from utils.input_scheduler import InputScheduler, build_job
+from utils.ratelimit import TokenBucket
+from utils.topics import TopicTrie
+
+KEYMAP = TopicTrie(
+    {
+        "elite/cmd/ship/gear": "g",
+        "elite/cmd/ship/+": "x",
+        "elite/cmd/srv/#": "s",
+    }
+)
+
+
+class FakeFocus:
+    def __init__(self, foreground=True):
+        self.foreground = foreground
+
+    def is_foreground(self, process_name):
+        return self.foreground
+
+
+class FakeKeys:
+    def __init__(self):
+        self.events = []
+
+    def key_down(self, key):
+        self.events.append(("down", key))
+        return True
+
+    def key_up(self, key):
+        self.events.append(("up", key))
+        return True
+
+
+class _Router(CommandRouter):
+    """Runs queued jobs synchronously so tests can assert on key events."""
+
+    def handle(self, topic, payload):
+        result = super().handle(topic, payload)
+        while self.scheduler.run_once(timeout=0):
+            pass
+        return result
+
+
+def _downs(keys):
+    return [k for op, k in keys.events if op == "down"]
+
+
+def _router(focus=None):
+    keys = FakeKeys()
+    router = _Router(
+        focus=focus or FakeFocus(),
+        scheduler=InputScheduler(keys),
+        resolve=KEYMAP.lookup,
+        keys=lambda: frozenset({"g", "x", "s"}),
+    )
+    return router, keys
+
+
+def test_trie_prefers_most_specific_match():
+    assert KEYMAP.lookup("elite/cmd/ship/gear") == "g"
+    assert KEYMAP.lookup("elite/cmd/ship/lights") == "x"
+    assert KEYMAP.lookup("elite/cmd/srv") == "s"
+    assert KEYMAP.lookup("elite/cmd/srv/turret/up") == "s"
+    assert KEYMAP.lookup("elite/cmd/mode/srv") is None
+
+
+def test_router_presses_mapped_key_only_when_foreground():
+    focus = FakeFocus(foreground=False)
+    router, keys = _router(focus)
+    router.handle("elite/cmd/ship/gear", "")
+    assert _downs(keys) == []
+    focus.foreground = True
+    router.handle("elite/cmd/ship/gear", "")
+    router.handle("elite/cmd/mode/srv", "")  # unmapped
+    assert _downs(keys) == ["g"]
+
+
+def test_rate_limit_is_per_command_class():
+    router, keys = _router()
+    router.handle("elite/cmd/ship/gear", "")
+    router.handle("elite/cmd/ship/lights", "")  # same class, bucket empty
+    router.handle("elite/cmd/srv/turret", "")  # other class has its own bucket
+    assert _downs(keys) == ["g", "s"]
+    assert set(router._buckets) == {"ship", "srv"}
+
+
+def test_reserved_topics_are_rate_limited_and_skip_the_keymap():
+    router, keys = _router()
+    assert router.handle("elite/cmd/$diag/threads", "") == "unmapped"  # diagnostics off
+    assert router.handle("elite/cmd/$diag/threads", "") == "rate_limited"
+    assert router.handle("elite/cmd/$query/systems", {}) == "unmapped"  # spatial index off
+    assert router.handle("elite/cmd/$query/systems", {}) == "rate_limited"
+    assert _downs(keys) == [] and set(router._buckets) == {"$diag", "$query"}
+
+
+def test_macro_payloads_compile_to_timed_steps():
+    job = build_job("t", "g", {"action": "chord", "keys": ["g", "l"], "hold_ms": 30})
+    assert job.steps == [("down", "g"), ("down", "l"), ("wait", 30), ("up", "l"), ("up", "g")]
+    job = build_job("t", "g", {"action": "repeat", "count": 2, "interval_ms": 10})
+    assert [s for s in job.steps if s[0] == "down"] == [("down", "g"), ("down", "g")]
+    job = build_job("t", "g", {"sequence": [{"action": "press"}, {"delay_ms": 5}]})
+    assert job.steps[-1] == ("wait", 5)
+
+
+def test_scheduler_runs_by_priority_and_releases_cancelled_holds():
+    keys = FakeKeys()
+    sched = InputScheduler(keys)
+    sched.submit(build_job("a", "g", "", None))
+    sched.submit(build_job("b", "l", {"priority": 0}, None))
+    sched.run_once(timeout=0)
+    sched.run_once(timeout=0)
+    assert _downs(keys) == ["l", "g"]
+
+    keys.events.clear()
+    sched.submit(build_job("hold", "g", {"action": "hold", "hold_ms": 5000}, None))
+    threading.Timer(0.05, sched.cancel, args=("hold",)).start()
+    assert not sched.run_once(timeout=0)
+    assert keys.events == [("down", "g"), ("up", "g")]
+
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    now[0] += 0.5
+    assert bucket.try_acquire()
+
+
+def test_foreground_tracker_resolves_only_on_window_change():
+    window = [1]
+    lookups = []
+    tracker = ForegroundTracker(
+        lambda: window[0],
+        lambda hwnd: hwnd * 10,
+        lambda pid: lookups.append(pid) or ("EliteDangerous64.exe" if pid == 10 else "x.exe"),
+    )
+    assert tracker.is_foreground("elitedangerous64.exe")
+    assert tracker.is_foreground("EliteDangerous64.exe")
+    window[0] = 2
+    assert not tracker.is_foreground("EliteDangerous64.exe")
+    assert lookups == [10, 20]
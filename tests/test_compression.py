@@ -0,0 +1,95 @@
+# tests/test_compression.py
+import json
+import os
+
+import pytest
+
+from utils.broker_pool import Message
+from utils.compression import (
+    DICT_PROP,
+    ENCODING_PROP,
+    Compressor,
+    decode,
+    dict_id,
+    train_dictionary,
+)
+
+
+def _packet(i, type_="Loadout"):
+    modules = [
+        {"Slot": f"Slot{j:02d}", "Item": f"int_module_size{j % 6}", "On": True} for j in range(40)
+    ]
+    return json.dumps({"type": type_, "seq": i, "data": {"Ship": "krait_mkii", "Modules": modules}})
+
+
+def test_round_trip_and_properties():
+    comp = Compressor("zlib", 6, min_bytes=256)
+    payload = _packet(1)
+    packed, props = comp.encode(payload)
+    assert props == [(ENCODING_PROP, "zlib")]
+    assert len(packed) < len(payload.encode())
+    assert decode(packed, props) == payload.encode()
+    assert comp.raw_bytes == len(payload) and comp.sent_bytes == len(packed)
+
+
+def test_small_or_incompressible_payloads_go_out_plain():
+    comp = Compressor("zlib", 6, min_bytes=256)
+    assert comp.encode('{"type":"Music"}') == ('{"type":"Music"}', None)
+    noise = os.urandom(4096)
+    assert comp.encode(noise) == (noise, None)
+    assert decode(noise, None) == noise
+
+
+def test_dictionary_helps_and_is_required_to_decode():
+    samples = [_packet(i, t).encode() for i in range(20) for t in ("Loadout", "Cargo")]
+    dictionary = train_dictionary(samples, size=8192)
+    assert 0 < len(dictionary) <= 8192
+    assert dictionary.endswith(samples[-1])  # most common shape last (ties keep order)
+    plain = Compressor("zlib", 6, min_bytes=64)
+    primed = Compressor("zlib", 6, min_bytes=64, dictionary=dictionary)
+    payload = _packet(99)
+    packed, props = primed.encode(payload)
+    assert len(packed) < len(plain.encode(payload)[0])
+    assert (DICT_PROP, dict_id(dictionary)) in props
+    assert decode(packed, props, {dict_id(dictionary): dictionary}) == payload.encode()
+    with pytest.raises(RuntimeError):
+        decode(packed, props)
+
+
+@pytest.mark.parametrize("kwargs", [{"codec": "brotli"}, {"codec": "zlib", "level": 12}])
+def test_bad_settings_raise(kwargs):
+    with pytest.raises(ValueError):
+        Compressor(**kwargs)
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    comp = Compressor("zstd", 3, min_bytes=64)
+    packed, props = comp.encode(_packet(2))
+    assert props == [(ENCODING_PROP, "zstd")]
+    assert decode(packed, props) == _packet(2).encode()
+
+
+def test_zstd_without_zstandard_uses_zlib_at_a_valid_level(monkeypatch, capsys):
+    from utils import compression
+
+    monkeypatch.setattr(compression, "_zstd", lambda: None)
+    comp = Compressor("zstd", 19, min_bytes=64)
+    assert (comp.codec, comp.level) == ("zlib", 9)
+    assert "using zlib at level 9" in capsys.readouterr().out
+    packed, props = comp.encode(_packet(5))
+    assert props == [(ENCODING_PROP, "zlib")]
+    assert decode(packed, props) == _packet(5).encode()
+
+
+def test_bad_config_falls_back_to_plain_payloads(config):
+    from utils import mqtt_output
+
+    cfg = config('[outputs.mqtt.compression]\ntopics = ["elite/#"]\ncodec = "brotli"\n')
+    assert mqtt_output._compressor_for("elite/events/Loadout", cfg.outputs.mqtt) is None
+    msg = Message("elite/events/Loadout", _packet(3).encode())
+    assert mqtt_output._wire(msg) == (msg.payload, None)
+
+    cfg = config('[outputs.mqtt.compression]\ntopics = ["elite/#"]\nmin_bytes = 64\n')
+    payload, properties = mqtt_output._wire(Message("elite/events/Loadout", _packet(4).encode()))
+    assert properties is not None and len(payload) < len(_packet(4))
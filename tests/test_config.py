@@ -0,0 +1,99 @@
+# tests/test_config.py
+import os
+import time
+
+import pytest
+
+from utils import config as cfg
+from utils.config import Snapshot
+
+
+def test_file_values_are_coerced_to_the_default_types(config):
+    snap = config(
+        '[outputs.mqtt]\nport = "1884"\nqos = 1.0\n'
+        '[general]\nheadless = "yes"\nauto_activate = 0\nextra = "kept"\n'
+    )
+    assert snap.outputs.mqtt.port == 1884 and snap.outputs.mqtt.qos == 1
+    assert snap.general.headless is True and snap.general.auto_activate is False
+    assert snap.general.extra == "kept"  # unknown keys pass through untouched
+    assert snap.outputs.mqtt.broker == cfg.DEFAULTS["outputs"]["mqtt"]["broker"]
+
+
+def test_bad_values_name_the_key(config):
+    with pytest.raises(RuntimeError, match="'config.outputs.mqtt.qos' expects int"):
+        config('[outputs.mqtt]\nqos = "at least once"\n')
+    with pytest.raises(RuntimeError, match="'config.general' must be a table"):
+        config("general = 3\n")
+
+
+def test_snapshots_are_read_only():
+    snap = Snapshot({"a": {"b": [1, {"c": 2}]}})
+    assert snap.a.b == (1, Snapshot({"c": 2})) and snap.a.b[1].c == 2
+    with pytest.raises(TypeError):
+        snap.a = 1
+    with pytest.raises(AttributeError):
+        snap.missing  # noqa: B018
+    assert snap.lookup("a.b")[0] == 1 and snap.lookup("a.x.y", "dflt") == "dflt"
+    assert snap.to_dict() == {"a": {"b": [1, {"c": 2}]}}
+
+
+def test_get_returns_default_only_for_missing_keys(config):
+    config('[general]\nbase_topic = "ship"\n')
+    assert cfg.get("general.base_topic") == "ship"
+    assert cfg.get("general.nope", 5) == 5 and cfg.get("nope.deeper", 5) == 5
+    cfg._install(cfg._cfg | {"plain": None, "zero": 0})
+    assert cfg.get("plain", "dflt") is None and cfg.get("zero", 7) == 0
+
+
+def test_on_change_sees_new_and_old(config):
+    config('[general]\nbase_topic = "a"\n')
+    seen = []
+
+    def broken(new, old):
+        raise ValueError("handler bug")
+
+    def record(new, old):
+        seen.append((old.general.base_topic, new.general.base_topic))
+
+    unsubscribe = [cfg.on_change(broken), cfg.on_change(record)]
+    try:
+        config('[general]\nbase_topic = "b"\n')
+        config('[general]\nbase_topic = "b"\n')  # no change, no call
+        assert seen == [("a", "b")]  # the failing handler didn't stop the next one
+    finally:
+        for fn in unsubscribe:
+            fn()
+    config('[general]\nbase_topic = "c"\n')
+    assert seen == [("a", "b")]
+
+
+def _edit(path, text, stamp):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (stamp, stamp))  # coarse filesystem clocks
+
+
+def _wait_for(pred):
+    deadline = time.monotonic() + 5
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pred()
+
+
+def test_watch_config_reloads_on_edit_and_keeps_the_last_good_one(config, tmp_path):
+    config('[general]\nbase_topic = "before"\n')
+    path = tmp_path / "config.toml"
+    thread = None
+    try:
+        cfg.watch_config(interval=0.02)
+        thread = cfg._watcher
+        _edit(path, '[general]\nbase_topic = "after"\n', 1_700_000_000)
+        _wait_for(lambda: cfg.snapshot().general.base_topic == "after")
+        _edit(path, "[general\nbroken", 1_700_000_100)
+        time.sleep(0.1)
+        assert cfg.snapshot().general.base_topic == "after"
+        _edit(path, '[general]\nbase_topic = "fixed"\n', 1_700_000_200)
+        _wait_for(lambda: cfg.snapshot().general.base_topic == "fixed")
+    finally:
+        cfg.unwatch_config()
+    thread.join(1)
+    assert not thread.is_alive()
@@ -0,0 +1,109 @@
+# tests/test_derived.py
+import sys
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import derived
+from derived import DerivedState, RollingWindow
+from utils.instance import Instance
+
+T0 = datetime(2024, 6, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _ts(t):
+    return datetime.fromtimestamp(T0 + t, timezone.utc).isoformat()
+
+
+def test_rolling_window_expires_buckets():
+    win = RollingWindow(60.0, 60)
+    win.add(1, 0.5)
+    win.add(2, 30.2)
+    assert win.sum(30.9) == 3
+    assert win.sum(60.0) == 2  # bucket 0 fell out
+    win.add(4, 61.0)
+    assert win.sum(90.5) == 4  # bucket 30 fell out at 90
+    assert win.sum(1000.0) == 0 and win.total == 0  # a long gap clears everything
+
+
+def test_rolling_window_ignores_late_values_and_clamps():
+    win = RollingWindow(10.0, 5)
+    win.add(5, 100.0)
+    win.add(7, 85.0)  # older than the window (journal catch-up)
+    win.add(1, 98.5)  # late but still inside
+    assert win.sum(100.0) == 6
+    win.add(-10, 100.0)  # net credits can go negative; the rate view cannot
+    assert win.sum(100.0) == 0.0 and win.total == -4
+
+
+def test_report_rates_and_flight_mode_split():
+    st = DerivedState()
+    st.reset(T0)
+    for i in range(6):
+        st.add("jumps", 1, T0 + 600 * i)
+        st.add("fuel", 2.5, T0 + 600 * i)
+    st.add("credits", 1_000_000, T0 + 3000)
+    st.supercruise, st.mode_since = True, T0
+    st.settle(T0 + 2700)
+    st.supercruise = False
+    st.settle(T0 + 3600)
+    report = st.report(T0 + 3600)
+    session = report["session"]
+    assert session["jumps"] == 6 and session["jumps_per_hr"] == 6.0
+    assert session["fuel_per_jump"] == 2.5 and session["credits_per_hr"] == 1_000_000
+    assert session["supercruise_share"] == 0.75
+    assert report["15m"]["jumps"] == 1 and report["15m"]["jumps_per_hr"] == 4.0
+    assert report["1m"]["jumps"] == 0 and report["1m"]["fuel_per_jump"] is None
+
+
+def test_journal_events_and_publish(config, monkeypatch):
+    config("[derived]\ninterval_ms = 0\n")
+    sent = []
+    monkeypatch.setattr(derived, "publish_packet", sent.append)
+    monkeypatch.setattr(derived, "send_to_serial", lambda packet: None)
+    inst = Instance("CMDR Derived")
+    assert not derived.maybe_publish(inst, now=T0)  # no session yet
+    derived.on_journal_event({"timestamp": _ts(0), "event": "LoadGame"}, inst)
+    derived.on_journal_event({"timestamp": _ts(10), "event": "HullDamage", "Health": 0.8}, inst)
+    derived.on_journal_event({"timestamp": _ts(20), "event": "RepairAll", "Cost": 500}, inst)
+    derived.on_journal_event({"timestamp": _ts(30), "event": "HullDamage", "Health": 0.9}, inst)
+    assert derived.maybe_publish(inst, now=T0 + 60)
+    assert not derived.maybe_publish(inst, now=T0 + 60)  # unchanged numbers
+    session = sent[0]["data"]["session"]
+    assert session["hull_dmg_pct_per_min"] == pytest.approx(30.0)
+    assert session["credits_per_hr"] == -30000
+
+
+def test_status_and_poller_threads_keep_windows_consistent(config, monkeypatch):
+    config("[derived]\ninterval_ms = 0\n")
+    monkeypatch.setattr(derived, "publish_packet", lambda packet: None)
+    monkeypatch.setattr(derived, "send_to_serial", lambda packet: None)
+    inst = Instance("CMDR Race")
+    derived.on_journal_event({"timestamp": _ts(0), "event": "LoadGame"}, inst)
+    n = 20000
+
+    def observer():  # Status.json: supercruise toggles
+        for i in range(n):
+            derived.on_status({"Supercruise": i % 2 == 0}, _ts(i * 0.01), inst)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=observer)
+    thread.start()
+    try:
+        for i in range(n):  # poller: journal events and publishing
+            derived.on_journal_event({"timestamp": _ts(i * 0.01), "event": "FSDJump"}, inst)
+            derived.maybe_publish(inst, now=T0 + i * 0.01)
+    finally:
+        thread.join()
+        sys.setswitchinterval(interval)
+    st = inst.state("derived", DerivedState)
+    assert st.session["jumps"] == n
+    flown = st.session["supercruise_s"] + st.session["normal_s"]
+    # Never booked twice (time before the observer's first update stays unbooked)
+    assert (n - 1) * 0.01 * 0.9 < flown <= (n - 1) * 0.01 + 1e-6
+    for windows in st.windows.values():
+        for win in windows.values():
+            assert win.total == pytest.approx(sum(win._sums))
+    assert st.windows["15m"]["jumps"].total == n  # the whole run fits in 15 minutes
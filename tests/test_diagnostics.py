@@ -0,0 +1,92 @@
+# tests/test_diagnostics.py
+import threading
+import time
+
+import pytest
+
+from utils import diagnostics
+
+
+@pytest.fixture
+def published(config, tmp_path, monkeypatch):
+    config(f'[diagnostics]\nenabled = true\ndir = "{(tmp_path / "diag").as_posix()}"\n')
+    out = []
+    monkeypatch.setattr(diagnostics, "_publish", lambda kind, data: out.append((kind, data)))
+    return out
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pred()
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_disabled_unless_configured(config):
+    config("")
+    assert diagnostics.handle("threads", None) == "unmapped"
+
+
+def test_sample_profile_writes_folded_stacks(published):
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="busy-worker", daemon=True)
+    worker.start()
+    try:
+        assert diagnostics.handle("profile", {"seconds": 0.3, "interval_ms": 2}) == "queued"
+        assert diagnostics.handle("profile", {"seconds": 1}) == "busy"
+        _wait(lambda: published)
+    finally:
+        stop.set()
+    kind, data = published[0]
+    assert kind == "profile" and data["mode"] == "sample" and data["samples"] > 10
+    assert data["threads"]["busy-worker"] > 0
+    with open(data["file"], encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert any(line.startswith("busy-worker;") and "_spin" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_memory_snapshot_reports_growth(published):
+    assert diagnostics.handle("memory/snapshot", None) == "bad_payload"  # not started
+    assert diagnostics.handle("memory/start", None) == "queued"
+    try:
+        assert diagnostics.handle("memory/snapshot", {"top": 5}) == "queued"
+        _wait(lambda: len(published) == 1)  # the worker snapshots in its own time
+        hoard = [bytearray(1024) for _ in range(2000)]  # ~2 MB from this line
+        assert diagnostics.handle("memory/snapshot", {"top": 5}) == "queued"
+    finally:
+        assert diagnostics.handle("memory/stop", None) == "cancelled"
+    _wait(lambda: len(published) == 2)
+    kind, data = published[-1]
+    assert kind == "memory" and data["traced_bytes"] >= 2_000_000
+    assert any("test_diagnostics.py" in row[0] and row[3] > 1_000_000 for row in data["growth"])
+    with open(data["file"], encoding="utf-8") as f:
+        assert "# growth since the previous snapshot" in f.read()
+    del hoard
+
+
+def test_dumps_run_off_the_calling_thread(published, monkeypatch):
+    names = []
+
+    def record(kind, data):
+        names.append(threading.current_thread().name)
+        published.append((kind, data))
+
+    monkeypatch.setattr(diagnostics, "_publish", record)
+    gate = threading.Event()
+    diagnostics._submit("test", gate.wait)  # a slow job ahead of ours
+    started = time.monotonic()
+    assert diagnostics.handle("threads", None) == "queued"
+    assert diagnostics.handle("stats", None) == "queued"
+    assert time.monotonic() - started < 0.5 and not published
+    gate.set()
+    _wait(lambda: len(published) == 2)
+    assert [kind for kind, _ in published] == ["threads", "stats"]  # in command order
+    assert names == ["diag-worker", "diag-worker"]
+    with open(published[0][1]["file"], encoding="utf-8") as f:
+        assert 'Thread "diag-worker"' in f.read()
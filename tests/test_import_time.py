@@ -0,0 +1,68 @@
+# tests/test_import_time.py
+# Cold-start guard: importing the parser must stay cheap and side-effect free.
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative import budget per module, in milliseconds (-X importtime).
+# Generous on purpose (CI runners are slow); a regression here usually means a
+# heavy dependency crept back to module level.
+BUDGET_MS = {
+    "eliteparser": 300,
+    "journal": 150,
+    "status": 150,
+    "modules": 150,
+    "loadout": 150,
+    "utils.config": 100,
+    "utils.mqtt_output": 120,
+    "utils.command_router": 150,
+}
+
+# Only needed once something actually connects, watches or presses keys
+LAZY = ("paho", "watchdog", "asyncio", "psutil", "multiprocessing.connection")
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def _import_times(stderr: str) -> dict[str, float]:
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1000.0
+        except ValueError:
+            continue  # header row
+    return times
+
+
+def test_import_time_budget():
+    proc = _run("import eliteparser, status, modules")
+    assert proc.returncode == 0, proc.stderr
+    times = _import_times(proc.stderr)
+    over = {m: round(times[m], 1) for m, ms in BUDGET_MS.items() if times.get(m, 0) > ms}
+    assert not over, f"import budget exceeded (ms): {over}"
+
+
+def test_import_has_no_side_effects():
+    code = (
+        "import sys, threading, eliteparser, status, modules\n"
+        "import utils.config as c\n"
+        f"lazy = [m for m in sys.modules if m.startswith({LAZY!r})]\n"
+        "assert not lazy, lazy\n"
+        "assert c._snapshot is None, 'config read at import'\n"
+        "assert threading.active_count() == 1, threading.enumerate()\n"
+    )
+    proc = _run(code)
+    assert proc.returncode == 0, proc.stderr[-2000:]
@@ -0,0 +1,121 @@
+# tests/test_instance.py
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utils.instance import Instance, configured_instances, default_instance, topic_namespace
+from utils.mqtt_output import packet_topic
+from utils.serial_output import format_packet
+
+
+def _toml_path(path):
+    return str(path).replace("\\", "/")
+
+
+def test_topic_namespace_is_one_safe_level():
+    assert topic_namespace("CMDR Jo/3") == "CMDR_Jo_3"
+    assert topic_namespace("  a+b#c  ") == "a_b_c"
+    assert topic_namespace("Ünïcode.ok-1") == "n_code.ok-1"
+
+
+def test_state_is_per_instance_and_created_once():
+    a, b = Instance("Alpha"), Instance("Beta")
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return {"n": 0}
+
+    assert a.state("journal", factory) is not b.state("journal", factory)
+    assert a.state("journal", factory) is a.state("journal", dict)
+    assert len(calls) == 2
+
+    c = Instance("Gamma")
+    barrier = threading.Barrier(8)
+    got = []
+
+    def racer():
+        barrier.wait()
+        got.append(c.state("shared", object))
+
+    threads = [threading.Thread(target=racer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(x) for x in got}) == 1
+
+
+def test_namespacing_and_labels(config, tmp_path):
+    config(f'[general]\ncmdr = "Solo Pilot"\nelite_dir = "{_toml_path(tmp_path)}"\n')
+    default = default_instance()
+    assert default.ns == "Solo_Pilot" and default.label("JOURNAL") == "[JOURNAL]"
+    assert default.elite_dir == os.path.normpath(str(tmp_path))  # follows the config
+    named = Instance("CMDR Two", str(tmp_path / "two"))
+    assert named.ns == "CMDR_Two" and named.label("JOURNAL") == "[JOURNAL:CMDR Two]"
+    assert packet_topic(format_packet("journal", "FSDJump", {}, cmdr=named.ns)) == (
+        "elite/CMDR_Two/events/FSDJump"
+    )
+    config('[general]\ncmdr = ""\n')
+    assert default.ns == "" and named.ns == "CMDR_Two"
+    assert packet_topic(format_packet("journal", "FSDJump", {}, cmdr=default.ns)) == (
+        "elite/events/FSDJump"
+    )
+
+
+def test_configured_instances(config, tmp_path):
+    one, two = _toml_path(tmp_path / "one"), _toml_path(tmp_path / "two")
+    config("")
+    assert configured_instances() == [default_instance()]
+    config(
+        f'[[instances]]\ncmdr = "Alpha"\nelite_dir = "{one}"\n'
+        f'[[instances]]\nelite_dir = "{two}"\nwatch_mode = "poll"\n'
+    )
+    alpha, second = configured_instances()
+    assert (alpha.name, alpha.ns, alpha.watch_mode) == ("Alpha", "Alpha", "auto")
+    assert (second.name, second.watch_mode) == ("cmdr2", "poll")
+    assert second.path("Status.json") == os.path.join(os.path.normpath(two), "Status.json")
+
+    for body, error in (
+        ('[[instances]]\ncmdr = "A"\n', "missing 'elite_dir'"),
+        (
+            f'[[instances]]\ncmdr = "A b"\nelite_dir = "{one}"\n'
+            f'[[instances]]\ncmdr = "A/b"\nelite_dir = "{two}"\n',
+            "duplicate commander",
+        ),
+        (
+            f'[[instances]]\ncmdr = "A"\nelite_dir = "{one}"\n'
+            f'[[instances]]\ncmdr = "B"\nelite_dir = "{one}/"\n',
+            "watched twice",
+        ),
+    ):
+        config(body)
+        with pytest.raises(RuntimeError, match=error):
+            configured_instances()
+
+
+def test_file_events_are_routed_to_the_instance_for_their_directory(tmp_path, monkeypatch):
+    pytest.importorskip("watchdog")
+    import eliteparser
+
+    a = Instance("Alpha", str(tmp_path / "a"))
+    b = Instance("Beta", str(tmp_path / "b"))
+    calls = []
+    monkeypatch.setitem(eliteparser.TARGET_FILES, "Status.json", calls.append)
+    active = threading.Event()
+    handler = eliteparser._handler_class()(active, [a, b])
+
+    def modified(path, is_directory=False):
+        handler.on_modified(SimpleNamespace(src_path=str(path), is_directory=is_directory))
+
+    modified(tmp_path / "b" / "Status.json")
+    assert calls == []  # paused
+    active.set()
+    modified(tmp_path / "b" / "Status.json")
+    modified(tmp_path / "a" / "Status.json")
+    modified(tmp_path / "a" / "Cargo.json")  # not a target file
+    modified(tmp_path / "c" / "Status.json")  # not a watched directory
+    modified(tmp_path / "a", is_directory=True)
+    assert calls == [b, a]
@@ -0,0 +1,106 @@
+# tests/test_journal_archive.py
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from journal_export import history
+from utils.journal_archive import JournalArchive
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def _write_journals(directory, days=4, per_day=600):
+    """One journal per day; an FSDJump every 50 entries, otherwise chatter."""
+    paths = []
+    for day in range(days):
+        name = f"Journal.2024-03-0{day + 1}T000000.01.log"
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(per_day):
+                ts = (START + timedelta(days=day, seconds=30 * i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+                if i % 50 == 0:
+                    entry = {"timestamp": ts, "event": "FSDJump", "StarSystem": f"Sys {day}-{i}"}
+                else:
+                    entry = {"timestamp": ts, "event": "ReceiveText", "Message": "o7 " * (i % 7)}
+                f.write(json.dumps(entry) + "\n")
+        paths.append(path)
+    return paths
+
+
+def _entries(paths):
+    out = []
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            out.extend(json.loads(line) for line in f)
+    return out
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip_and_block_skipping(tmp_path, codec):
+    paths = _write_journals(tmp_path)
+    expected = _entries(paths)
+    archive = JournalArchive(str(tmp_path / "archive"))
+    assert archive.pack(paths, codec, block_bytes=4096) == [os.path.basename(p) for p in paths]
+    assert list(archive.iter_entries()) == expected
+    total = len(archive.blocks)
+    stats = archive.stats()
+    assert stats["ratio"] > 3 and stats["files"] == 4
+
+    archive.blocks_read = 0
+    since, until = "2024-03-02T01:00", "2024-03-02T02"
+    got = list(archive.iter_entries(since, until))
+    assert got == [e for e in expected if since <= e["timestamp"] < "2024-03-02T03"]
+    assert 0 < archive.blocks_read <= 8 < total // 4  # ~25 min of entries per block
+
+    # Reopened from disk, an event filter only decompresses blocks holding that event
+    reopened = JournalArchive(str(tmp_path / "archive"))
+    assert list(reopened.iter_entries(events=["FSDJump"])) == [
+        e for e in expected if e["event"] == "FSDJump"
+    ]
+    assert list(reopened.iter_entries(events=["Docked"])) == []
+    assert reopened.blocks_read <= total
+
+
+def test_incremental_pack_delete_and_interrupted_tail(tmp_path):
+    paths = _write_journals(tmp_path)
+    expected = _entries(paths)
+    archive_dir = str(tmp_path / "archive")
+    archive = JournalArchive(archive_dir)
+    archive.pack(paths[:2], block_bytes=4096, delete=True)
+    assert not os.path.exists(paths[0]) and not os.path.exists(paths[1])
+
+    # A pack that died after writing data but before the index leaves junk at the end
+    with open(os.path.join(archive_dir, "journals.blk"), "ab") as f:
+        f.write(b"half a block")
+    archive = JournalArchive(archive_dir)
+    assert archive.pack(paths, block_bytes=4096) == [os.path.basename(p) for p in paths[2:]]
+    assert os.path.getsize(archive.data_path) == archive.data_end
+    assert list(JournalArchive(archive_dir).iter_entries()) == expected
+
+
+def test_history_merges_archive_with_live_journals(tmp_path):
+    paths = _write_journals(tmp_path)
+    expected = _entries(paths)
+    archive = JournalArchive(str(tmp_path / "archive"))
+    archive.pack(paths[:3], block_bytes=4096)  # originals kept: must not be read twice
+    assert list(history(paths, archive)) == expected
+    window = list(history(paths, archive, "2024-03-03T04", "2024-03-04T00:30"))
+    assert window == [
+        e for e in expected if "2024-03-03T04" <= e["timestamp"] < "2024-03-04T00:31"
+    ]  # a prefix `until` includes everything that starts with it
+
+
+def test_unpacked_archive_dir_reads_as_empty(tmp_path):
+    paths = _write_journals(tmp_path, days=2, per_day=100)
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()  # created by hand or by a pack that never ran
+    archive = JournalArchive(str(archive_dir))
+    assert list(archive.iter_entries()) == []
+    assert list(archive.iter_entries(events=["FSDJump"])) == []
+    assert list(history(paths, archive, since="2024-03-01")) == _entries(paths)
+
+    archive.pack(paths[:1], block_bytes=4096)
+    os.remove(archive.data_path)  # index without data: skipped, not fatal
+    assert list(JournalArchive(str(archive_dir)).iter_entries()) == []
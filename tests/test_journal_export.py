@@ -0,0 +1,119 @@
+# tests/test_journal_export.py
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+pytest.importorskip("numpy")
+
+import journal_export  # noqa: E402
+
+ENTRIES = [
+    {"event": "Fileheader", "part": 1},
+    {"event": "Location", "StarSystem": "Sol"},
+    {"event": "Docked", "StarSystem": "Sol", "StationName": "Abraham Lincoln", "MarketID": 1},
+    {"event": "MarketBuy", "MarketID": 1, "Type": "gold", "Count": 10, "BuyPrice": 9000},
+    {"event": "FSDJump", "StarSystem": "Alpha Centauri", "JumpDist": 4},
+    {"event": "Scan", "BodyName": "AC A", "StarType": "G", "Rings": [{"Name": "A 1"}]},
+    {"event": "Scan", "BodyName": "AC 1", "PlanetClass": "Icy body"},
+    {"event": "FSDJump", "StarSystem": "Wolf 359", "JumpDist": 7.5},
+    {"event": "Scan", "BodyName": "W 1", "PlanetClass": "Icy body", "Landable": True},
+    {"event": "Docked", "StarSystem": "Wolf 359", "StationName": "Powell", "MarketID": 2},
+    {
+        "event": "MarketSell",
+        "MarketID": 2,
+        "Type": "gold",
+        "Count": 10,
+        "SellPrice": 9500,
+        "AvgPricePaid": 9000,
+    },
+    {
+        "event": "MarketSell",
+        "MarketID": 2,
+        "Type": "gold",
+        "Count": 2,
+        "SellPrice": 8000,
+        "AvgPricePaid": 9000,
+        "IllegalGoods": "no",
+    },
+    {"event": "FSDJump", "StarSystem": "Far Away", "JumpDist": 250.0},
+    {"event": "MultiSellExplorationData", "TotalEarnings": 120000},
+    {
+        "event": "MarketSell",
+        "MarketID": 3,
+        "Type": "tea",
+        "Count": 1,
+        "SellPrice": 50,
+        "AvgPricePaid": 10,
+        "IllegalGoods": 0,
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    base = tmp_path_factory.mktemp("export")
+    journal = base / "Journal.2024-06-01T000000.01.log"
+    with open(journal, "w", encoding="utf-8") as f:
+        for minute, entry in enumerate(ENTRIES):
+            f.write(json.dumps({"timestamp": f"2024-06-01T00:{minute:02d}:00Z"} | entry) + "\n")
+        f.write("not json\n")
+    out = base / "out"
+    rows = journal_export.export([str(journal)], str(out), chunk_rows=2)
+    return out, rows
+
+
+def test_export_writes_one_table_per_event(exported):
+    out, rows = exported
+    assert rows == {
+        "Docked": 2,
+        "MarketBuy": 1,
+        "FSDJump": 3,
+        "Scan": 3,
+        "MarketSell": 3,
+        "MultiSellExplorationData": 1,
+    }
+    assert sorted(p.name for p in out.iterdir()) == sorted(f"{e}.parquet" for e in rows)
+    assert pq.ParquetFile(out / "FSDJump.parquet").num_row_groups == 2  # chunk_rows=2
+
+
+def test_export_schema_and_context_column(exported):
+    out, _ = exported
+    jumps = pq.read_table(out / "FSDJump.parquet")
+    assert jumps.schema.field("JumpDist").type == pa.float64()  # ints and floats mixed
+    assert jumps.schema.field("StarSystem").type == pa.dictionary(pa.int32(), pa.string())
+    ts_type = jumps.schema.field("timestamp").type  # Parquet stores "s" as "ms"
+    assert pa.types.is_timestamp(ts_type) and ts_type.tz == "UTC"
+    assert jumps.column("JumpDist").to_pylist() == [4.0, 7.5, 250.0]
+    assert jumps.column("timestamp")[0].as_py().isoformat() == "2024-06-01T00:04:00+00:00"
+
+    scans = pq.read_table(out / "Scan.parquet").to_pylist()
+    assert [s["_system"] for s in scans] == ["Alpha Centauri", "Alpha Centauri", "Wolf 359"]
+    assert json.loads(scans[0]["Rings"]) == [{"Name": "A 1"}]  # nested values as JSON text
+    assert [s["Landable"] for s in scans] == [None, None, True]
+
+    sells = pq.read_table(out / "MarketSell.parquet")
+    assert sells.schema.field("IllegalGoods").type == pa.string()  # str and int: JSON text
+    assert sells.column("IllegalGoods").to_pylist() == [None, "no", "0"]
+
+
+def test_reports(exported):
+    out, _ = exported
+    hist = journal_export.jump_histogram(str(out), bin_ly=5.0, max_ly=20.0)
+    assert hist["jumps"] == 3 and hist["total_ly"] == 261.5 and hist["mean_ly"] == 87.17
+    assert hist["bins"] == {"0-5": 1, "5-10": 1, "10-15": 0, "15-20": 1}  # overflow clipped
+
+    totals = journal_export.exploration_totals(str(out))
+    assert totals == {"scans": 3, "by_class": {"Icy body": 2, "G": 1}, "data_sold_cr": 120000}
+
+    assert journal_export.profit_by_station(str(out)) == [
+        {"market_id": 2, "station": "Powell", "profit_cr": 3000},
+        {"market_id": 3, "station": None, "profit_cr": 40},
+    ]
+
+
+def test_reports_on_a_missing_export(tmp_path):
+    assert journal_export.jump_histogram(str(tmp_path))["jumps"] == 0
+    assert journal_export.exploration_totals(str(tmp_path))["scans"] == 0
+    assert journal_export.profit_by_station(str(tmp_path)) == []
@@ -0,0 +1,59 @@
+# tests/test_mqtt_output.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import bus, mqtt_output
+from utils.serial_output import format_packet
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(bus, "_subs", ())
+    monkeypatch.setattr(mqtt_output, "_client", None)
+
+
+def test_bus_only_publishing_never_connects_or_serializes(offline, monkeypatch):
+    def no_start():
+        raise AssertionError("connected without being asked")
+
+    def no_json(*a, **kw):
+        raise AssertionError("serialized with no broker attached")
+
+    monkeypatch.setattr(mqtt_output, "start", no_start)
+    monkeypatch.setattr(mqtt_output.json, "dumps", no_json)
+    sub = bus.subscribe("elite/events/#")
+    mqtt_output.publish_packet(format_packet("journal", "FSDJump", {"StarSystem": "Sol"}))
+    assert sub.get(0)["data"] == {"StarSystem": "Sol"}
+    assert mqtt_output._client is None
+
+
+def test_opt_in_connect_builds_one_client_across_threads(offline, monkeypatch, config):
+    config("[outputs.mqtt]\nenabled = true\n")
+    built = []
+
+    class FakeClient:
+        def __init__(self, **kw):
+            time.sleep(0.01)  # widen the window a lock-free start() would race in
+            built.append(self)
+
+    monkeypatch.setattr(mqtt_output, "mqtt", SimpleNamespace(Client=FakeClient, MQTTv5=5))
+    monkeypatch.setattr(mqtt_output, "_connect", lambda cfg: None)
+    monkeypatch.setattr(mqtt_output, "_start_pool", lambda entries: None)
+    monkeypatch.setattr(mqtt_output, "on_change", lambda fn: None)
+    monkeypatch.setattr(mqtt_output, "_publisher_thread", lambda: None)
+    monkeypatch.setattr(mqtt_output, "_enqueue", lambda *a: None)
+    barrier = threading.Barrier(4)
+
+    def publish():
+        barrier.wait()
+        mqtt_output.publish_packet(format_packet("journal", "Music", {}), connect=True)
+
+    threads = [threading.Thread(target=publish) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1 and mqtt_output._client is built[0]
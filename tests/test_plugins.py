@@ -0,0 +1,154 @@
+# tests/test_plugins.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.instance import Instance
+from utils.plugins import PluginHost
+
+INST = Instance("CMDR Plugin")
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pred()
+
+
+@pytest.fixture
+def host():
+    host = PluginHost(queue_size=8, timeout_s=2.0, max_failures=3)
+    yield host
+    host.close()
+
+
+def _plugin(handle, events=("*",), **attrs):
+    return SimpleNamespace(EVENTS=list(events), handle=handle, **attrs)
+
+
+def test_plugins_get_a_read_only_view(host):
+    seen = []
+
+    def vandal(event, ctx):
+        seen.append(event["StarSystem"])
+        for mutate in (
+            lambda: event.__setitem__("StarSystem", "Hacked"),
+            lambda: event["StarPos"].append(0),
+            lambda: event["Factions"][0].update(Name="Hacked"),
+        ):
+            try:
+                mutate()
+            except (TypeError, AttributeError):
+                seen.append("blocked")
+
+    host.add("vandal", _plugin(vandal))
+    entry = {
+        "event": "FSDJump",
+        "StarSystem": "Sol",
+        "StarPos": [0.0, 0.0, 0.0],
+        "Factions": [{"Name": "Mother Gaia"}],
+    }
+    host.dispatch(entry, INST)
+    _wait(lambda: len(seen) == 4)
+    assert seen == ["Sol", "blocked", "blocked", "blocked"]
+    assert entry["StarSystem"] == "Sol" and entry["StarPos"] == [0.0, 0.0, 0.0]
+    assert entry["Factions"] == [{"Name": "Mother Gaia"}]
+
+
+def test_emit_accepts_the_frozen_event(host, monkeypatch):
+    from utils import mqtt_output
+
+    sent = []
+    monkeypatch.setattr(mqtt_output, "publish_packet", lambda packet, *a: sent.append(packet))
+    host.add("echo", _plugin(lambda event, ctx: ctx.emit("Echo", event), events=["Docked"]))
+    host.dispatch({"event": "Docked", "Services": ["refuel"]}, INST)
+    host.dispatch({"event": "Undocked"}, INST)  # not subscribed
+    _wait(lambda: sent)
+    assert sent[0]["data"] == {"event": "Docked", "Services": ["refuel"]}
+    assert sent[0]["plugin"] == "echo" and sent[0]["cmdr"] == INST.ns
+    assert host.stats()["echo"]["calls"] == 1
+
+
+def test_stalled_handler_skips_events_until_it_returns(host):
+    release, handled = threading.Event(), []
+
+    def slow(event, ctx):
+        if event["n"] == 0:
+            release.wait(5)
+        handled.append(event["n"])
+
+    host.add("slow", _plugin(slow, TIMEOUT_S=0.05))
+    host.dispatch({"event": "X", "n": 0}, INST)
+    _wait(lambda: host.plugins["slow"].busy_since is not None)
+    time.sleep(0.1)
+    for n in (1, 2, 3):
+        host.dispatch({"event": "X", "n": n}, INST)  # past the timeout: skipped
+    stats = host.stats()["slow"]
+    assert stats["stalled"] and stats["dropped"] == 3 and stats["queued"] == 0
+    release.set()
+    _wait(lambda: handled == [0])
+    _wait(lambda: not host.stats()["slow"]["stalled"])
+    host.dispatch({"event": "X", "n": 4}, INST)
+    _wait(lambda: handled == [0, 4])
+    stats = host.stats()["slow"]
+    assert stats["timeouts"] == 1 and stats["calls"] == 2 and stats["max_ms"] >= 100
+
+
+def test_plugin_is_disabled_after_max_failures_in_a_row(host):
+    def broken(event, ctx):
+        if event.get("ok"):
+            return
+        raise RuntimeError("boom")
+
+    host.add("broken", _plugin(broken))
+    host.dispatch({"event": "X"}, INST)
+    host.dispatch({"event": "X"}, INST)
+    host.dispatch({"event": "X", "ok": True}, INST)  # a success resets the streak
+    _wait(lambda: host.stats()["broken"]["calls"] == 3)
+    assert host.stats()["broken"]["enabled"]
+    for _ in range(3):
+        host.dispatch({"event": "X"}, INST)
+    _wait(lambda: not host.stats()["broken"]["enabled"])
+    host.dispatch({"event": "X", "ok": True}, INST)  # ignored once disabled
+    time.sleep(0.05)
+    stats = host.stats()["broken"]
+    assert stats["errors"] == 5 and stats["calls"] == 6 and stats["queued"] == 0
+
+
+def test_invalid_plugins_are_rejected(host):
+    assert not host.add("nohandle", SimpleNamespace(EVENTS=["*"]))
+
+    def bad_setup(ctx):
+        raise ValueError("no token")
+
+    assert not host.add("badsetup", _plugin(lambda e, c: None, setup=bad_setup))
+    assert host.add("fine", _plugin(lambda e, c: None))
+    assert not host.add("fine", _plugin(lambda e, c: None))  # duplicate name
+    assert list(host.stats()) == ["fine"]
+
+
+def test_single_event_string_is_one_event(host):
+    seen = []
+    impl = SimpleNamespace(EVENTS="FSDJump", handle=lambda e, c: seen.append(e["event"]))
+    assert host.add("jumps", impl)
+    assert host.plugins["jumps"].events == {"FSDJump"}
+    host.dispatch({"event": "F"}, INST)
+    host.dispatch({"event": "FSDJump"}, INST)
+    _wait(lambda: seen)
+    assert seen == ["FSDJump"]
+
+
+def test_disabled_plugins_are_never_imported(tmp_path):
+    from utils.plugins import discover
+
+    marker = tmp_path / "ran.txt"
+    for name in ("keep", "skip"):
+        (tmp_path / f"{name}.py").write_text(
+            f"open({str(marker)!r}, 'a').write({name!r})\ndef handle(event, ctx): pass\n"
+        )
+    found = discover(str(tmp_path), entry_points=False, disabled=("skip",))
+    assert [name for name, _ in found] == ["keep"]
+    assert marker.read_text() == "keep"
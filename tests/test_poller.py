@@ -0,0 +1,144 @@
+# tests/test_poller.py
+import pytest
+
+from utils.poller import AdaptivePoller
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def _append(path, text="x"):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)  # size changes, so coarse mtimes don't matter
+
+
+def test_fires_on_changes_and_follows_new_journals(tmp_path, clock):
+    status, old, new = (tmp_path / n for n in ("Status.json", "Journal.01.log", "Journal.02.log"))
+    status.write_text("{}")
+    old.write_text("")
+    fired = []
+    poller = AdaptivePoller(rescan_s=1.0, clock=clock)
+    poller.watch(
+        str(tmp_path), {"Status.json": lambda: fired.append("status")}, on_journal=fired.append
+    )
+
+    assert poller.poll_once() == 1  # the journal is read on first sight, Status.json is not
+    assert fired == [str(old)]
+    clock.t += 0.1
+    assert poller.poll_once() == 0
+    _append(status)
+    _append(old)
+    clock.t += 0.1
+    assert poller.poll_once() == 2 and fired[1:] == ["status", str(old)]
+
+    new.write_text("")
+    clock.t += 0.1
+    poller.poll_once()  # between rescans only known files are stat'ed
+    assert fired[-1] == str(old)
+    clock.t += 1.0
+    assert poller.poll_once() == 1 and fired[-1] == str(new)
+    _append(old)  # the previous journal is no longer watched
+    clock.t += 1.1
+    assert poller.poll_once() == 0
+
+
+def test_handler_errors_do_not_stop_polling(tmp_path, clock):
+    status = tmp_path / "Status.json"
+    status.write_text("{}")
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    poller = AdaptivePoller(clock=clock)
+    poller.watch(str(tmp_path), {"Status.json": broken})
+    poller.poll_once()
+    for _ in range(2):
+        _append(status)
+        clock.t += 1.0
+        assert poller.poll_once() == 1
+    assert len(calls) == 2
+
+
+def test_interval_stays_under_warm_until_idle(tmp_path, clock):
+    status = tmp_path / "Status.json"
+    status.write_text("{}")
+    shutdown = []
+    poller = AdaptivePoller(
+        min_interval=0.025,
+        warm_interval=0.04,
+        idle_interval=5.0,
+        hot_s=5.0,
+        idle_after_s=60.0,
+        clock=clock,
+    )
+    poller.watch(str(tmp_path), {"Status.json": lambda: None}, idle_hint=lambda: bool(shutdown))
+    poller.poll_once()
+    _append(status)
+    clock.t += 0.1
+    assert poller.poll_once() == 1 and poller.interval == 0.025
+
+    seen = set()
+    while clock.t < 1059.0:  # quiet, but the game is still running
+        clock.t += poller.interval
+        poller.poll_once()
+        seen.add(poller.interval)
+    assert min(seen) == 0.025 and max(seen) == 0.04 and len(seen) == 3
+    clock.t += 2.0
+    poller.poll_once()
+    assert poller.interval == 5.0  # idle_after_s without changes
+
+    poller.kick()  # e.g. on resume
+    assert poller.interval == 0.025
+    poller.poll_once()
+    assert poller.interval == 0.025
+    shutdown.append(True)  # the journal saw Shutdown
+    clock.t += 5.0
+    poller.poll_once()
+    assert poller.interval == 5.0
+    _append(status)
+    clock.t += 5.0
+    assert poller.poll_once() == 1 and poller.interval == 0.025
+
+
+def test_idle_polling_rescans_every_tick(tmp_path, clock):
+    (tmp_path / "Journal.01.log").write_text("")
+    poller = AdaptivePoller(idle_interval=5.0, idle_after_s=10.0, rescan_s=1.0, clock=clock)
+    poller.watch(str(tmp_path), {}, on_journal=lambda path: None)
+    poller.poll_once()
+    clock.t += 20.0
+    poller.poll_once()
+    assert poller.interval == 5.0
+    (tmp_path / "Journal.02.log").write_text("")
+    fired = []
+    poller._dirs[0].on_journal = fired.append
+    clock.t += 5.0
+    poller.poll_once()
+    assert fired == [str(tmp_path / "Journal.02.log")]
+
+
+def test_journal_reader_uses_the_polled_path(tmp_path, monkeypatch):
+    import journal
+    from utils.instance import Instance
+
+    def no_listing(path):
+        raise AssertionError("listed the journal directory")
+
+    path = tmp_path / "Journal.01.log"
+    path.write_text('{"timestamp": "2024-06-01T00:00:00Z", "event": "Fileheader"}\n')
+    inst = Instance("CMDR Poller", str(tmp_path))
+    monkeypatch.setattr(journal.os, "listdir", no_listing)
+    journal.process_journal_file(inst, str(path))
+    st = inst.state("journal", journal.JournalState)
+    assert st.last_file == str(path) and st.position == path.stat().st_size
@@ -0,0 +1,81 @@
+# tests/test_priority.py
+import pytest
+
+from utils.priority import BULK, CRITICAL, NORMAL, LaneStats, PriorityOutbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _drain(outbox):
+    out = []
+    while (got := outbox.get(timeout=0)) is not None:
+        out.append(got[0])
+    return out
+
+
+def test_strict_mode_always_serves_the_highest_class_first():
+    outbox = PriorityOutbox(clock=Clock())
+    for i in range(3):
+        outbox.put(f"bulk{i}", BULK)
+        outbox.put(f"normal{i}", NORMAL)
+    outbox.put("alarm", CRITICAL)
+    assert _drain(outbox) == ["alarm", "normal0", "normal1", "normal2", "bulk0", "bulk1", "bulk2"]
+    assert outbox.get(timeout=0.01) is None
+
+
+def test_weighted_mode_shares_by_weight_without_starving_bulk():
+    outbox = PriorityOutbox(mode="weighted", weights=(8, 3, 1), clock=Clock())
+    for i in range(24):
+        for cls in (CRITICAL, NORMAL, BULK):
+            outbox.put((cls, i), cls)
+    picks = [cls for cls, _ in _drain(outbox)[:24]]
+    assert [picks.count(c) for c in (CRITICAL, NORMAL, BULK)] == [16, 6, 2]
+    assert BULK in picks[:12]  # smooth: bulk gets a turn every round of 12
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_oldest", ["b", "c"]), ("drop_newest", ["a", "b"])])
+def test_lane_drop_policies(policy, kept):
+    outbox = PriorityOutbox(sizes=(2, 2, 2), policies=(policy,) * 3, clock=Clock())
+    assert outbox.put("a", BULK) and outbox.put("b", BULK)
+    assert not outbox.put("c", BULK)
+    assert outbox.put("alarm", CRITICAL)  # other lanes are unaffected
+    assert _drain(outbox) == ["alarm", *kept]
+    assert outbox.stats()["bulk"]["dropped"] == 1
+    assert outbox.stats()["critical"]["dropped"] == 0
+
+
+def test_latency_is_measured_with_the_injected_clock():
+    clock = Clock()
+    outbox = PriorityOutbox(clock=clock)
+    outbox.put("x", NORMAL)
+    outbox.put("y", NORMAL, since=-0.010)  # stamped upstream, 10 ms earlier
+    clock.now = 0.004
+    for _ in range(2):
+        _, cls, enqueued = outbox.get(timeout=0)
+        outbox.done(cls, enqueued)
+    stats = outbox.stats()["normal"]
+    assert stats["count"] == 2 and stats["queued"] == 0
+    assert stats["p50_ms"] == 14.0 and stats["max_ms"] == 14.0  # p50 index 1 of [4, 14]
+
+
+def test_lane_stats_percentiles():
+    stats = LaneStats(window=100)
+    for ms in range(200, 0, -1):  # only the newest 100 samples (100..1 ms) are kept
+        stats.record(ms / 1000)
+    summary = stats.summary()
+    assert summary["count"] == 200
+    assert (summary["p50_ms"], summary["p99_ms"], summary["max_ms"]) == (51.0, 100.0, 100.0)
+    assert LaneStats().summary() == {"count": 0, "dropped": 0}
+
+
+def test_bad_settings_are_rejected():
+    with pytest.raises(ValueError):
+        PriorityOutbox(policies=("drop_oldest", "drop_middle", "drop_oldest"))
+    with pytest.raises(ValueError):
+        PriorityOutbox(mode="random")
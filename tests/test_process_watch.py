@@ -0,0 +1,56 @@
+# tests/test_process_watch.py
+from utils.process_watch import ProcessWatcher
+
+
+class FakeTable:
+    def __init__(self, procs=None):
+        self.procs = dict(procs or {})
+        self.name_lookups = 0
+
+    def iter_processes(self):
+        return list(self.procs.items())
+
+    def name_of(self, pid):
+        self.name_lookups += 1
+        return self.procs.get(pid)
+
+
+def _watcher(table, now):
+    return ProcessWatcher(
+        "EliteDangerous64.exe", table, min_backoff=1, max_backoff=4, clock=lambda: now[0]
+    )
+
+
+def test_pid_is_cached_once_found():
+    table = FakeTable({1: "explorer.exe", 42: "EliteDangerous64.exe"})
+    watcher = _watcher(table, [0.0])
+    for _ in range(5):
+        assert watcher.is_running()
+    assert watcher.scans == 1
+    assert watcher.pid == 42
+
+
+def test_scans_back_off_while_absent_and_notify_resets():
+    table = FakeTable({1: "explorer.exe"})
+    now = [0.0]
+    watcher = _watcher(table, now)
+    scan_times = []
+    for step in range(20):  # 10 simulated seconds
+        now[0] = step * 0.5
+        before = watcher.scans
+        watcher.is_running()
+        if watcher.scans > before:
+            scan_times.append(now[0])
+    assert scan_times == [0.0, 1.0, 3.0, 7.0]
+
+    table.procs[7] = "EliteDangerous64.exe"
+    watcher.notify()
+    assert watcher.is_running()
+
+
+def test_exit_and_pid_reuse_are_detected():
+    table = FakeTable({42: "EliteDangerous64.exe"})
+    watcher = _watcher(table, [0.0])
+    assert watcher.is_running()
+    table.procs[42] = "notepad.exe"  # PID reused by something else
+    assert not watcher.is_running()
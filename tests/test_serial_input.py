@@ -0,0 +1,209 @@
+# tests/test_serial_input.py
+import os
+import select
+import sys
+import threading
+import time
+
+import pytest
+
+from utils.command_router import CommandRouter, set_router
+from utils.input_scheduler import InputScheduler
+from utils.serial_input import RESULT_CODES, SerialCommandInput, encode_binary
+from utils.topics import TopicTrie
+
+
+class Recorder:
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def __call__(self, topic, payload):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append((topic, payload))
+        return "queued"
+
+
+class LoopLink:
+    """In-memory duplex link: the test writes commands in and reads acks back."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._in = bytearray()
+        self._out = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self._in)
+
+    def read(self, n):
+        with self._cond:
+            self._cond.wait_for(lambda: self._in, timeout=0.1)
+            data = bytes(self._in[:n])
+            del self._in[:n]
+            return data
+
+    def write(self, data):
+        with self._cond:
+            self._out += data
+            self._cond.notify_all()
+
+    # --- test side ---
+    def send(self, data):
+        with self._cond:
+            self._in += data
+            self._cond.notify_all()
+
+    def take(self, done, timeout=5.0):
+        with self._cond:
+            self._cond.wait_for(lambda: done(self._out), timeout=timeout)
+            data = bytes(self._out)
+            self._out.clear()
+            return data
+
+
+@pytest.fixture
+def link_input():
+    """(link, factory); the input reads and acks over an in-memory LoopLink."""
+    link = LoopLink()
+    started = []
+
+    def make(**kw):
+        kw.setdefault("cmd_prefix", "elite/cmd/")
+        inp = SerialCommandInput(link=link, **kw)
+        inp.start()
+        started.append(inp)
+        return inp
+
+    yield link, make
+    for inp in started:
+        inp.stop()
+
+
+def _read_acks(link, n):
+    return link.take(lambda out: out.count(b"\n") >= n).decode().splitlines()
+
+
+def _read_bytes(link, n):
+    return link.take(lambda out: len(out) >= n)
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pred()
+
+
+def test_line_commands_are_routed_and_acked(link_input):
+    link, make = link_input
+    rec = Recorder()
+    make(handler=rec)
+    link.send(b'@1 ship/gear\n@2 elite/cmd/ship/lights {"action": "hold"}\nsrv/turret\n')
+    acks = _read_acks(link, 3)
+    assert rec.calls == [
+        ("elite/cmd/ship/gear", ""),
+        ("elite/cmd/ship/lights", {"action": "hold"}),
+        ("elite/cmd/srv/turret", ""),
+    ]
+    assert acks == ["OK 1 queued", "OK 2 queued", "OK elite/cmd/srv/turret queued"]
+
+
+def test_binary_frames_and_bad_checksum(link_input):
+    link, make = link_input
+    rec = Recorder()
+    make(handler=rec, framing="binary")
+    good = encode_binary(9, b'ship/gear\x00{"action":"repeat","count":2}')
+    bad = bytearray(encode_binary(10, b"ship/gear"))
+    bad[-1] ^= 0xFF
+    link.send(b"noise" + good + bytes(bad))
+    acks = _read_bytes(link, 10)
+    assert rec.calls == [("elite/cmd/ship/gear", {"action": "repeat", "count": 2})]
+    # Reader (bad frame) and dispatcher (result) ack independently
+    assert sorted([acks[:5], acks[5:]]) == sorted(
+        [
+            encode_binary(9, bytes((RESULT_CODES["queued"],))),
+            encode_binary(10, bytes((RESULT_CODES["bad_frame"],))),
+        ]
+    )
+
+
+def test_burst_merges_presses_and_drops_oldest(link_input):
+    link, make = link_input
+    gate = threading.Event()
+    rec = Recorder(gate)
+    inp = make(handler=rec, queue_size=3, merge="repeat", overflow="drop_oldest")
+    link.send(b"@0 ship/first\n")
+    _wait(lambda: inp.received == 1 and not inp._pending)  # dispatcher blocked on the gate
+    burst = [b"@1 ship/a\n", b"@2 ship/a\n", b"@3 ship/a\n", b"@4 ship/b\n"]
+    burst += [b'@5 ship/c {"action": "hold"}\n', b"@6 ship/d\n"]
+    link.send(b"".join(burst))
+    _wait(lambda: inp.received == 7)
+    gate.set()
+    acks = _read_acks(link, 7)
+    assert rec.calls == [
+        ("elite/cmd/ship/first", ""),
+        ("elite/cmd/ship/b", ""),
+        ("elite/cmd/ship/c", {"action": "hold"}),
+        ("elite/cmd/ship/d", ""),
+    ]
+    assert sorted(acks) == sorted(
+        [
+            "OK 0 queued",
+            "OK 2 merged",
+            "OK 3 merged",
+            "ERR 1 dropped",  # the merged ship/a (repeat x3) was oldest when ship/d arrived
+            "OK 4 queued",
+            "OK 5 queued",
+            "OK 6 queued",
+        ]
+    )
+
+
+def test_routes_through_keymap(link_input):
+    class Focus:
+        def is_foreground(self, process_name):
+            return True
+
+    class Keys:
+        def key_down(self, key):
+            return True
+
+        def key_up(self, key):
+            return True
+
+    keymap = TopicTrie({"elite/cmd/ship/gear": "g"})
+    router = CommandRouter(Focus(), InputScheduler(Keys()), keymap.lookup, lambda: frozenset("g"))
+    router.rate_hz, router.rate_burst = 1000.0, 1000.0
+    set_router(router)
+    try:
+        link, make = link_input
+        make(cmd_prefix=None)
+        for i in range(5):
+            link.send(f"@{i} ship/gear\n".encode())
+            assert _read_acks(link, 1) == [f"OK {i} queued"]
+        link.send(b"@x ship/unmapped\n")
+        assert _read_acks(link, 1) == ["ERR x unmapped"]
+    finally:
+        set_router(None)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a pty pair")
+def test_opens_port_through_pyserial():
+    master, slave = os.openpty()
+    inp = SerialCommandInput(os.ttyname(slave), 115200, handler=Recorder(), cmd_prefix="elite/")
+    inp.start()
+    try:
+        assert inp.connected.wait(5)  # pyserial flushes input on open
+        os.write(master, b"@1 ship/gear\n")
+        data = b""
+        deadline = time.monotonic() + 5.0
+        while b"\n" not in data and time.monotonic() < deadline:
+            if select.select([master], [], [], 0.05)[0]:
+                data += os.read(master, 4096)
+        assert data == b"OK 1 queued\n"
+    finally:
+        inp.stop()
+        os.close(master)
+        os.close(slave)
@@ -0,0 +1,129 @@
+# tests/test_shipcomms.py
+import pytest
+
+import shipcomms
+from shipcomms import CommsState
+from utils.batcher import BurstBatcher
+from utils.instance import Instance
+
+
+@pytest.fixture
+def comms(config, monkeypatch):
+    config(
+        "[comms]\nwindow_ms = 60000\nmax_batch = 5\nrate_hz = 0.001\nhistory = 8\n"
+        'dedup_channels = ["npc"]\ndedup_size = 3\n'
+    )
+    sent = []
+    depth = {"now": 0, "max": 0}
+
+    def publish(key, messages):
+        depth["now"] += 1
+        depth["max"] = max(depth["max"], depth["now"])
+        try:
+            shipcomms._publish_comms(key, messages)
+        finally:
+            depth["now"] -= 1
+
+    monkeypatch.setattr(shipcomms, "_batcher", BurstBatcher(publish, background=False))
+    monkeypatch.setattr(shipcomms, "publish_packet", lambda packet, *a: sent.append(packet))
+    monkeypatch.setattr(shipcomms, "send_to_serial", lambda packet: None)
+    return Instance("CMDR Comms"), sent, depth
+
+
+def _text(channel, sender, message, ts="2024-06-01T00:00:00Z"):
+    return {
+        "timestamp": ts,
+        "event": "ReceiveText",
+        "Channel": channel,
+        "From": sender,
+        "Message": message,
+    }
+
+
+def test_dedup_lru_expires_and_evicts():
+    st = CommsState()
+    assert not st.is_repeat(1, 0.0, size=2, ttl=10.0)
+    assert st.is_repeat(1, 5.0, size=2, ttl=10.0)
+    assert not st.is_repeat(1, 15.0, size=2, ttl=10.0)  # ttl passed: counts as new
+    st.is_repeat(2, 16.0, size=2, ttl=10.0)
+    st.is_repeat(1, 16.5, size=2, ttl=10.0)  # touch 1: 2 is now the oldest
+    st.is_repeat(3, 17.0, size=2, ttl=10.0)
+    assert list(st.seen) == [1, 3]
+
+
+def test_npc_repeats_are_suppressed_and_players_are_not(comms):
+    inst, sent, _ = comms
+    assert shipcomms.handle_comms(_text("npc", "Pirate", "Your cargo!"), inst)
+    assert not shipcomms.handle_comms(_text("npc", "Pirate", "Your cargo!"), inst)
+    assert shipcomms.handle_comms(_text("npc", "Other pirate", "Your cargo!"), inst)
+    assert shipcomms.handle_comms(_text("player", "Jo", "o7"), inst)
+    assert shipcomms.handle_comms(_text("player", "Jo", "o7"), inst)
+    send = {"timestamp": "2024-06-01T00:00:01Z", "event": "SendText", "To": "Jo", "Message": "o7"}
+    assert shipcomms.handle_comms(send, inst)
+    assert inst.state("comms", CommsState).suppressed == 1
+
+    shipcomms._batcher.flush()
+    batches = {p["data"]["channel"]: p["data"]["messages"] for p in sent}
+    assert [m["from"] for m in batches["npc"]] == ["Pirate", "Other pirate"]
+    assert [m["msg"] for m in batches["player"]] == ["o7", "o7"]
+    assert batches["sent"] == [
+        {"channel": "sent", "from": None, "to": "Jo", "msg": "o7", "ts": send["timestamp"]}
+    ]
+    assert all(p["type"] == "Comms" and p["cmdr"] == inst.ns for p in sent)
+
+
+def test_history_filters_limits_and_is_bounded(comms):
+    inst, _, _ = comms
+    for i in range(10):
+        shipcomms.handle_comms(_text("player" if i % 2 else "wing", "Jo", f"m{i}"), inst)
+    assert [m["msg"] for m in shipcomms.history(inst=inst)] == [f"m{i}" for i in range(2, 10)]
+    assert [m["msg"] for m in shipcomms.history("player", 2, inst)] == ["m7", "m9"]
+    assert shipcomms.history("local", inst=inst) == []
+
+
+def test_rate_limited_flushes_requeue_without_recursing(comms):
+    inst, sent, depth = comms
+    total = 100
+    for i in range(total):
+        shipcomms.handle_comms(_text("player", "Jo", f"m{i}"), inst)
+        assert shipcomms._batcher.pending() < 5  # never more than max_batch - 1 held
+    assert depth["max"] == 1  # the refused flush did not call back into itself
+    st = inst.state("comms", CommsState)
+    published = [m["msg"] for p in sent for m in p["data"]["messages"]]
+    assert len(sent) == 2  # burst of 2, then the bucket is empty
+    held = shipcomms._batcher.pending()
+    assert len(published) + held + st.dropped["player"] == total
+
+    st.buckets["player"]._tokens = 1.0  # the next window has a token again
+    shipcomms._batcher.flush()
+    last = sent[-1]["data"]
+    assert [m["msg"] for m in last["messages"]] == [f"m{i}" for i in range(total - held, total)]
+    assert last["dropped"] == total - 10 - held and "player" not in st.dropped
+
+
+def test_refused_flush_racing_new_messages_stays_bounded_and_ordered(comms):
+    inst, sent, depth = comms
+    st = inst.state("comms", CommsState)
+    st.bucket("player")._tokens = 0.0  # already over the rate
+    for i in range(4):
+        shipcomms.handle_comms(_text("player", "Jo", f"old{i}"), inst)
+    real = shipcomms._publish_comms
+    raced = []
+
+    def racing(key, messages):
+        # The journal thread adds while the timer thread's flush is being refused
+        if not raced:
+            raced.append(True)
+            for i in range(3):
+                shipcomms._batcher.add(key, {"channel": "player", "msg": f"new{i}"})
+        real(key, messages)
+
+    shipcomms._publish_comms = racing
+    try:
+        shipcomms._batcher.flush()
+    finally:
+        shipcomms._publish_comms = real
+    assert depth["max"] == 1 and sent == []
+    held = shipcomms._batcher._pending[(inst, "player")]
+    assert [m["msg"] for m in held] == ["old3", "new0", "new1", "new2"]  # oldest dropped
+    assert st.dropped["player"] == 3
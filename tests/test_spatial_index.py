@@ -0,0 +1,144 @@
+# tests/test_spatial_index.py
+import json
+import math
+import os
+import random
+
+import pytest
+
+from utils import spatial_index
+from utils.instance import Instance
+from utils.spatial_index import SpatialIndex
+
+
+def _galaxy(n=3000, seed=7):
+    """Dense clusters around a few hubs plus sparse far-flung outliers."""
+    rng = random.Random(seed)
+    hubs = [(0, 0, 0), (-9530, -910, 19808), (25.2, -20.9, 25.9)]
+    points = []
+    for i in range(n):
+        if i % 50 == 0:
+            p = tuple(rng.uniform(-40000, 40000) for _ in range(3))
+        else:
+            hub = hubs[i % len(hubs)]
+            p = tuple(c + rng.gauss(0, 120) for c in hub)
+        points.append((f"Sys {i}", 1000 + i, p))
+    return points
+
+
+def _brute(index, p, r=None):
+    d = [(math.dist(index.position(i), p), i) for i in range(len(index))]
+    return sorted(x for x in d if r is None or x[0] <= r)
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = SpatialIndex(cell_ly=50.0)
+    for name, address, p in _galaxy():
+        index.add(name, address, p)
+    return index
+
+
+def test_queries_match_brute_force(index):
+    rng = random.Random(1)
+    probes = [index.position(i) for i in range(0, len(index), 97)]
+    probes += [tuple(rng.uniform(-50000, 50000) for _ in range(3)) for _ in range(20)]
+    for p in probes:
+        assert [i for _, i in index.nearest(p, 5)] == [i for _, i in _brute(index, p)[:5]]
+        for r in (10.0, 75.0, 400.0):
+            want = _brute(index, p, r)
+            assert [i for _, i in index.radius(p, r)] == [i for _, i in want]
+            assert index.within(p, r) == bool(want)
+
+
+def test_repeat_visits_and_exclusion(index):
+    before = len(index)
+    name, address, p = _galaxy()[5]
+    assert not index.add(name, address, p, "2024-05-01T12:00:00Z")
+    i = index.lookup("sys 5")
+    assert len(index) == before and index.visits[i] == 2 and index.current == i
+    assert i not in [j for _, j in index.nearest(p, 3, exclude=i)]
+
+
+def test_save_load_roundtrip(index, tmp_path):
+    path = str(tmp_path / "visited.bin")
+    index.save(path)
+    loaded = SpatialIndex.load(path, cell_ly=25.0)  # a different grid is fine
+    assert len(loaded) == len(index) and loaded.watermark == index.watermark
+    assert loaded.names == index.names and loaded.xyz == index.xyz
+    assert loaded.visits == index.visits and loaded.current == index.current
+    p = index.position(42)
+    assert loaded.nearest(p, 4) == index.nearest(p, 4)
+    # 32 bytes a system (xyz float32, address, visits, last visit) plus the names
+    names = len("\n".join(index.names).encode())
+    assert os.path.getsize(path) == spatial_index.HEADER.size + 32 * len(index) + 4 + names
+
+
+def _journal(directory, day, systems):
+    path = directory / f"Journal.2024-06-0{day}T000000.01.log"
+    with open(path, "w", encoding="utf-8") as f:
+        for minute, (name, pos) in enumerate(systems):
+            ts = f"2024-06-0{day}T00:{minute:02d}:00Z"
+            f.write(json.dumps({"timestamp": ts, "event": "Music", "MusicTrack": "x"}) + "\n")
+            jump = {"timestamp": ts, "event": "FSDJump", "StarSystem": name, "StarPos": pos}
+            f.write(json.dumps(jump) + "\n")
+    os.utime(path, (1717200000 + day * 86400,) * 2)  # mtime within that day
+    return str(path)
+
+
+def _open(inst, live):
+    spatial_index._stores.pop(inst.ns, None)
+    index = spatial_index.load(inst, live)
+    spatial_index._stores[inst.ns].backfill.join(10)
+    return index
+
+
+def test_backfill_resumes_from_saved_watermark(tmp_path, monkeypatch, config):
+    monkeypatch.chdir(tmp_path)
+    config("[spatial]\nenabled = true\n")
+    journals = tmp_path / "journals"
+    journals.mkdir()
+    inst = Instance("CMDR Spatial", str(journals))
+    _journal(journals, 1, [("Sol", [0, 0, 0]), ("Alpha Centauri", [3.03, -0.09, 3.16])])
+    live = _journal(journals, 2, [("Barnard's Star", [-3.03, 1.38, 4.94])])
+
+    index = _open(inst, live)  # first start: everything but the live journal
+    assert sorted(index.names) == ["Alpha Centauri", "Sol"]
+    spatial_index.on_journal_event(
+        {
+            "timestamp": "2024-06-02T00:00:00Z",
+            "event": "FSDJump",
+            "StarSystem": "Barnard's Star",
+            "StarPos": [-3.03, 1.38, 4.94],
+        },
+        inst,
+    )
+    spatial_index.flush()
+
+    _journal(journals, 3, [("Sol", [0, 0, 0]), ("Wolf 359", [3.88, 6.47, 5.6])])
+    index = _open(inst, None)  # restart: only journals newer than the saved file
+    assert len(index) == 4 and index.visits[index.lookup("Sol")] == 2
+    reply = spatial_index.query({"id": 3, "op": "nearest", "k": 2}, inst)
+    assert reply["center"] == [3.88, 6.47, 5.6]  # current system: Wolf 359
+    assert [r["system"] for r in reply["results"]] == ["Alpha Centauri", "Barnard's Star"]
+    for radius, hit in ((15.0, False), (17.5, True)):
+        reply = spatial_index.query({"op": "within", "pos": [20, 0, 0], "radius": radius}, inst)
+        assert reply["result"] is hit
+    reply = spatial_index.query({"op": "radius", "pos": [0, 0, 0], "radius": 6.0}, inst)
+    assert [r["system"] for r in reply["results"]] == ["Sol", "Alpha Centauri", "Barnard's Star"]
+    assert "error" in spatial_index.query({"op": "nearest", "system": "Nowhere"}, inst)
+
+
+def test_reply_to_is_confined_to_the_query_topics(monkeypatch, config):
+    from utils import mqtt_output
+
+    config("[spatial]\nenabled = true\n")
+    sent = []
+    monkeypatch.setattr(mqtt_output, "publish_raw", lambda topic, *a, **kw: sent.append(topic))
+    q = {"op": "within", "pos": [0, 0, 0], "radius": 1}
+    for reply_to in ("elite/cmd/ship/gear", "elite/status", "elite/query/#", 7):
+        assert spatial_index.handle_query("systems", q | {"reply_to": reply_to}) == "bad_payload"
+    assert sent == []
+    assert spatial_index.handle_query("systems", q | {"reply_to": "elite/query/mine"}) == "queued"
+    assert spatial_index.handle_query("systems", q) == "queued"
+    assert sent == ["elite/query/mine", "elite/query/systems/result"]
@@ -0,0 +1,148 @@
+# tests/test_squadron.py
+import json
+
+from squadron import SquadronAggregator
+from utils.topics import topic_matches
+
+
+class FakeBroker:
+    """Stand-in for a local broker: routes publishes to matching subscribers, keeps retained."""
+
+    def __init__(self):
+        self.subs = []
+        self.retained = {}
+
+    def subscribe(self, topic_filter, handler):
+        self.subs.append((topic_filter, handler))
+
+    def publish(self, topic, payload, retain=False):
+        if retain:
+            self.retained[topic] = payload
+        for topic_filter, handler in self.subs:
+            if topic_matches(topic_filter, topic):
+                handler(topic, payload.encode("utf-8"))
+
+
+class Member:
+    """One squadron member's parser: own seq counter, publishes like mqtt_output."""
+
+    def __init__(self, broker, cmdr):
+        self.broker = broker
+        self.cmdr = cmdr
+        self.seq = 0
+        self.ts = 0
+
+    def send(self, type_, data, seq=None, ts=None):
+        if seq is None:
+            self.seq += 1
+            seq = self.seq
+        self.ts += 1
+        packet = {
+            "source": "status" if type_ == "StatusDelta" else "journal",
+            "type": type_,
+            "timestamp": ts or f"2026-10-19T12:00:{self.ts:06.3f}Z",
+            "seq": seq,
+            "data": data,
+            "cmdr": self.cmdr,
+        }
+        self.broker.publish(f"elite/{self.cmdr}/events/{type_}", json.dumps(packet))
+        return packet
+
+
+def _setup():
+    broker = FakeBroker()
+    now = [0.0]
+    agg = SquadronAggregator(
+        publish=broker.publish, base_topic="elite", stale_after_s=60, clock=lambda: now[0]
+    )
+    broker.subscribe("elite/+/events/#", agg.on_message)
+    return broker, agg, now
+
+
+def _summary(broker):
+    return json.loads(broker.retained["elite/squadron/summary"])
+
+
+def test_merges_members_into_summary_topics():
+    broker, agg, _ = _setup()
+    alpha, beta = Member(broker, "Alpha"), Member(broker, "Beta")
+    alpha.send("FSDJump", {"StarSystem": "Sol"})
+    alpha.send("Docked", {"StationName": "Abraham Lincoln", "StarSystem": "Sol"})
+    beta.send("Location", {"StarSystem": "Shinrarta Dezhra"})
+    beta.send("StatusDelta", {"IsInDanger": True, "Supercruise": False})
+    assert agg.flush() == 3
+
+    summary = _summary(broker)
+    assert summary["n"] == 2 and summary["online"] == 2
+    assert summary["docked"] == ["Alpha"]
+    assert summary["danger"] == ["Beta"]
+    alpha_state = json.loads(broker.retained["elite/squadron/cmdr/Alpha"])
+    assert alpha_state["sys"] == "Sol" and alpha_state["stn"] == "Abraham Lincoln"
+
+    # Nothing changed -> nothing published; one change -> only that cmdr + summary
+    assert agg.flush() == 0
+    beta.send("StatusDelta", {"IsInDanger": False})
+    assert agg.flush() == 2
+    assert _summary(broker)["danger"] == []
+
+
+def test_duplicates_and_reordering_are_dropped_once():
+    broker, agg, _ = _setup()
+    alpha = Member(broker, "Alpha")
+    first = alpha.send("Docked", {"StationName": "Jameson Memorial"})
+    alpha.send("Undocked", {})
+    # QoS1 redelivery of an old packet, then a late but unseen one
+    broker.publish("elite/Alpha/events/Docked", json.dumps(first))
+    alpha.send("HullDamage", {"Health": 0.5}, seq=5)
+    alpha.send("HullDamage", {"Health": 0.4}, seq=4, ts="2026-10-19T12:00:00.500Z")
+    assert agg.duplicates == 1
+    agg.flush()
+    assert not json.loads(broker.retained["elite/squadron/cmdr/Alpha"]).get("dock")
+
+
+def test_parser_restart_resets_seq_tracking():
+    broker, agg, _ = _setup()
+    alpha = Member(broker, "Alpha")
+    for _ in range(10):
+        alpha.send("HullDamage", {"Health": 1.0})
+    alpha.seq = 0  # parser restarted: seq starts over with fresh timestamps
+    alpha.send("Fileheader", {})
+    alpha.send("LoadGame", {"Ship": "krait_mkii"})
+    assert agg.duplicates == 0
+    assert agg._cmdrs["Alpha"].restarts == 1
+    assert agg._cmdrs["Alpha"].ship == "krait_mkii"
+
+
+def test_silent_members_go_offline():
+    broker, agg, now = _setup()
+    Member(broker, "Alpha").send("Location", {"StarSystem": "Sol"})
+    agg.flush()
+    now[0] = 61.0
+    assert agg.flush() == 2  # staleness is a change
+    assert _summary(broker)["online"] == 0
+
+
+def test_fleet_throughput():
+    broker, agg, _ = _setup()
+    members = [Member(broker, f"CMDR_{i}") for i in range(12)]
+    for i in range(5000):
+        members[i % 12].send("StatusDelta", {"IsInDanger": bool(i % 7 == 0)})
+    agg.flush()
+    assert agg.received == 5000 and agg.duplicates == 0
+    assert _summary(broker)["n"] == 12
+
+
+def test_client_ids_are_unique_per_process(config, monkeypatch):
+    from utils import mqtt_output
+
+    cfg = config('[general]\ncmdr = "CMDR Jo/3"\n')
+    ids = set()
+    for suffix in ("a1b2c3", "d4e5f6"):  # two launches: a member and the aggregator
+        monkeypatch.setattr(mqtt_output, "_ID_SUFFIX", suffix)
+        cid = mqtt_output.client_id(cfg)
+        assert cid.startswith("elite-parser-CMDR_Jo_3-") and cid.endswith(suffix)
+        ids.add(cid)
+    assert len(ids) == 2
+    assert mqtt_output.client_id(cfg) == mqtt_output.client_id(cfg)  # stable across reconnects
+    cfg = config('[outputs.mqtt]\nclient_id = "cockpit-1"\n')
+    assert mqtt_output.client_id(cfg) == "cockpit-1"
@@ -0,0 +1,194 @@
+# tests/test_status_block.py
+import math
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+from utils import status_block
+from utils.instance import Instance
+from utils.status_block import (
+    BODY,
+    HEADER,
+    P_ALTITUDE,
+    P_FUEL,
+    P_GUI_FOCUS,
+    P_LATLONG,
+    P_PIPS,
+    StatusBlockReader,
+    StatusBlockWriter,
+    StatusRecord,
+)
+
+STATUS = {
+    "timestamp": "2024-06-01T12:00:00Z",
+    "event": "Status",
+    "Flags": 0x1000008,
+    "Flags2": 0x10,
+    "Pips": [4, 8, 0],
+    "FireGroup": 2,
+    "GuiFocus": 0,
+    "Fuel": {"FuelMain": 16.0, "FuelReservoir": 0.5},
+    "Cargo": 4.0,
+    "Latitude": 12.5,
+    "Longitude": -40.25,
+    "Altitude": 1200.0,
+    "Heading": 90.0,
+    "Balance": 123456789012,
+}
+
+
+def _record(body, seq=2):
+    return StatusRecord(seq, *BODY.unpack(body))
+
+
+def test_pack_status_fields_and_present_bits():
+    rec = _record(status_block.pack_status(STATUS, now=5.0))
+    assert rec.updated_at == 5.0 and rec.game_ts == 1717243200.0
+    assert (rec.latitude, rec.longitude, rec.altitude, rec.heading) == (12.5, -40.25, 1200.0, 90.0)
+    assert rec.balance == 123456789012 and (rec.flags, rec.flags2) == (0x1000008, 0x10)
+    assert (rec.pips_sys, rec.pips_eng, rec.pips_wep) == (4, 8, 0)
+    assert (rec.fuel_main, rec.fuel_reservoir, rec.cargo) == (16.0, 0.5, 4.0)
+    assert rec.fire_group == 2 and rec.has(P_GUI_FOCUS) and rec.gui_focus == 0
+    assert rec.present == (1 << 9) - 1
+
+
+def test_pack_status_marks_absent_fields():
+    rec = _record(status_block.pack_status({"Flags": -1, "Pips": [1, 2]}, now=0.0))
+    assert rec.present == 0 and rec.flags == 0xFFFFFFFF  # masked to u32
+    assert not rec.has(P_PIPS) and (rec.pips_sys, rec.pips_eng, rec.pips_wep) == (0, 0, 0)
+    assert all(math.isnan(x) for x in (rec.game_ts, rec.latitude, rec.altitude, rec.fuel_main))
+    rec = _record(status_block.pack_status({"Fuel": {}, "Latitude": 1.0, "Longitude": 2.0}))
+    assert rec.present == P_FUEL | P_LATLONG and not rec.has(P_ALTITUDE)
+
+
+def test_writer_reader_round_trip(tmp_path):
+    path = str(tmp_path / "status.bin")
+    writer = StatusBlockWriter(path)
+    with StatusBlockReader(path) as reader:
+        assert reader.read() is None and reader.seq == 0  # mapped, never written
+        seq = writer.update(STATUS)
+        rec = reader.read()
+        assert rec.seq == seq == 2 and rec.balance == STATUS["Balance"]
+        assert reader.read_if_changed(rec.seq) is None
+        writer.update(STATUS | {"Flags": 1})
+        assert reader.read_if_changed(rec.seq).flags == 1
+    writer.close()
+
+
+def test_seq_wraps_past_zero_and_survives_restarts(tmp_path):
+    path = str(tmp_path / "status.bin")
+    writer = StatusBlockWriter(path)
+    writer._seq = 0xFFFFFFFC
+    assert writer.write(bytes(BODY.size)) == 0xFFFFFFFE
+    assert writer.write(bytes(BODY.size)) == 2  # 0 is reserved for "never written"
+    writer.write(bytes(BODY.size))
+    writer.close()
+    assert StatusBlockWriter(path).write(bytes(BODY.size)) == 6  # continues, not from 0
+
+    # A writer that died mid-update left seq odd; the next one rounds it up to even
+    with open(path, "r+b") as f:
+        f.seek(status_block.SEQ_OFFSET)
+        f.write(status_block.SEQ.pack(9))
+    writer = StatusBlockWriter(path)
+    with StatusBlockReader(path) as reader:
+        assert reader.seq == 10 and writer.write(bytes(BODY.size)) == 12
+    writer.close()
+
+
+def test_reader_rejects_other_layouts_and_writer_resets_them(tmp_path):
+    path = tmp_path / "status.bin"
+    data = bytearray(status_block.SIZE)
+    HEADER.pack_into(data, 0, status_block.MAGIC, status_block.LAYOUT_VERSION + 1, len(data), 40)
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="reader expects v1"):
+        StatusBlockReader(str(path))
+    writer = StatusBlockWriter(str(path))  # an old/new layout is wiped, seq starts over
+    with StatusBlockReader(str(path)) as reader:
+        assert reader.seq == 0
+        writer.update(STATUS)
+        assert reader.read().seq == 2
+    writer.close()
+
+
+def test_reader_times_out_on_a_writer_stuck_mid_update(tmp_path):
+    path = str(tmp_path / "status.bin")
+    writer = StatusBlockWriter(path)
+    status_block.SEQ.pack_into(writer._mm, status_block.SEQ_OFFSET, 3)
+    with StatusBlockReader(path, timeout=0.05) as reader, pytest.raises(TimeoutError):
+        reader.read()
+    writer.close()
+
+
+def test_no_torn_reads_under_a_busy_writer(tmp_path):
+    # benchmarks/bench_status_block.py runs the same check against a writer process
+    path = str(tmp_path / "status.bin")
+    writer = StatusBlockWriter(path)
+    stop = threading.Event()
+
+    def hammer():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            writer.update({"Latitude": i, "Longitude": i, "Altitude": i, "Balance": i})
+
+    thread = threading.Thread(target=hammer)
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread.start()
+    try:
+        with StatusBlockReader(path) as reader:
+            records = [reader.read() for _ in range(20000)]
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(switch)
+        writer.close()
+    records = [r for r in records if r is not None]
+    assert len({r.seq for r in records}) > 1
+    assert all(r.latitude == r.longitude == r.altitude == r.balance for r in records)
+
+
+def test_update_follows_a_reloaded_path(tmp_path, config):
+    inst = Instance("CMDR Block")
+    first, second = tmp_path / "a-{ns}.bin", tmp_path / "b.bin"
+    status_block.update(STATUS, inst)  # disabled: nothing mapped
+    config(f"[outputs.status_block]\nenabled = true\npath = '{first.as_posix()}'\n")
+    status_block.update(STATUS, inst)
+    with StatusBlockReader(str(tmp_path / f"a-{inst.ns}.bin")) as reader:
+        assert reader.read().seq == 2
+    config(f"[outputs.status_block]\nenabled = true\npath = '{second.as_posix()}'\n")
+    status_block.update(STATUS | {"Flags": 7}, inst)
+    with StatusBlockReader(str(second)) as reader:
+        assert reader.read().flags == 7
+    inst.state("status_block", list)[1].close()
+
+
+@pytest.mark.skipif(not hasattr(os, "O_NOFOLLOW"), reason="needs O_NOFOLLOW")
+def test_writer_refuses_planted_symlink_or_special_file(tmp_path):
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep me")
+    link = tmp_path / "status.bin"
+    link.symlink_to(victim)
+    with pytest.raises(OSError):
+        StatusBlockWriter(str(link))
+    assert victim.read_text() == "keep me"  # not truncated
+    fifo = tmp_path / "fifo.bin"
+    os.mkfifo(fifo)
+    with pytest.raises(OSError):
+        StatusBlockWriter(str(fifo))
+
+
+def test_default_path_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    expected = tmp_path / "elite-parser" / "elite-parser-status-x.bin"
+    assert status_block.default_path("x") == str(expected)
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert os.path.dirname(status_block.default_path()) != tempfile.gettempdir()
+    writer = StatusBlockWriter(str(tmp_path / "fresh" / "status.bin"))  # creates the directory
+    writer.close()
+    if os.name == "posix":
+        assert (tmp_path / "fresh").stat().st_mode & 0o777 == 0o700
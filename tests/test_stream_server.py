@@ -0,0 +1,232 @@
+# tests/test_stream_server.py
+import asyncio
+import base64
+import json
+import os
+import struct
+import time
+
+import pytest
+
+from utils.stream_server import StreamServer
+
+
+def _packet(i, type_="StatusDelta"):
+    return {"source": "status", "type": type_, "seq": i, "data": {"i": i}}
+
+
+async def _ws_connect(port, query="topic=%23"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        (
+            f"GET /ws?{query} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode()
+    )
+    status = await reader.readline()
+    assert b"101" in status
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    return reader, writer
+
+
+async def _ws_recv(reader):
+    b1, b2 = await reader.readexactly(2)
+    n = b2 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    return b1 & 0x0F, await reader.readexactly(n)
+
+
+def _ws_send(writer, obj):
+    data = json.dumps(obj).encode()
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+    writer.write(struct.pack("!BB", 0x81, 0x80 | len(data)) + mask + masked)
+
+
+async def _sse_connect(port, query="topic=%23"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /events?{query} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    assert b"200" in await reader.readline()
+    while (await reader.readline()) != b"\r\n":
+        pass
+    return reader, writer
+
+
+async def _sse_recv(reader):
+    event = {}
+    while True:
+        raw = await reader.readline()
+        if not raw:
+            raise ConnectionError("stream closed")
+        line = raw.decode().rstrip("\n")
+        if not line:
+            if "data" in event:
+                return event
+            continue
+        if line.startswith(":"):
+            continue
+        name, _, value = line.partition(": ")
+        event[name] = value
+
+
+@pytest.fixture
+def server():
+    srv = StreamServer(port=0, queue_size=64)
+    srv.start(attach_bus=False)
+    yield srv
+    srv.stop()
+
+
+async def _wait_clients(srv, n, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while srv.clients < n and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    assert srv.clients == n
+
+
+def test_fifty_plus_clients_receive_every_packet(server):
+    n_ws, n_sse, n_packets = 40, 20, 200
+
+    async def run():
+        ws = [await _ws_connect(server.port) for _ in range(n_ws)]
+        sse = [await _sse_connect(server.port) for _ in range(n_sse)]
+        await _wait_clients(server, n_ws + n_sse)
+
+        async def feed():
+            for i in range(n_packets):
+                server.publish("elite/events/StatusDelta", _packet(i))
+                if i % 32 == 0:
+                    await asyncio.sleep(0)  # let clients drain like a real paced stream
+
+        async def ws_reader(r):
+            return [json.loads((await _ws_recv(r))[1])["seq"] for _ in range(n_packets)]
+
+        async def sse_reader(r):
+            return [int((await _sse_recv(r))["id"]) for _ in range(n_packets)]
+
+        start = time.perf_counter()
+        readers = [ws_reader(r) for r, _ in ws] + [sse_reader(r) for r, _ in sse]
+        results, _ = await asyncio.gather(asyncio.gather(*readers), feed())
+        elapsed = time.perf_counter() - start
+        for _, w in ws + sse:
+            w.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(asyncio.wait_for(run(), 30))
+    assert all(seqs == list(range(n_packets)) for seqs in results)
+    assert server.evicted == 0
+    assert elapsed < 10
+
+
+def test_filters_and_initial_snapshot(server):
+    server.publish("elite/events/FSDJump", _packet(1, "FSDJump"))
+    server.publish("elite/events/Docked", _packet(2, "Docked"))
+
+    async def run():
+        reader, writer = await _ws_connect(server.port, "topic=elite/events/FSDJump")
+        first = json.loads((await _ws_recv(reader))[1])  # snapshot: latest FSDJump only
+        _ws_send(writer, {"subscribe": ["elite/events/Docked"]})
+        second = json.loads((await _ws_recv(reader))[1])  # snapshot for the new filter
+        server.publish("elite/events/HullDamage", _packet(3, "HullDamage"))
+        server.publish("elite/events/FSDJump", _packet(4, "FSDJump"))
+        third = json.loads((await _ws_recv(reader))[1])
+        writer.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(asyncio.wait_for(run(), 10))
+    assert first["type"] == "FSDJump"
+    assert second["type"] in ("FSDJump", "Docked")
+    assert third["seq"] in (1, 2, 4) and third["type"] != "HullDamage"
+
+
+def test_slow_client_is_evicted(server):
+    async def run():
+        slow_r, slow_w = await _ws_connect(server.port)
+        fast_r, fast_w = await _ws_connect(server.port)
+        await _wait_clients(server, 2)
+        big = {"source": "modules", "type": "ModulesSnapshot", "seq": 0, "data": "x" * 65536}
+        got = 0
+        for i in range(400):
+            big["seq"] = i
+            server.publish("elite/events/ModulesSnapshot", dict(big))
+            await _ws_recv(fast_r)
+            got += 1
+        await _wait_clients(server, 1)
+        fast_w.close()
+        slow_w.close()
+        return got
+
+    assert asyncio.run(asyncio.wait_for(run(), 30)) == 400
+    assert server.evicted == 1
+
+
+async def _status_and_headers(port, path, headers):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    extra = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    key = base64.b64encode(os.urandom(16)).decode()
+    if path.startswith("/ws"):
+        extra += (
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n"
+        )
+    writer.write(f"GET {path} HTTP/1.1\r\n{extra}\r\n".encode())
+    status = (await reader.readline()).decode()
+    head = []
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        head.append(line.decode().strip())
+    writer.close()
+    return status.split()[1], head
+
+
+@pytest.mark.parametrize("path", ["/ws", "/events"])
+def test_foreign_origin_is_refused(path):
+    srv = StreamServer(port=0, allowed_origins=["http://dash.lan:8080"])
+    srv.start(attach_bus=False)
+    host = f"localhost:{srv.port}"
+
+    async def run():
+        return [
+            await _status_and_headers(srv.port, path, h)
+            for h in (
+                {"Host": host, "Origin": "https://evil.example"},
+                # DNS rebinding: the attacker's name resolves to us, Host matches Origin
+                {"Host": f"evil.example:{srv.port}", "Origin": f"http://evil.example:{srv.port}"},
+                {"Host": host, "Origin": f"http://{host}"},
+                {"Host": host, "Origin": "http://dash.lan:8080"},
+                {"Host": host},
+            )
+        ]
+
+    try:
+        results = asyncio.run(asyncio.wait_for(run(), 10))
+    finally:
+        srv.stop()
+    ok = "101" if path == "/ws" else "200"
+    assert [status for status, _ in results] == ["403", "403", ok, ok, ok]
+    headers = [h for _, head in results for h in head]
+    assert "Access-Control-Allow-Origin: *" not in headers
+    if path == "/events":
+        assert "Access-Control-Allow-Origin: http://dash.lan:8080" in results[3][1]
+        assert not any(h.startswith("Access-Control") for h in results[4][1])
+
+
+def test_module_start_survives_busy_port(config, monkeypatch, capsys):
+    import socket
+
+    from utils import stream_server
+
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        port = busy.getsockname()[1]
+        config(f"[outputs.stream]\nenabled = true\nport = {port}\n")
+        monkeypatch.setattr(stream_server, "_server", None)
+        assert stream_server.start() is None
+    assert stream_server._server is None
+    assert "[STREAM] Disabled" in capsys.readouterr().out
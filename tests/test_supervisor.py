@@ -0,0 +1,122 @@
+# tests/test_supervisor.py
+import pickle
+import socket
+import threading
+import time
+
+import pytest
+
+from utils.supervisor import IPC_KEY_ENV, Supervisor, ipc_request, serve_ipc
+
+KEY = b"per-launch-test-key"
+_unpickled = []
+
+
+def _wait(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pred()
+
+
+def _boom():
+    _unpickled.append(True)
+
+
+class Evil:
+    def __reduce__(self):
+        return (_boom, ())
+
+
+@pytest.fixture
+def sup():
+    sup = Supervisor(min_backoff=0.01, max_backoff=0.05)
+    yield sup
+    sup.shutdown()
+
+
+def test_crashed_component_is_restarted_and_reported(sup):
+    runs = []
+
+    def flaky(ctx):
+        runs.append(1)
+        if len(runs) < 3:
+            raise RuntimeError(f"crash {len(runs)}")
+        while ctx.sleep(0.05):
+            pass
+
+    sup.add("flaky", flaky)
+    sup.start()
+    _wait(lambda: len(runs) == 3)
+    health = sup.health()["components"]["flaky"]
+    assert health["restarts"] == 2 and health["last_error"] == "RuntimeError: crash 2"
+    _wait(lambda: sup.health()["components"]["flaky"]["alive"])
+
+
+def test_pause_gates_components_and_resume_kicks(sup):
+    ticks, resumed = [], threading.Event()
+
+    def worker(ctx):
+        while ctx.wait_active():
+            ticks.append(1)
+            ctx.sleep(30)  # woken early by resume
+
+    sup.add("worker", worker, on_resume=resumed.set)
+    sup.start(active=False)
+    time.sleep(0.1)
+    assert ticks == [] and not sup.active
+    sup.resume()
+    _wait(lambda: ticks)
+    assert resumed.is_set() and sup.active
+    time.sleep(0.1)  # the first kick may land before the worker sleeps; let it settle
+    n = len(ticks)
+    sup.pause()
+    sup.resume()  # the kick cuts the 30 s sleep short
+    _wait(lambda: len(ticks) == n + 1)
+
+
+def test_ipc_round_trip(sup):
+    sup.add_health("mqtt_connected", lambda: True)
+    sup.start()
+    port = serve_ipc(sup, 0, authkey=KEY)
+    assert port
+    assert ipc_request(port, "pause", authkey=KEY)["active"] is False
+    health = ipc_request(port, "resume", authkey=KEY)
+    assert health["active"] is True and health["mqtt_connected"] is True
+    assert ipc_request(port, "health", authkey=b"wrong key") is None
+    assert ipc_request(port, "shutdown", authkey=KEY) is not None
+    assert sup.stopped.is_set()
+
+
+def test_ipc_never_unpickles(sup):
+    from multiprocessing.connection import Client
+
+    port = serve_ipc(sup, 0, authkey=KEY)
+    with Client(("127.0.0.1", port), authkey=KEY) as conn:
+        conn.send(Evil())  # a pickle, not JSON
+        conn.poll(1.0)
+    assert ipc_request(port, "health", authkey=KEY) is not None  # still serving
+    assert _unpickled == []
+    pickle.loads(pickle.dumps(Evil()))
+    assert _unpickled == [True]  # the payload would have run if unpickled
+
+
+def test_ipc_needs_a_key_and_a_free_port(sup, monkeypatch):
+    monkeypatch.delenv(IPC_KEY_ENV, raising=False)
+    assert serve_ipc(sup, 0) is None
+    assert ipc_request(1) is None
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        assert serve_ipc(sup, taken.getsockname()[1], authkey=KEY) is None
+
+
+def test_silent_client_does_not_block_ipc(sup):
+    port = serve_ipc(sup, 0, authkey=KEY)
+    with socket.create_connection(("127.0.0.1", port)) as silent:
+        started = time.monotonic()
+        assert ipc_request(port, "health", authkey=KEY) is not None
+        assert time.monotonic() - started < 1.0
+        silent.settimeout(5.0)
+        silent.recv(4096)  # the challenge
+        assert silent.recv(4096) == b""  # hung up after the handshake timeout
@@ -0,0 +1,87 @@
+# tests/test_telemetry.py
+import math
+import sys
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import telemetry  # noqa: E402
+from telemetry import ALT, LAT, Deadband, FlightBuffer, rates  # noqa: E402
+from utils.instance import Instance  # noqa: E402
+
+telemetry._numpy()
+
+
+def test_deadband_hysteresis_and_heading_wrap():
+    db = Deadband((0.001, 0.001, 1.0, 2.0), hysteresis=0.5)
+    assert db.accept((10.0, 20.0, 100.0, 359.0))  # first sample
+    assert not db.accept((10.0005, 20.0, 100.5, 0.5))  # jitter; 359 -> 0.5 is 1.5 deg
+    assert db.accept((10.0, 20.0, 101.5, 359.0)) and db.moving
+    assert db.accept((10.0, 20.0, 102.1, 359.0))  # 0.6 m clears the halved band
+    assert not db.accept((10.0, 20.0, 102.4, 359.0)) and not db.moving
+    assert not db.accept((10.0, 20.0, 103.0, 359.0))  # settled: full 1 m band again
+    assert db.accept((10.0, 20.0, math.nan, 359.0))  # altitude dropped out
+
+
+def test_flight_buffer_wraps_oldest_first():
+    buf = FlightBuffer(4)
+    for i in range(6):
+        buf.append((float(i), i, i, i, i))
+    assert buf.count == 4
+    assert buf.last(4)[:, 0].tolist() == [2.0, 3.0, 4.0, 5.0]  # spans the wrap
+    assert buf.last(2)[:, 0].tolist() == [4.0, 5.0]
+    assert buf.last(10)[:, 0].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert buf.since(3.5)[:, 0].tolist() == [4.0, 5.0]
+    buf.clear()
+    assert buf.count == 0 and len(buf.last(3)) == 0
+
+
+def test_rates_over_a_known_track():
+    radius = 1_000_000.0
+    speed = 50.0  # m/s due east along the equator, climbing 2 m/s
+    t = np.arange(5.0)
+    rows = np.zeros((5, 5))
+    rows[:, 0] = t
+    rows[:, 2] = np.degrees(speed * t / radius)
+    rows[:, ALT] = 100.0 + 2.0 * t
+    out = rates(rows, radius)
+    assert out["ground_speed"] == pytest.approx(speed, rel=1e-3)
+    assert out["vertical_rate"] == 2.0
+    assert out["course"] == 90.0
+    rows[:, LAT], rows[:, 2] = rows[:, 2], 0.0  # now due north
+    assert rates(rows, radius)["course"] == 0.0
+    assert rates(rows, None)["ground_speed"] is None  # no PlanetRadius, no speed
+    assert rates(rows[:1], radius) == {"ground_speed": None, "vertical_rate": None, "course": None}
+
+
+def test_status_and_poller_threads_never_lose_or_repeat_rows(config, monkeypatch):
+    config('[telemetry]\nenabled = true\nmode = "batch"\nbatch_max = 7\nbuffer = 4096\n')
+    sent = []
+    monkeypatch.setattr(telemetry, "publish_packet", lambda packet, *a: sent.append(packet))
+    monkeypatch.setattr(telemetry, "send_to_serial", lambda packet: None)
+    inst = Instance("CMDR Telemetry")
+    stop = threading.Event()
+
+    def poller():
+        while not stop.is_set():
+            telemetry.maybe_publish(inst)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    thread = threading.Thread(target=poller)
+    thread.start()
+    try:
+        for i in range(20000):  # climbs 1 m per update: every sample clears the deadband
+            telemetry.on_status(
+                {"Latitude": 1.0, "Longitude": 2.0, "Altitude": float(i), "PlanetRadius": 1e6},
+                inst,
+            )
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+    telemetry.maybe_publish(inst, now=float("inf"))  # flush the tail
+    altitudes = [a for p in sent for a in p["data"]["altitude"]]
+    assert altitudes == [float(i) for i in range(20000)]
@@ -6,21 +6,26 @@
 from __future__ import annotations
 
 # from multiprocessing import context
+import os
+import secrets
 import subprocess
 import sys
 import time
 from pathlib import Path
 
-import psutil
 from PySide6 import QtCore, QtGui, QtWidgets
 
 # Project-local config helpers
 try:
-    from utils.config import get, load_config, reload_config
+    from utils.config import get, load_config, reload_config, snapshot
+    from utils.process_watch import get_watcher
+    from utils.supervisor import IPC_KEY_ENV, ipc_request
 except Exception:
     # Allow running tray from other working dirs
     sys.path.append(str(Path(__file__).parent))
-    from utils.config import get, load_config, reload_config  # type: ignore
+    from utils.config import get, load_config, reload_config, snapshot  # type: ignore
+    from utils.process_watch import get_watcher  # type: ignore
+    from utils.supervisor import IPC_KEY_ENV, ipc_request  # type: ignore
 
 # Optional dependency for saving TOML nicely
 try:
@@ -33,46 +38,132 @@ REPO_ROOT = Path(__file__).resolve().parent
 CONFIG_PATH = REPO_ROOT / "config.toml"
 
 
+class IpcWorker(QtCore.QObject):
+    """Blocking IPC round trips to the parser, run on the tray's worker thread."""
+
+    polled = QtCore.Signal(object)  # health dict, or None when unreachable
+
+    def __init__(self, key: str):
+        super().__init__()
+        self._key = key
+
+    def call(self, cmd: str) -> dict | None:
+        return ipc_request(
+            snapshot().supervisor.ipc_port, cmd, authkey=self._key.encode(), timeout=0.5
+        )
+
+    @QtCore.Slot(bool)
+    def poll(self, want_active: bool):
+        health = self.call("health")
+        if health is not None and health.get("active") != want_active:
+            health = self.call("resume" if want_active else "pause")
+        self.polled.emit(health)
+
+
 class ParserProcess(QtCore.QObject):
+    """
+    Keeps one warm parser runtime (eliteparser.py --supervised) alive for the tray's
+    lifetime and pauses/resumes it over local IPC as the game comes and goes.
+    """
+
     state_changed = QtCore.Signal(bool)  # running?
+    poll_requested = QtCore.Signal(bool)  # want active?
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._proc: subprocess.Popen | None = None
+        self._key = secrets.token_hex(16)
+        self._want_active = False
+        self._active = False
         self._last_start = 0.0
-
-    def start(self):
-        if self.is_running():
+        self._respawn_backoff = 1.0
+        self._polling = False
+        self.health: dict | None = None
+        # IPC waits up to its timeout per call; keep that off the GUI thread
+        self._ipc_thread = QtCore.QThread(self)
+        self._ipc = IpcWorker(self._key)
+        self._ipc.moveToThread(self._ipc_thread)
+        self.poll_requested.connect(self._ipc.poll)
+        self._ipc.polled.connect(self._on_polled)
+        self._ipc_thread.start()
+
+    def warm_up(self):
+        """Launch the supervised parser (paused) if it isn't already up."""
+        if self._proc is not None and self._proc.poll() is None:
             return
         # Ensure config exists
         if not CONFIG_PATH.exists():
             QtWidgets.QMessageBox.critical(None, APP_NAME, f"Missing config.toml at\n{CONFIG_PATH}")
             return
         # Launch eliteparser.py in unbuffered mode so logs stream
-        cmd = [sys.executable, "-u", str(REPO_ROOT / "eliteparser.py")]
+        cmd = [sys.executable, "-u", str(REPO_ROOT / "eliteparser.py"), "--supervised", "--paused"]
+        env = dict(os.environ, **{IPC_KEY_ENV: self._key})
         try:
-            self._proc = subprocess.Popen(cmd, cwd=str(REPO_ROOT))
+            self._proc = subprocess.Popen(cmd, cwd=str(REPO_ROOT), env=env)
             self._last_start = time.time()
-            self.state_changed.emit(True)
         except Exception as e:
             QtWidgets.QMessageBox.critical(None, APP_NAME, f"Failed to start parser:\n{e}")
             self._proc = None
-            self.state_changed.emit(False)
+
+    def start(self):
+        self._want_active = True
+        self.warm_up()
+        self.refresh()
 
     def stop(self):
-        # Gracefully stop background process; ignore benign errors (already dead, etc.)
+        # Pause only: the runtime (imports, MQTT session, state) stays warm
+        self._want_active = False
+        self.refresh()
+
+    def shutdown(self):
+        self._want_active = False
+        self._ipc_thread.quit()
+        self._ipc_thread.wait(2000)  # let an in-flight poll finish first
+        self._ipc.call("shutdown")
         if self._proc:
             import contextlib
 
             with contextlib.suppress(Exception):
                 self._proc.terminate()
                 self._proc.wait(timeout=2)
-
         self._proc = None
-        self.state_changed.emit(False)
+        self._set_active(False)
+
+    def refresh(self):
+        """Respawn a dead runtime, then ask the worker to poll health and reconcile
+        paused/active; the answer arrives in _on_polled."""
+        if self._proc is not None and self._proc.poll() is not None:
+            print(f"[TRAY] Parser exited (rc={self._proc.returncode})")
+            self._proc = None
+        if self._proc is None:
+            self.health = None
+            self._set_active(False)
+            # Respawn with backoff so a crashing runtime doesn't spin
+            if time.time() - self._last_start >= self._respawn_backoff:
+                self._respawn_backoff = min(self._respawn_backoff * 2, 60.0)
+                self.warm_up()
+            return
+        if not self._polling:  # one round trip in flight at a time
+            self._polling = True
+            self.poll_requested.emit(self._want_active)
+
+    @QtCore.Slot(object)
+    def _on_polled(self, health: dict | None):
+        self._polling = False
+        if self._proc is None:  # exited while the poll was out
+            return
+        self.health = health
+        if health is not None:
+            self._respawn_backoff = 1.0
+        self._set_active(bool(health and health.get("active")))
+
+    def _set_active(self, active: bool):
+        if active != self._active:
+            self._active = active
+            self.state_changed.emit(active)
 
     def is_running(self) -> bool:
-        return self._proc is not None and (self._proc.poll() is None)
+        return self._active
 
 
 class SettingsDialog(QtWidgets.QDialog):
@@ -193,6 +284,8 @@ class TrayApp(QtWidgets.QSystemTrayIcon):
 
         self._set_icon_running(False)
         self.show()
+        # Bring the parser runtime up (paused) now so a game launch only needs a resume
+        self.proc.warm_up()
 
     # --- Icons ---
     def _make_dot(self, color: QtGui.QColor) -> QtGui.QIcon:
@@ -214,7 +307,8 @@ class TrayApp(QtWidgets.QSystemTrayIcon):
         self._set_icon_running(running)
 
     def _tick(self):
-        auto = bool(get("general.auto_activate", True))
+        self.proc.refresh()
+        auto = snapshot().general.auto_activate
         game_up = self._game_running()
         running = self.proc.is_running()
 
@@ -240,24 +334,18 @@ class TrayApp(QtWidgets.QSystemTrayIcon):
             self.proc.start()
 
     def _quit(self):
-        self.proc.stop()
+        self.proc.shutdown()
         QtWidgets.QApplication.quit()
 
     def _game_running(self) -> bool:
-        target = get("general.process_name", "EliteDangerous64.exe").lower()
-        for p in psutil.process_iter(["name"]):
-            try:
-                if p.info.get("name", "").lower() == target:
-                    return True
-            except psutil.Error:
-                continue
-        return False
+        # Remembers the game PID once found; backs off full scans while it is absent
+        return get_watcher(snapshot().general.process_name).is_running()
 
 
 def main():
     app = QtWidgets.QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
-    #    tray = TrayApp()
+    _tray = TrayApp()  # keep a reference for the app's lifetime
     sys.exit(app.exec())
 
 
@@ -0,0 +1,130 @@
+# utils/batcher.py
+# SPDX-License-Identifier: MIT
+"""
+Burst batching for event floods (e.g. FSS/SAA scans producing hundreds of lines a second).
+- Items are grouped by key; a batch is flushed window_s after its first item
+  arrived or as soon as it holds max_items, whichever comes first
+- Flushes run outside the lock, on the adding thread (size cap, explicit flush)
+  or on one lazily started timer thread (window expiry)
+- A flush function that can't send (e.g. rate limited) hands the batch back with
+  requeue() for the next window
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class BurstBatcher(Generic[K, T]):
+    def __init__(
+        self,
+        flush_fn: Callable[[K, list[T]], None],
+        window_s: float = 0.25,
+        max_items: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+        background: bool = True,
+    ):
+        self._flush_fn = flush_fn
+        self.window_s = window_s
+        self.max_items = max_items
+        self._clock = clock
+        self._background = background
+        self._pending: dict[K, list[T]] = {}
+        self._deadlines: dict[K, float] = {}
+        self._cv = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    def add(self, key: K, item: T) -> None:
+        with self._cv:
+            items = self._pending.get(key)
+            if items is None:
+                items = self._pending[key] = []
+                self._deadlines[key] = self._clock() + self.window_s
+                self._cv.notify()
+            items.append(item)
+            batch = self._take(key) if len(items) >= self.max_items else None
+            self._start()
+        if batch is not None:
+            self._emit(key, batch)
+
+    def requeue(self, key: K, items: list[T]) -> int:
+        """
+        Put a batch the flush function could not send back ahead of key's pending
+        items, for the next window. Never flushes inline, so it is safe to call from
+        flush_fn; keeps the newest max_items - 1 and returns how many were dropped.
+        """
+        with self._cv:
+            pending = self._pending.get(key)
+            merged = [*items, *(pending or ())]
+            dropped = max(len(merged) - max(self.max_items - 1, 1), 0)
+            self._pending[key] = merged[dropped:]
+            if pending is None:
+                self._deadlines[key] = self._clock() + self.window_s
+                self._cv.notify()
+            self._start()
+        return dropped
+
+    def _start(self) -> None:
+        """Start the timer thread on first use; caller holds the lock."""
+        if self._background and self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+            self._thread.start()
+
+    def _take(self, key: K) -> list[T]:
+        self._deadlines.pop(key, None)
+        return self._pending.pop(key)
+
+    def _emit(self, key: K, batch: list[T]) -> None:
+        try:
+            self._flush_fn(key, batch)
+        except Exception as e:
+            print(f"[BATCH] Flush of {key!r} failed: {e}")
+
+    def flush(self, key: K | None = None) -> int:
+        """Flush one key (or everything) now. Returns the number of batches emitted."""
+        with self._cv:
+            keys = list(self._pending) if key is None else [key] if key in self._pending else []
+            batches = [(k, self._take(k)) for k in keys]
+        for k, batch in batches:
+            self._emit(k, batch)
+        return len(batches)
+
+    def flush_due(self, now: float | None = None) -> int:
+        """Flush batches whose window has expired."""
+        now = self._clock() if now is None else now
+        with self._cv:
+            due = [k for k, deadline in self._deadlines.items() if deadline <= now]
+            batches = [(k, self._take(k)) for k in due]
+        for k, batch in batches:
+            self._emit(k, batch)
+        return len(batches)
+
+    def pending(self) -> int:
+        with self._cv:
+            return sum(len(items) for items in self._pending.values())
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                if self._closed:
+                    return
+                if self._deadlines:
+                    wait = min(self._deadlines.values()) - self._clock()
+                    if wait > 0:
+                        self._cv.wait(wait)
+                else:
+                    self._cv.wait()
+            self.flush_due()
+
+    def close(self) -> None:
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        self.flush()
@@ -0,0 +1,274 @@
+# utils/broker_pool.py
+# SPDX-License-Identifier: MIT
+"""
+Extra MQTT brokers published to alongside the main connection, e.g. a local broker
+for cockpit hardware and a remote one for squadron dashboards.
+- One [[outputs.mqtt.brokers]] table per broker: its own QoS, retain, topic filters
+  and rate cap (messages/s, token bucket; excess waits in that broker's outbox)
+- Every connection has its own paho client, reconnect backoff, priority outbox and
+  publisher thread, so a slow or unreachable broker only ever backs up itself
+- A packet is encoded (and compressed) once; the same bytes are fanned out to
+  every broker whose filters match
+- connections > 1 shards topics matching shard_topics across that many clients to
+  the same broker (by topic hash, so each topic stays in order on one connection);
+  other topics use the first connection
+"""
+
+from __future__ import annotations
+
+import threading
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+from utils.config import Snapshot, snapshot
+from utils.priority import PriorityOutbox
+from utils.ratelimit import TokenBucket
+from utils.topics import TopicTrie
+
+BROKER_DEFAULTS: dict[str, Any] = {
+    "name": "",
+    "broker": "127.0.0.1",
+    "port": 1883,
+    "username": "",
+    "password": "",
+    "qos": 0,
+    "retain": False,
+    "topics": [],  # topic filters to publish; empty = everything
+    "rate_hz": 0.0,  # messages/s across the broker's connections; 0 = uncapped
+    "burst": 20.0,
+    "connections": 1,
+    "shard_topics": [],  # filters spread across `connections` clients
+}
+
+
+class Message:
+    """One outgoing publish, shared by every outbox it is fanned out to."""
+
+    __slots__ = ("topic", "payload", "retain", "wire")
+
+    def __init__(self, topic: str, payload: str | bytes, retain: bool | None = None):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain  # None = the broker's own retain setting
+        self.wire: tuple[str | bytes, Any] | None = None  # (payload, properties) once encoded
+
+
+# encode(message) -> (payload, MQTT v5 properties or None); memoised on message.wire
+Encoder = Callable[[Message], tuple[Any, Any]]
+
+
+def _paho_client(client_id: str):
+    import paho.mqtt.client as mqtt
+
+    return mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
+
+
+class BrokerLink:
+    """One client connection with its own outbox, rate bucket and publisher thread."""
+
+    def __init__(
+        self,
+        name: str,
+        cfg: Snapshot,
+        encode: Encoder,
+        rate_hz: float,
+        client_factory: Callable[[str], Any] = _paho_client,
+        client_prefix: str = "elite-parser",
+    ):
+        self.name = name
+        self.client_id = f"{client_prefix}-{name}"
+        self.cfg = cfg
+        self.outbox = PriorityOutbox()
+        self.outbox.configure_from(snapshot().priority)
+        self.bucket = TokenBucket(rate_hz, cfg.burst)
+        self.connected = threading.Event()
+        self.published = 0
+        self.failed = 0
+        self.throttled = 0
+        self._encode = encode
+        self._factory = client_factory
+        self._client = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"mqtt-pub-{name}", daemon=True)
+
+    def start(self) -> None:
+        client = self._client = self._factory(self.client_id)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        if self.cfg.username:
+            client.username_pw_set(self.cfg.username, self.cfg.password)
+        client.reconnect_delay_set(min_delay=1, max_delay=30)
+        client.connect_async(self.cfg.broker, self.cfg.port, keepalive=30)
+        client.loop_start()
+        self._thread.start()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            self.connected.set()
+            print(f"[MQTT:{self.name}] Connected to {self.cfg.broker}:{self.cfg.port}")
+        else:
+            print(f"[MQTT:{self.name}] Connect failed: {reason_code}")
+
+    def _on_disconnect(self, client, userdata, reason_code, properties=None):
+        self.connected.clear()
+        print(f"[MQTT:{self.name}] Disconnected: {reason_code}")
+
+    def put(self, msg: Message, cls: int, since: float | None = None) -> bool:
+        return self.outbox.put(msg, cls, since)
+
+    def _run(self) -> None:
+        stop = self._stop
+        while not stop.is_set():
+            got = self.outbox.get(timeout=0.5)
+            if got is None:
+                continue
+            msg, cls, enqueued = got
+            while not self.connected.wait(0.5):
+                if stop.is_set():
+                    return
+            if not self.bucket.try_acquire():
+                self.throttled += 1
+                while not self.bucket.try_acquire():
+                    if stop.wait(1.0 / self.bucket.rate):
+                        return
+            retain = self.cfg.retain if msg.retain is None else msg.retain
+            try:
+                payload, properties = self._encode(msg)
+                res = self._client.publish(
+                    msg.topic,
+                    payload=payload,
+                    qos=self.cfg.qos,
+                    retain=retain,
+                    properties=properties,
+                )
+                ok = getattr(res, "rc", 0) == 0
+            except Exception as e:  # encoding failed, or payload/topic rejected by the client
+                print(f"[MQTT:{self.name}] Publish failed: {e}")
+                ok = False
+            if ok:
+                self.published += 1
+            else:
+                self.failed += 1
+            self.outbox.done(cls, enqueued)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2)
+        if self._client is not None:
+            try:
+                self._client.loop_stop()
+                self._client.disconnect()
+            except Exception:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connected": self.connected.is_set(),
+            "published": self.published,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "lanes": self.outbox.stats(),
+        }
+
+
+class Broker:
+    """Policy for one broker plus its connection(s)."""
+
+    def __init__(
+        self,
+        cfg: Snapshot,
+        encode: Encoder,
+        client_factory: Callable[[str], Any] = _paho_client,
+        client_prefix: str = "elite-parser",
+    ):
+        self.cfg = cfg
+        self.name = cfg.name or f"{cfg.broker}:{cfg.port}"
+        n = max(int(cfg.connections), 1)
+        rate = float(cfg.rate_hz) / n  # each connection gets its share of the cap
+        self.links = [
+            BrokerLink(
+                self.name if n == 1 else f"{self.name}-{i}",
+                cfg,
+                encode,
+                rate,
+                client_factory,
+                client_prefix,
+            )
+            for i in range(n)
+        ]
+        self._topics = TopicTrie(dict.fromkeys(cfg.topics, True)) if cfg.topics else None
+        self._sharded = (
+            TopicTrie(dict.fromkeys(cfg.shard_topics, True)) if n > 1 and cfg.shard_topics else None
+        )
+        # topic -> link, or None when filtered out; topics are a bounded set (event types)
+        self._routes: dict[str, BrokerLink | None] = {}
+
+    def route(self, topic: str) -> BrokerLink | None:
+        try:
+            return self._routes[topic]
+        except KeyError:
+            pass
+        link: BrokerLink | None = None
+        if self._topics is None or self._topics.lookup(topic, False):
+            link = self.links[0]
+            if self._sharded is not None and self._sharded.lookup(topic, False):
+                link = self.links[zlib.crc32(topic.encode()) % len(self.links)]
+        self._routes[topic] = link
+        return link
+
+    def start(self) -> None:
+        for link in self.links:
+            link.start()
+
+    def stop(self) -> None:
+        for link in self.links:
+            link.stop()
+
+    def stats(self) -> dict[str, Any]:
+        return {link.name: link.stats() for link in self.links}
+
+
+def broker_config(entry: Any) -> Snapshot:
+    """One [[outputs.mqtt.brokers]] table with BROKER_DEFAULTS filled in."""
+    unknown = set(entry) - set(BROKER_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown [[outputs.mqtt.brokers]] keys: {sorted(unknown)}")
+    return Snapshot(BROKER_DEFAULTS | dict(entry))
+
+
+class BrokerPool:
+    """Fans each message out to the matching brokers; publish() never blocks."""
+
+    def __init__(
+        self,
+        entries: Any,
+        encode: Encoder,
+        client_factory: Callable[[str], Any] = _paho_client,
+        client_prefix: str = "elite-parser",
+    ):
+        # client_prefix should be unique per process (mqtt_output.client_id()): two
+        # members with the same broker name would otherwise take over each other's session
+        self.brokers = [
+            Broker(broker_config(e), encode, client_factory, client_prefix) for e in entries
+        ]
+        names = [b.name for b in self.brokers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate broker names in [[outputs.mqtt.brokers]]: {names}")
+
+    def start(self) -> None:
+        for broker in self.brokers:
+            broker.start()
+
+    def publish(self, msg: Message, cls: int, since: float | None = None) -> None:
+        for broker in self.brokers:
+            link = broker.route(msg.topic)
+            if link is not None and not link.put(msg, cls, since):
+                print(f"[MQTT:{link.name}] Outbox lane {cls} full, dropped one")
+
+    def stop(self) -> None:
+        for broker in self.brokers:
+            broker.stop()
+
+    def stats(self) -> dict[str, Any]:
+        return {b.name: b.stats() for b in self.brokers}
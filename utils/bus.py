@@ -0,0 +1,162 @@
+# utils/bus.py
+# SPDX-License-Identifier: MIT
+"""
+In-process packet bus for Elite-Parser.
+- Hands packet dicts straight to local subscribers (no JSON, no broker)
+- Subscribers filter with MQTT-style patterns on the same topics MQTT uses
+- Each subscriber owns a bounded queue; when full the oldest packet is dropped
+
+Usage:
+    from utils import bus
+
+    sub = bus.subscribe("elite/events/+")        # pull / iterate / async for
+    bus.subscribe("elite/events/HullDamage", callback=on_hull)   # inline callback
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING, Any
+
+from utils.topics import topic_matches
+
+if TYPE_CHECKING:
+    import asyncio
+
+Packet = dict[str, Any]
+
+# Copy-on-write tuple so publish() never takes the lock
+_subs: tuple[Subscription, ...] = ()
+_lock = threading.Lock()
+
+
+class Subscription:
+    """A single subscriber. Packets are shared objects; treat them as read-only."""
+
+    def __init__(
+        self,
+        pattern: str,
+        callback: Callable[[Packet], None] | None = None,
+        maxsize: int = 256,
+    ):
+        self.pattern = pattern
+        self.callback = callback
+        self.maxsize = max(int(maxsize), 1)
+        self.dropped = 0
+        self._q: deque[Packet] = deque()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def matches(self, topic: str) -> bool:
+        return topic_matches(self.pattern, topic)
+
+    def _deliver(self, packet: Packet) -> None:
+        if self.callback is not None:
+            self.callback(packet)
+            return
+        with self._cv:
+            if self._closed:
+                return
+            if len(self._q) >= self.maxsize:
+                self._q.popleft()
+                self.dropped += 1
+            self._q.append(packet)
+            self._cv.notify()
+            loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    # --- Pull API ---
+    def get(self, timeout: float | None = None) -> Packet | None:
+        """Return the next packet, or None on timeout/close."""
+        with self._cv:
+            if not self._q and not self._closed:
+                self._cv.wait(timeout)
+            return self._q.popleft() if self._q else None
+
+    def __iter__(self) -> Iterator[Packet]:
+        while True:
+            with self._cv:
+                while not self._q and not self._closed:
+                    self._cv.wait()
+                if not self._q:
+                    return
+                packet = self._q.popleft()
+            yield packet
+
+    # --- asyncio API ---
+    def __aiter__(self) -> Subscription:
+        import asyncio  # only pulled in by async consumers
+
+        with self._cv:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+        return self
+
+    async def __anext__(self) -> Packet:
+        assert self._wakeup is not None, "use 'async for' to iterate"
+        while True:
+            with self._cv:
+                if self._q:
+                    return self._q.popleft()
+                if self._closed:
+                    raise StopAsyncIteration
+                self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def close(self) -> None:
+        unsubscribe(self)
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+            loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def subscribe(
+    pattern: str = "#",
+    callback: Callable[[Packet], None] | None = None,
+    maxsize: int = 256,
+) -> Subscription:
+    """
+    Register an in-process subscriber.
+    With a callback, packets are delivered inline on the producing thread (keep it fast).
+    Without one, packets are queued for get()/iteration/`async for`.
+    """
+    global _subs
+    sub = Subscription(pattern, callback, maxsize)
+    with _lock:
+        _subs = (*_subs, sub)
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    global _subs
+    with _lock:
+        _subs = tuple(s for s in _subs if s is not sub)
+
+
+def has_subscribers() -> bool:
+    return bool(_subs)
+
+
+def publish(topic: str, packet: Packet) -> None:
+    """Deliver packet to every matching subscriber. No-op when nobody listens."""
+    for sub in _subs:
+        if not sub.matches(topic):
+            continue
+        try:
+            sub._deliver(packet)
+        except Exception as e:
+            print(f"[BUS] Subscriber {sub.pattern!r} error: {e}")
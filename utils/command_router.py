@@ -2,52 +2,192 @@
 # SPDX-License-Identifier: MIT
 from __future__ import annotations
 
-import time
-from typing import Any
+from collections.abc import Callable
+from typing import Any, Protocol
 
-from utils.config import get
-from utils.keymap import load_keymap
+from utils.config import on_change, snapshot
+from utils.headless import HeadlessFocus, LoggingKeys, is_headless
+from utils.input_scheduler import InputScheduler, PayloadError, build_job
+from utils.keymap import allowed_keys
 from utils.keymap import resolve as resolve_key
-from utils.keys_win import press_key
-from utils.win_focus import is_process_foreground
-
-keymap = load_keymap()
-
-_last_ts: dict[str, float] = {}
-
-
-def _within_rate(topic: str, hz: float) -> bool:
-    if hz <= 0:
-        return True
-    now = time.time()
-    min_dt = 1.0 / hz
-    last = _last_ts.get(topic, 0.0)
-    if now - last < min_dt:
-        return False
-    _last_ts[topic] = now
-    return True
-
-
-def handle_inbound_command(topic: str, payload: Any) -> None:
-    key = resolve_key(topic)
-    if not key:
-        print(f"[CMD] {topic} -> (no key mapping) payload={payload!r}")
-        return
-
-    # Strict safety — require Elite foreground; never force focus
-    proc_name = get("general.process_name", "EliteDangerous64.exe")
-    require_foreground = True  # strict only
-    if require_foreground and not is_process_foreground(proc_name):
-        print(f"[CMD] {topic} -> Elite not foreground; skipping")
-        return
-
-    # Rate limit
-    hz = float(get("safety.rate_limit_hz", 5))
-    if not _within_rate(topic, hz):
-        print(f"[CMD] {topic} -> rate-limited")
-        return
-
-    # Optional action hint (we ignore for now; can use payload later)
-    # action = payload.get("action","press") if isinstance(payload, dict) else "press"
-    ok = press_key(key, hold_ms=80)
-    print(f"[CMD] {topic} -> PRESS '{key}' status={'ok' if ok else 'fail'} (payload={payload!r})")
+from utils.ratelimit import TokenBucket
+
+# handle() result codes; "queued" and "cancelled" mean the command was accepted
+RESULTS = (
+    "queued",
+    "cancelled",
+    "unmapped",
+    "not_foreground",
+    "rate_limited",
+    "bad_payload",
+    "queue_full",
+    "busy",  # e.g. a $diag profile is already running
+)
+
+# <cmd prefix>$diag/<action> is handled by utils.diagnostics
+DIAG_TOPIC = "$diag/"
+# <cmd prefix>$query/<name> is answered by utils.spatial_index (request/response)
+QUERY_TOPIC = "$query/"
+
+
+class FocusBackend(Protocol):
+    def is_foreground(self, process_name: str) -> bool: ...
+
+
+# Platform backends are imported on first command, never at import time
+def _default_focus() -> FocusBackend:
+    if is_headless():
+        return HeadlessFocus()
+    from utils.win_focus import make_tracker
+
+    return make_tracker()
+
+
+def _default_scheduler() -> InputScheduler:
+    if is_headless():
+        backend = LoggingKeys()
+    else:
+        from utils import keys_win as backend
+
+    scheduler = InputScheduler(backend, maxsize=snapshot().safety.input_queue)
+    scheduler.start()
+    return scheduler
+
+
+class CommandRouter:
+    """
+    Routes inbound command topics to key presses.
+    - keymap lookup via the compiled topic trie (utils.keymap.resolve)
+    - strict foreground check via a cached ForegroundTracker
+    - one token bucket per command class (the topic level after .../cmd/)
+    - key presses are queued on an InputScheduler; handle() never sleeps
+    Backends are injectable so the router can be exercised off-Windows.
+    """
+
+    def __init__(
+        self,
+        focus: FocusBackend | None = None,
+        scheduler: InputScheduler | None = None,
+        resolve: Callable[[str], str | None] = resolve_key,
+        keys: Callable[[], frozenset[str]] = allowed_keys,
+    ):
+        self._focus = focus
+        self._scheduler = scheduler
+        if scheduler is not None:
+            scheduler.set_guard(self._is_foreground)
+        self._resolve = resolve
+        self._keys = keys
+        self.configure()
+
+    def configure(self) -> None:
+        """(Re)read routing settings from config and reset the rate limiters."""
+        cfg = snapshot()
+        self.process_name = cfg.general.process_name
+        self.cmd_prefix = cfg.inputs.mqtt.cmd_topic.rstrip("#").rstrip("/") + "/"
+        self.rate_hz = cfg.safety.rate_limit_hz
+        self.rate_burst = cfg.safety.rate_burst
+        self.class_rates: dict[str, Any] = dict(cfg.safety.rate_limits)
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def command_class(self, topic: str) -> str:
+        if topic.startswith(self.cmd_prefix):
+            return topic[len(self.cmd_prefix) :].split("/", 1)[0] or "default"
+        return "default"
+
+    def _bucket(self, cls: str) -> TokenBucket:
+        bucket = self._buckets.get(cls)
+        if bucket is None:
+            hz = float(self.class_rates.get(cls, self.rate_hz))
+            bucket = self._buckets[cls] = TokenBucket(hz, self.rate_burst)
+        return bucket
+
+    def _is_foreground(self) -> bool:
+        if self._focus is None:
+            self._focus = _default_focus()
+        return self._focus.is_foreground(self.process_name)
+
+    @property
+    def scheduler(self) -> InputScheduler:
+        if self._scheduler is None:
+            self._scheduler = _default_scheduler()
+            # Focus is re-checked right before each job runs, in case it changed while queued
+            self._scheduler.set_guard(self._is_foreground)
+        return self._scheduler
+
+    def handle(self, topic: str, payload: Any) -> str:
+        """Route one command; returns a result code (see RESULTS) for acks and logs."""
+        # Diagnostics live on a reserved topic and never reach the keymap
+        if topic.startswith(self.cmd_prefix + DIAG_TOPIC):
+            from utils import diagnostics
+
+            if not self._bucket("$diag").try_acquire():
+                return "rate_limited"
+            return diagnostics.handle(topic[len(self.cmd_prefix) + len(DIAG_TOPIC) :], payload)
+        if topic.startswith(self.cmd_prefix + QUERY_TOPIC):
+            from utils import spatial_index
+
+            if not self._bucket("$query").try_acquire():
+                return "rate_limited"
+            return spatial_index.handle_query(
+                topic[len(self.cmd_prefix) + len(QUERY_TOPIC) :], payload
+            )
+
+        # Cancels bypass mapping, focus and rate checks: stopping input is always safe
+        if isinstance(payload, dict) and payload.get("action") == "cancel":
+            n = self.scheduler.cancel(None if payload.get("all") else topic)
+            print(f"[CMD] {topic} -> cancelled {n} job(s)")
+            return "cancelled"
+
+        key = self._resolve(topic)
+        if not key:
+            print(f"[CMD] {topic} -> (no key mapping) payload={payload!r}")
+            return "unmapped"
+
+        # Strict safety — require Elite foreground; never force focus
+        if not self._is_foreground():
+            print(f"[CMD] {topic} -> Elite not foreground; skipping")
+            return "not_foreground"
+
+        # Rate limit per command class (bounded by the keymap, not by raw topics)
+        if not self._bucket(self.command_class(topic)).try_acquire():
+            print(f"[CMD] {topic} -> rate-limited")
+            return "rate_limited"
+
+        try:
+            job = build_job(topic, key, payload, self._keys())
+        except PayloadError as e:
+            print(f"[CMD] {topic} -> bad payload: {e}")
+            return "bad_payload"
+
+        if not self.scheduler.submit(job):
+            print(f"[CMD] {topic} -> input queue full; dropped")
+            return "queue_full"
+        print(f"[CMD] {topic} -> QUEUED '{key}' ({len(job.steps)} steps, payload={payload!r})")
+        return "queued"
+
+
+_router: CommandRouter | None = None
+
+
+def get_router() -> CommandRouter:
+    global _router
+    if _router is None:
+        _router = CommandRouter()
+        on_change(_on_config_change)
+    return _router
+
+
+def _on_config_change(new, old) -> None:
+    # Rate limits, process name and command prefix re-tune live
+    if _router is not None:
+        _router.configure()
+
+
+def set_router(router: CommandRouter | None) -> None:
+    """Swap the process-wide router (tests, embedding)."""
+    global _router
+    _router = router
+
+
+def handle_inbound_command(topic: str, payload: Any) -> str:
+    return get_router().handle(topic, payload)
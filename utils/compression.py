@@ -0,0 +1,154 @@
+# utils/compression.py
+# SPDX-License-Identifier: MIT
+"""
+Optional payload compression for large MQTT packets (Loadout, ModulesSnapshot, ...).
+- zlib (stdlib) or zstd (pip install zstandard), optionally with a preset dictionary
+  trained from journal packets (train_dictionary / benchmarks/bench_compression.py)
+- Compressed payloads carry MQTT v5 user properties so clients can tell:
+    content-encoding = zlib | zstd     dict-id = first 8 hex of sha1(dictionary)
+- Payloads under min_bytes, or that don't shrink, go out as plain JSON
+
+Client side:
+    from utils.compression import decode
+    data = decode(msg.payload, msg.properties.UserProperty, {dict_id: dict_bytes})
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+from collections.abc import Iterable, Mapping
+
+ENCODING_PROP = "content-encoding"
+DICT_PROP = "dict-id"
+CODECS = ("zlib", "zstd")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_codecs() -> list[str]:
+    return ["zlib", "zstd"] if _zstd() is not None else ["zlib"]
+
+
+def dict_id(dictionary: bytes | None) -> str | None:
+    return hashlib.sha1(dictionary).hexdigest()[:8] if dictionary else None
+
+
+class Compressor:
+    """Stateful encoder for one codec/level/dictionary (not thread-safe; one per thread)."""
+
+    def __init__(
+        self,
+        codec: str = "zlib",
+        level: int = 6,
+        min_bytes: int = 1024,
+        dictionary: bytes | None = None,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec {codec!r} (expected one of {CODECS})")
+        zstd = _zstd() if codec == "zstd" else None
+        if codec == "zstd" and zstd is None:
+            # zstd levels run to 22; bring the level into zlib's range instead of
+            # failing on the first packet
+            fallback = max(-1, min(level, 9))
+            note = f" at level {fallback}" if fallback != level else ""
+            print(f"[COMPRESS] zstandard not installed; using zlib{note}")
+            codec, level = "zlib", fallback
+        if codec == "zlib" and not -1 <= level <= 9:
+            raise ValueError(f"zlib level must be -1..9, got {level}")
+        self.codec = codec
+        self.level = level
+        self.min_bytes = min_bytes
+        self.dictionary = dictionary or None
+        self.dict_id = dict_id(self.dictionary)
+        if zstd is not None:
+            zdict = zstd.ZstdCompressionDict(self.dictionary) if self.dictionary else None
+            self._zstd = zstd.ZstdCompressor(level=level, dict_data=zdict)
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._zstd.compress(data)
+        if self.dictionary:
+            c = zlib.compressobj(
+                self.level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, self.dictionary
+            )
+            return c.compress(data) + c.flush()
+        return zlib.compress(data, self.level)
+
+    def encode(self, payload: str | bytes) -> tuple[str | bytes, list[tuple[str, str]] | None]:
+        """Returns (payload, user_properties); properties are None when sent uncompressed."""
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        self.raw_bytes += len(data)
+        if len(data) >= self.min_bytes:
+            packed = self.compress(data)
+            if len(packed) < len(data):
+                self.sent_bytes += len(packed)
+                props = [(ENCODING_PROP, self.codec)]
+                if self.dict_id:
+                    props.append((DICT_PROP, self.dict_id))
+                return packed, props
+        self.sent_bytes += len(data)
+        return payload, None
+
+
+def decompress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    if codec == "zlib":
+        if dictionary:
+            d = zlib.decompressobj(zdict=dictionary)
+            return d.decompress(data) + d.flush()
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError("payload is zstd-compressed; pip install zstandard")
+        zdict = zstd.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstd.ZstdDecompressor(dict_data=zdict).decompress(data)
+    raise ValueError(f"unknown content-encoding {codec!r}")
+
+
+def decode(
+    payload: bytes,
+    user_properties: Iterable[tuple[str, str]] | None,
+    dictionaries: Mapping[str, bytes] | None = None,
+) -> bytes:
+    """Undo Compressor.encode() given the message's MQTT v5 UserProperty list."""
+    props = dict(user_properties or ())
+    codec = props.get(ENCODING_PROP)
+    if codec is None:
+        return payload
+    dictionary = None
+    if DICT_PROP in props:
+        dictionary = (dictionaries or {}).get(props[DICT_PROP])
+        if dictionary is None:
+            raise RuntimeError(f"payload needs compression dictionary {props[DICT_PROP]}")
+    return decompress(payload, codec, dictionary)
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 16384, codec: str = "zlib") -> bytes:
+    """
+    Build a preset dictionary from sample payloads.
+    zstd uses its trainer; for zlib (32 KB window, later bytes matter most) the
+    dictionary is one recent sample per distinct packet shape, most common shapes last.
+    """
+    samples = list(samples)
+    if codec == "zstd" and _zstd() is not None:
+        return _zstd().train_dictionary(size, samples).as_bytes()
+    by_shape: dict[str | None, tuple[int, bytes]] = {}
+    for s in samples:
+        try:
+            shape = json.loads(s).get("type")
+        except (ValueError, AttributeError):
+            shape = None
+        count = by_shape.get(shape, (0, b""))[0]
+        by_shape[shape] = (count + 1, s)
+    ordered = [s for _, s in sorted(by_shape.values(), key=lambda cs: cs[0])]
+    return b"".join(ordered)[-min(size, 32768) :]
@@ -1,9 +1,22 @@
 # utils/config.py
 # SPDX-License-Identifier: MIT
+"""
+Config loading for Elite-Parser.
+- config.toml is merged over DEFAULTS once and frozen into a read-only Snapshot
+  (attribute access: snapshot().outputs.mqtt.port); values are coerced to the
+  type of their default
+- get('a.b.c') is a single dict lookup against a pre-flattened copy
+- watch_config() swaps in a new snapshot when the file changes on disk and calls
+  on_change() subscribers so subsystems can re-tune without a restart
+"""
 from __future__ import annotations
 
+import copy
 import os
 import pathlib
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
 from typing import Any
 
 # Python 3.11+ has tomllib in stdlib; fallback to tomli if needed
@@ -17,8 +30,12 @@ DEFAULTS: dict[str, Any] = {
         "elite_dir": r"C:\Users\Public\Saved Games\Frontier Developments\Elite Dangerous",
         "only_when_game_running": True,
         "process_name": "EliteDangerous64.exe",
-        "poll_interval_ms": 500,
         "base_topic": "elite",
+        "auto_activate": True,
+        "keymap_file": "keymap.toml",
+        "headless": False,
+        "cmdr": "",
+        "watch_mode": "auto",  # auto | watchdog | poll
     },
     "outputs": {
         "mqtt": {
@@ -29,6 +46,17 @@ DEFAULTS: dict[str, Any] = {
             "password": "",
             "qos": 0,
             "retain": False,
+            "client_id": "",  # empty = elite-parser-<cmdr>-<host>-<random per launch>
+            # Opt-in payload compression per topic filter (utils/compression.py)
+            "compression": {
+                "topics": [],
+                "codec": "zlib",
+                "level": 6,
+                "min_bytes": 1024,
+                "dictionary": "",
+            },
+            # Extra publish-only brokers: [[outputs.mqtt.brokers]] (utils/broker_pool.py)
+            "brokers": [],
         },
         "serial": {
             "enabled": False,
@@ -36,6 +64,22 @@ DEFAULTS: dict[str, Any] = {
             "baud": 115200,
             "newline_delimited_json": True,
         },
+        # Built-in WebSocket/SSE endpoint for browser dashboards (utils/stream_server.py)
+        "stream": {
+            "enabled": False,
+            "host": "127.0.0.1",
+            "port": 8765,
+            "queue_size": 256,
+            "max_clients": 200,
+            # Extra browser origins allowed to connect (e.g. "http://dash.lan:8080");
+            # pages served from this host are always allowed, "*" allows any
+            "allowed_origins": [],
+        },
+        # Memory-mapped live status record for local readers (utils/status_block.py)
+        "status_block": {
+            "enabled": False,
+            "path": "",  # empty = <per-user dir>/elite-parser-status[-<ns>].bin; may use {ns}
+        },
     },
     "inputs": {
         "mqtt": {
@@ -46,12 +90,225 @@ DEFAULTS: dict[str, Any] = {
             "enabled": False,
             "port": "COM6",
             "baud": 115200,
+            # utils/serial_input.py
+            "framing": "auto",  # auto | line | binary
+            "queue_size": 32,
+            "overflow": "drop_oldest",  # drop_oldest | drop_newest
+            "merge": "repeat",  # none | dedupe | repeat
+            "ack": True,
         },
     },
+    "safety": {
+        "require_foreground": True,
+        "force_focus": False,
+        "rate_limit_hz": 5.0,
+        "rate_burst": 1.0,
+        "input_queue": 64,
+        "rate_limits": {},
+    },
+    # Multi-instance mode: [[instances]] cmdr = "...", elite_dir = "..."
+    "instances": [],
+    "supervisor": {
+        "ipc_port": 47654,
+    },
+    # Adaptive stat poller (utils/poller.py)
+    "poller": {
+        "min_interval_ms": 25,
+        "warm_interval_ms": 40,
+        "idle_interval_ms": 5000,
+        "hot_s": 5.0,
+        "idle_after_s": 60.0,
+        "rescan_ms": 1000,
+    },
+    # Burst batching of exploration scans into ScanBatch packets
+    "batching": {
+        "window_ms": 250,
+        "max_items": 200,
+    },
+    # ReceiveText/SendText pipeline (shipcomms.py)
+    "comms": {
+        "window_ms": 500,
+        "max_batch": 50,
+        "rate_hz": 2.0,
+        "history": 500,
+        "dedup_channels": ["npc"],
+        "dedup_size": 512,
+        "dedup_ttl_s": 300.0,
+    },
+    # Derived session metrics (derived.py)
+    "derived": {
+        "enabled": True,
+        "interval_ms": 5000,
+    },
+    # Planetary flight telemetry from Status.json (telemetry.py, needs numpy)
+    "telemetry": {
+        "enabled": False,
+        "mode": "stream",  # stream | batch | both
+        "rate_hz": 5.0,  # FlightTelemetry packets at most this often
+        "batch_interval_ms": 2000,  # FlightTrack packets at least this often while moving
+        "batch_max": 100,  # ...or as soon as this many samples are waiting
+        "buffer": 2048,  # samples kept in the ring buffer
+        "window_s": 2.0,  # span used for ground speed / vertical rate / course
+        "hysteresis": 0.5,  # band multiplier while moving
+        "deadband": {"latitude": 0.00002, "longitude": 0.00002, "altitude": 0.5, "heading": 1.0},
+    },
+    # Squadron aggregator (eliteparser.py --aggregate)
+    "aggregator": {
+        "topic": "",  # empty = <base_topic>/+/events/#
+        "interval_ms": 1000,
+        "stale_after_s": 120.0,
+    },
+    # Priority lanes for outbound packets (utils/priority.py)
+    "priority": {
+        "dequeue": "strict",  # strict | weighted
+        "weights": {"critical": 8, "normal": 3, "bulk": 1},
+        "queue_size": {"critical": 256, "normal": 1000, "bulk": 200},
+        "drop": {"critical": "drop_oldest", "normal": "drop_oldest", "bulk": "drop_oldest"},
+        "critical": [],  # extra event types per class (added to the built-in lists)
+        "bulk": [],
+    },
+    # Plugin handlers (utils/plugins.py)
+    "plugins": {
+        "enabled": False,  # runs every *.py in dir at startup
+        "dir": "plugins",
+        "entry_points": True,
+        "disabled": [],
+        "queue_size": 256,
+        "timeout_s": 2.0,
+        "max_failures": 5,
+        "settings": {},  # [plugins.settings.<name>] -> ctx.settings
+    },
+    # Block-compressed archive of closed journals (utils/journal_archive.py)
+    "archive": {
+        "dir": "archive",
+        "codec": "zlib",  # zlib | lzma
+        "level": 9,
+        "block_kb": 256,
+        "min_age_s": 3600.0,  # never pack a journal touched more recently than this
+        "delete_originals": False,  # remove journals once their archived copy verifies
+    },
+    # Visited-systems spatial index (utils/spatial_index.py)
+    "spatial": {
+        "enabled": False,
+        "path": "",  # empty = visited_systems[-<cmdr>].bin; may use {ns}
+        "cell_ly": 50.0,
+        "save_interval_s": 60.0,
+        "backfill": True,  # scan journals/archive newer than the saved index at startup
+        "max_results": 100,
+    },
+    # Profiling/memory/thread dumps over <cmd prefix>$diag/... (utils/diagnostics.py)
+    "diagnostics": {
+        "enabled": False,  # anyone who can publish to the command topic can use these
+        "dir": "diagnostics",
+        "max_seconds": 300.0,
+    },
     "keymap": {},
 }
 
 _cfg: dict[str, Any] | None = None
+_path: str | os.PathLike = "config.toml"
+_snapshot: Snapshot | None = None
+_flat: dict[str, Any] = {}
+_subscribers: list[Callable[[Snapshot, Snapshot], None]] = []
+_lock = threading.RLock()
+
+
+class Snapshot(Mapping[str, Any]):
+    """
+    Immutable, attribute-access view of one config table.
+    Nested tables are Snapshots, arrays are tuples; unknown attributes raise
+    AttributeError (use .get() / lookup() for optional keys).
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any]):
+        object.__setattr__(self, "_data", {k: _freeze(v) for k, v in data.items()})
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise TypeError("config snapshots are read-only")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Snapshot) and self._data == other._data
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self._data!r})"
+
+    def lookup(self, path: str, default: Any = None) -> Any:
+        node: Any = self
+        for part in path.split("."):
+            if not isinstance(node, Snapshot) or part not in node._data:
+                return default
+            node = node._data[part]
+        return node
+
+    def to_dict(self) -> dict[str, Any]:
+        return {k: _thaw(v) for k, v in self._data.items()}
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return value if isinstance(value, Snapshot) else Snapshot(value)
+    if isinstance(value, list | tuple):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Snapshot):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]  # arrays of tables ([[instances]]) included
+    return value
+
+
+def _coerce(value: Any, default: Any, path: str) -> Any:
+    """Coerce value to the type of its default (e.g. port = "1883" -> 1883)."""
+    if isinstance(default, dict):
+        if not isinstance(value, dict):
+            raise RuntimeError(f"Config '{path}' must be a table, got {value!r}")
+        return {
+            k: _coerce(v, default[k], f"{path}.{k}") if k in default else v
+            for k, v in value.items()
+        }
+    if default is None or isinstance(value, type(default)):
+        return value
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                return value.strip().lower() in ("1", "true", "yes", "on")
+            return bool(value)
+        if isinstance(default, int | float | str):
+            return type(default)(value)
+    except (TypeError, ValueError) as e:
+        raise RuntimeError(f"Config '{path}' expects {type(default).__name__}: {value!r}") from e
+    return value
+
+
+def _flatten(node: Mapping[str, Any], prefix: str, out: dict[str, Any]) -> dict[str, Any]:
+    for k, v in node.items():
+        key = f"{prefix}{k}"
+        out[key] = v
+        if isinstance(v, Mapping):
+            _flatten(v, f"{key}.", out)
+    return out
 
 
 def _deep_merge(dst: dict[str, Any], src: dict[str, Any]) -> dict[str, Any]:
@@ -63,12 +320,8 @@ def _deep_merge(dst: dict[str, Any], src: dict[str, Any]) -> dict[str, Any]:
     return dst
 
 
-def load_config(path: str | os.PathLike = "config.toml") -> dict[str, Any]:
-    """Load TOML config and merge with defaults. Idempotent."""
-    global _cfg
-    if _cfg is not None:
-        return _cfg
-    cfg = {k: (v.copy() if isinstance(v, dict) else v) for k, v in DEFAULTS.items()}
+def _read(path: str | os.PathLike) -> dict[str, Any]:
+    cfg = copy.deepcopy(DEFAULTS)
 
     # utils/config.py (inside load_config)
     p = pathlib.Path(path)
@@ -88,6 +341,8 @@ def load_config(path: str | os.PathLike = "config.toml") -> dict[str, Any]:
                 f"Original error: {e}"
             ) from e
         _deep_merge(cfg, file_cfg)
+    # Type-check the file before the ENV overrides index into it
+    cfg = _coerce(cfg, DEFAULTS, "config")
 
     # ENV overrides (useful for secrets/CI)
     # ELITE_MQTT_HOST, ELITE_MQTT_PORT, ELITE_MQTT_USER, ELITE_MQTT_PASS, ELITE_BASE_TOPIC
@@ -99,25 +354,126 @@ def load_config(path: str | os.PathLike = "config.toml") -> dict[str, Any]:
 
     cfg["general"]["base_topic"] = os.getenv("ELITE_BASE_TOPIC", cfg["general"]["base_topic"])
 
-    _cfg = cfg
     return cfg
 
 
+def _install(cfg: dict[str, Any]) -> Snapshot | None:
+    """Swap in a new config; returns the previous snapshot."""
+    global _cfg, _snapshot, _flat
+    snap = Snapshot(cfg)
+    flat = _flatten(snap, "", {})
+    with _lock:
+        old = _snapshot
+        # Single reference assignments: readers see either the old or the new config
+        _cfg, _snapshot, _flat = cfg, snap, flat
+    return old
+
+
+def load_config(path: str | os.PathLike = "config.toml") -> dict[str, Any]:
+    """Load TOML config and merge with defaults. Idempotent."""
+    global _path
+    with _lock:
+        if _cfg is not None:
+            return _cfg
+        _path = path
+        _install(_read(path))
+        return _cfg  # type: ignore[return-value]
+
+
+def snapshot() -> Snapshot:
+    """Current immutable config snapshot (loads config.toml on first use)."""
+    snap = _snapshot
+    if snap is None:
+        load_config()
+        snap = _snapshot
+    return snap  # type: ignore[return-value]
+
+
+_MISSING = object()
+
+
 def get(path: str, default: Any = None) -> Any:
     """
-    Dot-path getter, e.g. get('outputs.mqtt.broker')
+    Dot-path getter, e.g. get('outputs.mqtt.broker'); default only for missing keys
     """
-    cfg = load_config()
-    node: Any = cfg
-    for part in path.split("."):
-        if not isinstance(node, dict):
-            return default
-        node = node.get(part, default)
-    return node
-
-
-def reload_config(path: str | os.PathLike = "config.toml") -> dict[str, Any]:
-    """Clear cache and reload (for future GUI hot-reload)."""
-    global _cfg
-    _cfg = None
-    return load_config(path)
+    if _snapshot is None:
+        load_config()
+    value = _flat.get(path, _MISSING)
+    return default if value is _MISSING else value
+
+
+def on_change(fn: Callable[[Snapshot, Snapshot], None]) -> Callable[[], None]:
+    """Call fn(new, old) after every config swap. Returns an unsubscribe function."""
+    with _lock:
+        _subscribers.append(fn)
+
+    def _unsubscribe() -> None:
+        with _lock:
+            if fn in _subscribers:
+                _subscribers.remove(fn)
+
+    return _unsubscribe
+
+
+def _notify(new: Snapshot, old: Snapshot | None) -> None:
+    if old is None or new == old:
+        return
+    for fn in list(_subscribers):
+        try:
+            fn(new, old)
+        except Exception as e:
+            print(f"[CONFIG] Change handler {getattr(fn, '__name__', fn)!r} failed: {e}")
+
+
+def reload_config(path: str | os.PathLike | None = None) -> dict[str, Any]:
+    """Re-read config from disk, swap the snapshot and notify subscribers."""
+    global _path
+    with _lock:
+        if path is not None:
+            _path = path
+        old = _install(_read(_path))
+        new = _snapshot
+    _notify(new, old)  # type: ignore[arg-type]
+    return _cfg  # type: ignore[return-value]
+
+
+_watcher: threading.Thread | None = None
+
+
+def watch_config(interval: float = 1.0) -> None:
+    """Start a daemon thread that hot-reloads config.toml when it changes (idempotent)."""
+    global _watcher
+    if _watcher is not None:
+        return
+    snapshot()
+
+    def _mtime() -> float | None:
+        try:
+            return pathlib.Path(_path).stat().st_mtime
+        except OSError:
+            return None
+
+    def _loop(last: float | None) -> None:
+        while True:
+            time.sleep(interval)
+            if _watcher is not threading.current_thread():
+                return  # unwatch_config() was called
+            mt = _mtime()
+            if mt == last:
+                continue
+            last = mt
+            try:
+                reload_config()
+                print(f"[CONFIG] Reloaded {_path}")
+            except RuntimeError as e:
+                print(f"[CONFIG] Reload failed, keeping previous config: {e}")
+
+    # Taken before the thread starts, so an edit made right after this call is not missed
+    _watcher = threading.Thread(target=_loop, args=(_mtime(),), name="config-watch", daemon=True)
+    _watcher.start()
+
+
+def unwatch_config() -> None:
+    """Stop the watch_config() thread (it exits within one interval)."""
+    global _watcher
+    _watcher = None
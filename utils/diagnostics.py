@@ -0,0 +1,435 @@
+# utils/diagnostics.py
+# SPDX-License-Identifier: MIT
+"""
+Runtime diagnostics toggled over the command topic, for a parser that misbehaves
+on a user's machine. Off unless diagnostics.enabled. Commands on <cmd prefix>$diag/
+<action> (e.g. elite/cmd/$diag/threads) skip keymap and focus checks but share one
+"$diag" rate bucket; payloads are optional JSON objects.
+
+    profile          {"seconds": 30, "mode": "sample" | "cprofile", "interval_ms": 5}
+    profile/stop     end the running session early
+    memory/start     {"frames": 1}   start tracemalloc
+    memory/snapshot  {"top": 20}     top allocators (+ growth since the last snapshot)
+    memory/stop
+    threads          stack of every thread
+    stats            packet lane latencies, extra brokers and plugin counters
+
+"sample" walks every thread's stack from a helper thread; "cprofile" profiles the
+journal/status poll thread (attached at its next tick via checkpoint()).
+Full results are written under [diagnostics] dir; a "Diagnostics" packet with the
+summary is published. Nothing runs, and nothing is imported, until a command arrives.
+Memory, thread and stats actions run in order on one "diag-worker" thread, never on
+the MQTT network thread that delivered the command.
+"""
+
+from __future__ import annotations
+
+import abc
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from utils.config import snapshot
+
+ACTIONS = (
+    "profile",
+    "profile/stop",
+    "memory/start",
+    "memory/snapshot",
+    "memory/stop",
+    "threads",
+    "stats",
+)
+PROFILE_MODES = ("sample", "cprofile")
+MAX_DEPTH = 64
+
+_lock = threading.Lock()
+_session: _Session | None = None
+_cprofile: _CProfileSession | None = None  # read by checkpoint() on the poll thread
+_last_memory = None  # previous tracemalloc snapshot, for diffs
+_jobs: queue.SimpleQueue | None = None  # started with the first job
+_memory_on = False  # tracing as of the last queued memory/start|stop
+
+
+def _opt(payload: Any, key: str, default):
+    if isinstance(payload, dict) and key in payload:
+        return type(default)(payload[key])
+    return default
+
+
+def _output_path(kind: str, ext: str) -> str:
+    directory = snapshot().diagnostics.dir
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+    return os.path.join(directory, f"{kind}-{stamp}.{ext}")
+
+
+def _publish(kind: str, data: dict[str, Any]) -> None:
+    from utils.mqtt_output import publish_packet
+    from utils.serial_output import format_packet
+
+    print(f"[DIAG] {kind}: {data.get('file', '')}")
+    publish_packet(format_packet("diag", "Diagnostics", {"kind": kind} | data))
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}:{code.co_name}"
+
+
+# === Profiling ===
+class _Session(abc.ABC):
+    """Base for one profiling session; stop() is idempotent and publishes once."""
+
+    mode = ""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self._done = threading.Event()
+        self._timer = threading.Timer(seconds, self.stop)
+        self._timer.name = "diag-timer"
+        self._timer.daemon = True
+
+    def start(self) -> None:
+        self._timer.start()
+
+    def stop(self) -> None:
+        global _session
+        with _lock:
+            if self._done.is_set():
+                return
+            self._done.set()
+            if _session is self:
+                _session = None
+        self._timer.cancel()
+        self._finish()
+
+    @abc.abstractmethod
+    def _finish(self) -> None:
+        """Write and publish the results (called once, off the lock)."""
+
+
+class _SampleSession(_Session):
+    """Samples every thread's stack at a fixed interval from a helper thread."""
+
+    mode = "sample"
+
+    def __init__(self, seconds: float, interval_s: float):
+        super().__init__(seconds)
+        self.interval_s = interval_s
+        self.samples = 0
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._thread = threading.Thread(target=self._run, name="diag-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        super().start()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        labels: dict[Any, str] = {}  # code object -> label; sessions are short-lived
+        while not self._done.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def _finish(self) -> None:
+        self._thread.join(timeout=2)
+        path = _output_path("profile", "folded")
+        # Collapsed stacks: one "thread;outer;...;inner count" line, for flamegraph tools
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {n}\n")
+        self_time: Counter[str] = Counter()
+        per_thread: Counter[str] = Counter()
+        for stack, n in self.stacks.items():
+            self_time[f"{stack[0]}: {stack[-1]}"] += n
+            per_thread[stack[0]] += n
+        _publish(
+            "profile",
+            {
+                "mode": self.mode,
+                "file": path,
+                "seconds": round(time.monotonic() - self.started, 1),
+                "samples": self.samples,
+                "threads": dict(per_thread.most_common()),
+                "top": [[label, n] for label, n in self_time.most_common(15)],
+            },
+        )
+
+
+class _CProfileSession(_Session):
+    """
+    cProfile only sees the thread that enables it, so the poll thread attaches the
+    profiler itself at its next checkpoint() and detaches once the session ends.
+    """
+
+    mode = "cprofile"
+
+    def __init__(self, seconds: float):
+        import cProfile
+
+        super().__init__(seconds)
+        self.profiler = cProfile.Profile()
+        self.attached = False
+        self._state = threading.Lock()  # orders attach/detach against stop()
+        self._detached = threading.Event()
+
+    def tick(self) -> None:
+        """Poll thread only: attach on the first tick, detach after stop()."""
+        global _cprofile
+        with self._state:
+            if self._detached.is_set():
+                return
+            if self._done.is_set():
+                if self.attached:
+                    self.profiler.disable()
+                _cprofile = None
+                self._detached.set()
+            elif not self.attached:
+                self.profiler.enable()
+                self.attached = True
+
+    def _finish(self) -> None:
+        global _cprofile
+        with self._state:
+            if not self.attached:
+                _cprofile = None
+                self._detached.set()
+        if not self._detached.wait(timeout=5) or not self.attached:
+            _publish("profile", {"mode": self.mode, "error": "poll thread not running"})
+            return
+        import io
+        import pstats
+
+        path = _output_path("profile", "prof")
+        self.profiler.dump_stats(path)  # open with snakeviz or `python -m pstats`
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)
+        top = [
+            [f"{os.path.basename(fn)}:{line}:{name}", calls, round(1000 * cum, 3)]
+            for (fn, line, name), (_, calls, _, cum, _) in rows[:15]
+        ]
+        _publish(
+            "profile",
+            {
+                "mode": self.mode,
+                "file": path,
+                "seconds": round(time.monotonic() - self.started, 1),
+                "top": top,  # [function, calls, cumulative ms]
+            },
+        )
+
+
+def checkpoint() -> None:
+    """Called once per poll-thread tick; a single global read unless cProfile is on."""
+    session = _cprofile
+    if session is not None:
+        session.tick()
+
+
+def start_profile(seconds: float, mode: str = "sample", interval_ms: float = 5.0) -> str:
+    global _session, _cprofile
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"unknown profile mode {mode!r} (expected one of {PROFILE_MODES})")
+    seconds = min(max(seconds, 0.1), snapshot().diagnostics.max_seconds)
+    with _lock:
+        if _session is not None:
+            return "busy"
+        session: _Session
+        if mode == "cprofile":
+            session = _cprofile = _CProfileSession(seconds)
+        else:
+            session = _SampleSession(seconds, max(interval_ms, 1.0) / 1000)
+        _session = session
+    session.start()
+    print(f"[DIAG] {mode} profile for {seconds:g}s")
+    return "queued"
+
+
+def stop_profile() -> str:
+    session = _session
+    if session is None:
+        return "cancelled"
+    # Not on the calling thread: a cProfile session waits for the poll thread to detach
+    threading.Thread(target=session.stop, name="diag-stop", daemon=True).start()
+    return "cancelled"
+
+
+# === Memory ===
+def memory_start(frames: int = 1) -> str:
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(frames, 1))
+        print(f"[DIAG] tracemalloc started ({frames} frame(s))")
+    return "queued"
+
+
+def memory_snapshot(top: int = 20) -> str:
+    global _last_memory
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return "bad_payload"  # nothing traced yet: memory/start first
+    snap = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    stats = snap.statistics("lineno")
+    growth = snap.compare_to(_last_memory, "lineno") if _last_memory is not None else []
+    _last_memory = snap
+
+    def row(stat) -> list[Any]:
+        frame = stat.traceback[0]
+        return [f"{frame.filename}:{frame.lineno}", stat.size, stat.count]
+
+    path = _output_path("memory", "txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"traced {current} B, peak {peak} B\n\n# top allocators\n")
+        f.writelines(f"{s}\n" for s in stats[:200])
+        if growth:
+            f.write("\n# growth since the previous snapshot\n")
+            f.writelines(f"{s}\n" for s in growth[:200])
+    _publish(
+        "memory",
+        {
+            "file": path,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [row(s) for s in stats[:top]],  # [location, bytes, blocks]
+            "growth": [row(s) + [s.size_diff] for s in growth[:top] if s.size_diff],
+        },
+    )
+    return "queued"
+
+
+def memory_stop() -> str:
+    global _last_memory
+    import tracemalloc
+
+    tracemalloc.stop()
+    _last_memory = None
+    return "cancelled"
+
+
+# === Threads and counters ===
+def dump_threads() -> str:
+    import traceback
+
+    frames = sys._current_frames()
+    path = _output_path("threads", "txt")
+    summary: dict[str, str] = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for t in threading.enumerate():
+            frame = frames.get(t.ident)
+            if frame is None:
+                continue
+            f.write(f'Thread "{t.name}" ident={t.ident} daemon={t.daemon}\n')
+            f.writelines(traceback.format_stack(frame))
+            f.write("\n")
+            summary[t.name] = _frame_label(frame.f_code)
+    _publish("threads", {"file": path, "count": len(summary), "threads": summary})
+    return "queued"
+
+
+def publish_stats() -> str:
+    from utils import mqtt_output, plugins
+
+    _publish(
+        "stats",
+        {
+            "threads": threading.active_count(),
+            "lanes": mqtt_output.lane_stats(),
+            "brokers": mqtt_output.broker_stats(),
+            "plugins": plugins.stats(),
+        },
+    )
+    return "queued"
+
+
+# === Worker ===
+def _submit(action: str, fn, *args) -> None:
+    """Queue fn(*args) for the worker thread, starting it on first use."""
+    global _jobs
+    with _lock:
+        if _jobs is None:
+            _jobs = queue.SimpleQueue()
+            threading.Thread(target=_worker, args=(_jobs,), name="diag-worker", daemon=True).start()
+        _jobs.put((action, fn, args))
+
+
+def _worker(jobs: queue.SimpleQueue) -> None:
+    while True:
+        action, fn, args = jobs.get()
+        try:
+            if fn(*args) == "bad_payload":
+                print(f"[DIAG] {action}: nothing to report")
+        except OSError as e:
+            print(f"[DIAG] {action}: cannot write results: {e}")
+        except Exception as e:  # keep the worker alive for the next command
+            print(f"[DIAG] {action} failed: {e!r}")
+
+
+def _queue(action: str, payload: Any) -> str:
+    global _memory_on
+    if action == "memory/start":
+        args: tuple = (int(_opt(payload, "frames", 1)),)
+        _memory_on = True
+        fn = memory_start
+    elif action == "memory/snapshot":
+        args = (int(_opt(payload, "top", 20)),)
+        if not _memory_on:
+            return "bad_payload"  # nothing traced yet: memory/start first
+        fn = memory_snapshot
+    elif action == "memory/stop":
+        args, fn = (), memory_stop
+        _memory_on = False
+    elif action == "threads":
+        args, fn = (), dump_threads
+    else:
+        args, fn = (), publish_stats
+    _submit(action, fn, *args)
+    return "cancelled" if action == "memory/stop" else "queued"
+
+
+def handle(action: str, payload: Any) -> str:
+    """Run one $diag action; returns a command_router result code.
+
+    Called on the MQTT network thread, so anything that walks the heap or stacks,
+    or writes files, is handed to the worker thread and reported from there.
+    """
+    if not snapshot().diagnostics.enabled:
+        return "unmapped"
+    try:
+        if action == "profile":
+            return start_profile(
+                _opt(payload, "seconds", 30.0),
+                _opt(payload, "mode", "sample"),
+                _opt(payload, "interval_ms", 5.0),
+            )
+        if action == "profile/stop":
+            return stop_profile()
+        if action in ("memory/start", "memory/snapshot", "memory/stop", "threads", "stats"):
+            return _queue(action, payload)
+    except (TypeError, ValueError) as e:
+        print(f"[DIAG] {action}: bad payload: {e}")
+        return "bad_payload"
+    return "unmapped"
@@ -0,0 +1,55 @@
+# utils/focus.py
+# SPDX-License-Identifier: MIT
+"""
+Cached foreground-process tracking.
+The OS backend is injected so the tracker (and anything using it) runs on Linux
+with stand-ins; utils.win_focus provides the real Win32 backend.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+
+class ForegroundTracker:
+    """
+    Remembers which process owns the foreground window.
+    Each check asks only for the foreground window handle (one cheap call);
+    pid/name resolution happens again only when that handle changes.
+    """
+
+    def __init__(
+        self,
+        window_fn: Callable[[], int | None],
+        pid_fn: Callable[[int], int | None],
+        name_fn: Callable[[int], str | None],
+    ):
+        self._window_fn = window_fn
+        self._pid_fn = pid_fn
+        self._name_fn = name_fn
+        # (hwnd, name) swapped as one object so concurrent readers never see a mixed pair
+        self._cached: tuple[int | None, str | None] = (None, None)
+
+    def foreground_name(self) -> str | None:
+        hwnd = self._window_fn() or None
+        cached_hwnd, name = self._cached
+        if hwnd != cached_hwnd:
+            name = self._resolve(hwnd)
+            self._cached = (hwnd, name)
+        return name
+
+    def _resolve(self, hwnd: int | None) -> str | None:
+        if not hwnd:
+            return None
+        pid = self._pid_fn(hwnd)
+        if not pid:
+            return None
+        name = self._name_fn(pid)
+        return name.lower() if name else None
+
+    def is_foreground(self, process_name: str) -> bool:
+        name = self.foreground_name()
+        return name is not None and name == process_name.lower()
+
+    def invalidate(self) -> None:
+        self._cached = (None, None)
@@ -0,0 +1,41 @@
+# utils/headless.py
+# SPDX-License-Identifier: MIT
+"""
+Headless backends for hosts without Win32 input (Linux, Proton, CI, servers).
+Telemetry runs normally; inbound commands are routed and logged but no keys are sent.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+from utils.config import snapshot
+
+HEADLESS_ENV = "ELITE_HEADLESS"
+
+
+def is_headless() -> bool:
+    """True off-Windows, with general.headless = true, or with ELITE_HEADLESS=1."""
+    if os.getenv(HEADLESS_ENV) == "1" or sys.platform != "win32":
+        return True
+    return bool(snapshot().general.headless)
+
+
+class HeadlessFocus:
+    """No window system to ask: treat the game as foreground so routing can be exercised."""
+
+    def is_foreground(self, process_name: str) -> bool:
+        return True
+
+
+class LoggingKeys:
+    """Input backend that only logs what would have been pressed."""
+
+    def key_down(self, key: str) -> bool:
+        print(f"[HEADLESS] key down '{key}'")
+        return True
+
+    def key_up(self, key: str) -> bool:
+        print(f"[HEADLESS] key up '{key}'")
+        return True
@@ -0,0 +1,242 @@
+# utils/input_scheduler.py
+# SPDX-License-Identifier: MIT
+"""
+Input scheduler: runs key presses off the MQTT network thread.
+- Commands become Jobs (a list of down/up/wait steps) on a bounded priority queue
+- A single worker thread executes them; submit() never blocks
+- Payloads can describe holds, repeats, chords and timed macro sequences
+- Jobs can be cancelled by topic (queued or mid-hold; held keys are released)
+
+Payload forms (anything that isn't a dict is a plain press of the mapped key):
+    {"action": "press", "hold_ms": 80}
+    {"action": "hold", "hold_ms": 1500}
+    {"action": "repeat", "count": 3, "interval_ms": 150}
+    {"action": "chord", "keys": ["g", "l"], "hold_ms": 100}
+    {"sequence": [{"action": "press"}, {"delay_ms": 500}, {"action": "press", "key": "l"}]}
+    {"action": "cancel"}                  # cancel pending/active jobs for this topic
+    any of the above + {"priority": 0..9}  # lower runs first (default 5)
+"""
+
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+from collections.abc import Callable, Collection
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+DEFAULT_HOLD_MS = 80
+DEFAULT_PRIORITY = 5
+MAX_HOLD_MS = 10_000
+MAX_REPEAT = 50
+MAX_STEPS = 200
+
+Step = tuple[str, Any]  # ("down", key) | ("up", key) | ("wait", ms)
+
+
+class InputBackend(Protocol):
+    def key_down(self, key: str) -> bool: ...
+
+    def key_up(self, key: str) -> bool: ...
+
+
+class PayloadError(ValueError):
+    """Raised when a command payload cannot be turned into a job."""
+
+
+_counter = itertools.count()
+
+
+@dataclass(order=True)
+class Job:
+    priority: int
+    order: int
+    topic: str = field(compare=False)
+    steps: list[Step] = field(compare=False)
+    cancelled: threading.Event = field(compare=False, default_factory=threading.Event)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+
+def _clamp_ms(value: Any, default: int) -> int:
+    try:
+        ms = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(ms, 1), MAX_HOLD_MS)
+
+
+def _keys_for(spec: dict[str, Any], default_key: str, allowed: Collection[str] | None) -> list[str]:
+    keys = spec.get("keys") or [spec.get("key") or default_key]
+    if isinstance(keys, str):
+        keys = [keys]
+    for k in keys:
+        if not isinstance(k, str) or not k:
+            raise PayloadError(f"bad key {k!r}")
+        if allowed is not None and k != default_key and k not in allowed:
+            raise PayloadError(f"key {k!r} is not in the keymap")
+    return list(keys)
+
+
+def _tap(keys: list[str], hold_ms: int) -> list[Step]:
+    return [("down", k) for k in keys] + [("wait", hold_ms)] + [("up", k) for k in reversed(keys)]
+
+
+def _steps_for(spec: dict[str, Any], default_key: str, allowed: Collection[str] | None):
+    if "delay_ms" in spec and "action" not in spec:
+        return [("wait", _clamp_ms(spec["delay_ms"], 0))]
+    action = spec.get("action", "press")
+    keys = _keys_for(spec, default_key, allowed)
+    if action in ("press", "chord", "hold"):
+        hold = _clamp_ms(spec.get("hold_ms"), 500 if action == "hold" else DEFAULT_HOLD_MS)
+        return _tap(keys, hold)
+    if action == "repeat":
+        try:
+            count = min(max(int(spec.get("count", 2)), 1), MAX_REPEAT)
+        except (TypeError, ValueError) as e:
+            raise PayloadError(f"bad count {spec.get('count')!r}") from e
+        one = _tap(keys, _clamp_ms(spec.get("hold_ms"), DEFAULT_HOLD_MS))
+        gap = _clamp_ms(spec.get("interval_ms"), 100)
+        steps: list[Step] = []
+        for i in range(count):
+            if i:
+                steps.append(("wait", gap))
+            steps.extend(one)
+        return steps
+    raise PayloadError(f"unknown action {action!r}")
+
+
+def build_job(
+    topic: str, key: str, payload: Any, allowed_keys: Collection[str] | None = None
+) -> Job:
+    """Compile a command payload into a Job. Raises PayloadError on bad input."""
+    spec: dict[str, Any] = payload if isinstance(payload, dict) else {}
+    try:
+        priority = min(max(int(spec.get("priority", DEFAULT_PRIORITY)), 0), 9)
+    except (TypeError, ValueError):
+        priority = DEFAULT_PRIORITY
+    if "sequence" in spec:
+        seq = spec["sequence"]
+        if not isinstance(seq, list):
+            raise PayloadError("'sequence' must be a list")
+        steps: list[Step] = []
+        for item in seq:
+            if not isinstance(item, dict):
+                raise PayloadError(f"bad sequence item {item!r}")
+            steps.extend(_steps_for(item, key, allowed_keys))
+    else:
+        steps = _steps_for(spec, key, allowed_keys)
+    if len(steps) > MAX_STEPS:
+        raise PayloadError(f"macro too long ({len(steps)} steps)")
+    return Job(priority, next(_counter), topic, steps)
+
+
+class InputScheduler:
+    """Single worker that executes Jobs in priority order."""
+
+    def __init__(
+        self,
+        backend: InputBackend,
+        maxsize: int = 64,
+        guard: Callable[[], bool] | None = None,
+    ):
+        self._backend = backend
+        self._guard = guard
+        self._q: queue.PriorityQueue[Job] = queue.PriorityQueue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._live: dict[int, Job] = {}  # queued or running, for cancel()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def set_guard(self, guard: Callable[[], bool] | None) -> None:
+        """guard() is checked right before each job runs (e.g. foreground check)."""
+        self._guard = guard
+
+    def submit(self, job: Job) -> bool:
+        """Enqueue without blocking. Returns False when the queue is full."""
+        with self._lock:
+            self._live[job.order] = job
+        try:
+            self._q.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._live.pop(job.order, None)
+            return False
+        return True
+
+    def cancel(self, topic: str | None = None) -> int:
+        """Cancel queued and running jobs for topic (all jobs if None)."""
+        with self._lock:
+            hits = [j for j in self._live.values() if topic is None or j.topic == topic]
+        for job in hits:
+            job.cancel()
+        return len(hits)
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    def run_once(self, timeout: float | None = 0.5) -> bool:
+        """Execute the next job (blocking up to timeout). Returns False if none ran."""
+        try:
+            job = self._q.get(timeout=timeout) if timeout else self._q.get_nowait()
+        except queue.Empty:
+            return False
+        try:
+            if job.cancelled.is_set():
+                return False
+            if self._guard is not None and not self._guard():
+                print(f"[INPUT] {job.topic} -> guard failed; dropping job")
+                return False
+            return self._execute(job)
+        finally:
+            with self._lock:
+                self._live.pop(job.order, None)
+
+    def _execute(self, job: Job) -> bool:
+        held: list[str] = []
+        ok = True
+        try:
+            for op, arg in job.steps:
+                if job.cancelled.is_set():
+                    print(f"[INPUT] {job.topic} -> cancelled")
+                    return False
+                if op == "wait":
+                    job.cancelled.wait(arg / 1000.0)
+                elif op == "down":
+                    if self._backend.key_down(arg):
+                        held.append(arg)
+                    else:
+                        ok = False
+                        break
+                elif op == "up" and arg in held:
+                    held.remove(arg)
+                    ok = self._backend.key_up(arg) and ok
+        finally:
+            # Never leave a key stuck down (cancel, error or failed step)
+            for key in reversed(held):
+                self._backend.key_up(key)
+        return ok
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once(timeout=0.5)
+            except Exception as e:
+                print(f"[INPUT] Job failed: {e}")
+        print("[INPUT] Scheduler thread exit")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="input-sched", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
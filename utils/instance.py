@@ -0,0 +1,113 @@
+# utils/instance.py
+# SPDX-License-Identifier: MIT
+"""
+Watched game instances (one per commander / Saved Games directory).
+- Single mode: one default instance that follows general.elite_dir and
+  publishes to <base>/events/<type> as before (or <base>/<cmdr>/events/<type>
+  when general.cmdr is set, e.g. for squadron aggregation)
+- Multi mode ([[instances]] in config.toml): one Instance per directory,
+  each with its own parser state, published under <base>/<cmdr>/events/<type>
+All instances share the observer, the journal poller thread and the MQTT client.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+import threading
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from utils.config import snapshot
+
+T = TypeVar("T")
+
+_TOPIC_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+@functools.lru_cache(maxsize=64)
+def topic_namespace(name: str) -> str:
+    """Make a commander name safe for one MQTT topic level ('CMDR Jo/3' -> 'CMDR_Jo_3')."""
+    return _TOPIC_UNSAFE.sub("_", name.strip()).strip("_")
+
+
+class Instance:
+    """One watched directory plus the per-module parser state that goes with it."""
+
+    def __init__(self, name: str = "", elite_dir: str | None = None, watch_mode: str = ""):
+        self.name = name
+        self._watch_mode = watch_mode
+        self._ns = topic_namespace(name) if name else None
+        self._dir = os.path.normpath(elite_dir) if elite_dir else None
+        self._state: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ns(self) -> str:
+        """Topic namespace ('' publishes to the un-namespaced <base>/events/...)."""
+        if self._ns is not None:
+            return self._ns
+        return topic_namespace(snapshot().general.cmdr)
+
+    @property
+    def elite_dir(self) -> str:
+        # The default instance follows general.elite_dir across config reloads
+        if self._dir is not None:
+            return self._dir
+        return os.path.normpath(snapshot().general.elite_dir)
+
+    @property
+    def watch_mode(self) -> str:
+        """auto | watchdog | poll (per-instance override, else general.watch_mode)."""
+        return self._watch_mode or snapshot().general.watch_mode
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.elite_dir, filename)
+
+    def state(self, key: str, factory: Callable[[], T]) -> T:
+        """Per-instance state object for a module (created on first use)."""
+        st = self._state.get(key)
+        if st is None:
+            with self._lock:
+                st = self._state.setdefault(key, factory())
+        return st
+
+    def label(self, tag: str) -> str:
+        """Log prefix, e.g. '[JOURNAL]' or '[JOURNAL:Alpha]'."""
+        return f"[{tag}:{self.name}]" if self.name else f"[{tag}]"
+
+    def __repr__(self) -> str:
+        return f"Instance({self.name!r}, {self.elite_dir!r})"
+
+
+_default = Instance()
+
+
+def default_instance() -> Instance:
+    return _default
+
+
+def configured_instances() -> list[Instance]:
+    """Instances from [[instances]] in config.toml, or just the default one."""
+    entries = snapshot().instances
+    if not entries:
+        return [_default]
+    result: list[Instance] = []
+    seen_ns: set[str] = set()
+    seen_dirs: set[str] = set()
+    for i, entry in enumerate(entries):
+        name = str(entry.get("cmdr") or f"cmdr{i + 1}")
+        elite_dir = entry.get("elite_dir")
+        if not elite_dir:
+            raise RuntimeError(f"[[instances]] entry {name!r} is missing 'elite_dir'")
+        inst = Instance(name, elite_dir, str(entry.get("watch_mode") or ""))
+        if inst.ns in seen_ns:
+            raise RuntimeError(f"[[instances]] duplicate commander name {name!r}")
+        key = os.path.normcase(inst.elite_dir)
+        if key in seen_dirs:
+            raise RuntimeError(f"[[instances]] directory watched twice: {inst.elite_dir}")
+        seen_ns.add(inst.ns)
+        seen_dirs.add(key)
+        result.append(inst)
+    return result
@@ -0,0 +1,384 @@
+# utils/journal_archive.py
+# SPDX-License-Identifier: MIT
+"""
+Seekable compressed archive for closed Journal*.log files.
+- journals.blk: whole journal lines packed into independently compressed blocks
+  (zlib or lzma, stdlib only); a line never spans two blocks
+- journals.idx: sidecar JSON index; per archived file its block range, and per block
+  its offset, sizes, CRC, first/last timestamp and the event types inside
+- Reads pick blocks by time range and event type from the index and decompress
+  only those, so a query over one evening of a multi-year history touches a
+  handful of blocks
+- pack() appends; the index is replaced atomically after the data is synced, and
+  bytes past the last indexed block (an interrupted pack) are truncated away
+
+    python -m utils.journal_archive pack [--delete]        # archive closed journals
+    python -m utils.journal_archive query --since 2024-03-01 --events FSDJump
+    python -m utils.journal_archive stats
+"""
+
+from __future__ import annotations
+
+import json
+import lzma
+import os
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+INDEX_VERSION = 1
+DATA_NAME = "journals.blk"
+INDEX_NAME = "journals.idx"
+CODECS = ("zlib", "lzma")
+
+# Block tuple fields in the index
+B_OFFSET, B_CLEN, B_RLEN, B_CRC, B_T0, B_T1, B_CODEC, B_EVENTS = range(8)
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    if codec == "lzma":
+        return lzma.compress(data, preset=level)
+    raise ValueError(f"unknown archive codec {codec!r} (expected one of {CODECS})")
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    return zlib.decompress(data) if codec == "zlib" else lzma.decompress(data)
+
+
+def _line_meta(line: bytes) -> tuple[str, str]:
+    """(timestamp, event) of one journal line; ("", "") if it is not JSON."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return "", ""
+    return str(entry.get("timestamp") or ""), str(entry.get("event") or "")
+
+
+def closed_journals(elite_dir: str, min_age_s: float = 3600.0) -> list[str]:
+    """Journals the game is done with: all but the newest, untouched for min_age_s."""
+    names = sorted(
+        f for f in os.listdir(elite_dir) if f.startswith("Journal") and f.endswith(".log")
+    )
+    cutoff = time.time() - min_age_s
+    paths = [os.path.join(elite_dir, n) for n in names[:-1]]
+    return [p for p in paths if os.path.getmtime(p) < cutoff]
+
+
+class JournalArchive:
+    """One archive directory (journals.blk + journals.idx)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_NAME)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.blocks_read = 0  # decompressed by queries, for stats/tests
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {"version": INDEX_VERSION, "events": [], "files": [], "blocks": []}
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"{self.index_path}: index v{index.get('version')}, expected v1")
+        self.events: list[str] = index["events"]
+        self.files: list[dict[str, Any]] = index["files"]
+        self.blocks: list[list[Any]] = index["blocks"]
+        self._event_ids = {name: i for i, name in enumerate(self.events)}
+
+    def __contains__(self, name: str) -> bool:
+        return any(f["name"] == name for f in self.files)
+
+    @property
+    def data_end(self) -> int:
+        if not self.blocks:
+            return 0
+        last = self.blocks[-1]
+        return last[B_OFFSET] + last[B_CLEN]
+
+    # --- writing ---
+    def pack(
+        self,
+        paths: Iterable[str],
+        codec: str = "zlib",
+        level: int = 9,
+        block_bytes: int = 256 * 1024,
+        delete: bool = False,
+    ) -> list[str]:
+        """Append journals not archived yet; returns the names added."""
+        todo = [p for p in sorted(paths, key=os.path.basename) if os.path.basename(p) not in self]
+        if not todo:
+            return []
+        _compress(b"", codec, level)  # reject a bad codec before touching anything
+        os.makedirs(self.directory, exist_ok=True)
+        added: list[tuple[str, int]] = []
+        with open(self.data_path, "ab+") as out:
+            out.truncate(self.data_end)  # drop the tail of an interrupted pack
+            out.seek(self.data_end)
+            for path in todo:
+                self._pack_file(out, path, codec, level, block_bytes)
+                added.append((path, self.files[-1]["crc"]))
+            out.flush()
+            os.fsync(out.fileno())
+        self.files.sort(key=lambda f: f["name"])
+        self._save()
+        if delete:
+            for path, crc in added:
+                self._delete_verified(path, crc)
+        return [os.path.basename(p) for p, _ in added]
+
+    def _pack_file(self, out, path: str, codec: str, level: int, block_bytes: int) -> None:
+        name = os.path.basename(path)
+        first = len(self.blocks)
+        file_crc = 0
+        size = 0
+        chunk: list[bytes] = []
+        chunk_len = 0
+        t0 = t1 = ""
+        event_ids: set[int] = set()
+
+        def flush() -> None:
+            nonlocal chunk, chunk_len, t0, t1, event_ids
+            raw = b"".join(chunk)
+            packed = _compress(raw, codec, level)
+            offset = out.tell()
+            out.write(packed)
+            self.blocks.append(
+                [offset, len(packed), len(raw), zlib.crc32(raw), t0, t1, codec, sorted(event_ids)]
+            )
+            chunk, chunk_len, t0, t1, event_ids = [], 0, "", "", set()
+
+        with open(path, "rb") as f:
+            for line in f:
+                file_crc = zlib.crc32(line, file_crc)
+                size += len(line)
+                ts, event = _line_meta(line)
+                if ts:
+                    t0 = min(t0, ts) if t0 else ts
+                    t1 = max(t1, ts)
+                if event:
+                    eid = self._event_ids.get(event)
+                    if eid is None:
+                        eid = self._event_ids[event] = len(self.events)
+                        self.events.append(event)
+                    event_ids.add(eid)
+                chunk.append(line)
+                chunk_len += len(line)
+                if chunk_len >= block_bytes:
+                    flush()
+        if chunk:
+            flush()
+        blocks = self.blocks[first:]
+        starts = [b[B_T0] for b in blocks if b[B_T0]]
+        self.files.append(
+            {
+                "name": name,
+                "size": size,
+                "crc": file_crc,
+                "first_block": first,
+                "block_count": len(blocks),
+                "t0": min(starts) if starts else "",
+                "t1": max((b[B_T1] for b in blocks), default=""),
+            }
+        )
+
+    def _save(self) -> None:
+        index = {
+            "version": INDEX_VERSION,
+            "events": self.events,
+            "files": self.files,
+            "blocks": self.blocks,
+        }
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    def _delete_verified(self, path: str, crc: int) -> None:
+        """Remove an original only if the archive gives back exactly its bytes."""
+        name = os.path.basename(path)
+        entry = next(f for f in self.files if f["name"] == name)
+        check = 0
+        for raw in self._read_blocks(
+            range(entry["first_block"], entry["first_block"] + entry["block_count"])
+        ):
+            check = zlib.crc32(raw, check)
+        if check == crc == entry["crc"]:
+            os.remove(path)
+        else:
+            print(f"[ARCHIVE] {name}: verification failed; original kept")
+
+    # --- reading ---
+    def _read_blocks(self, indices: Iterable[int]) -> Iterator[bytes]:
+        indices = list(indices)
+        if not indices:
+            return
+        if not os.path.exists(self.data_path):
+            # An archive dir that was never packed (or lost its data file) reads as empty
+            print(f"[ARCHIVE] {self.data_path} is missing; {len(indices)} block(s) skipped")
+            return
+        with open(self.data_path, "rb") as f:
+            for i in indices:
+                block = self.blocks[i]
+                f.seek(block[B_OFFSET])
+                raw = _decompress(f.read(block[B_CLEN]), block[B_CODEC])
+                if zlib.crc32(raw) != block[B_CRC]:
+                    raise ValueError(f"{self.data_path}: block {i} is corrupt")
+                self.blocks_read += 1
+                yield raw
+
+    def select(
+        self,
+        since: str | None = None,
+        until: str | None = None,
+        events: Iterable[str] | None = None,
+    ) -> list[int]:
+        """Indices of the blocks that may hold matching lines, in journal order."""
+        wanted = None
+        if events is not None:
+            wanted = {self._event_ids[e] for e in events if e in self._event_ids}
+            if not wanted:
+                return []
+        picked = []
+        for f in self.files:
+            if (since and f["t1"] and f["t1"] < since) or (until and f["t0"] and f["t0"] > until):
+                continue
+            for i in range(f["first_block"], f["first_block"] + f["block_count"]):
+                block = self.blocks[i]
+                if since and block[B_T1] and block[B_T1] < since:
+                    continue
+                if until and block[B_T0] and block[B_T0] > until:
+                    continue
+                if wanted is not None and wanted.isdisjoint(block[B_EVENTS]):
+                    continue
+                picked.append(i)
+        return picked
+
+    def iter_entries(
+        self,
+        since: str | None = None,
+        until: str | None = None,
+        events: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
+        """
+        Parsed journal entries, oldest first. since/until compare against the ISO
+        "timestamp" strings (a prefix such as "2024-03-01" works; until is inclusive
+        of anything starting with it).
+        """
+        wanted = set(events) if events is not None else None
+        upper = until + "\uffff" if until else None
+        for raw in self._read_blocks(self.select(since, upper, wanted)):
+            for line in raw.splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if wanted is not None and entry.get("event") not in wanted:
+                    continue
+                ts = entry.get("timestamp", "")
+                if (since and ts < since) or (upper and ts > upper):
+                    continue
+                yield entry
+
+    def stats(self) -> dict[str, Any]:
+        raw = sum(f["size"] for f in self.files)
+        packed = self.data_end
+        return {
+            "files": len(self.files),
+            "blocks": len(self.blocks),
+            "raw_bytes": raw,
+            "archived_bytes": packed,
+            "ratio": round(raw / packed, 2) if packed else None,
+            "first": self.files[0]["t0"] if self.files else None,
+            "last": self.files[-1]["t1"] if self.files else None,
+        }
+
+
+def iter_journal_entries(files: Iterable[str]) -> Iterator[dict]:
+    """Parsed entries of plain Journal*.log files, in the order given."""
+    for path in files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def history(
+    files: Iterable[str],
+    archive: JournalArchive | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    events: Iterable[str] | None = None,
+) -> Iterator[dict]:
+    """
+    Archived entries, then those from journals the archive does not hold, oldest first.
+    events is a hint: archive blocks without any of them are skipped, and the caller
+    still filters. since/until are ISO timestamps or prefixes (until inclusive).
+    """
+    live = list(files)
+    if archive is not None:
+        yield from archive.iter_entries(since, until, events)
+        live = [p for p in live if os.path.basename(p) not in archive]
+    if since is None and until is None:
+        yield from iter_journal_entries(live)
+        return
+    upper = until + "\uffff" if until else None
+    for entry in iter_journal_entries(live):
+        ts = entry.get("timestamp", "")
+        if (since and ts < since) or (upper and ts > upper):
+            continue
+        yield entry
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    from utils.config import load_config, snapshot
+
+    ap = argparse.ArgumentParser(prog="journal_archive", description=__doc__.split("\n")[1])
+    ap.add_argument("command", choices=("pack", "query", "stats"))
+    ap.add_argument("--config", default="config.toml", help="path to config.toml")
+    ap.add_argument("--dir", help="journal directory (default: general.elite_dir)")
+    ap.add_argument("--archive", help="archive directory (default: archive.dir)")
+    ap.add_argument("--delete", action="store_true", help="pack: remove verified originals")
+    ap.add_argument("--since", help="query: ISO timestamp or prefix, e.g. 2024-03-01")
+    ap.add_argument("--until", help="query: ISO timestamp or prefix (inclusive)")
+    ap.add_argument("--events", help="query: comma-separated event types")
+    args = ap.parse_args(argv)
+
+    load_config(args.config)
+    cfg = snapshot().archive
+    try:
+        archive = JournalArchive(args.archive or cfg.dir)
+        if args.command == "pack":
+            files = closed_journals(args.dir or snapshot().general.elite_dir, cfg.min_age_s)
+            added = archive.pack(
+                files,
+                cfg.codec,
+                cfg.level,
+                int(cfg.block_kb) * 1024,
+                delete=args.delete or cfg.delete_originals,
+            )
+            print(f"[ARCHIVE] Packed {len(added)} journal(s); {archive.stats()}")
+        elif args.command == "query":
+            events = [e.strip() for e in args.events.split(",")] if args.events else None
+            for entry in archive.iter_entries(args.since, args.until, events):
+                print(json.dumps(entry, ensure_ascii=False))
+        else:
+            print(json.dumps(archive.stats(), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"[ARCHIVE] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
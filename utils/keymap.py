@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import pathlib
+import time
 from typing import Any
 
 from utils.config import get
+from utils.topics import TopicTrie
 
 try:
     import tomllib  # py311+
@@ -15,6 +17,11 @@ except ModuleNotFoundError:
 _CACHE: dict[str, str] | None = None
 _MTIME: float | None = None
 
+# Compiled topic trie + how often we stat keymap.toml for hot reload
+_TRIE: TopicTrie | None = None
+_CHECKED_AT = 0.0
+RELOAD_CHECK_S = 1.0
+
 
 def _read_bytes_strip_bom(p: pathlib.Path) -> bytes:
     data = p.read_bytes()
@@ -23,13 +30,24 @@ def _read_bytes_strip_bom(p: pathlib.Path) -> bytes:
     return data
 
 
+def _keymap_path() -> pathlib.Path:
+    return pathlib.Path(get("general.keymap_file", "keymap.toml"))
+
+
+def _mtime(path: pathlib.Path) -> float | None:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
 def load_keymap(force: bool = False) -> dict[str, str]:
-    global _CACHE, _MTIME
+    global _CACHE, _MTIME, _TRIE
     if not force and _CACHE is not None:
         return _CACHE
-    path = pathlib.Path(get("general.keymap_file", "keymap.toml"))
+    path = _keymap_path()
     if not path.exists():
-        _CACHE, _MTIME = {}, None
+        _CACHE, _MTIME, _TRIE = {}, None, None
         return _CACHE
     mt = path.stat().st_mtime
     if not force and mt == _MTIME and _CACHE is not None:
@@ -42,9 +60,40 @@ def load_keymap(force: bool = False) -> dict[str, str]:
     result: dict[str, str] = {
         topic: key for topic, key in km.items() if isinstance(key, str) and key
     }
-    _CACHE, _MTIME = result, mt
+    _CACHE, _MTIME, _TRIE = result, mt, None
     return result
 
 
+def compiled_keymap() -> TopicTrie:
+    """
+    Keymap compiled into a wildcard-aware topic trie.
+    keymap.toml is stat'ed at most once per RELOAD_CHECK_S and recompiled when it
+    changes; a broken edit keeps the previous mapping.
+    """
+    global _TRIE, _CHECKED_AT
+    now = time.monotonic()
+    if _TRIE is not None and now - _CHECKED_AT < RELOAD_CHECK_S:
+        return _TRIE
+    _CHECKED_AT = now
+    if _TRIE is not None and _mtime(_keymap_path()) == _MTIME:
+        return _TRIE
+    try:
+        km = load_keymap(force=_TRIE is not None)
+    except Exception as e:
+        if _TRIE is None:
+            raise
+        print(f"[KEYMAP] Reload failed, keeping previous mapping: {e}")
+        return _TRIE
+    if _TRIE is not None:
+        print(f"[KEYMAP] Reloaded ({len(km)} mappings)")
+    _TRIE = TopicTrie(km)
+    return _TRIE
+
+
+def allowed_keys() -> frozenset[str]:
+    """Every key the keymap may press (macros may only use these)."""
+    return frozenset(load_keymap().values())
+
+
 def resolve(topic: str) -> str | None:
-    return load_keymap().get(topic)
+    return compiled_keymap().lookup(topic)
@@ -3,10 +3,9 @@
 from __future__ import annotations
 
 import ctypes
+import functools
 import time
-
-user32 = ctypes.WinDLL("user32", use_last_error=True)
-kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+from types import SimpleNamespace
 
 # ---- Win32 constants
 INPUT_KEYBOARD = 1
@@ -26,27 +25,39 @@ ULONG_PTR = ctypes.c_size_t
 DWORD = ctypes.c_uint32
 WORD = ctypes.c_ushort
 
-# MapVirtualKeyW setup
-MapVirtualKeyW = user32.MapVirtualKeyW
-MapVirtualKeyW.argtypes = (UINT := ctypes.c_uint, UINT)
-MapVirtualKeyW.restype = UINT
-
-# SendInput setup
-SendInput = user32.SendInput
-SendInput.argtypes = (UINT, ctypes.c_void_p, ctypes.c_int)
-SendInput.restype = UINT
-
-FormatMessageW = kernel32.FormatMessageW
-FormatMessageW.argtypes = (
-    DWORD,
-    ctypes.c_void_p,
-    DWORD,
-    DWORD,
-    ctypes.c_wchar_p,
-    DWORD,
-    ctypes.c_void_p,
-)
-FormatMessageW.restype = DWORD
+UINT = ctypes.c_uint
+
+
+@functools.cache
+def _win32() -> SimpleNamespace:
+    """Bind user32/kernel32 on first use so importing this module works anywhere."""
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    # MapVirtualKeyW setup
+    MapVirtualKeyW = user32.MapVirtualKeyW
+    MapVirtualKeyW.argtypes = (UINT, UINT)
+    MapVirtualKeyW.restype = UINT
+
+    # SendInput setup
+    SendInput = user32.SendInput
+    SendInput.argtypes = (UINT, ctypes.c_void_p, ctypes.c_int)
+    SendInput.restype = UINT
+
+    FormatMessageW = kernel32.FormatMessageW
+    FormatMessageW.argtypes = (
+        DWORD,
+        ctypes.c_void_p,
+        DWORD,
+        DWORD,
+        ctypes.c_wchar_p,
+        DWORD,
+        ctypes.c_void_p,
+    )
+    FormatMessageW.restype = DWORD
+    return SimpleNamespace(
+        MapVirtualKeyW=MapVirtualKeyW, SendInput=SendInput, FormatMessageW=FormatMessageW
+    )
 
 
 class KEYBDINPUT(ctypes.Structure):
@@ -91,39 +102,52 @@ def _last_error_msg() -> str:
     #    FM_ALLOCATE_BUFFER   = 0x00000100
     FM_FROM_SYSTEM = 0x00001000
     # Use a stack buffer version to avoid LocalFree bookkeeping
-    FormatMessageW(FM_FROM_SYSTEM, None, err, 0, buf, len(buf), None)
+    _win32().FormatMessageW(FM_FROM_SYSTEM, None, err, 0, buf, len(buf), None)
     return f"{err}: {buf.value.strip()}"
 
 
 def _send_input(inputs: list[INPUT]) -> bool:
     n = len(inputs)
     arr = (INPUT * n)(*inputs)
-    sent = SendInput(n, ctypes.byref(arr), ctypes.sizeof(INPUT))
+    sent = _win32().SendInput(n, ctypes.byref(arr), ctypes.sizeof(INPUT))
     if sent != n:
         print(f"[KEYS] SendInput failed ({sent}/{n}) :: {_last_error_msg()}")
         return False
     return True
 
 
-def press_key(letter: str, hold_ms: int = 60) -> bool:
-    """Press and release a key using scan codes (preferred by games)."""
+def _scan_code(letter: str) -> int | None:
     vk = VK.get(letter.lower())
     if vk is None:
         print(f"[KEYS] Unknown key '{letter}'")
-        return False
+        return None
 
     # MAPVK_VK_TO_VSC = 0
-    sc = MapVirtualKeyW(vk, 0)
+    sc = _win32().MapVirtualKeyW(vk, 0)
     if sc == 0:
         print(f"[KEYS] MapVirtualKey failed for '{letter}' (vk={vk})")
+        return None
+    return sc
+
+
+def key_down(letter: str) -> bool:
+    sc = _scan_code(letter)
+    if sc is None:
         return False
+    return _send_input([INPUT(type=INPUT_KEYBOARD, ki=KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE, 0, 0))])
 
-    down = INPUT(type=INPUT_KEYBOARD, ki=KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE, 0, 0))
-    up = INPUT(
-        type=INPUT_KEYBOARD, ki=KEYBDINPUT(0, sc, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0, 0)
-    )
 
-    if not _send_input([down]):
+def key_up(letter: str) -> bool:
+    sc = _scan_code(letter)
+    if sc is None:
+        return False
+    flags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
+    return _send_input([INPUT(type=INPUT_KEYBOARD, ki=KEYBDINPUT(0, sc, flags, 0, 0))])
+
+
+def press_key(letter: str, hold_ms: int = 60) -> bool:
+    """Press and release a key using scan codes (preferred by games)."""
+    if not key_down(letter):
         return False
     time.sleep(max(hold_ms, 1) / 1000.0)
-    return _send_input([up])
+    return key_up(letter)
@@ -4,34 +4,48 @@
 Minimal MQTT publisher + subscriber for Elite-Parser.
 - Publishes packets to elite/events/<type> as JSON
 - Subscribes to elite/cmd/# and forwards inbound messages to a handler
+- Every packet is also handed to in-process subscribers (utils.bus) first
+- Topics listed in outputs.mqtt.compression.topics are compressed on the
+  publisher thread (utils.compression), flagged with MQTT v5 user properties
+- Packets are queued in priority lanes (utils.priority): critical events are
+  published ahead of bulk snapshots and never dropped to make room for them
+- subscribe() adds raw topic subscriptions (e.g. the squadron aggregator
+  consuming elite/+/events/#); those messages bypass the command handler
+- [[outputs.mqtt.brokers]] adds publish-only brokers (utils.broker_pool), each
+  with its own connection(s), outbox and policy; packets are encoded once and the
+  same bytes go to the main client and every matching broker
+- Settings are read from the live config snapshot; broker/credential/topic
+  changes in config.toml reconnect or resubscribe without a restart
 """
 
 import json
-import queue
+import secrets
+import socket
 import threading
 import time
 from collections.abc import Callable
-from typing import Optional
+from typing import Any, Optional
 
-from utils.config import get
+from utils import bus
+from utils.broker_pool import BrokerPool, Message
+from utils.compression import Compressor
+from utils.config import Snapshot, on_change, snapshot
+from utils.instance import topic_namespace
+from utils.priority import NORMAL, PriorityOutbox, classify
+from utils.topics import TopicTrie, topic_matches
 
-try:
-    import paho.mqtt.client as mqtt
-except Exception:
-    mqtt = None
+# paho is imported on first start() so importing this module stays cheap
+mqtt = None
 
 CLIENT_ID = "elite-parser"
-BROKER = get("outputs.mqtt.broker")
-PORT = get("outputs.mqtt.port")
-BASE_TOPIC = get("general.base_topic")
-QOS = get("outputs.mqtt.qos", 0)
-RETAIN = get("outputs.mqtt.retain", False)
-USERNAME = get("outputs.mqtt.username", "")
-PASSWORD = get("outputs.mqtt.password", "")
-CMD_TOPIC = get("inputs.mqtt.cmd_topic", f"{BASE_TOPIC}/cmd/#")
+# Per launch: stable across reconnects, distinct for every process sharing a broker
+_ID_SUFFIX = secrets.token_hex(3)
 
 _client: Optional["mqtt.Client"] = None
-_outbox: "queue.Queue[tuple[str,str]]" = queue.Queue(maxsize=1000)
+# Messages in per-class lanes; configured from [priority] on start()
+_outbox = PriorityOutbox()
+_pool: BrokerPool | None = None  # extra brokers ([[outputs.mqtt.brokers]])
+_wire_lock = threading.Lock()
 _connected = threading.Event()
 _stop = threading.Event()
 
@@ -45,16 +59,43 @@ def set_command_handler(fn: Callable[[str, object], None]):
     _command_handler = fn
 
 
+# --- Raw topic subscriptions (copy-on-write, read lock-free on the network thread) ---
+_raw_subs: tuple[tuple[str, Callable[[str, bytes], None]], ...] = ()
+_raw_lock = threading.Lock()
+
+
+def subscribe(topic_filter: str, handler: Callable[[str, bytes], None], qos: int = 0):
+    """
+    Route messages matching topic_filter to handler(topic, payload_bytes).
+    Runs on the paho network thread, so the handler must be quick. Survives reconnects.
+    """
+    global _raw_subs
+    with _raw_lock:
+        _raw_subs = (*_raw_subs, (topic_filter, handler))
+    if _client is not None and _connected.is_set():
+        _client.subscribe(topic_filter, qos=qos)
+        print(f"[MQTT] Subscribed to {topic_filter}")
+
+
+def _cmd_topics(cfg: Snapshot) -> list[str]:
+    topics = [f"{cfg.general.base_topic}/cmd/#"]
+    if cfg.inputs.mqtt.cmd_topic not in topics:
+        topics.append(cfg.inputs.mqtt.cmd_topic)
+    return topics
+
+
 def _on_connect(client, userdata, flags, reason_code, properties=None):
     if reason_code == 0:
         _connected.set()
         print("[MQTT] Connected")
         # Resubscribe on reconnect
         try:
-            client.subscribe(f"{BASE_TOPIC}/cmd/#", qos=0)
-            client.subscribe(CMD_TOPIC, qos=0)
-
-            print(f"[MQTT] Subscribed to {BASE_TOPIC}/cmd/#")
+            for topic in _cmd_topics(snapshot()):
+                client.subscribe(topic, qos=0)
+                print(f"[MQTT] Subscribed to {topic}")
+            for topic, _ in _raw_subs:
+                client.subscribe(topic, qos=0)
+                print(f"[MQTT] Subscribed to {topic}")
         except Exception as e:
             print(f"[MQTT] Subscribe failed: {e}")
     else:
@@ -67,6 +108,17 @@ def _on_disconnect(client, userdata, reason_code, properties=None):
 
 
 def _on_message(client, userdata, msg):
+    routed = False
+    for topic_filter, handler in _raw_subs:
+        if topic_matches(topic_filter, msg.topic):
+            routed = True
+            try:
+                handler(msg.topic, msg.payload)
+            except Exception as e:
+                print(f"[MQTT] Handler for {topic_filter!r} failed: {e}")
+    if routed:
+        return
+
     payload_raw = msg.payload.decode("utf-8", errors="ignore").strip()
     payload: object
     # Try JSON first; if that fails, pass string
@@ -84,55 +136,216 @@ def _on_message(client, userdata, msg):
         print(f"[MQTT] CMD {msg.topic} :: {payload}")
 
 
+# (config table, topic trie, compressor), rebuilt when the compression table changes
+_compression: tuple[Snapshot | None, TopicTrie | None, Compressor | None] = (None, None, None)
+
+
+def _compressor_for(topic: str, cfg: Snapshot) -> Compressor | None:
+    global _compression
+    table = cfg.compression
+    if _compression[0] is not table:
+        trie = comp = None
+        if table.topics:
+            dictionary = None
+            if table.dictionary:
+                try:
+                    with open(table.dictionary, "rb") as f:
+                        dictionary = f.read()
+                except OSError as e:
+                    print(f"[MQTT] Compression dictionary unavailable ({e}); compressing without")
+            try:
+                comp = Compressor(table.codec, table.level, table.min_bytes, dictionary)
+                trie = TopicTrie(dict.fromkeys(table.topics, True))
+            except (ValueError, TypeError) as e:
+                print(f"[MQTT] Bad [outputs.mqtt.compression] settings, sending uncompressed: {e}")
+        _compression = (table, trie, comp)
+    _, trie, comp = _compression
+    if trie is None or not trie.lookup(topic, False):
+        return None
+    return comp
+
+
+def _publish_properties(user_props: list[tuple[str, str]]):
+    from paho.mqtt.packettypes import PacketTypes
+    from paho.mqtt.properties import Properties
+
+    props = Properties(PacketTypes.PUBLISH)
+    props.UserProperty = user_props
+    return props
+
+
+def _wire(msg: Message) -> tuple[Any, Any]:
+    """(payload, properties) as sent; compressed once, on whichever publisher gets there first."""
+    wire = msg.wire
+    if wire is None:
+        with _wire_lock:
+            wire = msg.wire
+            if wire is None:
+                payload, properties = msg.payload, None
+                comp = _compressor_for(msg.topic, snapshot().outputs.mqtt)
+                if comp is not None:
+                    try:
+                        payload, user_props = comp.encode(payload)
+                    except Exception as e:  # e.g. a codec library error; send it plain
+                        print(f"[MQTT] Compressing {msg.topic} failed, sending uncompressed: {e}")
+                        user_props = None
+                    if user_props:
+                        properties = _publish_properties(user_props)
+                wire = msg.wire = (payload, properties)
+    return wire
+
+
 def _publisher_thread():
     while not _stop.is_set():
-        try:
-            payload, topic = _outbox.get(timeout=0.5)
-        except queue.Empty:
+        got = _outbox.get(timeout=0.5)
+        if got is None:
             continue
+        msg, cls, enqueued = got
         while not _connected.is_set() and not _stop.is_set():
             time.sleep(0.5)
         if _stop.is_set():
             break
         if _client:
-            # Use configured QoS/retain (ensure you defined QOS/RETAIN earlier from config)
-            res = _client.publish(topic, payload=payload, qos=QOS, retain=RETAIN)
+            # Use configured QoS/retain from the live config snapshot
+            cfg = snapshot().outputs.mqtt
+            retain = cfg.retain if msg.retain is None else msg.retain
+            try:
+                payload, properties = _wire(msg)
+                res = _client.publish(
+                    msg.topic, payload=payload, qos=cfg.qos, retain=retain, properties=properties
+                )
+            except Exception as e:  # one bad message must not stop the publisher
+                print(f"[MQTT] Publish failed topic={msg.topic}: {e}")
+                res = None
 
             # Optional: if you want to block until the library hands it off to the socket:
             # res.wait_for_publish()
 
             # Optional: basic error logging
             if hasattr(res, "rc") and res.rc != mqtt.MQTT_ERR_SUCCESS:
-                print(f"[MQTT] Publish failed rc={res.rc} topic={topic}")
+                print(f"[MQTT] Publish failed rc={res.rc} topic={msg.topic}")
+            _outbox.done(cls, enqueued)
 
     print("[MQTT] Publisher thread exit")
 
 
+def client_id(cfg: Snapshot | None = None) -> str:
+    """
+    outputs.mqtt.client_id, or elite-parser-<cmdr>-<host>-<random>. A broker drops the
+    older session when a second client connects with the same id, so squadron members
+    and the aggregator on one broker must never share one.
+    """
+    cfg = cfg or snapshot()
+    if cfg.outputs.mqtt.client_id:
+        return cfg.outputs.mqtt.client_id
+    parts = [CLIENT_ID, topic_namespace(cfg.general.cmdr)[:16]]
+    parts += [topic_namespace(socket.gethostname())[:16], _ID_SUFFIX]
+    return "-".join(p for p in parts if p)
+
+
+_start_lock = threading.Lock()
+
+
 def start():
-    """Start MQTT client and background publisher thread (idempotent)."""
-    global _client
-    if mqtt is None:
-        print("[MQTT] paho-mqtt not installed. Skipping MQTT.")
-        return
+    """Start MQTT client and background publisher thread (idempotent, thread-safe)."""
+    with _start_lock:
+        _start()
+
+
+def _start():
+    global _client, mqtt
     if _client is not None:
         return
+    if mqtt is None:
+        try:
+            import paho.mqtt.client as mqtt
+        except Exception:
+            print("[MQTT] paho-mqtt not installed. Skipping MQTT.")
+            return
+    cfg = snapshot().outputs.mqtt
+    if not cfg.enabled:
+        print("[MQTT] Disabled in config. Skipping MQTT.")
+        return
 
-    _client = mqtt.Client(client_id=CLIENT_ID, protocol=mqtt.MQTTv5)
+    _outbox.configure_from(snapshot().priority)
+    with _wire_lock:
+        _compressor_for("", cfg)  # report bad compression settings now, not on the first packet
+    _client = mqtt.Client(client_id=client_id(), protocol=mqtt.MQTTv5)
     _client.on_connect = _on_connect
     _client.on_disconnect = _on_disconnect
     _client.on_message = _on_message
+    _connect(cfg)
 
-    if USERNAME:
-        _client.username_pw_set(USERNAME, PASSWORD)
+    threading.Thread(target=_publisher_thread, name="mqtt-pub", daemon=True).start()
+    _start_pool(cfg.brokers)
+    on_change(_on_config_change)
+
+
+def _start_pool(entries) -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+    if not entries:
+        return
+    try:
+        pool = BrokerPool(entries, _wire, client_prefix=client_id())
+    except ValueError as e:
+        print(f"[MQTT] Bad [[outputs.mqtt.brokers]] settings, extra brokers off: {e}")
+        return
+    pool.start()
+    _pool = pool
 
-    _client.connect_async(BROKER, PORT, keepalive=30)
+
+def _connect(cfg: Snapshot) -> None:
+    if cfg.username:
+        _client.username_pw_set(cfg.username, cfg.password)
+    _client.connect_async(cfg.broker, cfg.port, keepalive=30)
     _client.loop_start()
 
-    threading.Thread(target=_publisher_thread, name="mqtt-pub", daemon=True).start()
+
+_CONNECTION_KEYS = ("broker", "port", "username", "password")
+
+
+def _on_config_change(new: Snapshot, old: Snapshot) -> None:
+    """Re-tune the live client after config.toml changes."""
+    if _client is None:
+        return
+    if new.priority != old.priority:
+        try:
+            _outbox.configure_from(new.priority)
+        except ValueError as e:
+            print(f"[MQTT] Bad [priority] settings, keeping previous: {e}")
+    n, o = new.outputs.mqtt, old.outputs.mqtt
+    if n.compression != o.compression:
+        with _wire_lock:
+            _compressor_for("", n)
+    if n.brokers != o.brokers:
+        print("[MQTT] Extra brokers changed; reconnecting them")
+        _start_pool(n.brokers)
+    if any(n[k] != o[k] for k in _CONNECTION_KEYS):
+        print(f"[MQTT] Broker settings changed; reconnecting to {n.broker}:{n.port}")
+        _connected.clear()
+        try:
+            _client.loop_stop()
+            _client.disconnect()
+        except Exception:
+            pass
+        _connect(n)
+        return  # _on_connect subscribes to the new command topics
+    old_topics, new_topics = _cmd_topics(old), _cmd_topics(new)
+    if old_topics != new_topics and _connected.is_set():
+        for topic in set(old_topics) - set(new_topics):
+            _client.unsubscribe(topic)
+        for topic in set(new_topics) - set(old_topics):
+            _client.subscribe(topic, qos=0)
+            print(f"[MQTT] Subscribed to {topic}")
 
 
 def stop():
     _stop.set()
+    if _pool is not None:
+        _pool.stop()
     try:
         if _client:
             _client.loop_stop()
@@ -141,14 +354,59 @@ def stop():
         pass
 
 
-def publish_packet(packet: dict):
-    """Queue a packet for publish to elite/events/<type> as JSON."""
+def is_connected() -> bool:
+    return _connected.is_set()
+
+
+def packet_topic(packet: dict) -> str:
+    """<base>/events/<type>, or <base>/<cmdr>/events/<type> for namespaced packets."""
     t = packet.get("type", "Unknown")
-    topic = f"{BASE_TOPIC}/events/{t}"
-    payload = json.dumps(packet, separators=(",", ":"), ensure_ascii=False)
-    try:
-        _outbox.put_nowait((payload, topic))
-    except queue.Full:
-        _outbox.get_nowait()
-        _outbox.put_nowait((payload, topic))
-        print("[MQTT] Outbox full, dropped oldest")
+    base = snapshot().general.base_topic
+    ns = packet.get("cmdr")
+    return f"{base}/{ns}/events/{t}" if ns else f"{base}/events/{t}"
+
+
+def publish_packet(packet: dict, priority: int | None = None, *, connect: bool = False):
+    """
+    Deliver to in-process subscribers, then queue for elite/events/<type> as JSON
+    (elite/<cmdr>/events/<type> for multi-instance packets) in its priority lane.
+    Nothing connects on its own: the app calls start(); embedders that want the
+    broker brought up by their first packet pass connect=True.
+    """
+    since = time.perf_counter()
+    topic = packet_topic(packet)
+    bus.publish(topic, packet)
+    if connect and _client is None:
+        start()
+    if _client is None:
+        return  # no broker attached; skip serialization entirely
+    # Encoded once; the main client and every extra broker share these bytes
+    payload = json.dumps(packet, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    cls = classify(packet.get("type")) if priority is None else priority
+    _enqueue(Message(topic, payload), cls, since)
+
+
+def publish_raw(topic: str, payload: str, retain: bool | None = None, priority: int = NORMAL):
+    """Queue an already-encoded payload on an arbitrary topic (retain None = config)."""
+    if _client is None:
+        return
+    _enqueue(Message(topic, payload, retain), priority)
+
+
+def _enqueue(msg: Message, cls: int, since: float | None = None) -> None:
+    if not _outbox.put(msg, cls, since):
+        print(f"[MQTT] Outbox lane {cls} full, dropped one ({_outbox.policies[cls]})")
+    pool = _pool
+    if pool is not None:
+        pool.publish(msg, cls, since)
+
+
+def lane_stats() -> dict:
+    """Per-priority-class latency (p50/p99/max ms), counts, drops and queue depth."""
+    return _outbox.stats()
+
+
+def broker_stats() -> dict:
+    """Per extra broker and connection: connected, published/failed/throttled, lanes."""
+    pool = _pool
+    return pool.stats() if pool is not None else {}
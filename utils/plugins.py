@@ -0,0 +1,309 @@
+# utils/plugins.py
+# SPDX-License-Identifier: MIT
+"""
+Plugin handlers for journal events, run off the journal thread.
+- Discovery: Python files in [plugins] dir (default ./plugins) and installed
+  packages exposing the "elite_parser.plugins" entry point group
+- Each plugin gets its own worker thread and bounded queue (oldest dropped when
+  full), so a slow or crashing plugin never delays telemetry or other plugins
+- A handler running longer than its timeout is reported and the plugin's events are
+  skipped until it returns; max_failures errors in a row disable the plugin
+- Per-plugin timing and counters: stats()
+
+A plugin is a module (or object) with:
+    EVENTS = ["FSDJump", "Docked"]      # journal event types; "*" for every event
+    TIMEOUT_S = 2.0                      # optional, overrides plugins.timeout_s
+    def setup(ctx): ...                  # optional, once at load
+    def handle(event, ctx):              # event: read-only view of the journal entry
+        ctx.emit("Notified", {"system": event["StarSystem"]})   # new packet
+ctx.inst is the instance the event came from; ctx.settings is [plugins.settings.<name>].
+Events are deep read-only views (mappings and tuples) shared by every plugin, so no
+plugin can change what the parser publishes; copy with dict(event) to modify.
+Off unless plugins.enabled: any *.py in plugins.dir runs at startup.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Mapping
+from types import MappingProxyType
+from typing import Any
+
+from utils.config import snapshot
+from utils.instance import Instance, default_instance
+
+ENTRY_POINT_GROUP = "elite_parser.plugins"
+
+
+def readonly(value: Any) -> Any:
+    """Deep read-only view of a parsed JSON value: dicts -> mappingproxy, lists -> tuple."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: readonly(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(readonly(v) for v in value)
+    return value
+
+
+def _plain(value: Any) -> Any:
+    """Undo readonly() so emitted data serialises as JSON."""
+    if isinstance(value, Mapping):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, tuple | list):
+        return [_plain(v) for v in value]
+    return value
+
+
+class PluginContext:
+    """Handed to setup()/handle(); only touched from the plugin's own worker thread."""
+
+    def __init__(self, name: str, settings: Any):
+        self.name = name
+        self.settings = settings
+        self.inst: Instance = default_instance()
+
+    def emit(self, type_: str, data: Any) -> dict:
+        """Publish a new packet (source "plugin") to serial, MQTT and the bus."""
+        from utils.mqtt_output import publish_packet
+        from utils.serial_output import format_packet, send_to_serial
+
+        packet = format_packet("plugin", type_, _plain(data), cmdr=self.inst.ns)
+        packet["plugin"] = self.name
+        send_to_serial(packet)
+        publish_packet(packet)
+        return packet
+
+    def log(self, msg: str) -> None:
+        print(f"[PLUGIN:{self.name}] {msg}")
+
+
+class _Plugin:
+    def __init__(self, name: str, impl: Any, queue_size: int, timeout_s: float, max_failures: int):
+        self.name = name
+        self.impl = impl
+        events = getattr(impl, "EVENTS", ("*",))
+        # EVENTS = "FSDJump" would otherwise subscribe to "F", "S", "D", ...
+        self.events = frozenset((events,) if isinstance(events, str) else events)
+        self.timeout_s = float(getattr(impl, "TIMEOUT_S", timeout_s))
+        self.max_failures = max_failures
+        self.ctx = PluginContext(name, snapshot().plugins.settings.get(name, {}))
+        self.queue: deque[tuple[Mapping, Instance]] = deque(maxlen=max(int(queue_size), 1))
+        self.cv = threading.Condition()
+        self.busy_since: float | None = None
+        self.stalled = False
+        self.enabled = True
+        self.closed = False
+        self.failures = 0  # consecutive
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.thread = threading.Thread(target=self._run, name=f"plugin-{name}", daemon=True)
+
+    # --- producer side (journal thread) ---
+    def offer(self, event: Mapping, inst: Instance) -> None:
+        if not self.enabled:
+            return
+        busy = self.busy_since
+        if busy is not None and time.monotonic() - busy > self.timeout_s:
+            if not self.stalled:
+                self.stalled = True
+                self.ctx.log(f"handler exceeded {self.timeout_s:.1f}s; skipping events")
+                with self.cv:
+                    self.dropped += len(self.queue)
+                    self.queue.clear()
+            self.dropped += 1
+            return
+        with self.cv:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append((event, inst))
+            self.cv.notify()
+
+    # --- worker ---
+    def _run(self) -> None:
+        handle = self.impl.handle
+        while True:
+            with self.cv:
+                while not self.queue and not self.closed:
+                    self.cv.wait()
+                if self.closed:
+                    return
+                event, inst = self.queue.popleft()
+            if not self.enabled:
+                continue
+            self.ctx.inst = inst
+            start = time.monotonic()
+            self.busy_since = start
+            try:
+                handle(event, self.ctx)
+                self.failures = 0
+            except Exception as e:
+                self.errors += 1
+                self.failures += 1
+                self.ctx.log(f"{event.get('event')} failed: {e!r}")
+                if self.failures >= self.max_failures:
+                    self.enabled = False
+                    self.ctx.log(f"disabled after {self.failures} failures in a row")
+                    with self.cv:
+                        self.dropped += len(self.queue)
+                        self.queue.clear()
+            finally:
+                elapsed = time.monotonic() - start
+                self.busy_since = None
+                self.calls += 1
+                self.total_s += elapsed
+                self.max_s = max(self.max_s, elapsed)
+                if elapsed > self.timeout_s:
+                    self.timeouts += 1
+                if self.stalled:
+                    self.stalled = False
+                    self.ctx.log(f"handler returned after {elapsed:.1f}s; resuming")
+
+    def close(self) -> None:
+        with self.cv:
+            self.closed = True
+            self.cv.notify()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "stalled": self.stalled,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "dropped": self.dropped,
+            "queued": len(self.queue),
+            "avg_ms": round(1000 * self.total_s / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(1000 * self.max_s, 3),
+        }
+
+
+class PluginHost:
+    def __init__(self, queue_size: int = 256, timeout_s: float = 2.0, max_failures: int = 5):
+        self.queue_size = queue_size
+        self.timeout_s = timeout_s
+        self.max_failures = max_failures
+        self.plugins: dict[str, _Plugin] = {}
+        self._by_event: dict[str, tuple[_Plugin, ...]] = {}
+        self._wildcard: tuple[_Plugin, ...] = ()
+
+    def add(self, name: str, impl: Any) -> bool:
+        """Register and start one plugin; False (logged) if it is invalid or setup() fails."""
+        if name in self.plugins:
+            print(f"[PLUGIN] Duplicate plugin name {name!r}; skipping")
+            return False
+        if not callable(getattr(impl, "handle", None)):
+            print(f"[PLUGIN] {name}: no handle(event, ctx); skipping")
+            return False
+        plugin = _Plugin(name, impl, self.queue_size, self.timeout_s, self.max_failures)
+        setup = getattr(impl, "setup", None)
+        if callable(setup):
+            try:
+                setup(plugin.ctx)
+            except Exception as e:
+                print(f"[PLUGIN] {name}: setup failed: {e!r}")
+                return False
+        self.plugins[name] = plugin
+        if "*" in plugin.events:
+            self._wildcard = (*self._wildcard, plugin)
+        for ev in plugin.events - {"*"}:
+            self._by_event[ev] = (*self._by_event.get(ev, ()), plugin)
+        plugin.thread.start()
+        print(f"[PLUGIN] Loaded {name} ({', '.join(sorted(plugin.events))})")
+        return True
+
+    def dispatch(self, event: dict, inst: Instance) -> None:
+        """Journal thread: O(subscribers) appends, never waits on a plugin."""
+        targets = self._by_event.get(event.get("event"), ()) + self._wildcard
+        if not targets:
+            return
+        # The journal keeps using (and publishing) event; plugins share one frozen copy
+        view = readonly(event)
+        for plugin in targets:
+            plugin.offer(view, inst)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {name: p.stats() for name, p in self.plugins.items()}
+
+    def close(self) -> None:
+        for p in self.plugins.values():
+            p.close()
+
+
+def _load_file(path: str) -> Any:
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(f"elite_plugins.{name}", path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot load {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def discover(
+    directory: str, entry_points: bool = True, disabled: Iterable[str] = ()
+) -> list[tuple[str, Any]]:
+    """(name, plugin) pairs from a plugins directory and installed entry points.
+
+    Names in disabled are skipped before anything is imported, so a disabled
+    plugin's module-level code never runs.
+    """
+    skip = frozenset(disabled)
+    found: list[tuple[str, Any]] = []
+    if directory and os.path.isdir(directory):
+        for fname in sorted(os.listdir(directory)):
+            if not fname.endswith(".py") or fname.startswith("_") or fname[:-3] in skip:
+                continue
+            try:
+                found.append((fname[:-3], _load_file(os.path.join(directory, fname))))
+            except Exception as e:
+                print(f"[PLUGIN] Cannot import {fname}: {e!r}")
+    if entry_points:
+        from importlib.metadata import entry_points as _entry_points
+
+        for ep in _entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name in skip:
+                continue
+            try:
+                found.append((ep.name, ep.load()))
+            except Exception as e:
+                print(f"[PLUGIN] Cannot load entry point {ep.name}: {e!r}")
+    return found
+
+
+_host: PluginHost | None = None
+
+
+def load() -> PluginHost | None:
+    """Discover and start plugins per [plugins] (once). None when disabled or none found."""
+    global _host
+    cfg = snapshot().plugins
+    if _host is not None or not cfg.enabled:
+        return _host
+    host = PluginHost(cfg.queue_size, cfg.timeout_s, cfg.max_failures)
+    for name, impl in discover(cfg.dir, cfg.entry_points, cfg.disabled):
+        host.add(name, impl)
+    _host = host if host.plugins else None
+    return _host
+
+
+def set_host(host: PluginHost | None) -> None:
+    """Swap the process-wide host (tests, embedding)."""
+    global _host
+    _host = host
+
+
+def dispatch(event: dict, inst: Instance) -> None:
+    host = _host
+    if host is not None:
+        host.dispatch(event, inst)
+
+
+def stats() -> dict[str, dict[str, Any]]:
+    return _host.stats() if _host is not None else {}
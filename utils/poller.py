@@ -0,0 +1,242 @@
+# utils/poller.py
+# SPDX-License-Identifier: MIT
+"""
+Adaptive stat-based poller for directories where change notifications are unreliable
+(Proton/Wine, SMB/NFS-mounted Saved Games) — and for the journal everywhere.
+- Fast tier: os.stat() of the few known files (Status.json, ModulesInfo.json, the
+  current journal) each tick; a file fires when its (mtime, size) changes
+- Slow tier: one os.scandir() per directory every rescan_s picks up new journal
+  files and batches the stats of every watched file in that directory
+- Interval: min_interval right after activity (hot_s), then backs off to
+  warm_interval, and to idle_interval once nothing changed for idle_after_s or
+  every directory reports idle (e.g. after the journal's Shutdown event)
+- on_journal gets the newest journal's path, so readers need no directory listing
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import time
+from collections.abc import Callable, Mapping
+
+WATCH_MODES = ("auto", "watchdog", "poll")
+NETWORK_FS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "9p", "fuse.sshfs", "fuse.rclone", "davfs"}
+
+Sig = tuple[int, int]  # (st_mtime_ns, st_size)
+
+
+class _Dir:
+    __slots__ = ("path", "files", "on_journal", "idle_hint", "journal", "sigs", "next_rescan")
+
+    def __init__(self, path, files, on_journal, idle_hint):
+        self.path = path
+        self.files: dict[str, Callable[[], None]] = dict(files)
+        self.on_journal: Callable[[str], None] | None = on_journal
+        self.idle_hint: Callable[[], bool] | None = idle_hint
+        self.journal: str | None = None  # newest Journal*.log name
+        self.sigs: dict[str, Sig | None] = {}
+        self.next_rescan = 0.0
+
+
+class AdaptivePoller:
+    def __init__(
+        self,
+        min_interval: float = 0.025,
+        warm_interval: float = 0.04,
+        idle_interval: float = 5.0,
+        hot_s: float = 5.0,
+        idle_after_s: float = 60.0,
+        rescan_s: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval = min_interval
+        self.warm_interval = warm_interval
+        self.idle_interval = idle_interval
+        self.hot_s = hot_s
+        self.idle_after_s = idle_after_s
+        self.rescan_s = rescan_s
+        self._clock = clock
+        self._dirs: list[_Dir] = []
+        self._interval = min_interval
+        self.last_activity = clock()
+        self.ticks = 0
+        self.stats = 0
+
+    def watch(
+        self,
+        path: str,
+        files: Mapping[str, Callable[[], None]],
+        on_journal: Callable[[str], None] | None = None,
+        idle_hint: Callable[[], bool] | None = None,
+    ) -> None:
+        """Poll files (name -> handler) in path; on_journal fires for the newest Journal*.log."""
+        self._dirs.append(_Dir(path, files, on_journal, idle_hint))
+
+    # --- one tick ---
+    def poll_once(self) -> int:
+        """Check every directory once. Returns the number of handlers fired."""
+        now = self._clock()
+        self.ticks += 1
+        fired = 0
+        for d in self._dirs:
+            if now >= d.next_rescan:
+                d.next_rescan = now + (self.rescan_s if self._interval < self.idle_interval else 0)
+                changes = self._rescan(d)
+            else:
+                changes = self._stat_known(d)
+            for name in changes:
+                if name == d.journal:
+                    handler = functools.partial(d.on_journal, os.path.join(d.path, name))
+                else:
+                    handler = d.files.get(name)
+                if handler is None:
+                    continue
+                fired += 1
+                try:
+                    handler()
+                except Exception as e:
+                    print(f"[POLL] Handler for {name} failed: {e}")
+        if fired:
+            self.last_activity = now
+        self._interval = self._next_interval(now)
+        return fired
+
+    def _update(self, d: _Dir, name: str, sig: Sig | None, changes: list[str]) -> None:
+        old = d.sigs.get(name, ...)
+        d.sigs[name] = sig
+        if sig is None or old == sig:
+            return
+        # First sight of a file only counts for the journal (catch-up, like the old loop)
+        if old is not ... or name == d.journal:
+            changes.append(name)
+
+    def _stat_known(self, d: _Dir) -> list[str]:
+        changes: list[str] = []
+        names = list(d.files)
+        if d.journal is not None:
+            names.append(d.journal)
+        for name in names:
+            try:
+                st = os.stat(os.path.join(d.path, name))
+                sig: Sig | None = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                sig = None
+            self.stats += 1
+            self._update(d, name, sig, changes)
+        return changes
+
+    def _rescan(self, d: _Dir) -> list[str]:
+        """One scandir for the whole directory: new journal + stats of watched files."""
+        changes: list[str] = []
+        newest: str | None = None
+        found: dict[str, Sig] = {}
+        try:
+            with os.scandir(d.path) as it:
+                for entry in it:
+                    name = entry.name
+                    is_journal = name.startswith("Journal") and name.endswith(".log")
+                    if is_journal and d.on_journal is not None:
+                        if newest is None or name > newest:
+                            newest = name
+                        continue
+                    if name in d.files:
+                        st = entry.stat()  # free on Windows: comes with the listing
+                        found[name] = (st.st_mtime_ns, st.st_size)
+                if newest is not None:
+                    st = os.stat(os.path.join(d.path, newest))
+                    found[newest] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            print(f"[POLL] Cannot scan '{d.path}': {e}")
+            return changes
+        self.stats += len(found)
+        if newest != d.journal:
+            if d.journal is not None:
+                d.sigs.pop(d.journal, None)
+            d.journal = newest
+        for name in d.files:
+            self._update(d, name, found.get(name), changes)
+        if newest is not None:
+            self._update(d, newest, found[newest], changes)
+        return changes
+
+    # --- pacing ---
+    def _next_interval(self, now: float) -> float:
+        quiet = now - self.last_activity
+        if quiet < self.hot_s:
+            return self.min_interval
+        idle = all(d.idle_hint is not None and d.idle_hint() for d in self._dirs)
+        if idle or quiet >= self.idle_after_s:
+            return self.idle_interval
+        return min(max(self._interval * 1.5, self.min_interval), self.warm_interval)
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def kick(self) -> None:
+        """Treat now as activity (e.g. on resume) so polling starts fast."""
+        self.last_activity = self._clock()
+        self._interval = self.min_interval
+        for d in self._dirs:
+            d.next_rescan = 0.0
+
+
+# --- Mode selection ---
+def _is_wine() -> bool:
+    if sys.platform != "win32":
+        return False
+    try:
+        import ctypes
+
+        return hasattr(ctypes.WinDLL("ntdll"), "wine_get_version")
+    except Exception:
+        return False
+
+
+def _is_network_path(path: str) -> bool:
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        try:
+            import ctypes
+
+            DRIVE_REMOTE = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == (
+                DRIVE_REMOTE
+            )
+        except Exception:
+            return False
+    best, fstype = "", ""
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount = parts[1].replace("\\040", " ")
+                prefix = mount.rstrip("/") + "/"
+                if (path + "/").startswith(prefix) and len(mount) > len(best):
+                    best, fstype = mount, parts[2]
+    except OSError:
+        return False
+    return fstype in NETWORK_FS
+
+
+def _native_observer() -> bool:
+    try:
+        from watchdog.observers import Observer
+    except ImportError:
+        return False
+    return "Polling" not in Observer.__name__
+
+
+def choose_mode(path: str, configured: str = "auto") -> str:
+    """'watchdog' or 'poll' for a directory; auto polls where notifications can't be trusted."""
+    if configured in ("watchdog", "poll"):
+        return configured
+    if _is_wine() or _is_network_path(path) or not _native_observer():
+        return "poll"
+    return "watchdog"
@@ -0,0 +1,212 @@
+# utils/priority.py
+# SPDX-License-Identifier: MIT
+"""
+Priority classes for packets, so alarms never wait behind snapshots.
+- Every event type maps to a class: critical (hull/heat/shields/interdiction),
+  bulk (Loadout, ModulesSnapshot, ScanBatch, Derived) or normal; [priority]
+  critical/bulk lists extend the defaults
+- PriorityOutbox: one bounded lane per class with its own drop policy
+  (drop_oldest | drop_newest), dequeued strictly by class or by weights
+- Per-class latency (enqueue -> handed to the client) and drop counters: stats();
+  benchmarks/bench_priority.py measures alarms against a Loadout backlog
+- Only the MQTT outboxes (main client and [[outputs.mqtt.brokers]]) are laned:
+  serial output is a synchronous write with no queue, and bus subscribers get
+  each packet inline in publish order and drain their own queues
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from utils.config import Snapshot, snapshot
+
+CRITICAL, NORMAL, BULK = 0, 1, 2
+CLASS_NAMES = ("critical", "normal", "bulk")
+DROP_POLICIES = ("drop_oldest", "drop_newest")
+DEQUEUE_MODES = ("strict", "weighted")
+
+DEFAULT_CRITICAL = frozenset(
+    {
+        "HullDamage",
+        "HeatWarning",
+        "HeatDamage",
+        "ShieldState",
+        "Interdicted",
+        "Interdiction",
+        "EscapeInterdiction",
+        "UnderAttack",
+        "CockpitBreached",
+        "SelfDestruct",
+        "Died",
+    }
+)
+DEFAULT_BULK = frozenset(
+    {"Loadout", "ModulesSnapshot", "ScanBatch", "Derived", "Comms", "FlightTrack"}
+)
+
+# Status.json flags whose change makes a StatusDelta critical
+CRITICAL_FLAGS = frozenset(
+    {"BeingInterdicted", "IsInDanger", "Overheating", "ShieldsUp", "LowFuel", "FsdMassLocked"}
+)
+
+# (config table, event -> class) rebuilt when [priority] changes
+_classes: tuple[Snapshot | None, dict[str, int]] = (None, {})
+
+
+def _class_map(cfg: Snapshot) -> dict[str, int]:
+    global _classes
+    if _classes[0] is not cfg:
+        table = dict.fromkeys(DEFAULT_BULK | set(cfg.bulk), BULK)
+        table.update(dict.fromkeys(DEFAULT_CRITICAL | set(cfg.critical), CRITICAL))
+        _classes = (cfg, table)
+    return _classes[1]
+
+
+def classify(event_type: str | None) -> int:
+    """Priority class of an event/packet type (NORMAL when unlisted)."""
+    return _class_map(snapshot().priority).get(event_type or "", NORMAL)
+
+
+class LaneStats:
+    __slots__ = ("samples", "count", "dropped")
+
+    def __init__(self, window: int = 2048):
+        self.samples: deque[float] = deque(maxlen=window)  # seconds
+        self.count = 0
+        self.dropped = 0
+
+    def record(self, latency_s: float) -> None:
+        self.samples.append(latency_s)
+        self.count += 1
+
+    def summary(self) -> dict[str, Any]:
+        s = sorted(self.samples)
+        if not s:
+            return {"count": self.count, "dropped": self.dropped}
+
+        def pct(p: float) -> float:
+            return round(1000 * s[min(len(s) - 1, int(p * len(s)))], 3)
+
+        return {
+            "count": self.count,
+            "dropped": self.dropped,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": round(1000 * s[-1], 3),
+        }
+
+
+class PriorityOutbox:
+    """
+    Multi-lane replacement for queue.Queue: put(item, cls) never blocks,
+    get(timeout) returns (item, cls, enqueued_at) or None on timeout.
+    """
+
+    def __init__(
+        self,
+        sizes: tuple[int, ...] = (256, 1000, 200),
+        policies: tuple[str, ...] = ("drop_oldest", "drop_oldest", "drop_oldest"),
+        mode: str = "strict",
+        weights: tuple[int, ...] = (8, 3, 1),
+        clock=time.perf_counter,
+    ):
+        self._clock = clock
+        self._cv = threading.Condition()
+        self._lanes: list[deque[tuple[Any, float]]] = [deque() for _ in CLASS_NAMES]
+        self.stats_by_class = [LaneStats() for _ in CLASS_NAMES]
+        self._credit = [0] * len(CLASS_NAMES)
+        self.configure(sizes, policies, mode, weights)
+
+    def configure(
+        self,
+        sizes: tuple[int, ...],
+        policies: tuple[str, ...],
+        mode: str,
+        weights: tuple[int, ...],
+    ) -> None:
+        for p in policies:
+            if p not in DROP_POLICIES:
+                raise ValueError(f"unknown drop policy {p!r} (expected one of {DROP_POLICIES})")
+        if mode not in DEQUEUE_MODES:
+            raise ValueError(f"unknown dequeue mode {mode!r} (expected one of {DEQUEUE_MODES})")
+        with self._cv:
+            self.sizes = tuple(max(int(n), 1) for n in sizes)
+            self.policies = tuple(policies)
+            self.mode = mode
+            self.weights = tuple(max(int(w), 1) for w in weights)
+
+    def configure_from(self, cfg: Snapshot) -> None:
+        """Apply a [priority] config table."""
+        self.configure(
+            tuple(cfg.queue_size[n] for n in CLASS_NAMES),
+            tuple(cfg.drop[n] for n in CLASS_NAMES),
+            cfg.dequeue,
+            tuple(cfg.weights[n] for n in CLASS_NAMES),
+        )
+
+    def put(self, item: Any, cls: int = NORMAL, since: float | None = None) -> bool:
+        """
+        Enqueue; returns False if something was dropped to honour the lane's bound.
+        since: perf_counter() stamp latency is measured from (default: now).
+        """
+        now = self._clock() if since is None else since
+        with self._cv:
+            lane = self._lanes[cls]
+            ok = True
+            if len(lane) >= self.sizes[cls]:
+                self.stats_by_class[cls].dropped += 1
+                ok = False
+                if self.policies[cls] == "drop_newest":
+                    return False
+                lane.popleft()
+            lane.append((item, now))
+            self._cv.notify()
+        return ok
+
+    def _pick(self) -> int | None:
+        lanes = self._lanes
+        if self.mode == "strict":
+            for cls, lane in enumerate(lanes):
+                if lane:
+                    return cls
+            return None
+        # Smooth weighted round-robin over the non-empty lanes
+        ready = [cls for cls, lane in enumerate(lanes) if lane]
+        if not ready:
+            return None
+        total = 0
+        for cls in ready:
+            self._credit[cls] += self.weights[cls]
+            total += self.weights[cls]
+        best = max(ready, key=lambda c: self._credit[c])
+        self._credit[best] -= total
+        return best
+
+    def get(self, timeout: float | None = None) -> tuple[Any, int, float] | None:
+        with self._cv:
+            cls = self._pick()
+            if cls is None:
+                self._cv.wait(timeout)
+                cls = self._pick()
+                if cls is None:
+                    return None
+            item, enqueued = self._lanes[cls].popleft()
+        return item, cls, enqueued
+
+    def done(self, cls: int, enqueued: float) -> None:
+        """Record the end-to-end latency of an item after it has been handed off."""
+        self.stats_by_class[cls].record(self._clock() - enqueued)
+
+    def qsize(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._cv:
+            depth = [len(lane) for lane in self._lanes]
+        out = {}
+        for cls, name in enumerate(CLASS_NAMES):
+            out[name] = self.stats_by_class[cls].summary() | {"queued": depth[cls]}
+        return out
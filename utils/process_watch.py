@@ -0,0 +1,168 @@
+# utils/process_watch.py
+# SPDX-License-Identifier: MIT
+"""
+Cheap "is the game running?" checks.
+- Once the game is found its PID is remembered; later checks only ask whether
+  that PID still exists with the same name (no process-table walk)
+- While the game is absent, full scans back off exponentially
+- A platform start notifier (WMI on Windows, when available) or notify() cuts
+  the backoff short so a fresh launch is seen right away
+The process table is an injectable backend so the logic runs with fakes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Protocol
+
+
+class ProcessTable(Protocol):
+    def iter_processes(self) -> Iterable[tuple[int, str]]:
+        """Yield (pid, name) for every process."""
+        ...
+
+    def name_of(self, pid: int) -> str | None:
+        """Name of pid, or None if it no longer exists."""
+        ...
+
+
+class PsutilTable:
+    """Real process table backed by psutil."""
+
+    def __init__(self):
+        import psutil
+
+        self._psutil = psutil
+
+    def iter_processes(self) -> Iterable[tuple[int, str]]:
+        for p in self._psutil.process_iter(["name"]):
+            name = p.info.get("name")
+            if name:
+                yield p.pid, name
+
+    def name_of(self, pid: int) -> str | None:
+        try:
+            return self._psutil.Process(pid).name()
+        except self._psutil.Error:
+            return None
+
+
+class ProcessWatcher:
+    """
+    Tracks one process by name.
+    is_running() is O(1) while the game is up; while it is down, a full scan
+    runs at most every `backoff` seconds, doubling from min_backoff to max_backoff.
+    """
+
+    def __init__(
+        self,
+        process_name: str,
+        table: ProcessTable | None = None,
+        min_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._target = process_name.lower()
+        self._table = table if table is not None else PsutilTable()
+        self._min = min_backoff
+        self._max = max_backoff
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._backoff = min_backoff
+        self._next_scan = 0.0
+        self.scans = 0  # full table walks so far (handy for tuning/tests)
+
+    @property
+    def process_name(self) -> str:
+        return self._target
+
+    @property
+    def pid(self) -> int | None:
+        return self._pid
+
+    def notify(self) -> None:
+        """A process just started somewhere: scan on the next check."""
+        with self._lock:
+            self._reset_backoff()
+
+    def _reset_backoff(self) -> None:
+        self._backoff = self._min
+        self._next_scan = 0.0
+
+    def _scan(self) -> int | None:
+        self.scans += 1
+        for pid, name in self._table.iter_processes():
+            if name.lower() == self._target:
+                return pid
+        return None
+
+    def find(self) -> int | None:
+        """PID of the watched process or None. Cheap while it keeps running."""
+        with self._lock:
+            if self._pid is not None:
+                name = self._table.name_of(self._pid)
+                if name is not None and name.lower() == self._target:
+                    return self._pid
+                # Gone (or PID reused): start over with a fast scan
+                self._pid = None
+                self._reset_backoff()
+            now = self._clock()
+            if now < self._next_scan:
+                return None
+            self._pid = self._scan()
+            if self._pid is None:
+                self._next_scan = now + self._backoff
+                self._backoff = min(self._backoff * 2, self._max)
+            else:
+                self._reset_backoff()
+            return self._pid
+
+    def is_running(self) -> bool:
+        return self.find() is not None
+
+
+def start_notifier(watcher: ProcessWatcher) -> bool:
+    """
+    Best-effort: subscribe to OS process-start notifications and poke the watcher.
+    Uses WMI (pip install wmi) on Windows; returns False when unavailable.
+    """
+    try:
+        import pythoncom  # type: ignore
+        import wmi  # type: ignore
+    except Exception:
+        return False
+
+    def _loop():
+        pythoncom.CoInitialize()
+        try:
+            starts = wmi.WMI().Win32_ProcessStartTrace.watch_for()
+            while True:
+                event = starts()
+                if str(getattr(event, "ProcessName", "")).lower() == watcher.process_name:
+                    watcher.notify()
+        except Exception as e:
+            # Start traces need admin rights; fall back to backoff scanning
+            print(f"[PROC] Start notifications unavailable: {e}")
+        finally:
+            pythoncom.CoUninitialize()
+
+    threading.Thread(target=_loop, name="proc-notify", daemon=True).start()
+    return True
+
+
+_watchers: dict[str, ProcessWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(process_name: str) -> ProcessWatcher:
+    """Shared watcher per process name (tray supervisor, focus helpers, ...)."""
+    key = process_name.lower()
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = _watchers[key] = ProcessWatcher(process_name)
+            start_notifier(watcher)
+        return watcher
@@ -0,0 +1,360 @@
+# utils/serial_input.py
+# SPDX-License-Identifier: MIT
+"""
+Serial command input for button boxes: commands go straight to the CommandRouter
+(same keymap, focus check and rate limits as MQTT) without a broker round trip.
+
+Framing ([inputs.serial] framing = "auto" | "line" | "binary"; auto picks per frame):
+- Line:    [@<id> ]<topic> [<json payload>]\\n     e.g.  @7 ship/gear {"action":"hold"}
+           ack:  OK <id> <result>\\n  /  ERR <id> <result>\\n   (<id> is the topic when omitted)
+- Binary:  0x7E | len | id | body[len] | sum8(id, body)   body = topic [0x00 json payload]
+           ack:  0x7E | 1 | id | code | sum8                code = RESULT_CODES[result]
+Topics without the command prefix get it added ("ship/gear" -> "elite/cmd/ship/gear").
+
+Bursts: a reader thread parses frames into a bounded queue that a dispatcher thread
+drains into the router. While queued, commands can be merged (merge = "repeat":
+plain presses of one topic become a single repeat job; "dedupe": identical commands
+collapse). When the queue is full, overflow = "drop_oldest" | "drop_newest".
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import threading
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from utils.command_router import RESULTS, get_router
+from utils.config import snapshot
+from utils.input_scheduler import MAX_REPEAT
+
+FRAME_START = 0x7E
+MAX_LINE = 1024
+FRAMINGS = ("auto", "line", "binary")
+OVERFLOW = ("drop_oldest", "drop_newest")
+MERGE = ("none", "dedupe", "repeat")
+
+# Router results plus the ones decided here
+RESULT_CODES = {r: i for i, r in enumerate(RESULTS)} | {
+    "merged": 32,
+    "dropped": 33,
+    "bad_frame": 34,
+}
+
+
+def sum8(data: bytes) -> int:
+    return sum(data) & 0xFF
+
+
+def encode_binary(frame_id: int, body: bytes) -> bytes:
+    """Build one binary frame (used for acks here and by test/host tools)."""
+    if len(body) > 255:
+        raise ValueError("binary frame body is limited to 255 bytes")
+    head = bytes((frame_id & 0xFF,))
+    return bytes((FRAME_START, len(body))) + head + body + bytes((sum8(head + body),))
+
+
+@dataclass
+class Command:
+    topic: str
+    payload: Any
+    ack_id: str | int | None  # int for binary frames, str (or None) for lines
+    binary: bool = False
+    count: int = 1  # > 1 after "repeat" merges
+
+    @property
+    def plain(self) -> bool:
+        return not isinstance(self.payload, dict) or not self.payload
+
+    def routed_payload(self) -> Any:
+        if self.count > 1:
+            return {"action": "repeat", "count": self.count}
+        return self.payload
+
+
+def _parse_payload(raw: str) -> Any:
+    raw = raw.strip()
+    if not raw:
+        return ""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+class FrameParser:
+    """Incremental parser: feed() raw bytes, get complete Commands (or bad-frame ids)."""
+
+    def __init__(self, framing: str = "auto"):
+        if framing not in FRAMINGS:
+            raise ValueError(f"unknown framing {framing!r} (expected one of {FRAMINGS})")
+        self.framing = framing
+        self._buf = bytearray()
+        self.bad_frames = 0
+
+    def feed(self, data: bytes) -> list[Command | int]:
+        """Returns Commands, and ints for binary frame ids that failed their checksum."""
+        buf = self._buf
+        buf += data
+        out: list[Command | int] = []
+        while buf:
+            binary = self.framing == "binary" or (self.framing == "auto" and buf[0] == FRAME_START)
+            if binary:
+                if buf[0] != FRAME_START:  # resync on the next start byte
+                    start = buf.find(FRAME_START)
+                    del buf[: start if start >= 0 else len(buf)]
+                    continue
+                if len(buf) < 3:
+                    break
+                n = buf[1]
+                end = 3 + n + 1
+                if len(buf) < end:
+                    break
+                frame_id, body, check = buf[2], bytes(buf[3 : 3 + n]), buf[end - 1]
+                del buf[:end]
+                if sum8(bytes((frame_id,)) + body) != check:
+                    self.bad_frames += 1
+                    out.append(frame_id)
+                    continue
+                topic, _, payload = body.partition(b"\x00")
+                out.append(
+                    Command(
+                        topic.decode("utf-8", errors="replace"),
+                        _parse_payload(payload.decode("utf-8", errors="replace")),
+                        frame_id,
+                        binary=True,
+                    )
+                )
+                continue
+            nl = buf.find(b"\n")
+            if nl < 0:
+                if len(buf) > MAX_LINE:  # no newline in sight: drop the garbage
+                    self.bad_frames += 1
+                    buf.clear()
+                break
+            line = buf[:nl].decode("utf-8", errors="replace").strip()
+            del buf[: nl + 1]
+            if line:
+                out.append(self._parse_line(line))
+        return out
+
+    @staticmethod
+    def _parse_line(line: str) -> Command:
+        ack_id = None
+        if line.startswith("@"):
+            ack_id, _, line = line[1:].partition(" ")
+        topic, _, payload = line.strip().partition(" ")
+        return Command(topic, _parse_payload(payload), ack_id)
+
+
+class SerialCommandInput:
+    """
+    Reader + dispatcher threads over one serial link.
+    `link` is anything with read(n)/write(b) (a pyserial Serial by default), which
+    keeps the class usable over a pty or a socket in tests.
+    """
+
+    def __init__(
+        self,
+        port: str = "",
+        baud: int = 115200,
+        framing: str = "auto",
+        queue_size: int = 32,
+        overflow: str = "drop_oldest",
+        merge: str = "repeat",
+        ack: bool = True,
+        handler: Callable[[str, Any], str] | None = None,
+        cmd_prefix: str | None = None,
+        link=None,
+    ):
+        if overflow not in OVERFLOW:
+            raise ValueError(f"unknown overflow policy {overflow!r} (expected one of {OVERFLOW})")
+        if merge not in MERGE:
+            raise ValueError(f"unknown merge policy {merge!r} (expected one of {MERGE})")
+        self.port = port
+        self.baud = baud
+        self.parser = FrameParser(framing)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.merge = merge
+        self.ack = ack
+        self._handler = handler
+        self._prefix = cmd_prefix
+        self._link = link
+        self._owns_link = link is None
+        self._pending: deque[Command] = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.connected = threading.Event()  # set while the link is open
+        if link is not None:
+            self.connected.set()
+        self._threads: list[threading.Thread] = []
+        self.received = 0
+        self.dispatched = 0
+        self.merged = 0
+        self.dropped = 0
+
+    # --- lifecycle ---
+    def start(self) -> None:
+        for name, target in (("serial-in", self._read_loop), ("serial-dispatch", self._dispatch)):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2)
+        if self._owns_link and self._link is not None:
+            self._link.close()
+
+    def _open(self):
+        import serial  # pyserial; only needed when serial input is enabled
+
+        return serial.Serial(self.port, self.baud, timeout=0.1)
+
+    # --- reader thread ---
+    def _read_loop(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            if self._link is None:
+                try:
+                    self._link = self._open()
+                    self.connected.set()
+                    print(f"[SERIAL-IN] Listening on {self.port} @ {self.baud}")
+                    backoff = 1.0
+                except Exception as e:
+                    print(f"[SERIAL-IN] Cannot open {self.port}: {e}; retrying in {backoff:.0f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+            try:
+                # One byte blocks up to the port timeout; whatever else arrived comes with it
+                data = self._link.read(max(1, getattr(self._link, "in_waiting", 0)))
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                print(f"[SERIAL-IN] Read failed: {e}; reopening")
+                self.connected.clear()
+                if self._owns_link:
+                    with contextlib.suppress(Exception):
+                        self._link.close()
+                    self._link = None
+                else:
+                    return
+                continue
+            if data:
+                self.feed(data)
+
+    def feed(self, data: bytes) -> None:
+        """Parse raw bytes and queue the commands in them (reader thread, or tests)."""
+        for item in self.parser.feed(data):
+            if isinstance(item, int):
+                self._send_ack(Command("", "", item, binary=True), "bad_frame")
+                continue
+            self.received += 1
+            self._enqueue(self._qualify(item))
+
+    def _qualify(self, cmd: Command) -> Command:
+        prefix = self._prefix if self._prefix is not None else get_router().cmd_prefix
+        if not cmd.topic.startswith(prefix):
+            cmd.topic = prefix + cmd.topic.lstrip("/")
+        return cmd
+
+    def _enqueue(self, cmd: Command) -> None:
+        acks: list[tuple[Command, str]] = []
+        with self._cond:
+            target = self._merge_target(cmd)
+            if target is not None:
+                if self.merge == "repeat":
+                    target.count += 1
+                self.merged += 1
+                acks.append((cmd, "merged"))
+            else:
+                if len(self._pending) >= self.queue_size:
+                    self.dropped += 1
+                    if self.overflow == "drop_newest":
+                        acks.append((cmd, "dropped"))
+                        cmd = None
+                    else:
+                        acks.append((self._pending.popleft(), "dropped"))
+                if cmd is not None:
+                    self._pending.append(cmd)
+                    self._cond.notify()
+        for c, result in acks:
+            self._send_ack(c, result)
+
+    def _merge_target(self, cmd: Command) -> Command | None:
+        if self.merge == "none":
+            return None
+        for queued in reversed(self._pending):
+            if queued.topic != cmd.topic:
+                continue
+            if self.merge == "repeat":
+                if queued.plain and cmd.plain and queued.count < MAX_REPEAT:
+                    return queued
+            elif queued.payload == cmd.payload and queued.count == 1:
+                return queued
+            return None  # only merge into the newest queued command for this topic
+        return None
+
+    # --- dispatcher thread ---
+    def _dispatch(self) -> None:
+        handler = self._handler or (lambda topic, payload: get_router().handle(topic, payload))
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop.is_set():
+                    self._cond.wait()
+                if self._stop.is_set():
+                    return
+                cmd = self._pending.popleft()
+            try:
+                result = handler(cmd.topic, cmd.routed_payload()) or "queued"
+            except Exception as e:
+                print(f"[SERIAL-IN] {cmd.topic} -> handler failed: {e}")
+                result = "bad_payload"
+            self.dispatched += 1
+            self._send_ack(cmd, result)
+
+    # --- acks ---
+    def _send_ack(self, cmd: Command, result: str) -> None:
+        if not self.ack or self._link is None:
+            return
+        if cmd.binary:
+            data = encode_binary(int(cmd.ack_id or 0), bytes((RESULT_CODES.get(result, 255),)))
+        else:
+            ok = "OK" if result in ("queued", "cancelled", "merged") else "ERR"
+            data = f"{ok} {cmd.ack_id if cmd.ack_id is not None else cmd.topic} {result}\n".encode()
+        try:
+            with self._write_lock:
+                self._link.write(data)
+        except Exception as e:
+            print(f"[SERIAL-IN] Ack failed: {e}")
+
+
+_input: SerialCommandInput | None = None
+
+
+def start() -> SerialCommandInput | None:
+    """Start the configured serial command input ([inputs.serial]) once."""
+    global _input
+    cfg = snapshot().inputs.serial
+    if _input is not None or not cfg.enabled:
+        return _input
+    _input = SerialCommandInput(
+        cfg.port,
+        cfg.baud,
+        framing=cfg.framing,
+        queue_size=cfg.queue_size,
+        overflow=cfg.overflow,
+        merge=cfg.merge,
+        ack=cfg.ack,
+    )
+    _input.start()
+    return _input
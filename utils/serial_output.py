@@ -4,19 +4,22 @@
 _seq = 0
 
 
-def format_packet(source, type_, data):
+def format_packet(source, type_, data, cmdr=None):
     """Create a canonical packet with a monotonically increasing sequence number."""
     from datetime import datetime
 
     global _seq
     _seq += 1
-    return {
+    packet = {
         "source": source,  # "journal" | "status" | "modules" | "loadout" | "app"
         "type": type_,  # e.g., "FSDJump", "StatusDelta", "ModulesSnapshot", "Loadout"
         "timestamp": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
         "seq": _seq,
         "data": data,
     }
+    if cmdr:
+        packet["cmdr"] = cmdr  # multi-instance: topic namespace of the instance
+    return packet
 
 
 def send_to_serial(packet):
@@ -0,0 +1,504 @@
+# utils/spatial_index.py
+# SPDX-License-Identifier: MIT
+"""
+Spatial index of every star system a commander has visited (FSDJump, Location and
+CarrierJump StarPos), for "nearest visited", radius and "been within N ly" queries.
+- Coordinates live in a compact array('f') (x, y, z per system), bucketed into a
+  uniform grid of spatial.cell_ly cubes; queries only touch nearby cells, falling
+  back to cells ordered by distance bound when the neighbourhood is empty
+- Persisted as one little-endian binary file per instance, loaded at startup;
+  journals (and archive blocks) newer than the file's watermark are backfilled
+  in the background, new jumps are added as the journal is read
+- In process: index_for(inst).nearest(pos, k) / .radius(pos, ly) / .within(pos, ly)
+- Over MQTT: publish to <cmd prefix>$query/systems, e.g.
+      {"id": 7, "op": "nearest", "system": "Sol", "k": 5}
+      {"op": "radius", "pos": [0, 0, 0], "radius": 20}
+      {"op": "within", "radius": 100}           # around the current system
+  The reply goes to <base>/query/systems/result, or to payload "reply_to" when that
+  is a plain topic under <base>/query/ (never the command topic)
+- Off unless spatial.enabled
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Any
+
+from utils.config import Snapshot, snapshot
+from utils.instance import Instance, configured_instances, default_instance
+
+MAGIC = b"EPSI"
+FILE_VERSION = 1
+HEADER = struct.Struct("<4sHHI20s")  # magic, version, reserved, count, watermark
+POSITION_EVENTS = frozenset({"FSDJump", "Location", "CarrierJump"})
+QUERY_OPS = ("nearest", "radius", "within")
+
+
+def _epoch(ts: str) -> float:
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class SpatialIndex:
+    """Visited systems in flat arrays plus a grid of cell -> row indices."""
+
+    def __init__(self, cell_ly: float = 50.0):
+        self.cell = float(cell_ly)
+        self.xyz = array("f")
+        self.address = array("q")  # SystemAddress, -1 when the journal lacks it
+        self.visits = array("I")
+        self.last = array("d")  # epoch of the latest visit
+        self.names: list[str] = []
+        self.watermark = ""  # newest journal timestamp ingested
+        self.current: int | None = None  # row of the latest visit
+        self.dirty = False
+        self._keys: dict[Any, int] = {}
+        self._by_name: dict[str, int] = {}
+        self._grid: dict[tuple[int, int, int], list[int]] = {}
+        self._lock = threading.Lock()  # journal/backfill threads write, MQTT thread reads
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _cell(self, x: float, y: float, z: float) -> tuple[int, int, int]:
+        c = self.cell
+        return (math.floor(x / c), math.floor(y / c), math.floor(z / c))
+
+    def _insert(self, name: str, address: int, pos, last: float, visits: int) -> int:
+        i = len(self.names)
+        self.xyz.extend(pos)
+        self.address.append(address)
+        self.visits.append(visits)
+        self.last.append(last)
+        self.names.append(name)
+        self._keys[address if address >= 0 else name.lower()] = i
+        self._by_name.setdefault(name.lower(), i)
+        self._grid.setdefault(self._cell(*self.xyz[3 * i : 3 * i + 3]), []).append(i)
+        return i
+
+    def add(self, name: str, address: int | None, pos, ts: str = "") -> bool:
+        """Record one visit; True if the system is new to the index."""
+        address = -1 if address is None else int(address)
+        with self._lock:
+            i = self._keys.get(address if address >= 0 else name.lower())
+            new = i is None
+            if i is None:
+                i = self._insert(name, address, [float(v) for v in pos], 0.0, 0)
+            self.visits[i] += 1
+            if ts:
+                self.last[i] = max(self.last[i], _epoch(ts))
+                if ts >= self.watermark:
+                    self.watermark = ts
+                    self.current = i
+            else:
+                self.current = i
+            self.dirty = True
+        return new
+
+    def lookup(self, name: str) -> int | None:
+        return self._by_name.get(name.lower())
+
+    def position(self, i: int) -> tuple[float, float, float]:
+        x, y, z = self.xyz[3 * i : 3 * i + 3]
+        return (x, y, z)
+
+    # --- queries ---
+    def _dist2(self, i: int, px: float, py: float, pz: float) -> float:
+        xyz = self.xyz
+        dx, dy, dz = xyz[3 * i] - px, xyz[3 * i + 1] - py, xyz[3 * i + 2] - pz
+        return dx * dx + dy * dy + dz * dz
+
+    def _bound2(self, cell: tuple[int, int, int], p) -> float:
+        """Squared distance from p to the nearest point of a grid cell."""
+        total = 0.0
+        for c, v in zip(cell, p, strict=True):
+            lo = c * self.cell
+            d = lo - v if v < lo else v - (lo + self.cell) if v > lo + self.cell else 0.0
+            total += d * d
+        return total
+
+    def _cells_within(self, p, r: float):
+        """Occupied cells that may hold points within r of p."""
+        lo = self._cell(p[0] - r, p[1] - r, p[2] - r)
+        hi = self._cell(p[0] + r, p[1] + r, p[2] + r)
+        span = (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+        grid = self._grid
+        if span > len(grid):  # cheaper to walk the occupied cells
+            r2 = r * r
+            return [rows for cell, rows in grid.items() if self._bound2(cell, p) <= r2]
+        out = []
+        for cx in range(lo[0], hi[0] + 1):
+            for cy in range(lo[1], hi[1] + 1):
+                for cz in range(lo[2], hi[2] + 1):
+                    rows = grid.get((cx, cy, cz))
+                    if rows is not None:
+                        out.append(rows)
+        return out
+
+    def radius(self, p, r: float, limit: int | None = None) -> list[tuple[float, int]]:
+        """(distance, row) of systems within r ly of p, nearest first."""
+        px, py, pz = p
+        r2 = r * r
+        with self._lock:
+            hits = [
+                (d2, i)
+                for rows in self._cells_within(p, r)
+                for i in rows
+                if (d2 := self._dist2(i, px, py, pz)) <= r2
+            ]
+        hits.sort()
+        if limit is not None:
+            hits = hits[:limit]
+        return [(math.sqrt(d2), i) for d2, i in hits]
+
+    def within(self, p, r: float) -> bool:
+        """Has any visited system been within r ly of p? Stops at the first hit."""
+        px, py, pz = p
+        r2 = r * r
+        with self._lock:
+            return any(
+                self._dist2(i, px, py, pz) <= r2 for rows in self._cells_within(p, r) for i in rows
+            )
+
+    def nearest(self, p, k: int = 1, exclude: int | None = None) -> list[tuple[float, int]]:
+        """The k visited systems closest to p (optionally skipping one row), nearest first."""
+        px, py, pz = p
+        best: list[tuple[float, int]] = []  # max-heap of (-d2, row)
+
+        def consider(rows) -> None:
+            for i in rows:
+                if i == exclude:
+                    continue
+                d2 = self._dist2(i, px, py, pz)
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, i))
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, i))
+
+        with self._lock:
+            grid = self._grid
+            if not grid or k <= 0:
+                return []
+            cx, cy, cz = self._cell(px, py, pz)
+            # Expand shells of cells around p while they stay small relative to the grid
+            ring = 0
+            while (2 * ring + 1) ** 3 <= 4 * len(grid):
+                for x in range(cx - ring, cx + ring + 1):
+                    for y in range(cy - ring, cy + ring + 1):
+                        edge = x in (cx - ring, cx + ring) or y in (cy - ring, cy + ring)
+                        zs = range(cz - ring, cz + ring + 1) if edge else (cz - ring, cz + ring)
+                        for z in zs:
+                            rows = grid.get((x, y, z))
+                            if rows is not None:
+                                consider(rows)
+                # Anything outside shell `ring` is at least ring * cell away
+                if len(best) == k and -best[0][0] <= (ring * self.cell) ** 2:
+                    break
+                ring += 1
+            else:
+                # Sparse neighbourhood: visit occupied cells by their distance bound
+                seen = ring  # shells 0..ring-1 are done
+                cells = sorted(
+                    (self._bound2(cell, p), cell)
+                    for cell in grid
+                    if max(abs(cell[0] - cx), abs(cell[1] - cy), abs(cell[2] - cz)) >= seen
+                )
+                for bound, cell in cells:
+                    if len(best) == k and bound > -best[0][0]:
+                        break
+                    consider(grid[cell])
+        return sorted((math.sqrt(-nd2), i) for nd2, i in best)
+
+    def describe(self, i: int, distance: float | None = None) -> dict[str, Any]:
+        out: dict[str, Any] = {
+            "system": self.names[i],
+            "address": self.address[i] if self.address[i] >= 0 else None,
+            "pos": [round(v, 5) for v in self.position(i)],
+            "visits": self.visits[i],
+            "last_visit": (
+                time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.last[i]))
+                if self.last[i]
+                else None
+            ),
+        }
+        if distance is not None:
+            out["distance_ly"] = round(distance, 2)
+        return out
+
+    # --- persistence ---
+    def save(self, path: str) -> None:
+        with self._lock:
+            arrays = [array("f", self.xyz), array("q", self.address)]
+            arrays += [array("I", self.visits), array("d", self.last)]
+            names = "\n".join(self.names).encode("utf-8")
+            head = HEADER.pack(
+                MAGIC, FILE_VERSION, 0, len(self.names), self.watermark.encode("ascii")
+            )
+            self.dirty = False
+        if sys.byteorder == "big":
+            for a in arrays:
+                a.byteswap()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(head)
+            for a in arrays:
+                a.tofile(f)
+            f.write(struct.pack("<I", len(names)))
+            f.write(names)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, cell_ly: float = 50.0) -> SpatialIndex:
+        index = cls(cell_ly)
+        with open(path, "rb") as f:
+            magic, version, _, count, watermark = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != FILE_VERSION:
+                raise ValueError(f"{path}: not a v{FILE_VERSION} visited-systems index")
+            xyz, address, visits, last = array("f"), array("q"), array("I"), array("d")
+            xyz.fromfile(f, 3 * count)
+            for a in (address, visits, last):
+                a.fromfile(f, count)
+            (n,) = struct.unpack("<I", f.read(4))
+            names = f.read(n).decode("utf-8").split("\n") if count else []
+        if sys.byteorder == "big":
+            for a in (xyz, address, visits, last):
+                a.byteswap()
+        index.watermark = watermark.rstrip(b"\0").decode("ascii")
+        for i, name in enumerate(names):
+            index._insert(name, address[i], xyz[3 * i : 3 * i + 3], last[i], visits[i])
+        if names:
+            index.current = max(range(count), key=last.__getitem__)
+        return index
+
+
+# === Per-instance indexes ===
+class _Store:
+    """One instance's index, its file and the backfill bookkeeping."""
+
+    def __init__(self, inst: Instance):
+        cfg = snapshot().spatial
+        self.inst = inst
+        if cfg.path:
+            self.path = cfg.path.format(ns=inst.ns)
+        else:
+            self.path = f"visited_systems-{inst.ns}.bin" if inst.ns else "visited_systems.bin"
+        self.index = SpatialIndex(cfg.cell_ly)
+        if os.path.exists(self.path):
+            try:
+                self.index = SpatialIndex.load(self.path, cfg.cell_ly)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"{inst.label('SPATIAL')} Cannot load {self.path} ({e}); rebuilding")
+        # Live journal entries at or before this were ingested in an earlier run
+        self.loaded_upto = self.index.watermark
+        self.last_save = time.monotonic()
+        self.backfill: threading.Thread | None = None
+        print(f"{inst.label('SPATIAL')} {len(self.index)} visited systems from {self.path}")
+
+    def start_backfill(self, live_file: str | None) -> None:
+        self.backfill = threading.Thread(
+            target=self._backfill, args=(live_file,), name=f"spatial-backfill{self.inst.ns}"
+        )
+        self.backfill.daemon = True
+        self.backfill.start()
+
+    def _backfill(self, live_file: str | None) -> None:
+        """Journals (and archive blocks) newer than the saved watermark, minus the live one."""
+        from utils.journal_archive import JournalArchive, history
+
+        since = self.loaded_upto or None
+        cutoff = _epoch(since) if since else 0.0
+        try:
+            names = sorted(
+                f
+                for f in os.listdir(self.inst.elite_dir)
+                if f.startswith("Journal") and f.endswith(".log")
+            )
+        except OSError:
+            names = []
+        files = [os.path.join(self.inst.elite_dir, n) for n in names]
+        files = [p for p in files if p != live_file and os.path.getmtime(p) >= cutoff]
+        archive_dir = snapshot().archive.dir
+        archive = JournalArchive(archive_dir) if os.path.isdir(archive_dir) else None
+        before = len(self.index)
+        started = time.monotonic()
+        try:
+            for entry in history(files, archive, since, events=POSITION_EVENTS):
+                ts = entry.get("timestamp", "")
+                if entry.get("event") in POSITION_EVENTS and (not since or ts > since):
+                    _add_entry(self.index, entry)
+        except (OSError, ValueError) as e:
+            print(f"{self.inst.label('SPATIAL')} Backfill stopped: {e}")
+        if self.index.dirty:
+            self.save()
+        print(
+            f"{self.inst.label('SPATIAL')} Backfilled {len(self.index) - before} systems "
+            f"from {len(files)} journal(s) in {time.monotonic() - started:.1f}s"
+        )
+
+    def can_save(self) -> bool:
+        # Saving mid-backfill would move the watermark past journals not yet scanned
+        return self.backfill is None or not self.backfill.is_alive()
+
+    def save(self) -> None:
+        try:
+            self.index.save(self.path)
+        except OSError as e:
+            print(f"{self.inst.label('SPATIAL')} Cannot save {self.path}: {e}")
+        self.last_save = time.monotonic()
+
+
+_stores: dict[str, _Store] = {}
+_stores_lock = threading.Lock()
+
+
+def _add_entry(index: SpatialIndex, entry: dict) -> bool:
+    pos = entry.get("StarPos")
+    name = entry.get("StarSystem")
+    if not name or not isinstance(pos, list) or len(pos) != 3:
+        return False
+    index.add(name, entry.get("SystemAddress"), pos, entry.get("timestamp", ""))
+    return True
+
+
+def _store(inst: Instance) -> _Store:
+    store = _stores.get(inst.ns)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(inst.ns)
+            if store is None:
+                store = _stores[inst.ns] = _Store(inst)
+    return store
+
+
+def load(inst: Instance, live_file: str | None = None) -> SpatialIndex | None:
+    """Open (and backfill) one instance's index at startup; None when disabled."""
+    cfg = snapshot().spatial
+    if not cfg.enabled:
+        return None
+    store = _store(inst)
+    if cfg.backfill and store.backfill is None:
+        store.start_backfill(live_file)
+    return store.index
+
+
+def index_for(inst: Instance | None = None) -> SpatialIndex:
+    return _store(inst or default_instance()).index
+
+
+def on_journal_event(entry: dict, inst: Instance) -> None:
+    """Journal thread: add FSDJump/Location/CarrierJump positions as they are read."""
+    cfg = snapshot().spatial
+    if not cfg.enabled:
+        return
+    store = _store(inst)
+    ts = entry.get("timestamp", "")
+    if store.loaded_upto and ts <= store.loaded_upto:
+        return  # the live journal is re-read from the top on startup
+    if (
+        _add_entry(store.index, entry)
+        and time.monotonic() - store.last_save >= cfg.save_interval_s
+        and store.can_save()
+    ):
+        store.save()
+
+
+def flush() -> None:
+    """Write every index with unsaved visits (shutdown)."""
+    for store in list(_stores.values()):
+        if store.index.dirty and store.can_save():
+            store.save()
+
+
+# === MQTT request/response ===
+def _center(index: SpatialIndex, payload: dict) -> tuple[float, float, float] | None:
+    if "pos" in payload:
+        x, y, z = (float(v) for v in payload["pos"])
+        return (x, y, z)
+    if "system" in payload:
+        i = index.lookup(str(payload["system"]))
+        return None if i is None else index.position(i)
+    return None if index.current is None else index.position(index.current)
+
+
+def query(payload: dict, inst: Instance | None = None) -> dict[str, Any]:
+    """Run one query dict (see module docstring) and return the reply body."""
+    cfg = snapshot().spatial
+    index = index_for(inst)
+    op = payload.get("op", "nearest")
+    reply: dict[str, Any] = {"id": payload.get("id"), "op": op}
+    if op not in QUERY_OPS:
+        return reply | {"error": f"unknown op {op!r} (expected one of {QUERY_OPS})"}
+    center = _center(index, payload)
+    if center is None:
+        return reply | {"error": "unknown system" if "system" in payload else "no position yet"}
+    reply["center"] = [round(v, 5) for v in center]
+    limit = min(int(payload.get("limit", cfg.max_results)), cfg.max_results)
+    if op == "within":
+        reply["result"] = index.within(center, float(payload["radius"]))
+        return reply
+    if op == "radius":
+        hits = index.radius(center, float(payload["radius"]), limit)
+    else:
+        exclude = index.lookup(str(payload["system"])) if "system" in payload else None
+        if "pos" not in payload and "system" not in payload:
+            exclude = index.current
+        hits = index.nearest(center, min(int(payload.get("k", 1)), limit), exclude)
+    reply["results"] = [index.describe(i, d) for d, i in hits]
+    return reply
+
+
+def reply_topic(payload: dict, cfg: Snapshot) -> str | None:
+    """Where a query's reply goes; None when reply_to is not an allowed topic."""
+    prefix = f"{cfg.general.base_topic}/query/"
+    reply_to = payload.get("reply_to")
+    if reply_to is None:
+        return prefix + "systems/result"
+    cmd_prefix = cfg.inputs.mqtt.cmd_topic.rstrip("#").rstrip("/") + "/"
+    # A reply published onto the command topic would come straight back as a key press
+    if (
+        not isinstance(reply_to, str)
+        or not reply_to.startswith(prefix)
+        or reply_to.startswith(cmd_prefix)
+        or "+" in reply_to
+        or "#" in reply_to
+    ):
+        return None
+    return reply_to
+
+
+def handle_query(action: str, payload: Any) -> str:
+    """<cmd prefix>$query/<action>; returns a command_router result code."""
+    import json
+
+    from utils.mqtt_output import publish_raw
+
+    cfg = snapshot()
+    if action != "systems" or not cfg.spatial.enabled:
+        return "unmapped"
+    if not isinstance(payload, dict):
+        payload = {}
+    topic = reply_topic(payload, cfg)
+    if topic is None:
+        print(f"[SPATIAL] Refusing reply_to {payload.get('reply_to')!r}")
+        return "bad_payload"
+    inst = default_instance()
+    if payload.get("cmdr"):
+        inst = next((i for i in configured_instances() if payload["cmdr"] in (i.ns, i.name)), inst)
+    try:
+        reply = query(payload, inst)
+        result = "queued"
+    except (KeyError, TypeError, ValueError) as e:
+        reply = {"id": payload.get("id"), "error": f"bad query: {e!r}"}
+        result = "bad_payload"
+    publish_raw(topic, json.dumps(reply, separators=(",", ":"), ensure_ascii=False), retain=False)
+    return result
@@ -0,0 +1,301 @@
+# utils/status_block.py
+# SPDX-License-Identifier: MIT
+"""
+Fixed-layout live status record in a memory-mapped file, for local overlays that
+want the ship's flags, pips, fuel and position at any rate without MQTT or JSON.
+- Written by status.process_status_file (outputs.status_block), one file per
+  instance; read with StatusBlockReader, which only needs the stdlib
+- Seqlock: the writer makes `seq` odd, writes the body, makes it even again; a
+  reader retries while seq is odd or changed under it, so it never sees a torn record
+- Layout (little-endian, LAYOUT_VERSION bumps on any change):
+    header  magic "EPST" | u16 version | u16 record size | u32 seq
+    body    see BODY below; absent Status.json fields are flagged in `present`
+
+    from utils.status_block import StatusBlockReader
+    reader = StatusBlockReader(default_path())
+    rec = reader.read()          # StatusRecord or None before the first update
+    if rec and rec.flags & 1: ...
+"""
+
+from __future__ import annotations
+
+import errno
+import math
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+MAGIC = b"EPST"
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHI")
+SEQ_OFFSET = 8
+SEQ = struct.Struct("<I")
+BODY = struct.Struct(
+    "<d"  # updated_at: unix time the parser wrote this record
+    "d"  # game_ts: Status.json timestamp as unix time
+    "ddd"  # latitude, longitude, altitude
+    "q"  # balance
+    "II"  # flags, flags2
+    "ffff"  # fuel_main, fuel_reservoir, cargo, heading
+    "BBBBB"  # pips sys/eng/wep (half-pips, 0-8), fire_group, gui_focus
+    "x"
+    "H"  # present bits (P_*)
+)
+SIZE = HEADER.size + BODY.size
+
+# `present` bits: which optional Status.json fields the last update carried
+P_PIPS = 1 << 0
+P_FUEL = 1 << 1
+P_CARGO = 1 << 2
+P_LATLONG = 1 << 3
+P_ALTITUDE = 1 << 4
+P_HEADING = 1 << 5
+P_BALANCE = 1 << 6
+P_FIRE_GROUP = 1 << 7
+P_GUI_FOCUS = 1 << 8
+
+NAN = math.nan
+
+
+class StatusRecord(NamedTuple):
+    seq: int
+    updated_at: float
+    game_ts: float
+    latitude: float
+    longitude: float
+    altitude: float
+    balance: int
+    flags: int
+    flags2: int
+    fuel_main: float
+    fuel_reservoir: float
+    cargo: float
+    heading: float
+    pips_sys: int
+    pips_eng: int
+    pips_wep: int
+    fire_group: int
+    gui_focus: int
+    present: int
+
+    def has(self, bit: int) -> bool:
+        return bool(self.present & bit)
+
+
+def runtime_dir() -> str:
+    """Per-user directory for the status file: %LOCALAPPDATA% or $XDG_RUNTIME_DIR,
+    else a uid-suffixed directory under the temp dir (never the shared temp dir itself)."""
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "elite-parser")
+    xdg = os.environ.get("XDG_RUNTIME_DIR")
+    if xdg and os.path.isdir(xdg):
+        return os.path.join(xdg, "elite-parser")
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"elite-parser-{user}")
+
+
+def default_path(ns: str = "") -> str:
+    name = f"elite-parser-status-{ns}.bin" if ns else "elite-parser-status.bin"
+    return os.path.join(runtime_dir(), name)
+
+
+def _unix(ts) -> float:
+    if not ts:
+        return NAN
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return NAN
+
+
+def pack_status(data: dict, now: float | None = None) -> bytes:
+    """Status.json dict -> BODY bytes."""
+    present = 0
+    pips = data.get("Pips")
+    if isinstance(pips, list) and len(pips) == 3:
+        present |= P_PIPS
+    else:
+        pips = (0, 0, 0)
+    fuel = data.get("Fuel")
+    if isinstance(fuel, dict):
+        present |= P_FUEL
+    else:
+        fuel = {}
+
+    def opt(key: str, bit: int, default):
+        nonlocal present
+        value = data.get(key)
+        if value is None:
+            return default
+        present |= bit
+        return value
+
+    lat = opt("Latitude", P_LATLONG, NAN)
+    lon = data.get("Longitude", NAN)
+    return BODY.pack(
+        time.time() if now is None else now,
+        _unix(data.get("timestamp")),
+        lat,
+        lon,
+        opt("Altitude", P_ALTITUDE, NAN),
+        int(opt("Balance", P_BALANCE, 0)),
+        int(data.get("Flags", 0)) & 0xFFFFFFFF,
+        int(data.get("Flags2", 0)) & 0xFFFFFFFF,
+        fuel.get("FuelMain", NAN),
+        fuel.get("FuelReservoir", NAN),
+        opt("Cargo", P_CARGO, NAN),
+        opt("Heading", P_HEADING, NAN),
+        *(max(0, min(255, int(p))) for p in pips),
+        int(opt("FireGroup", P_FIRE_GROUP, 0)) & 0xFF,
+        int(opt("GuiFocus", P_GUI_FOCUS, 0)) & 0xFF,
+        present,
+    )
+
+
+class StatusBlockWriter:
+    """Single writer for one status file (one per instance)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Don't follow a planted symlink, and don't map (and truncate) a file someone
+        # else created at this path
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                raise OSError(errno.EINVAL, "not a regular file", path)
+            if hasattr(os, "getuid") and st.st_uid != os.getuid():
+                raise PermissionError(errno.EPERM, "owned by another user", path)
+            if st.st_size != SIZE:
+                os.ftruncate(fd, SIZE)
+            self._mm = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)  # the mapping keeps its own reference
+        magic, version, size, seq = HEADER.unpack_from(self._mm, 0)
+        if (magic, version, size) != (MAGIC, LAYOUT_VERSION, SIZE):
+            self._mm[:] = bytes(SIZE)
+            seq = 0
+        # Keep seq monotonic across restarts so readers' "changed?" checks stay valid
+        self._seq = seq + (seq & 1)
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, SIZE, self._seq)
+
+    def write(self, body: bytes) -> int:
+        seq = self._seq
+        SEQ.pack_into(self._mm, SEQ_OFFSET, (seq + 1) & 0xFFFFFFFF)
+        self._mm[HEADER.size : SIZE] = body
+        seq = (seq + 2) & 0xFFFFFFFF or 2  # 0 means "never written"
+        SEQ.pack_into(self._mm, SEQ_OFFSET, seq)
+        self._seq = seq
+        return seq
+
+    def update(self, data: dict) -> int:
+        return self.write(pack_status(data))
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class StatusBlockReader:
+    """Lock-free reader; read() copies one consistent record out of the mapping."""
+
+    def __init__(self, path: str | None = None, timeout: float = 0.5):
+        self.path = path or default_path()
+        self.timeout = timeout
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+        magic, version, size, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or size != SIZE or version != LAYOUT_VERSION:
+            self._mm.close()
+            raise ValueError(
+                f"{self.path}: status block v{version}/{size}B, "
+                f"reader expects v{LAYOUT_VERSION}/{SIZE}B"
+            )
+
+    @property
+    def seq(self) -> int:
+        """Current sequence number; cheap "has anything changed?" check."""
+        return SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+
+    def read(self) -> StatusRecord | None:
+        mm = self._mm
+        deadline = None
+        while True:
+            for _ in range(100):
+                before = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+                if before & 1:
+                    continue  # writer mid-update
+                body = BODY.unpack_from(mm, HEADER.size)
+                if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == before:
+                    return StatusRecord(before, *body) if before else None
+            # The writer was preempted mid-update (or died there): yield, then give up
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + self.timeout
+            elif now > deadline:
+                raise TimeoutError(f"{self.path}: writer stuck mid-update")
+            time.sleep(0)
+
+    def read_if_changed(self, last_seq: int) -> StatusRecord | None:
+        """None when nothing was written since last_seq (pass rec.seq from the last read)."""
+        if self.seq == last_seq:
+            return None
+        return self.read()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> StatusBlockReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def update(data: dict, inst) -> None:
+    """Called by status.process_status_file; no-op unless outputs.status_block.enabled."""
+    from utils.config import snapshot
+
+    cfg = snapshot().outputs.status_block
+    if not cfg.enabled:
+        return
+
+    def _open(path: str) -> StatusBlockWriter | None:
+        try:
+            writer = StatusBlockWriter(path)
+        except OSError as e:
+            print(f"{inst.label('STATUS')} Cannot map status block '{path}': {e}")
+            return None
+        print(f"{inst.label('STATUS')} Status block at {path}")
+        return writer
+
+    path = cfg.path.format(ns=inst.ns) if cfg.path else default_path(inst.ns)
+    holder = inst.state("status_block", lambda: [None, None])  # [path, writer]
+    if holder[0] != path:  # first update, or status_block.path was hot-reloaded
+        if holder[1] is not None:
+            holder[1].close()
+        holder[:] = [path, _open(path)]
+    if holder[1] is not None:
+        holder[1].update(data)
+
+
+if __name__ == "__main__":  # python -m utils.status_block [path]: live dump
+    import sys
+
+    with StatusBlockReader(sys.argv[1] if len(sys.argv) > 1 else None) as r:
+        last = -1
+        while True:
+            rec = r.read_if_changed(last)
+            if rec is not None:
+                last = rec.seq
+                print(rec)
+            time.sleep(0.05)
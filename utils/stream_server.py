@@ -0,0 +1,459 @@
+# utils/stream_server.py
+# SPDX-License-Identifier: MIT
+"""
+Built-in WebSocket + Server-Sent Events endpoint for browser dashboards (stdlib only).
+    ws://127.0.0.1:8765/ws?topic=elite/events/%23         JSON text frames
+    http://127.0.0.1:8765/events?topic=elite/events/+     text/event-stream
+- Packets come from the in-process bus; the producing thread only appends to an
+  inbox and wakes the server loop, so slow or many clients never touch the parse path
+- Each packet is encoded once and shared by every client that wants it
+- Per-client topic filters (repeat ?topic=; WebSocket clients may send
+  {"subscribe": [...]} / {"unsubscribe": [...]}), per-client bounded send queue;
+  a client whose queue fills up is disconnected
+- On connect a client first gets the latest packet of every topic it matches
+- Browser requests carrying an Origin header are only served when the origin is the
+  server's own (loopback) host or listed in allowed_origins; others get 403
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import struct
+import threading
+from collections import deque
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from utils import bus
+from utils.config import snapshot
+from utils.mqtt_output import packet_topic
+from utils.topics import topic_matches
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_CLIENT_FRAME = 64 * 1024
+INBOX_MAX = 10_000
+SSE_KEEPALIVE_S = 15.0
+LOOPBACK_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Unmasked server->client frame."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+def _close_frame(code: int, reason: str = "") -> bytes:
+    return ws_frame(struct.pack("!H", code) + reason.encode("utf-8"), opcode=0x8)
+
+
+class _Encoded:
+    """One packet, serialized lazily and at most once per wire format."""
+
+    __slots__ = ("topic", "packet", "_json", "_ws", "_sse")
+
+    def __init__(self, topic: str, packet: dict):
+        self.topic = topic
+        self.packet = packet
+        self._json: bytes | None = None
+        self._ws: bytes | None = None
+        self._sse: bytes | None = None
+
+    def json(self) -> bytes:
+        if self._json is None:
+            text = json.dumps(self.packet, separators=(",", ":"), ensure_ascii=False)
+            self._json = text.encode("utf-8")
+        return self._json
+
+    def ws(self) -> bytes:
+        if self._ws is None:
+            self._ws = ws_frame(self.json())
+        return self._ws
+
+    def sse(self) -> bytes:
+        if self._sse is None:
+            p = self.packet
+            head = f"event: {p.get('type', 'message')}\nid: {p.get('seq', '')}\n"
+            self._sse = head.encode("utf-8") + b"data: " + self.json() + b"\n\n"
+        return self._sse
+
+
+class _Client:
+    __slots__ = ("kind", "filters", "queue", "writer", "peer", "sent")
+
+    def __init__(self, kind: str, filters: list[str], writer, queue_size: int):
+        self.kind = kind  # "ws" | "sse"
+        self.filters = filters
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(queue_size)
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self.sent = 0
+
+    def wants(self, topic: str) -> bool:
+        return any(topic_matches(f, topic) for f in self.filters)
+
+    def frame(self, enc: _Encoded) -> bytes:
+        return enc.ws() if self.kind == "ws" else enc.sse()
+
+
+class StreamServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        queue_size: int = 256,
+        max_clients: int = 200,
+        write_timeout: float = 5.0,
+        allowed_origins: tuple[str, ...] | list[str] = (),
+    ):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.write_timeout = write_timeout
+        self.allowed_origins = frozenset(o.rstrip("/") for o in allowed_origins)
+        self.evicted = 0
+        self._clients: set[_Client] = set()
+        self._latest: dict[str, _Encoded] = {}
+        self._inbox: deque[tuple[str, dict]] = deque(maxlen=INBOX_MAX)
+        self._wake_pending = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping: asyncio.Event | None = None
+        self._ready = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._sub: bus.Subscription | None = None
+        self._error: BaseException | None = None
+
+    # --- lifecycle (any thread) ---
+    def start(self, attach_bus: bool = True) -> int:
+        """Start the server thread; returns the bound port (useful with port=0)."""
+        self._thread = threading.Thread(target=self._run, name="stream-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        if self._error is not None:
+            raise RuntimeError(f"stream server failed to start: {self._error}")
+        if attach_bus:
+            self._sub = bus.subscribe("#", callback=lambda p: self.publish(packet_topic(p), p))
+        print(f"[STREAM] Serving ws://{self.host}:{self.port}/ws and /events")
+        return self.port
+
+    def stop(self) -> None:
+        if self._sub is not None:
+            self._sub.close()
+            self._sub = None
+        loop, stopping = self._loop, self._stopping
+        if loop is not None and stopping is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def publish(self, topic: str, packet: dict) -> None:
+        """Hand a packet to the server loop. Cheap and non-blocking (producer thread)."""
+        loop = self._loop
+        if loop is None:
+            return
+        self._inbox.append((topic, packet))
+        if not self._wake_pending:
+            self._wake_pending = True
+            with contextlib.suppress(RuntimeError):  # loop closed during shutdown
+                loop.call_soon_threadsafe(self._drain_inbox)
+
+    # --- server loop ---
+    def _run(self) -> None:
+        try:
+            asyncio.run(self._main())
+        except BaseException as e:  # surface bind errors to start()
+            self._error = e
+            self._ready.set()
+
+    async def _main(self) -> None:
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        keepalive = asyncio.create_task(self._keepalive())
+        async with server:
+            await self._stopping.wait()
+        keepalive.cancel()
+        for client in list(self._clients):
+            self._drop(client, 1001, "server shutting down")
+
+    def _drain_inbox(self) -> None:
+        self._wake_pending = False  # before draining, so a concurrent append re-arms
+        inbox = self._inbox
+        while inbox:
+            topic, packet = inbox.popleft()
+            enc = _Encoded(topic, packet)
+            self._latest[topic] = enc
+            for client in list(self._clients):
+                if client.wants(topic):
+                    self._offer(client, client.frame(enc))
+
+    def _offer(self, client: _Client, data: bytes) -> None:
+        try:
+            client.queue.put_nowait(data)
+            return
+        except asyncio.QueueFull:
+            pass
+        # A full queue during a burst only means the pump hasn't run yet; the client
+        # is slow when its socket is backed up too
+        if self._flush_now(client):
+            client.queue.put_nowait(data)
+            return
+        self.evicted += 1
+        print(f"[STREAM] Evicting slow client {client.peer}")
+        self._drop(client, 1008, "too slow")
+
+    def _flush_now(self, client: _Client) -> bool:
+        transport = client.writer.transport
+        if transport.is_closing() or (
+            transport.get_write_buffer_size() > transport.get_write_buffer_limits()[1]
+        ):
+            return False
+        q = client.queue
+        chunks = [q.get_nowait() for _ in range(q.qsize())]
+        client.writer.write(b"".join(chunks))  # the queue never holds None while listed
+        client.sent += len(chunks)
+        return True
+
+    async def _keepalive(self) -> None:
+        """SSE comment lines so proxies and browsers don't time out idle streams."""
+        while True:
+            await asyncio.sleep(SSE_KEEPALIVE_S)
+            for client in list(self._clients):
+                if client.kind == "sse" and client.queue.empty():
+                    self._offer(client, b":\n\n")
+
+    def _drop(self, client: _Client, code: int, reason: str) -> None:
+        if client not in self._clients:
+            return
+        self._clients.discard(client)
+        try:
+            if client.kind == "ws":
+                client.writer.write(_close_frame(code, reason))
+            client.writer.close()
+        except Exception:
+            pass
+        # Wake the pump so its task ends
+        while True:
+            try:
+                client.queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                client.queue.get_nowait()
+
+    def _send_snapshot(self, client: _Client) -> None:
+        for topic, enc in list(self._latest.items()):
+            if client.wants(topic) and client.queue.qsize() < client.queue.maxsize:
+                client.queue.put_nowait(client.frame(enc))
+
+    # --- connections ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, target, headers = await asyncio.wait_for(_read_request(reader), 10)
+        except (asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        url = urlsplit(target)
+        filters = parse_qs(url.query).get("topic") or ["#"]
+        if method != "GET":
+            await _respond(writer, 405, "Method Not Allowed")
+        elif url.path not in ("/ws", "/events"):
+            body = json.dumps({"clients": self.clients, "evicted": self.evicted})
+            await _respond(writer, 200 if url.path == "/" else 404, "OK", body)
+        elif not self._origin_allowed(headers):
+            print(f"[STREAM] Refused origin {headers['origin']!r}")
+            await _respond(writer, 403, "Forbidden")
+        elif len(self._clients) >= self.max_clients:
+            await _respond(writer, 503, "Service Unavailable")
+        elif url.path == "/ws":
+            await self._serve_ws(reader, writer, headers, filters)
+        else:
+            await self._serve_sse(writer, filters, headers.get("origin"))
+
+    def _origin_allowed(self, headers: dict[str, str]) -> bool:
+        """No Origin (non-browser client), a listed origin, or the page this host serves."""
+        origin = headers.get("origin")
+        if origin is None or "*" in self.allowed_origins:
+            return True
+        if origin.rstrip("/") in self.allowed_origins:
+            return True
+        # Same host: the page was loaded from the address the request went to, and that
+        # address is ours (a Host check alone would let DNS rebinding through)
+        url = urlsplit(origin)
+        if url.scheme not in ("http", "https") or url.netloc != headers.get("host"):
+            return False
+        return url.hostname in LOOPBACK_HOSTS or url.hostname == self.host
+
+    async def _serve_ws(self, reader, writer, headers: dict[str, str], filters: list[str]):
+        key = headers.get("sec-websocket-key")
+        if not key or "websocket" not in headers.get("upgrade", "").lower():
+            await _respond(writer, 400, "Bad Request")
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        client = _Client("ws", filters, writer, self.queue_size)
+        self._clients.add(client)
+        self._send_snapshot(client)
+        pump = asyncio.create_task(self._pump(client))
+        try:
+            while client in self._clients:
+                opcode, data = await _read_frame(reader)
+                if opcode == 0x8:  # close
+                    break
+                if opcode == 0x9:  # ping
+                    writer.write(ws_frame(data, opcode=0xA))
+                elif opcode == 0x1:
+                    self._on_ws_message(client, data)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._drop(client, 1000, "")
+            await pump
+
+    def _on_ws_message(self, client: _Client, data: bytes) -> None:
+        try:
+            msg: Any = json.loads(data)
+        except ValueError:
+            return
+        if not isinstance(msg, dict):
+            return
+        added = [f for f in msg.get("subscribe", ()) if isinstance(f, str)]
+        removed = set(msg.get("unsubscribe", ()))
+        client.filters = [f for f in client.filters if f not in removed]
+        client.filters += [f for f in added if f not in client.filters]
+        if added or msg.get("snapshot"):
+            self._send_snapshot(client)
+
+    async def _serve_sse(self, writer, filters: list[str], origin: str | None = None) -> None:
+        # Cross-origin EventSource needs the (already vetted) origin echoed back
+        cors = f"Access-Control-Allow-Origin: {origin}\r\nVary: Origin\r\n" if origin else ""
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                f"Cache-Control: no-cache\r\n{cors}Connection: keep-alive\r\n\r\n"
+            ).encode("latin-1")
+        )
+        client = _Client("sse", filters, writer, self.queue_size)
+        self._clients.add(client)
+        self._send_snapshot(client)
+        await self._pump(client)
+        self._drop(client, 1000, "")
+
+    async def _pump(self, client: _Client) -> None:
+        """Write queued frames, coalescing whatever is already waiting into one drain()."""
+        q = client.queue
+        try:
+            while True:
+                item = await q.get()
+                if item is None:
+                    return
+                chunks = [item]
+                while not q.empty():
+                    nxt = q.get_nowait()
+                    if nxt is None:
+                        client.writer.write(b"".join(chunks))
+                        return
+                    chunks.append(nxt)
+                writer = client.writer
+                if writer.is_closing():
+                    return
+                writer.write(b"".join(chunks))
+                client.sent += len(chunks)
+                # Only wait when the socket is actually backed up: a wait_for() per
+                # write costs loop iterations that fan-out bursts can't spare
+                transport = writer.transport
+                if transport.get_write_buffer_size() > transport.get_write_buffer_limits()[1]:
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            if client in self._clients:
+                self.evicted += 1
+            self._drop(client, 1008, "write timeout")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str]]:
+    line = (await reader.readline()).decode("latin-1").strip()
+    parts = line.split()
+    if len(parts) != 3:
+        raise ValueError("bad request line")
+    headers: dict[str, str] = {}
+    for _ in range(100):
+        h = (await reader.readline()).decode("latin-1").strip()
+        if not h:
+            return parts[0], parts[1], headers
+        name, _, value = h.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise ValueError("too many headers")
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    b1, b2 = await reader.readexactly(2)
+    opcode, masked, n = b1 & 0x0F, b2 & 0x80, b2 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_CLIENT_FRAME:
+        raise ValueError("client frame too large")
+    mask = await reader.readexactly(4) if masked else b""
+    data = await reader.readexactly(n)
+    if masked:
+        data = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+    return opcode, data
+
+
+async def _respond(writer, status: int, reason: str, body: str = "") -> None:
+    payload = body.encode("utf-8")
+    ctype = "application/json" if body else "text/plain"
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+    )
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+_server: StreamServer | None = None
+
+
+def start() -> StreamServer | None:
+    """Start the configured server (outputs.stream) once; no-op when disabled.
+
+    A port that can't be bound is logged and leaves the stream off rather than
+    taking the parser down with it.
+    """
+    global _server
+    cfg = snapshot().outputs.stream
+    if _server is not None or not cfg.enabled:
+        return _server
+    server = StreamServer(
+        cfg.host, cfg.port, cfg.queue_size, cfg.max_clients, allowed_origins=cfg.allowed_origins
+    )
+    try:
+        server.start()
+    except RuntimeError as e:
+        print(f"[STREAM] Disabled: {e}")
+        return None
+    _server = server
+    return server
@@ -0,0 +1,296 @@
+# utils/supervisor.py
+# SPDX-License-Identifier: MIT
+"""
+Warm runtime supervisor for Elite-Parser.
+- Runs each component (journal poller, file watcher, ...) in its own thread
+- pause()/resume() gate the components without tearing anything down, so
+  imports, MQTT connection and parser state stay warm between game sessions
+- Components that crash (raise or return) are restarted with exponential backoff
+- serve_ipc() answers health/pause/resume/shutdown over a local authenticated
+  socket (multiprocessing.connection), used by the tray instead of Popen.poll().
+  The key is random per launch (handed over in ELITE_PARSER_IPC_KEY) and messages
+  are JSON (send_bytes/recv_bytes), never pickles
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+IPC_KEY_ENV = "ELITE_PARSER_IPC_KEY"
+IPC_HANDSHAKE_S = 2.0  # authenticate and send a request within this, or be hung up on
+IPC_MAX_PENDING = 8  # connections being served at once; more are closed straight away
+
+
+class RunContext:
+    """Handed to every component; wraps the shared pause/stop state."""
+
+    def __init__(self, active: threading.Event, stop: threading.Event):
+        self.active = active
+        self.stop = stop
+        self.kick = threading.Event()  # set on resume to cut sleeps short
+
+    def wait_active(self) -> bool:
+        """Block while paused. Returns False once the supervisor is shutting down."""
+        while not self.stop.is_set():
+            if self.active.wait(0.5):
+                return True
+        return False
+
+    def sleep(self, seconds: float) -> bool:
+        """Sleep up to seconds (woken early by resume). Returns False when stopping."""
+        if self.kick.wait(seconds):
+            self.kick.clear()
+        return not self.stop.is_set()
+
+
+class _Component:
+    def __init__(self, name: str, run: Callable[[RunContext], None], on_resume):
+        self.name = name
+        self.run = run
+        self.on_resume = on_resume
+        self.thread: threading.Thread | None = None
+        self.ctx: RunContext | None = None
+        self.restarts = 0
+        self.last_error: str | None = None
+        self.started_at = 0.0
+        self.backoff = 0.0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    def __init__(self, min_backoff: float = 1.0, max_backoff: float = 30.0):
+        self._components: dict[str, _Component] = {}
+        self._active = threading.Event()
+        self._stop = threading.Event()
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._started = time.time()
+        self._health_hooks: dict[str, Callable[[], Any]] = {}
+        self.stopped = threading.Event()
+
+    # --- setup ---
+    def add(
+        self,
+        name: str,
+        run: Callable[[RunContext], None],
+        on_resume: Callable[[], None] | None = None,
+    ) -> None:
+        self._components[name] = _Component(name, run, on_resume)
+
+    def add_health(self, name: str, fn: Callable[[], Any]) -> None:
+        """Extra field for health() (e.g. MQTT connection state)."""
+        self._health_hooks[name] = fn
+
+    # --- lifecycle ---
+    def start(self, active: bool = True) -> None:
+        if active:
+            self._active.set()
+        for comp in self._components.values():
+            self._launch(comp)
+        threading.Thread(target=self._monitor, name="supervisor", daemon=True).start()
+
+    def _launch(self, comp: _Component) -> None:
+        comp.ctx = RunContext(self._active, self._stop)
+        comp.started_at = time.monotonic()
+        comp.thread = threading.Thread(
+            target=self._guard, args=(comp,), name=f"sup-{comp.name}", daemon=True
+        )
+        comp.thread.start()
+
+    def _guard(self, comp: _Component) -> None:
+        try:
+            comp.run(comp.ctx)  # type: ignore[arg-type]
+            if not self._stop.is_set():
+                comp.last_error = "exited unexpectedly"
+        except Exception as e:
+            comp.last_error = f"{type(e).__name__}: {e}"
+            print(f"[SUP] {comp.name} crashed: {comp.last_error}")
+
+    def _monitor(self) -> None:
+        while not self._stop.wait(0.5):
+            now = time.monotonic()
+            for comp in self._components.values():
+                if comp.thread is not None and comp.thread.is_alive():
+                    # A minute of clean running forgives earlier crashes
+                    if comp.backoff and now - comp.started_at > 60:
+                        comp.backoff = 0.0
+                    continue
+                if not comp.restart_at:
+                    comp.backoff = min(max(comp.backoff * 2, self._min_backoff), self._max_backoff)
+                    comp.restart_at = now + comp.backoff
+                    print(f"[SUP] Restarting {comp.name} in {comp.backoff:.1f}s")
+                elif now >= comp.restart_at:
+                    comp.restart_at = 0.0
+                    comp.restarts += 1
+                    self._launch(comp)
+
+    def pause(self) -> None:
+        if self._active.is_set():
+            self._active.clear()
+            print("[SUP] Paused")
+
+    def resume(self) -> None:
+        if self._active.is_set():
+            return
+        self._active.set()
+        print("[SUP] Resumed")
+        for comp in self._components.values():
+            if comp.ctx is not None:
+                comp.ctx.kick.set()
+            if comp.on_resume is not None:
+                try:
+                    comp.on_resume()
+                except Exception as e:
+                    print(f"[SUP] {comp.name} resume hook failed: {e}")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._active.set()  # release anything blocked in wait_active()
+        for comp in self._components.values():
+            if comp.ctx is not None:
+                comp.ctx.kick.set()
+        for comp in self._components.values():
+            if comp.thread is not None:
+                comp.thread.join(timeout=2)
+        self.stopped.set()
+
+    @property
+    def active(self) -> bool:
+        return self._active.is_set() and not self._stop.is_set()
+
+    def health(self) -> dict[str, Any]:
+        report: dict[str, Any] = {
+            "pid": os.getpid(),
+            "active": self.active,
+            "uptime_s": round(time.time() - self._started, 1),
+            "components": {
+                c.name: {
+                    "alive": c.thread is not None and c.thread.is_alive(),
+                    "restarts": c.restarts,
+                    "last_error": c.last_error,
+                }
+                for c in self._components.values()
+            },
+        }
+        for name, fn in self._health_hooks.items():
+            try:
+                report[name] = fn()
+            except Exception as e:
+                report[name] = f"error: {e}"
+        return report
+
+
+# --- Local IPC ---
+def ipc_key() -> bytes | None:
+    """The per-launch key from ELITE_PARSER_IPC_KEY; None when the launcher set none."""
+    key = os.getenv(IPC_KEY_ENV)
+    return key.encode("utf-8") if key else None
+
+
+def _send(conn, obj: Any) -> None:
+    conn.send_bytes(json.dumps(obj, default=str).encode("utf-8"))
+
+
+def _recv(conn) -> Any:
+    return json.loads(conn.recv_bytes(65536))
+
+
+def serve_ipc(sup: Supervisor, port: int, authkey: bytes | None = None) -> int | None:
+    """
+    Answer {'cmd': 'health'|'pause'|'resume'|'shutdown'} on 127.0.0.1:port.
+    Returns the bound port, or None (IPC off) without a key or when the port is taken.
+
+    Each connection is authenticated and served on its own thread, and hung up on
+    after IPC_HANDSHAKE_S without a request, so a client that connects and goes
+    quiet can't hold up the tray's polls.
+    """
+    import socket
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+
+    authkey = authkey or ipc_key()
+    if not authkey:
+        print(f"[SUP] IPC off: no per-launch key in {IPC_KEY_ENV} (start from the tray app)")
+        return None
+    try:
+        server = socket.create_server(("127.0.0.1", port))
+    except OSError as e:
+        print(f"[SUP] IPC off: cannot listen on 127.0.0.1:{port}: {e}")
+        return None
+    actions: dict[str, Callable[[], None]] = {
+        "pause": sup.pause,
+        "resume": sup.resume,
+        "shutdown": sup.shutdown,
+    }
+    slots = threading.BoundedSemaphore(IPC_MAX_PENDING)
+
+    def _hang_up(sock) -> None:
+        with contextlib.suppress(OSError):
+            sock.shutdown(socket.SHUT_RDWR)  # wakes the handler's blocked read with EOF
+
+    def _handle(sock) -> None:
+        watchdog = threading.Timer(IPC_HANDSHAKE_S, _hang_up, args=(sock,))
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            # Connection gets its own handle so the watchdog can still shut the socket
+            with sock, Connection(sock.dup().detach()) as conn:
+                deliver_challenge(conn, authkey)
+                answer_challenge(conn, authkey)
+                if not conn.poll(2.0):
+                    return
+                request = _recv(conn)
+                watchdog.cancel()
+                cmd = request.get("cmd", "health") if isinstance(request, dict) else None
+                action = actions.get(cmd)
+                if action is not None:
+                    action()
+                _send(conn, sup.health())
+        except (EOFError, OSError, ValueError, AuthenticationError):
+            pass
+        finally:
+            watchdog.cancel()
+            slots.release()
+
+    def _serve():
+        while not sup.stopped.is_set():
+            try:
+                sock, _ = server.accept()
+            except OSError as e:
+                print(f"[SUP] IPC accept failed: {e}")
+                continue
+            if not slots.acquire(blocking=False):
+                sock.close()  # too many half-open clients; the tray just retries
+                continue
+            threading.Thread(target=_handle, args=(sock,), name="sup-ipc-conn", daemon=True).start()
+
+    bound = server.getsockname()[1]
+    threading.Thread(target=_serve, name="sup-ipc", daemon=True).start()
+    print(f"[SUP] IPC listening on 127.0.0.1:{bound}")
+    return bound
+
+
+def ipc_request(
+    port: int, cmd: str = "health", authkey: bytes | None = None, timeout: float = 1.0
+) -> dict[str, Any] | None:
+    """Send one command to a supervised parser; returns its health or None if unreachable."""
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+
+    authkey = authkey or ipc_key()
+    if not authkey:
+        return None
+    try:
+        with Client(("127.0.0.1", port), authkey=authkey) as conn:
+            _send(conn, {"cmd": cmd})
+            if conn.poll(timeout):
+                return _recv(conn)
+    except (OSError, EOFError, ValueError, AuthenticationError):
+        return None
+    return None
@@ -0,0 +1,78 @@
+# utils/topics.py
+# SPDX-License-Identifier: MIT
+"""
+MQTT topic helpers shared by the in-process bus and command routing.
+"""
+
+from __future__ import annotations
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Return True if topic matches an MQTT filter (supports '+' and trailing '#')."""
+    if pattern == topic or pattern == "#":
+        return True
+    p_parts = pattern.split("/")
+    t_parts = topic.split("/")
+    for i, p in enumerate(p_parts):
+        if p == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if p != "+" and p != t_parts[i]:
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+_MISSING = object()
+
+
+class _Node:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.value: object = _MISSING
+
+
+class TopicTrie:
+    """
+    Topic -> value map whose keys may contain MQTT wildcards.
+    lookup() walks one level per topic segment and prefers the most specific
+    key: a literal segment beats '+', which beats '#'.
+    """
+
+    def __init__(self, items: dict[str, object] | None = None):
+        self._root = _Node()
+        self._size = 0
+        for pattern, value in (items or {}).items():
+            self.insert(pattern, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, pattern: str, value: object) -> None:
+        node = self._root
+        for part in pattern.split("/"):
+            node = node.children.setdefault(part, _Node())
+        if node.value is _MISSING:
+            self._size += 1
+        node.value = value
+
+    def lookup(self, topic: str, default: object = None) -> object:
+        value = self._lookup(self._root, topic.split("/"), 0)
+        return default if value is _MISSING else value
+
+    def _lookup(self, node: _Node, parts: list[str], i: int) -> object:
+        if i == len(parts):
+            if node.value is not _MISSING:
+                return node.value
+            tail = node.children.get("#")  # 'a/#' also matches 'a'
+            return tail.value if tail is not None else _MISSING
+        for key in (parts[i], "+"):
+            child = node.children.get(key)
+            if child is not None:
+                value = self._lookup(child, parts, i + 1)
+                if value is not _MISSING:
+                    return value
+        tail = node.children.get("#")
+        return tail.value if tail is not None else _MISSING
@@ -4,34 +4,48 @@ from __future__ import annotations
 
 import ctypes
 import ctypes.wintypes as wt
+import functools
 
 import psutil
 
-user32 = ctypes.WinDLL("user32", use_last_error=True)
-GetForegroundWindow = user32.GetForegroundWindow
-GetWindowThreadProcessId = user32.GetWindowThreadProcessId
-SetForegroundWindow = user32.SetForegroundWindow
+from utils.focus import ForegroundTracker
+from utils.process_watch import get_watcher
+
+
+@functools.cache
+def _user32():
+    """Loaded on first use so importing this module works off-Windows."""
+    return ctypes.WinDLL("user32", use_last_error=True)
+
+
+def _foreground_window() -> int | None:
+    return _user32().GetForegroundWindow()
 
 
 def _pid_of_hwnd(hwnd: int) -> int | None:
     pid = wt.DWORD()
-    GetWindowThreadProcessId(wt.HWND(hwnd), ctypes.byref(pid))
+    _user32().GetWindowThreadProcessId(wt.HWND(hwnd), ctypes.byref(pid))
     return pid.value or None
 
 
-def is_process_foreground(process_name: str) -> bool:
-    """Return True if the foreground window belongs to process_name."""
-    hwnd = GetForegroundWindow()
-    if not hwnd:
-        return False
-    pid = _pid_of_hwnd(hwnd)
-    if not pid:
-        return False
+def _process_name(pid: int) -> str | None:
     try:
-        p = psutil.Process(pid)
-        return p.name().lower() == process_name.lower()
+        return psutil.Process(pid).name()
     except psutil.Error:
-        return False
+        return None
+
+
+def make_tracker() -> ForegroundTracker:
+    """Foreground tracker backed by Win32; only resolves names when the window changes."""
+    return ForegroundTracker(_foreground_window, _pid_of_hwnd, _process_name)
+
+
+_tracker = make_tracker()
+
+
+def is_process_foreground(process_name: str) -> bool:
+    """Return True if the foreground window belongs to process_name."""
+    return _tracker.is_foreground(process_name)
 
 
 def try_focus_process(process_name: str) -> bool:
@@ -39,13 +53,8 @@ def try_focus_process(process_name: str) -> bool:
     Best-effort: find a top-level window for process_name and bring it to front.
     Very minimal (no enumeration) to keep scope tight; returns False if not found.
     """
-    # Light-weight approach: scan processes with matching name and try their main window
-    for p in psutil.process_iter(["name", "pid"]):
-        if p.info.get("name", "").lower() == process_name.lower():
-            try:
-                # Return focus status directly; conservative: do not force focus
-                return is_process_foreground(process_name)
-            except psutil.Error:
-                continue  # keep if this is inside a loop; otherwise, use `return False`
-
-    return False
+    # Cached PID check instead of walking every process on the machine
+    if not get_watcher(process_name).is_running():
+        return False
+    # Return focus status directly; conservative: do not force focus
+    return is_process_foreground(process_name)